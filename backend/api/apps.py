@@ -6,7 +6,12 @@ class ApiConfig(AppConfig):
     name = 'api'
     
     def ready(self):
-        """Initialize app - preload YOLO models"""
+        """Initialize app - preload and warm up YOLO models (runserver / gunicorn only)"""
+        # عمق صف استنتاج در /api/metrics/
+        from .inference import executor
+        from .views import metrics
+        metrics.QUEUE_DEPTH.labels(queue='inference').set_function(lambda: executor.in_flight)
+
         # Only preload in production, not during migrations
         import sys
         if 'runserver' in sys.argv or 'gunicorn' in sys.argv[0]:
@@ -14,11 +19,15 @@ class ApiConfig(AppConfig):
                 print("\n" + "="*60)
                 print("Preloading YOLO models...")
                 print("="*60)
-                from .yolo_service import preload_models
-                preload_models()
+                from .yolo_service import warm_up
+                warm_up()
                 print("="*60)
                 print("✓ YOLO models ready")
                 print("="*60 + "\n")
             except Exception as e:
                 print(f"⚠ Warning: Could not preload models: {e}")
                 print("Models will be loaded on first request")
+
+            # پنجره ورودهای اخیر برای حذف تکراری (بدون کوئری در هر درخواست)
+            from .views import db
+            db.load_recent_entries()
@@ -0,0 +1,149 @@
+"""
+اجرای استنتاج YOLO روی یک استخر نخ محدود
+
+The detection views used to run detect_plate_in_image() on the request
+thread, so one slow inference held a whole worker and an upload burst
+queued behind it until every worker was busy. The async views now hand
+inference to this executor instead.
+
+The executor has `workers` threads and room for at most `max_pending`
+further jobs waiting behind them. When every slot is taken, submit()
+raises QueueFull immediately. The views turn that into 429, so a burst is
+rejected up front and does not turn into a long tail of timeouts.
+
+Configured with PARKING_INFERENCE_WORKERS (default 1: the models are
+shared module globals and one CPU inference at a time is the fastest
+overall) and PARKING_INFERENCE_QUEUE (default 8).
+
+`readiness` holds the state of the model warm-up (yolo_service.warm_up)
+for /api/ready/. It lives here rather than in yolo_service so the
+readiness check never imports the vision stack.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 1
+DEFAULT_MAX_PENDING = 8
+
+
+class QueueFull(Exception):
+    """همه ظرفیت استنتاج (در حال اجرا + صف) پر است"""
+
+
+class InferenceExecutor:
+    """ThreadPoolExecutor با صف محدود که به جای انتظار، QueueFull می‌دهد"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inference')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self):
+        """تعداد کارهای در حال اجرا یا در صف"""
+        return self._in_flight
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def _job(self, fn, args):
+        # جا قبل از تکمیل future آزاد می‌شود، پس هر کس نتیجه را دید می‌تواند دوباره submit کند
+        try:
+            return fn(*args)
+        finally:
+            self._release()
+
+    def submit(self, fn, *args):
+        """fn را در صف می‌گذارد؛ اگر جا نباشد QueueFull"""
+        if not self._slots.acquire(blocking=False):
+            raise QueueFull(f"{self.workers + self.max_pending} inference jobs already in flight")
+        with self._lock:
+            self._in_flight += 1
+        try:
+            # مثل asyncio.to_thread: contextvars (ردیابی درخواست) به نخ استنتاج هم برسد
+            context = contextvars.copy_context()
+            return self._pool.submit(context.run, self._job, fn, args)
+        except BaseException:
+            self._release()
+            raise
+
+    async def run(self, fn, *args):
+        """نسخه async از submit: نتیجه fn را await می‌کند"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+
+executor = InferenceExecutor(
+    workers=int(os.environ.get('PARKING_INFERENCE_WORKERS', DEFAULT_WORKERS)),
+    max_pending=int(os.environ.get('PARKING_INFERENCE_QUEUE', DEFAULT_MAX_PENDING)),
+)
+
+
+class Readiness:
+    """وضعیت گرم‌کردن مدل‌ها: cold -> warming -> ready | failed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = 'cold'
+            self.models = {}
+            self.error = None
+            self.started_at = None
+            self.finished_at = None
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def begin(self):
+        """True اگر این فراخواننده گرم‌کردن را شروع کرد (نه کس دیگری)"""
+        with self._lock:
+            if self.state in ('warming', 'ready'):
+                return False
+            self.state = 'warming'
+            self.models = {}
+            self.error = None
+            self.started_at = time.time()
+            self.finished_at = None
+            return True
+
+    def record(self, name, **timings):
+        with self._lock:
+            self.models[name] = timings
+
+    def finish(self, error=None):
+        with self._lock:
+            self.state = 'failed' if error else 'ready'
+            self.error = error
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            data = {
+                'ready': self.state == 'ready',
+                'state': self.state,
+                'models': {name: dict(timings) for name, timings in self.models.items()},
+            }
+            if self.started_at and self.finished_at:
+                data['warmup_ms'] = round((self.finished_at - self.started_at) * 1000, 1)
+            if self.error:
+                data['error'] = self.error
+            return data
+
+
+readiness = Readiness()
@@ -1,25 +1,55 @@
 """
 Authentication middleware for token-based authentication.
 """
+import asyncio
+import random
 import sys
 import os
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 
 # Add src directory to path to import database functions
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import database as db
+import metrics
 
 from .error_responses import unauthorized_error, forbidden_error
+from . import profiling
 
 
 class TokenAuthenticationMiddleware:
     """
     Middleware to validate authentication tokens and attach user to request.
+    
+    Sync and async capable: under ASGI a sync-only middleware would run every
+    async view (the detection endpoints) through one shared thread, one
+    request at a time. The token lookup itself still hits SQLite, so the
+    async path does it in a worker thread.
     """
+    sync_capable = True
+    async_capable = True
     
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
     
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        self.authenticate(request)
+        response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        if request.META.get('HTTP_AUTHORIZATION', '').startswith('Token '):
+            await asyncio.to_thread(self.authenticate, request)
+        else:
+            self.authenticate(request)
+        return await self.get_response(request)
+    
+    def authenticate(self, request):
         # Extract token from Authorization header
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
         
@@ -43,8 +73,124 @@ class TokenAuthenticationMiddleware:
             request.user_data = None
             request.user_id = None
             request.auth_token = None
-        
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of every API request in
+    parking_http_request_duration_seconds{view, method, status}.
+    
+    Goes first in MIDDLEWARE so the time covers the whole middleware chain.
+    The view label is the URL name (e.g. 'detect-exit'), never the raw
+    path, so plate numbers and ids in URLs do not create new series.
+    Sync and async capable, like TokenAuthenticationMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
         response = self.get_response(request)
+        self.observe(request, response, start)
+        return response
+    
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, start)
+        return response
+    
+    @staticmethod
+    def observe(request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            view=view, method=request.method, status=response.status_code,
+        ).observe(time.perf_counter() - start)
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiling (see api.profiling).
+    
+    A fraction SAMPLE_RATE of requests is profiled. With SLOW_MS set,
+    every other request is traced too but kept only if it took longer.
+    Kept profiles go to the rolling on-disk buffer and the response gets
+    an X-Profile-Id header. With neither setting, requests pass straight
+    through.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = profiling.get_config()
+        profile = self.start(request, config)
+        if profile is None:
+            return self.get_response(request)
+        # view همگام روی همین نخ اجرا می‌شود
+        profile.attach_thread()
+        token = metrics.current_trace.set(profile)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.current_trace.reset(token)
+            profile.detach_thread()
+            profiling.sampler.remove(profile)
+        return self.finish(profile, response, time.perf_counter() - start, config)
+    
+    async def __acall__(self, request):
+        config = profiling.get_config()
+        profile = self.start(request, config)
+        if profile is None:
+            return await self.get_response(request)
+        # نخ event loop نمونه‌برداری نمی‌شود؛ کار واقعی در فازها (to_thread / executor) است
+        token = metrics.current_trace.set(profile)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.current_trace.reset(token)
+            profiling.sampler.remove(profile)
+        return self.finish(profile, response, time.perf_counter() - start, config)
+    
+    @staticmethod
+    def start(request, config):
+        if config['SAMPLE_RATE'] > 0 and random.random() < config['SAMPLE_RATE']:
+            reason = 'sampled'
+        elif config['SLOW_MS'] > 0:
+            reason = 'slow'
+        else:
+            return None
+        profile = profiling.RequestProfile(request.method, request.path, reason)
+        profiling.sampler.add(profile, config['INTERVAL_MS'])
+        return profile
+    
+    @staticmethod
+    def finish(profile, response, elapsed, config):
+        if profile.reason == 'slow' and elapsed * 1000 < config['SLOW_MS']:
+            return response
+        data = profile.to_dict(response.status_code, elapsed, config['INTERVAL_MS'])
+        try:
+            profiling.get_store(config).save(data)
+        except OSError as e:
+            print(f"⚠ Could not save request profile: {e}")
+            return response
+        response['X-Profile-Id'] = profile.id
         return response
 
 
@@ -0,0 +1,98 @@
+"""
+Pagination and filtering helpers for the history endpoints.
+
+Entries and exits grow without bound, so list endpoints use cursor
+pagination on the primary key (stable under concurrent inserts and
+served by the rowid index), and the bulk export streams rows instead
+of building the whole response in memory.
+"""
+
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from rest_framework.pagination import CursorPagination
+
+
+# Number of rows fetched from SQLite per round-trip while streaming
+STREAM_CHUNK_SIZE = 2000
+
+
+class HistoryCursorPagination(CursorPagination):
+    """Cursor pagination for entry/exit history (newest first)."""
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+def _parse_bound(value, param_name, end_of_range=False):
+    """
+    Parse a date range bound from the query string.
+
+    Accepts 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'. A bare date used as
+    the upper bound covers the whole day.
+    Raises ValueError on malformed input.
+    """
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        if end_of_range and fmt == "%Y-%m-%d":
+            parsed += timedelta(days=1)
+        return timezone.make_aware(parsed, timezone.get_default_timezone())
+
+    raise ValueError(f"Invalid {param_name}: {value}. Use YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+
+
+def filter_history(queryset, params, timestamp_field):
+    """
+    Apply the common history filters to a queryset.
+
+    Query parameters:
+        plate:     exact plate match
+        date_from: inclusive lower bound on the timestamp
+        date_to:   upper bound (a bare date includes the whole day)
+
+    Raises ValueError if a date bound is malformed.
+    """
+    plate = params.get('plate')
+    if plate:
+        queryset = queryset.filter(plate=plate)
+
+    date_from = params.get('date_from')
+    if date_from:
+        start = _parse_bound(date_from, 'date_from')
+        queryset = queryset.filter(**{f'{timestamp_field}__gte': start})
+
+    date_to = params.get('date_to')
+    if date_to:
+        end = _parse_bound(date_to, 'date_to', end_of_range=True)
+        lookup = 'lt' if len(date_to) == 10 else 'lte'
+        queryset = queryset.filter(**{f'{timestamp_field}__{lookup}': end})
+
+    return queryset
+
+
+def history_bounds(params):
+    """
+    The date_from / date_to filters as SQLite timestamp strings, for raw
+    queries (see database.iter_history).
+
+    Returns (start, end, end_inclusive); missing bounds are None.
+    Raises ValueError if a date bound is malformed.
+    """
+    fmt = "%Y-%m-%d %H:%M:%S"
+    start = end = None
+    end_inclusive = False
+
+    date_from = params.get('date_from')
+    if date_from:
+        start = _parse_bound(date_from, 'date_from').strftime(fmt)
+
+    date_to = params.get('date_to')
+    if date_to:
+        end = _parse_bound(date_to, 'date_to', end_of_range=True).strftime(fmt)
+        end_inclusive = len(date_to) != 10
+
+    return start, end, end_inclusive
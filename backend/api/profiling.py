@@ -0,0 +1,257 @@
+"""
+پروفایل نمونه‌برداری‌شده درخواست‌ها (ProfilingMiddleware)
+
+Opt-in: nothing is recorded unless PARKING_PROFILE has a SAMPLE_RATE or a
+SLOW_MS threshold (settings.py, from PARKING_PROFILE_SAMPLE_RATE /
+PARKING_PROFILE_SLOW_MS). A profiled request gets a RequestProfile in
+metrics.current_trace. It collects two things:
+
+  * phases: every timed call to a histogram declared with a phase, i.e.
+    each database.py function (db.register_exit, ...) and each inference
+    stage (inference.decode, inference.plate_detect, ...), with its start
+    offset, duration and thread. The context is copied into
+    asyncio.to_thread and the inference executor, so their work is
+    included.
+  * stacks: a sampler thread reads sys._current_frames() every
+    INTERVAL_MS. For each profiled request it counts the stack of every
+    thread working for it: the request thread (sync views) and any
+    thread currently inside one of its phases. The output is in folded
+    format ("a;b;c 12"), which flamegraph.pl and speedscope read
+    directly.
+
+Sampled requests are always kept. Requests traced only for the threshold
+are kept only when they turn out slower than SLOW_MS. Kept profiles go
+to a rolling directory of JSON files (the newest KEEP; DIR defaults to
+parking-profiles under the system temp directory, PARKING_PROFILE_DIR)
+and are served to admins by /api/admin/profiles/.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from pathlib import Path
+
+DEFAULTS = {
+    'SAMPLE_RATE': 0.0,
+    'SLOW_MS': 0.0,
+    'INTERVAL_MS': 5.0,
+    'DIR': Path(tempfile.gettempdir()) / 'parking-profiles',
+    'KEEP': 200,
+}
+
+MAX_STACK_DEPTH = 64
+
+
+def get_config():
+    from django.conf import settings
+    config = dict(DEFAULTS)
+    config.update(getattr(settings, 'PARKING_PROFILE', {}))
+    return config
+
+
+def fold_stack(frame):
+    """frame -> 'root;...;leaf' (تابع (فایل))"""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class RequestProfile:
+    """فازها و نمونه‌های پشته یک درخواست"""
+
+    def __init__(self, method, path, reason):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.created_at = datetime.now()
+        self.started = time.perf_counter()
+        self.phases = []
+        self.stacks = Counter()
+        self.samples = 0
+        self._threads = defaultdict(int)  # thread id -> عمق فازهای باز
+        self._lock = threading.Lock()
+
+    def attach_thread(self):
+        with self._lock:
+            self._threads[threading.get_ident()] += 1
+
+    def detach_thread(self):
+        tid = threading.get_ident()
+        with self._lock:
+            self._threads[tid] -= 1
+            if self._threads[tid] <= 0:
+                del self._threads[tid]
+
+    # metrics.current_trace protocol
+    def begin_phase(self, name):
+        self.attach_thread()
+        return name, threading.current_thread().name, time.perf_counter()
+
+    def end_phase(self, handle):
+        end = time.perf_counter()
+        name, thread, start = handle
+        self.detach_thread()
+        with self._lock:
+            self.phases.append((name, thread, start - self.started, end - start))
+
+    def sample(self, frames):
+        with self._lock:
+            tids = list(self._threads)
+        stacks = [fold_stack(frames[tid]) for tid in tids if tid in frames]
+        with self._lock:
+            self.samples += 1
+            self.stacks.update(stacks)
+
+    def to_dict(self, status_code, total_seconds, interval_ms):
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p[2])
+            stacks = self.stacks.most_common()
+            samples = self.samples
+        totals = defaultdict(lambda: [0, 0.0])
+        for name, _, _, duration in phases:
+            totals[name][0] += 1
+            totals[name][1] += duration
+        return {
+            'id': self.id,
+            'created_at': self.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'method': self.method,
+            'path': self.path,
+            'status': status_code,
+            'reason': self.reason,
+            'total_ms': round(total_seconds * 1000, 2),
+            'breakdown': [
+                {'phase': name, 'calls': calls, 'total_ms': round(seconds * 1000, 2)}
+                for name, (calls, seconds) in sorted(totals.items(), key=lambda t: -t[1][1])
+            ],
+            'phases': [
+                {'phase': name, 'thread': thread,
+                 'start_ms': round(start * 1000, 2), 'duration_ms': round(duration * 1000, 2)}
+                for name, thread, start, duration in phases
+            ],
+            'sample_interval_ms': interval_ms,
+            'samples': samples,
+            'stacks': [{'stack': stack, 'count': count} for stack, count in stacks],
+        }
+
+
+def to_folded(profile):
+    """پروفایل ذخیره‌شده -> متن folded برای flamegraph.pl / speedscope"""
+    return ''.join(f"{item['stack']} {item['count']}\n" for item in profile['stacks'])
+
+
+class StackSampler:
+    """یک نخ برای همه درخواست‌های در حال پروفایل؛ وقتی کاری نیست متوقف می‌شود"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._profiles = set()
+        self._thread = None
+        self.interval = DEFAULTS['INTERVAL_MS'] / 1000
+
+    def add(self, profile, interval_ms):
+        with self._lock:
+            self.interval = interval_ms / 1000
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, profile):
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+                interval = self.interval
+            frames = sys._current_frames()
+            frames.pop(me, None)
+            for profile in profiles:
+                profile.sample(frames)
+            del frames
+            time.sleep(interval)
+
+
+class ProfileStore:
+    """بافر چرخشی روی دیسک: هر پروفایل یک فایل JSON، فقط KEEP تای آخر"""
+
+    def __init__(self, directory, keep):
+        self.directory = Path(directory)
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _files(self):
+        if not self.directory.exists():
+            return []
+        # نام فایل با زمان شروع می‌شود، پس ترتیب الفبایی = ترتیب زمانی
+        return sorted(self.directory.glob('*.json'))
+
+    def save(self, profile):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        path = self.directory / f"{stamp}-{profile['id']}.json"
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(profile, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, path)
+        with self._lock:
+            files = self._files()
+            for old in files[:max(0, len(files) - self.keep)]:
+                try:
+                    old.unlink()
+                except FileNotFoundError:
+                    pass
+        return path
+
+    def list(self, limit=50):
+        """خلاصه پروفایل‌ها، جدیدترین اول"""
+        summaries = []
+        for path in reversed(self._files()):
+            if len(summaries) >= limit:
+                break
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            summaries.append({key: data[key] for key in (
+                'id', 'created_at', 'method', 'path', 'status', 'reason', 'total_ms',
+            )})
+        return summaries
+
+    def get(self, profile_id):
+        if not profile_id.isalnum():
+            return None
+        for path in self.directory.glob(f'*-{profile_id}.json'):
+            try:
+                return json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                return None
+        return None
+
+
+sampler = StackSampler()
+
+_stores = {}
+
+
+def get_store(config=None):
+    config = config or get_config()
+    key = (str(config['DIR']), config['KEEP'])
+    store = _stores.get(key)
+    if store is None:
+        store = _stores[key] = ProfileStore(config['DIR'], config['KEEP'])
+    return store
@@ -0,0 +1,41 @@
+"""
+Fast JSON renderer for the hot read endpoints.
+
+Uses orjson when it is installed and falls back to DRF's JSONRenderer
+otherwise (or when the client asks for indented output).
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+
+_fallback_encoder = JSONEncoder()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in replacement for JSONRenderer backed by orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_AVAILABLE:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_fallback_encoder.default)
+
+        # Keep DRF's guarantee that the output is a strict javascript subset
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
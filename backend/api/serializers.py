@@ -1,3 +1,8 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.functions import Cast
 from rest_framework import serializers
 from .models import Entry, Exit, ActiveCar, Setting, User, Wallet, Transaction, UserPlate
 
@@ -118,3 +123,90 @@ class AddPlateRequestSerializer(serializers.Serializer):
 class PlateListSerializer(serializers.Serializer):
     """Serializer for plate list response"""
     plates = UserPlateSerializer(many=True)
+
+
+# Fast path serializers (hot list endpoints)
+
+class FastRowSerializer:
+    """
+    Lightweight row -> dict serializer for the polled list endpoints.
+
+    Rows are read with values() and timestamps are selected as the text
+    stored in SQLite, so neither Django's datetime converters nor DRF's
+    per-field machinery run per row. The output matches the
+    corresponding ModelSerializer exactly.
+    """
+    fields = ()
+    timestamp_fields = ()
+
+    @staticmethod
+    def is_supported():
+        """
+        The text -> ISO shortcut is only equivalent to DRF's output when
+        stored timestamps are interpreted and rendered in UTC.
+        """
+        return not settings.USE_TZ or settings.TIME_ZONE == 'UTC'
+
+    def get_values_queryset(self, queryset):
+        """Turn a model queryset into a values() queryset of raw columns."""
+        plain = [f for f in self.fields if f not in self.timestamp_fields]
+        raw_timestamps = {
+            f'{f}_text': Cast(f, output_field=CharField()) for f in self.timestamp_fields
+        }
+        return queryset.values(*plain, **raw_timestamps)
+
+    def to_representation(self, rows):
+        """Convert values() rows to response dicts in field order."""
+        fields = self.fields
+        timestamp_fields = self.timestamp_fields
+        suffix = 'Z' if settings.USE_TZ else ''
+
+        data = []
+        for row in rows:
+            for f in timestamp_fields:
+                value = row.pop(f'{f}_text')
+                # 'YYYY-MM-DD HH:MM:SS' -> 'YYYY-MM-DDTHH:MM:SSZ'
+                row[f] = value.replace(' ', 'T', 1) + suffix if value else None
+            data.append({f: row[f] for f in fields})
+        return data
+
+    def represent_rows(self, rows):
+        """
+        Same output for plain dict rows whose timestamps hold the stored
+        text under the field name itself (e.g. db.get_dashboard_snapshot).
+        """
+        if not self.is_supported():
+            # SQLite stores naive UTC; let DRF render it like the ModelSerializer
+            field = serializers.DateTimeField()
+            render = lambda value: field.to_representation(
+                datetime.fromisoformat(value).replace(tzinfo=dt_timezone.utc)
+            )
+        else:
+            suffix = 'Z' if settings.USE_TZ else ''
+            render = lambda value: value.replace(' ', 'T', 1) + suffix
+
+        data = []
+        for row in rows:
+            item = {f: row[f] for f in self.fields}
+            for f in self.timestamp_fields:
+                item[f] = render(item[f]) if item[f] else None
+            data.append(item)
+        return data
+
+
+class FastEntrySerializer(FastRowSerializer):
+    """Fast path equivalent of EntrySerializer"""
+    fields = ('id', 'plate', 'image_in', 'timestamp_in')
+    timestamp_fields = ('timestamp_in',)
+
+
+class FastExitSerializer(FastRowSerializer):
+    """Fast path equivalent of ExitSerializer"""
+    fields = ('id', 'entry', 'plate', 'image_out', 'timestamp_out', 'duration_minutes', 'cost')
+    timestamp_fields = ('timestamp_out',)
+
+
+class FastActiveCarSerializer(FastRowSerializer):
+    """Fast path equivalent of ActiveCarSerializer"""
+    fields = ('entry', 'plate', 'timestamp_in')
+    timestamp_fields = ('timestamp_in',)
@@ -10,6 +10,10 @@ router.register(r'active-cars', views.ActiveCarViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('status/', views.parking_status, name='parking-status'),
+    path('dashboard/', views.dashboard, name='dashboard'),
+    path('changes/', views.changes, name='changes'),
+    path('events/stream/', views.event_stream, name='event-stream'),
+    path('export/<str:table>.<str:file_format>', views.export_history, name='export'),
     path('entry/', views.register_entry_api, name='register-entry'),
     path('exit/', views.register_exit_api, name='register-exit'),
     path('settings/', views.settings_view, name='settings'),
@@ -19,6 +23,8 @@ urlpatterns = [
     path('detect-plate/', views.detect_plate, name='detect-plate'),
     path('detect-entry/', views.detect_and_register_entry, name='detect-entry'),
     path('detect-exit/', views.detect_and_register_exit, name='detect-exit'),
+    path('ready/', views.ready, name='ready'),
+    path('metrics/', views.metrics_view, name='metrics'),
     
     # Authentication endpoints
     path('auth/login/', views.login, name='auth-login'),
@@ -37,4 +43,7 @@ urlpatterns = [
     # Admin endpoints
     path('admin/users/', views.get_all_users_api, name='admin-get-users'),
     path('admin/users/<int:user_id>/role/', views.update_user_role_api, name='admin-update-role'),
+    path('admin/profiles/', views.list_profiles_api, name='admin-profiles'),
+    path('admin/profiles/<str:profile_id>/', views.get_profile_api, name='admin-profile'),
+    path('admin/queries/', views.query_stats_api, name='admin-queries'),
 ]
@@ -2,12 +2,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, action
 from rest_framework.response import Response
 from django.db import connection
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse, HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+import asyncio
+import json
 import sys
 import os
 
 # Add src directory to path to import existing database functions
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 import database as db
+import event_bus
+import metrics
+import exporters
+import sql_trace
 
 from .models import Entry, Exit, ActiveCar, Setting
 from .serializers import (
@@ -17,27 +28,98 @@ from .serializers import (
     LoginResponseSerializer, WalletBalanceSerializer,
     ChargeWalletRequestSerializer, ChargeWalletResponseSerializer,
     TransactionListSerializer, TransactionSerializer,
-    UserPlateSerializer, AddPlateRequestSerializer, PlateListSerializer
+    UserPlateSerializer, AddPlateRequestSerializer, PlateListSerializer,
+    FastEntrySerializer, FastExitSerializer, FastActiveCarSerializer
 )
 from .middleware import require_authentication, require_role
+from .pagination import HistoryCursorPagination, filter_history, history_bounds, STREAM_CHUNK_SIZE
+from .error_responses import bad_request_error, error_response
+from .renderers import FastJSONRenderer
+from .inference import executor as inference_executor, QueueFull, readiness
+from . import profiling
 
 
-class EntryViewSet(viewsets.ReadOnlyModelViewSet):
+class HistoryViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Base ViewSet for append-only history tables (entries / exits).
+
+    GET /api/<table>/?plate=...&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD&page_size=50
+        Cursor-paginated list, newest first.
+    GET /api/<table>/stream/?plate=...&date_from=...&date_to=...
+        Streams every matching row as NDJSON (one JSON object per line).
+    """
+    pagination_class = HistoryCursorPagination
+    renderer_classes = [FastJSONRenderer]
+    fast_serializer_class = None
+    timestamp_field = None
+    stream_fields = ()
+
+    def get_queryset(self):
+        return filter_history(super().get_queryset(), self.request.query_params, self.timestamp_field)
+
+    def list(self, request, *args, **kwargs):
+        try:
+            queryset = self.filter_queryset(self.get_queryset())
+        except ValueError as e:
+            return bad_request_error(str(e), 'INVALID_DATE_RANGE')
+
+        fast = self.fast_serializer_class()
+        if not fast.is_supported():
+            return super().list(request, *args, **kwargs)
+
+        page = self.paginate_queryset(fast.get_values_queryset(queryset))
+        return self.get_paginated_response(fast.to_representation(page))
+
+    @action(detail=False, methods=['get'])
+    def stream(self, request):
+        """Stream the filtered history as NDJSON with constant memory use"""
+        try:
+            queryset = self.get_queryset()
+        except ValueError as e:
+            return bad_request_error(str(e), 'INVALID_DATE_RANGE')
+
+        rows = queryset.order_by('id').values(*self.stream_fields).iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+        def generate():
+            for row in rows:
+                yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+        response = StreamingHttpResponse(generate(), content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class EntryViewSet(HistoryViewSet):
     """ViewSet for viewing entry records"""
-    queryset = Entry.objects.all().order_by('-timestamp_in')
+    queryset = Entry.objects.all()
     serializer_class = EntrySerializer
+    fast_serializer_class = FastEntrySerializer
+    timestamp_field = 'timestamp_in'
+    stream_fields = ('id', 'plate', 'image_in', 'timestamp_in')
 
 
-class ExitViewSet(viewsets.ReadOnlyModelViewSet):
+class ExitViewSet(HistoryViewSet):
     """ViewSet for viewing exit records"""
-    queryset = Exit.objects.all().order_by('-timestamp_out')
+    queryset = Exit.objects.select_related('entry')
     serializer_class = ExitSerializer
+    fast_serializer_class = FastExitSerializer
+    timestamp_field = 'timestamp_out'
+    stream_fields = ('id', 'entry', 'plate', 'image_out', 'timestamp_out', 'duration_minutes', 'cost')
 
 
 class ActiveCarViewSet(viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing currently parked cars"""
     queryset = ActiveCar.objects.all()
     serializer_class = ActiveCarSerializer
+    renderer_classes = [FastJSONRenderer]
+
+    def list(self, request, *args, **kwargs):
+        fast = FastActiveCarSerializer()
+        if not fast.is_supported():
+            return super().list(request, *args, **kwargs)
+
+        rows = fast.get_values_queryset(self.filter_queryset(self.get_queryset()))
+        return Response(fast.to_representation(rows))
 
 
 @api_view(['GET'])
@@ -59,6 +141,111 @@ def parking_status(request):
     return Response(serializer.data)
 
 
+def _dashboard_limit(request):
+    """Number of recent entries/exits to include (1..100, default 20)"""
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        return 20
+    if limit < 1 or limit > 100:
+        return 20
+    return limit
+
+
+def _dashboard_etag(request, *args, **kwargs):
+    """ETag = change version (event log head) + requested limit; one indexed lookup"""
+    return f"dashboard-{db.get_change_version()}-{_dashboard_limit(request)}"
+
+
+@condition(etag_func=_dashboard_etag)
+@api_view(['GET'])
+def dashboard(request):
+    """
+    Combined dashboard snapshot: parking status plus recent activity.
+    
+    GET /api/dashboard/?limit=20
+    Headers: If-None-Match: <etag from previous response> (optional)
+    Response: {
+        "version": 42,
+        "status": {"capacity": ..., "active_cars": ..., "free_slots": ..., "price_per_hour": ...},
+        "recent_entries": [...],   # rows as in /api/entries/
+        "recent_exits": [...]      # rows as in /api/exits/
+    }
+    
+    Returns 304 Not Modified when nothing has changed since the ETag
+    the client already holds.
+    """
+    snapshot = db.get_dashboard_snapshot(limit=_dashboard_limit(request))
+    # Same field names and ISO 8601 timestamps as /api/entries/ and /api/exits/
+    snapshot['recent_entries'] = FastEntrySerializer().represent_rows(snapshot['recent_entries'])
+    snapshot['recent_exits'] = FastExitSerializer().represent_rows(snapshot['recent_exits'])
+    return Response(snapshot)
+
+
+CHANGES_MAX_LIMIT = 1000
+
+
+@api_view(['GET'])
+def changes(request):
+    """
+    Incremental change feed from the append-only event log.
+    
+    GET /api/changes/?since=<seq>&limit=500&types=entry,exit
+    Response: {
+        "results": [{"seq": 43, "event_type": "entry", "payload": {...}, "created_at": "..."}],
+        "next_since": 43,
+        "has_more": false
+    }
+    
+    Clients keep next_since and pass it back as `since` on the next poll,
+    so each request returns only what changed. Wallet events are not
+    exposed here.
+    
+    Old events are pruned (db.EVENT_RETENTION_DAYS). A `since` older than
+    the oldest kept event gets 410 with code RESYNC_REQUIRED and
+    details.next_since: reload the full state (e.g. /api/dashboard/) and
+    continue polling from there.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET.get('limit', 500))
+    except ValueError:
+        return bad_request_error('since and limit must be integers', 'INVALID_PARAMETER')
+    if since < 0 or limit < 1:
+        return bad_request_error('since must be >= 0 and limit >= 1', 'INVALID_PARAMETER')
+    limit = min(limit, CHANGES_MAX_LIMIT)
+
+    types = db.FEED_EVENT_TYPES
+    if request.GET.get('types'):
+        requested = [t.strip() for t in request.GET['types'].split(',') if t.strip()]
+        unknown = [t for t in requested if t not in db.FEED_EVENT_TYPES]
+        if unknown:
+            return bad_request_error(
+                f"Unknown event types: {', '.join(unknown)}", 'INVALID_PARAMETER'
+            )
+        types = requested
+
+    pruned_upto = db.events_pruned_upto()
+    if since < pruned_upto:
+        return error_response(
+            'Events after since are no longer in the log; reload the full state',
+            'RESYNC_REQUIRED',
+            status.HTTP_410_GONE,
+            {'next_since': db.get_change_version(), 'oldest_seq': pruned_upto + 1},
+        )
+
+    # One extra row tells us whether the client should poll again immediately
+    rows = db.changes_since(since, limit=limit + 1, event_types=types)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return Response({
+        'results': rows,
+        'next_since': rows[-1]['seq'] if rows else since,
+        'has_more': has_more,
+    })
+
+
 @api_view(['POST'])
 def register_entry_api(request):
     """Register a new vehicle entry"""
@@ -156,13 +343,274 @@ def reset_database_api(request):
 
 
 
+# Event feed (Server-Sent Events)
+
+SSE_HEARTBEAT_SECONDS = 15
+SSE_RETRY_MS = 3000
+
+
+def _format_sse(event):
+    data = json.dumps(event.data, ensure_ascii=False)
+    return f"id: {event.id}\nevent: {event.type}\ndata: {data}\n\n"
+
+
+def _sse_sync(last_id):
+    """Blocking SSE generator (WSGI / runserver: one thread per client)"""
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    # bus.close() (worker retiring) ends the stream; EventSource reconnects elsewhere
+    while not event_bus.bus.closed:
+        events = event_bus.bus.wait(last_id, timeout=SSE_HEARTBEAT_SECONDS)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            last_id = event.id
+            yield _format_sse(event)
+
+
+async def _sse_async(last_id):
+    """Async SSE generator (ASGI: clients only cost a coroutine)"""
+    yield f"retry: {SSE_RETRY_MS}\n\n"
+    while not event_bus.bus.closed:
+        events = await event_bus.bus.wait_async(last_id, timeout=SSE_HEARTBEAT_SECONDS)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            last_id = event.id
+            yield _format_sse(event)
+
+
+def event_stream(request):
+    """
+    Push feed of parking events as Server-Sent Events, read from the
+    durable event log (see /api/changes/).
+    
+    GET /api/events/stream/
+    Headers: Last-Event-ID: <id> (optional, sent automatically by EventSource on reconnect)
+    Query: ?last_event_id=<id> (alternative to the header; 0 replays the log)
+    
+    Each message:
+        id: 17                  (event log seq)
+        event: entry | exit | settings | reset | resync
+        data: {"entry_id": 5, "plate": "12ب345-67", ...}
+    
+    `resync` means the events after the client's id were pruned from the
+    log: reload the full state; the stream continues from the resync id.
+    
+    Served with an async generator under ASGI (parking_api.asgi) and a
+    blocking generator under WSGI.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    value = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(value) if value else None
+    except ValueError:
+        last_id = None
+
+    current = event_bus.bus.last_id
+    if last_id is None:
+        # New subscriber: only future events
+        last_id = current
+    elif last_id > current:
+        # Id from a log that has since been recreated: replay it
+        last_id = 0
+
+    if isinstance(request, ASGIRequest):
+        stream = _sse_async(last_id)
+    else:
+        stream = _sse_sync(last_id)
+
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+# Export
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+@api_view(['GET'])
+def export_history(request, table, file_format):
+    """
+    Download entries / exits as CSV or Excel, streamed.
+    
+    GET /api/export/<entries|exits|history>.<csv|xlsx>?plate=...&date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    
+    'history' is an Excel workbook with one sheet per table. Rows are read
+    from SQLite in short keyset chunks and written as they arrive; Excel
+    files are built with xlsxwriter in constant_memory mode and streamed
+    once complete. Date filters work as on /api/entries/.
+    """
+    if file_format not in EXPORT_CONTENT_TYPES:
+        return bad_request_error(
+            f"Unknown export format: {file_format}. Use csv or xlsx", 'INVALID_PARAMETER'
+        )
+    if table == 'history':
+        if file_format != 'xlsx':
+            return bad_request_error(
+                'history export is only available as xlsx', 'INVALID_PARAMETER'
+            )
+        tables = list(db.HISTORY_TABLES)
+    elif table in db.HISTORY_TABLES:
+        tables = [table]
+    else:
+        return bad_request_error(
+            f"Unknown export table: {table}. Use entries, exits or history", 'INVALID_PARAMETER'
+        )
+
+    if file_format == 'xlsx' and not exporters.XLSX_AVAILABLE:
+        return error_response(
+            'Excel export is not available on this server',
+            'EXPORT_UNAVAILABLE',
+            status.HTTP_501_NOT_IMPLEMENTED,
+        )
+
+    try:
+        start, end, end_inclusive = history_bounds(request.query_params)
+    except ValueError as e:
+        return bad_request_error(str(e), 'INVALID_DATE_RANGE')
+    plate = request.query_params.get('plate') or None
+
+    def rows(name):
+        return db.iter_history(
+            name, start, end, end_inclusive, plate=plate, chunk_size=STREAM_CHUNK_SIZE
+        )
+
+    if file_format == 'csv':
+        stream = exporters.iter_csv(db.HISTORY_TABLES[table][1], rows(table))
+    else:
+        stream = exporters.iter_xlsx(
+            (name, db.HISTORY_TABLES[name][1], rows(name)) for name in tables
+        )
+
+    response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{table}.{file_format}"'
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
 # YOLO Detection Endpoints
-from rest_framework.parsers import MultiPartParser, FormParser
-from .yolo_service import detect_plate_in_image
+#
+# Async views: inference runs on the bounded executor in api.inference and
+# SQLite calls in a worker thread, so under ASGI a slow model never blocks
+# the event loop and a burst beyond the executor's queue gets 429 at once.
+# DRF's @api_view has no async support, hence plain Django views.
 
 
-@api_view(['POST'])
-def detect_plate(request):
+def detect_plate_in_image(image_bytes):
+    """
+    yolo_service.detect_plate_in_image, imported on first use.
+    
+    yolo_service pulls in torch, cv2, numpy and yolov5 (~2 s); importing it
+    here keeps that cost out of every management command, test run and
+    worker that never serves a detection. Runs on the inference executor,
+    so the first request pays the import off the event loop.
+    """
+    from .yolo_service import detect_plate_in_image as detect
+    return detect(image_bytes)
+
+
+def _run_detection(image_bytes):
+    with _DETECT_SECONDS.time():
+        return detect_plate_in_image(image_bytes)
+
+
+def warm_up_models():
+    """yolo_service.warm_up, imported on first use (see detect_plate_in_image)"""
+    from .yolo_service import warm_up
+    return warm_up()
+
+
+@api_view(['GET'])
+def ready(request):
+    """
+    Readiness of the detection endpoints
+    
+    GET /api/ready/
+    
+    200 once both YOLO models are loaded and warmed up, 503 before that.
+    A cold process starts the warm-up on the inference executor, so a
+    readiness probe alone brings the models up. Body: {
+        "ready": true,
+        "state": "ready",              // cold | warming | ready | failed
+        "warmup_ms": 2150.3,
+        "models": {
+            "plate": {"input_shape": [480, 640, 3], "load_ms": 1500.2,
+                      "first_run_ms": 310.5, "warm_run_ms": 95.1, "fused_layers": 0},
+            "chars": {...}
+        },
+        "inference": {"workers": 1, "max_pending": 8, "in_flight": 0}
+    }
+    """
+    if readiness.state in ('cold', 'failed'):
+        try:
+            inference_executor.submit(warm_up_models)
+        except QueueFull:
+            pass
+
+    data = readiness.snapshot()
+    data['inference'] = {
+        'workers': inference_executor.workers,
+        'max_pending': inference_executor.max_pending,
+        'in_flight': inference_executor.in_flight,
+    }
+    return Response(
+        data,
+        status=status.HTTP_200_OK if data['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+INFERENCE_RETRY_AFTER = 1  # seconds
+
+# کل کار یک درخواست روی executor (decode + هر دو مدل)
+_DETECT_SECONDS = metrics.INFERENCE_SECONDS.labels(source='api', stage='total')
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, json_dumps_params={'ensure_ascii': False})
+
+
+async def _detect(request):
+    """
+    Run detection on the uploaded image.
+    
+    Returns (image_file, result) on success, or (None, response) when the
+    request has no image, the executor is full or no plate was found.
+    """
+    if 'image' not in request.FILES:
+        return None, _json({'error': 'No image file provided'}, status.HTTP_400_BAD_REQUEST)
+
+    image_file = request.FILES['image']
+    image_bytes = image_file.read()
+
+    try:
+        result = await inference_executor.run(_run_detection, image_bytes)
+    except QueueFull:
+        response = _json(
+            {
+                'success': False,
+                'error': 'Plate detection is busy, retry shortly',
+                'code': 'INFERENCE_BUSY',
+            },
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        response['Retry-After'] = str(INFERENCE_RETRY_AFTER)
+        return None, response
+
+    if not result['success']:
+        return None, _json(result, status.HTTP_400_BAD_REQUEST)
+    return image_file, result
+
+
+@csrf_exempt
+async def detect_plate(request):
     """
     Detect license plate from uploaded image
     
@@ -176,27 +624,21 @@ def detect_plate(request):
         "confidence": 0.95,
         "bbox": {"x1": 100, "y1": 50, "x2": 300, "y2": 150}
     }
-    """
-    if 'image' not in request.FILES:
-        return Response(
-            {'error': 'No image file provided'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    image_file = request.FILES['image']
-    image_bytes = image_file.read()
-    
-    # Detect plate
-    result = detect_plate_in_image(image_bytes)
-    
-    if not result['success']:
-        return Response(result, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response(result)
+    429 {"code": "INFERENCE_BUSY"} with Retry-After when the inference
+    queue is full.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
 
+    image_file, result = await _detect(request)
+    if image_file is None:
+        return result
+    return _json(result)
 
-@api_view(['POST'])
-def detect_and_register_entry(request):
+
+@csrf_exempt
+async def detect_and_register_entry(request):
     """
     Detect plate and automatically register entry
     
@@ -211,47 +653,39 @@ def detect_and_register_entry(request):
         "confidence": 0.95
     }
     """
-    if 'image' not in request.FILES:
-        return Response(
-            {'error': 'No image file provided'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    image_file = request.FILES['image']
-    image_bytes = image_file.read()
-    
-    # Detect plate
-    result = detect_plate_in_image(image_bytes)
-    
-    if not result['success']:
-        return Response(result, status=status.HTTP_400_BAD_REQUEST)
-    
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    image_file, result = await _detect(request)
+    if image_file is None:
+        return result
+
     plate = result['plate']
-    
+
     # Check if recently recorded
-    if db.was_recently_recorded(plate):
-        return Response(
+    if await asyncio.to_thread(db.was_recently_recorded, plate):
+        return _json(
             {
                 'success': False,
                 'error': 'Vehicle was recently recorded',
                 'plate': plate
             },
-            status=status.HTTP_400_BAD_REQUEST
+            status.HTTP_400_BAD_REQUEST
         )
-    
+
     # Register entry
-    entry_id = db.register_entry(plate, f"auto_{image_file.name}")
-    
-    return Response({
+    entry_id = await asyncio.to_thread(db.register_entry, plate, f"auto_{image_file.name}")
+
+    return _json({
         'success': True,
         'plate': plate,
         'entry_id': entry_id,
         'confidence': result['confidence']
-    }, status=status.HTTP_201_CREATED)
+    }, status.HTTP_201_CREATED)
 
 
-@api_view(['POST'])
-def detect_and_register_exit(request):
+@csrf_exempt
+async def detect_and_register_exit(request):
     """
     Detect plate and automatically register exit
     
@@ -268,37 +702,29 @@ def detect_and_register_exit(request):
         "confidence": 0.95
     }
     """
-    if 'image' not in request.FILES:
-        return Response(
-            {'error': 'No image file provided'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    image_file = request.FILES['image']
-    image_bytes = image_file.read()
-    
-    # Detect plate
-    result = detect_plate_in_image(image_bytes)
-    
-    if not result['success']:
-        return Response(result, status=status.HTTP_400_BAD_REQUEST)
-    
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+
+    image_file, result = await _detect(request)
+    if image_file is None:
+        return result
+
     plate = result['plate']
-    
+
     # Register exit
-    exit_result = db.register_exit(plate, f"auto_{image_file.name}")
-    
+    exit_result = await asyncio.to_thread(db.register_exit, plate, f"auto_{image_file.name}")
+
     if exit_result is None:
-        return Response(
+        return _json(
             {
                 'success': False,
                 'error': 'Vehicle not found in parking',
                 'plate': plate
             },
-            status=status.HTTP_404_NOT_FOUND
+            status.HTTP_404_NOT_FOUND
         )
-    
-    return Response({
+
+    return _json({
         'success': True,
         'plate': plate,
         'confidence': result['confidence'],
@@ -306,6 +732,29 @@ def detect_and_register_exit(request):
     })
 
 
+# Metrics
+
+
+def metrics_view(request):
+    """
+    Prometheus metrics of this API process
+    
+    GET /api/metrics/
+    
+    Text exposition format: request latency per view, inference latency
+    per stage, time per database.py function, inference queue depth and
+    occupancy. The camera processes serve the same metrics on their own
+    ports (PARKING_METRICS_PORT). With --api workers any worker answers
+    with the totals of all workers (metrics.enable_multiprocess).
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    # اشغال پارکینگ در لحظه خواندن (از هر پروسه‌ای که ثبت کرده باشد)
+    metrics.ACTIVE_CARS.set(db.count_active_cars())
+    metrics.CAPACITY.set(db.get_capacity())
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
 # Authentication Endpoints
 
 @api_view(['POST'])
@@ -835,3 +1284,99 @@ def update_user_role_api(request, user_id):
             },
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+# Request profiles (api.profiling)
+
+@api_view(['GET'])
+@require_authentication
+@require_role(['admin', 'superuser'])
+def list_profiles_api(request):
+    """
+    Recent request profiles, newest first (Admin/SuperUser only).
+    
+    GET /api/admin/profiles/?limit=50
+    Headers: Authorization: Token <token>
+    Response: {
+        "enabled": true,
+        "results": [{"id": "3f2a9c1b7d4e", "created_at": "...", "method": "POST",
+                     "path": "/api/detect-exit/", "status": 200, "reason": "slow",
+                     "total_ms": 2310.4}, ...]
+    }
+    """
+    try:
+        limit = int(request.GET.get('limit', 50))
+    except ValueError:
+        limit = 50
+    limit = min(max(limit, 1), 500)
+
+    config = profiling.get_config()
+    return Response({
+        'enabled': config['SAMPLE_RATE'] > 0 or config['SLOW_MS'] > 0,
+        'results': profiling.get_store(config).list(limit),
+    })
+
+
+@api_view(['GET'])
+@require_authentication
+@require_role(['admin', 'superuser'])
+def get_profile_api(request, profile_id):
+    """
+    One request profile (Admin/SuperUser only).
+    
+    GET /api/admin/profiles/{id}/
+    GET /api/admin/profiles/{id}/?output=folded
+    
+    JSON: phase breakdown, phase timeline and sampled stacks. With
+    output=folded, the stacks as plain text for flamegraph.pl or speedscope.
+    """
+    profile = profiling.get_store().get(profile_id)
+    if profile is None:
+        return error_response('Profile not found', 'PROFILE_NOT_FOUND', status.HTTP_404_NOT_FOUND)
+    if request.GET.get('output') == 'folded':
+        return HttpResponse(profiling.to_folded(profile), content_type='text/plain; charset=utf-8')
+    return Response(profile)
+
+
+# SQL statement stats (sql_trace)
+
+@api_view(['GET', 'DELETE'])
+@require_authentication
+@require_role(['admin', 'superuser'])
+def query_stats_api(request):
+    """
+    Most expensive SQL statements in this process (Admin/SuperUser only).
+    
+    GET /api/admin/queries/?limit=20&by=total_ms
+        by: total_ms (default), calls, max_ms, lock_wait_ms, rows
+    DELETE /api/admin/queries/  -> reset the counters
+    
+    Each API worker process keeps its own counters.
+    Response: {
+        "slow_query_ms": 100.0,
+        "results": [{"caller": "database.get_history", "sql": "SELECT ...", "calls": 120,
+                     "total_ms": 85.2, "avg_ms": 0.71, "max_ms": 4.3, "rows": 6000,
+                     "lock_wait_ms": 0.0, "errors": 0}, ...]
+    }
+    """
+    if request.method == 'DELETE':
+        sql_trace.stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    try:
+        limit = int(request.GET.get('limit', 20))
+    except ValueError:
+        limit = 20
+    limit = min(max(limit, 1), 500)
+
+    by = request.GET.get('by', 'total_ms')
+    if by not in sql_trace.QueryStats.ORDERINGS:
+        return bad_request_error(
+            f"by must be one of {', '.join(sql_trace.QueryStats.ORDERINGS)}",
+            'INVALID_ORDERING',
+        )
+
+    return Response({
+        'slow_query_ms': sql_trace.SLOW_QUERY_MS,
+        'results': sql_trace.top(limit, by),
+    })
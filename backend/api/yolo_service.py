@@ -5,11 +5,12 @@ Handles license plate detection and character recognition
 
 import sys
 import os
+import time
 from pathlib import Path
 import cv2
 import numpy as np
 import torch
-import re
+from torch.nn.utils.fusion import fuse_conv_bn_eval
 from collections import Counter
 
 # Add src directory to path
@@ -17,11 +18,20 @@ src_path = Path(__file__).parent.parent / 'src'
 sys.path.insert(0, str(src_path))
 
 from yolo_loader import load_plate_model, load_char_model
+from plate_parser import clean_plate_text
+import metrics
+from .inference import readiness
 
 # Global model cache
 _plate_model = None
 _char_model = None
 _device = None
+# conv/bn pairs folded by prepare_model, per model
+_fused_layers = {}
+
+_DECODE_SECONDS = metrics.INFERENCE_SECONDS.labels(source='api', stage='decode')
+_PLATE_SECONDS = metrics.INFERENCE_SECONDS.labels(source='api', stage='plate_detect')
+_CHARS_SECONDS = metrics.INFERENCE_SECONDS.labels(source='api', stage='char_recognize')
 
 
 def get_device():
@@ -38,7 +48,9 @@ def get_plate_model():
     global _plate_model
     if _plate_model is None:
         print("Loading plate detection model...")
-        _plate_model = load_plate_model(device=get_device())
+        model = load_plate_model(device=get_device())
+        _fused_layers['plate'] = prepare_model(model)
+        _plate_model = model
         print("✓ Plate model loaded")
     return _plate_model
 
@@ -48,11 +60,40 @@ def get_char_model():
     global _char_model
     if _char_model is None:
         print("Loading character recognition model...")
-        _char_model = load_char_model(device=get_device())
+        model = load_char_model(device=get_device())
+        _fused_layers['chars'] = prepare_model(model)
+        _char_model = model
         print("✓ Character model loaded")
     return _char_model
 
 
+def prepare_model(model):
+    """
+    Make a loaded model inference-only, in place.
+    
+    eval mode, Conv+BatchNorm pairs folded into the conv (the YOLOv5
+    Conv block: .conv, .bn and a forward_fuse without the bn) and
+    channels-last weights. Each step is skipped when the model does not
+    support it. Returns the number of fused layers.
+    """
+    model.eval()
+    fused = 0
+    for module in model.modules():
+        conv = getattr(module, 'conv', None)
+        bn = getattr(module, 'bn', None)
+        if (isinstance(conv, torch.nn.Conv2d) and isinstance(bn, torch.nn.BatchNorm2d)
+                and hasattr(module, 'forward_fuse')):
+            module.conv = fuse_conv_bn_eval(conv, bn)
+            delattr(module, 'bn')
+            module.forward = module.forward_fuse
+            fused += 1
+    try:
+        model.to(memory_format=torch.channels_last)
+    except (TypeError, RuntimeError):
+        pass
+    return fused
+
+
 def detect_plate_in_image(image_bytes):
     """
     Detect license plate in image bytes
@@ -65,8 +106,9 @@ def detect_plate_in_image(image_bytes):
     """
     try:
         # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with _DECODE_SECONDS.time():
+            nparr = np.frombuffer(image_bytes, np.uint8)
+            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         if img is None:
             return {
@@ -76,7 +118,8 @@ def detect_plate_in_image(image_bytes):
         
         # Detect plate region
         plate_model = get_plate_model()
-        results = plate_model(img)
+        with _PLATE_SECONDS.time(), torch.inference_mode():
+            results = plate_model(img)
         
         # Handle yolov5 package results format
         detections = results.pred[0] if hasattr(results, 'pred') else results.xyxy[0]
@@ -137,7 +180,8 @@ def recognize_characters(plate_img):
     """
     try:
         char_model = get_char_model()
-        results = char_model(plate_img)
+        with _CHARS_SECONDS.time(), torch.inference_mode():
+            results = char_model(plate_img)
         
         # Handle yolov5 package results format
         detections = results.pred[0] if hasattr(results, 'pred') else results.xyxy[0]
@@ -188,21 +232,6 @@ def recognize_characters(plate_img):
         return None
 
 
-def clean_plate_text(text):
-    """Clean and format plate text"""
-    if not text:
-        return None
-    
-    # Remove extra spaces
-    text = re.sub(r'\s+', '', text)
-    
-    # Basic validation - should have numbers and possibly Persian letters
-    if len(text) < 5:
-        return None
-    
-    return text
-
-
 def preload_models():
     """Preload models at startup"""
     try:
@@ -214,3 +243,62 @@ def preload_models():
     except Exception as e:
         print(f"✗ Error preloading models: {e}")
         return False
+
+
+# Warm-up inputs at production sizes: a 640x480 gate camera frame and a
+# plate crop at the 320x80 the camera scripts resize to
+WARMUP_FRAME_SHAPE = (480, 640, 3)
+WARMUP_PLATE_SHAPE = (80, 320, 3)
+WARMUP_RUNS = 3
+
+
+def warm_up(runs=WARMUP_RUNS):
+    """
+    Load both models and run `runs` dummy inferences through each, so the
+    first real car does not pay for allocator setup and kernel selection.
+    
+    Timings per model (load, first run, last run) go to
+    api.inference.readiness, which /api/ready/ reports. Returns True when
+    both models are warm; concurrent calls leave the work to the first.
+    """
+    if not readiness.begin():
+        return readiness.ready
+    print("Warming up YOLO models...")
+    # نویز ثابت به جای تصویر سیاه تا NMS هم کاندید داشته باشد
+    rng = np.random.default_rng(0)
+    stages = (
+        ('plate', get_plate_model, WARMUP_FRAME_SHAPE),
+        ('chars', get_char_model, WARMUP_PLATE_SHAPE),
+    )
+    try:
+        for name, get_model, shape in stages:
+            start = time.perf_counter()
+            model = get_model()
+            load_ms = (time.perf_counter() - start) * 1000
+
+            dummy = rng.integers(0, 256, size=shape, dtype=np.uint8)
+            run_ms = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                with torch.inference_mode():
+                    model(dummy)
+                run_ms.append((time.perf_counter() - start) * 1000)
+
+            readiness.record(
+                name,
+                input_shape=list(shape),
+                load_ms=round(load_ms, 1),
+                first_run_ms=round(run_ms[0], 1),
+                warm_run_ms=round(run_ms[-1], 1),
+                fused_layers=_fused_layers.get(name, 0),
+            )
+            print(f"  {name}: load {load_ms:.0f} ms, first run {run_ms[0]:.0f} ms, "
+                  f"warm run {run_ms[-1]:.0f} ms")
+    except Exception as e:
+        readiness.finish(error=str(e))
+        print(f"✗ Error warming up models: {e}")
+        return False
+
+    readiness.finish()
+    print("✓ Models warmed up")
+    return True
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Benchmark: find every visit of one plate across a year of archived days.
+
+Builds a throwaway database with --days days of traffic (--per-day
+sessions each, drawn from a pool of --plates plates), archives every day
+with archive_utils.archive_day, then times
+  * the old way: read_archive_table() for every day and filter in Python
+  * archive_query.query_archive(plate=...) cold (summaries not cached)
+  * archive_query.query_archive(plate=...) warm
+
+Usage:
+    python benchmarks/bench_archive_query.py [--days 365] [--per-day 300] [--plates 5000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR / 'src'))
+
+import database as db  # noqa: E402
+import archive_query  # noqa: E402
+from archive_utils import archive_day, list_archived_days, read_archive_table  # noqa: E402
+
+
+def plate_name(i):
+    return f"{10 + i % 90}ب{100 + i // 90 % 900}-{10 + i % 77}"
+
+
+def populate(n_days, per_day, n_plates, archive_root):
+    db.DB_PATH = Path(tempfile.mkdtemp()) / 'bench_parking.db'
+    db.init_db()
+    first = date(2024, 1, 1)
+    conn = db.get_conn()
+    cur = conn.cursor()
+    for d in range(n_days):
+        day = (first + timedelta(days=d)).strftime("%Y-%m-%d")
+        for i in range(per_day):
+            plate = plate_name((d * per_day + i) * 7919 % n_plates)
+            cur.execute(
+                "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, ?, ?)",
+                (plate, f"captures/entry/{d}_{i}.jpg", f"{day} 08:{i % 60:02d}:00"),
+            )
+            cur.execute("""
+                INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (cur.lastrowid, plate, f"captures/exit/{d}_{i}.jpg",
+                  f"{day} 10:{i % 60:02d}:00", 30 + i % 300, 20000 * (1 + i % 5)))
+    conn.commit()
+    conn.close()
+    db.rebuild_daily_stats()
+
+    for d in range(n_days):
+        archive_day(first + timedelta(days=d), archive_root=archive_root)
+
+
+def old_search(plate, archive_root):
+    found = []
+    for day in list_archived_days(archive_root):
+        rows = read_archive_table(os.path.join(archive_root, day), "exits")
+        found.extend(r for r in rows if r["plate"] == plate)
+    return found
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--per-day', type=int, default=300)
+    parser.add_argument('--plates', type=int, default=5000)
+    args = parser.parse_args()
+
+    archive_root = tempfile.mkdtemp()
+    print(f"days={args.days} per_day={args.per_day} plates={args.plates}")
+    build, _ = timed(lambda: populate(args.days, args.per_day, args.plates, archive_root))
+    print(f"build archive:      {build:>8.2f} s")
+
+    plate = plate_name(42)
+
+    def new_search():
+        return list(archive_query.query_archive("exits", plate=plate, archive_root=archive_root))
+
+    old, expected = timed(lambda: old_search(plate, archive_root))
+    cold, found = timed(new_search)
+    warm, _ = timed(new_search)
+    assert len(found) == len(expected), (len(found), len(expected))
+
+    print(f"plate visits found: {len(found)}")
+    print(f"old full scan:      {old * 1000:>8.1f} ms")
+    print(f"query cold:         {cold * 1000:>8.1f} ms   speedup: {old / cold:.1f}x")
+    print(f"query warm:         {warm * 1000:>8.1f} ms   speedup: {old / warm:.1f}x")
+
+    totals, result = timed(lambda: archive_query.archive_totals(archive_root=archive_root))
+    print(f"revenue all days:   {totals * 1000:>8.1f} ms   ({result['revenue']})")
+
+
+if __name__ == '__main__':
+    main()
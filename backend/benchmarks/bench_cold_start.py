@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Benchmark: Django API cold start, lazy vs eager vision stack.
+
+Starts fresh interpreters with `python -X importtime` and measures
+  * lazy:  django.setup() + parking_api.urls (what manage.py, the tests
+           and a worker that never serves a detection pay)
+  * eager: the same plus api.yolo_service (torch, cv2, numpy, yolov5),
+           i.e. the startup cost before detection was imported lazily
+Reports the median wall time over --runs runs and the slowest imports of
+the last lazy run. tests/test_import_time.py enforces the lazy budget.
+
+Usage:
+    python benchmarks/bench_cold_start.py [--runs 5] [--top 10]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+STARTUP = "import django; django.setup(); import parking_api.urls"
+SCENARIOS = {
+    'lazy': STARTUP,
+    'eager': STARTUP + "; import api.yolo_service",
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)\s*$')
+
+
+def run_once(code):
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='parking_api.settings')
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    wall = time.perf_counter() - start
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    return wall, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    last_imports = None
+    for label, code in SCENARIOS.items():
+        walls = []
+        for _ in range(args.runs):
+            wall, imports = run_once(code)
+            walls.append(wall)
+            if label == 'lazy':
+                last_imports = imports
+        print(f"{label:<6} median {statistics.median(walls) * 1000:>7.0f} ms   "
+              f"min {min(walls) * 1000:>7.0f} ms   ({len(imports)} modules)")
+
+    # فقط ماژول‌های سطح بالا (تو رفتگی یک) تا جمع‌ها دوبار شمرده نشوند
+    top_level = sorted((i for i in last_imports if i[1] == 1), reverse=True)[:args.top]
+    print("\nslowest top-level imports (lazy):")
+    for cumulative, _, name in top_level:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+"""
+Benchmark: GUI data-layer startup and refresh cost, pandas vs row tuples.
+
+Startup: time to import the live-tab data layer (gui_data) in a fresh
+interpreter, compared with importing pandas, which gui_qt used to do at
+module load.
+
+Refresh: builds a throwaway SQLite database with N entries (some still
+active) and exits, then times
+  * the old refresh: four pd.read_sql_query calls + region .apply()
+  * a full snapshot: gui_data.load_snapshot()
+  * an incremental refresh after one new entry: gui_data.fetch_update()
+
+Does not need PyQt5.
+
+Usage:
+    python benchmarks/bench_gui_refresh.py [--rows 20000] [--active 300] [--repeat 5]
+"""
+
+import argparse
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = BACKEND_DIR / 'src'
+sys.path.insert(0, str(SRC_DIR))
+
+import database as db  # noqa: E402
+import gui_data  # noqa: E402
+from plate_utils import get_plate_region  # noqa: E402
+
+
+def populate(n_rows, n_active):
+    db.DB_PATH = Path(tempfile.mkdtemp()) / 'bench_parking.db'
+    db.init_db()
+    conn = db.get_conn()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO entries (id, plate, image_in, timestamp_in) VALUES (?, ?, ?, ?)",
+        (
+            (i, f"{10 + i % 90}ب{100 + i % 900}-{10 + i % 90}",
+             f"captures/entry/{i}.jpg", f"2024-01-{1 + i % 28:02d} 08:{i % 60:02d}:00")
+            for i in range(1, n_rows + 1)
+        ),
+    )
+    cur.execute("""
+        INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+        SELECT id, plate, 'captures/exit/' || id || '.jpg', timestamp_in, 60, 20000
+        FROM entries WHERE id <= ?
+    """, (n_rows - n_active,))
+    cur.execute("""
+        INSERT INTO active_cars (entry_id, plate, timestamp_in)
+        SELECT id, plate, timestamp_in FROM entries WHERE id > ?
+    """, (n_rows - n_active,))
+    conn.commit()
+    conn.close()
+
+
+def time_import(statement, repeat):
+    code = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); "
+        f"t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    )
+    best = float('inf')
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, '-c', code, str(SRC_DIR)],
+            capture_output=True, text=True, check=True,
+        )
+        best = min(best, float(out.stdout.strip()))
+    return best
+
+
+def time_best(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def old_refresh():
+    """What MainWindow.refresh_all did before (pandas, uncached region)."""
+    import pandas as pd
+
+    region = get_plate_region.__wrapped__
+
+    def query(sql):
+        conn = db.get_conn()
+        df = pd.read_sql_query(sql, conn)
+        conn.close()
+        return df
+
+    query("SELECT COUNT(*) AS c FROM active_cars")
+    for sql in (
+        """SELECT ac.entry_id, ac.plate, ac.timestamp_in, e.image_in
+           FROM active_cars ac JOIN entries e ON ac.entry_id = e.id""",
+        "SELECT * FROM entries ORDER BY id DESC LIMIT 100",
+        "SELECT * FROM exits ORDER BY id DESC LIMIT 100",
+    ):
+        df = query(sql)
+        df["region"] = df["plate"].apply(lambda p: region(p) or "National")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--active', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"rows={args.rows} active={args.active} repeat={args.repeat}")
+
+    pandas_import = time_import("import pandas", args.repeat)
+    data_import = time_import("import gui_data", args.repeat)
+    print(f"startup  import pandas: {pandas_import * 1000:>8.1f} ms   "
+          f"import gui_data: {data_import * 1000:>8.1f} ms")
+
+    populate(args.rows, args.active)
+    import pandas  # noqa: F401  (exclude import time from the refresh numbers)
+
+    old = time_best(old_refresh, args.repeat)
+    snapshot = time_best(gui_data.load_snapshot, args.repeat)
+    print(f"refresh  pandas:        {old * 1000:>8.1f} ms   "
+          f"snapshot:        {snapshot * 1000:>8.1f} ms   speedup: {old / snapshot:.1f}x")
+
+    def incremental():
+        version = db.get_change_version()
+        db.register_entry('12ب345-67', 'captures/entry/new.jpg')
+        start = time.perf_counter()
+        kind, _, _ = gui_data.fetch_update(version)
+        assert kind == 'changes'
+        return time.perf_counter() - start
+
+    delta = min(incremental() for _ in range(args.repeat))
+
+    def unchanged():
+        gui_data.fetch_update(db.get_change_version())
+
+    idle = time_best(unchanged, args.repeat)
+    print(f"refresh  one new entry: {delta * 1000:>8.2f} ms   "
+          f"nothing changed: {idle * 1000:>8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Benchmark: fuzzy exit matching, linear scan vs PlateIndex.
+
+For each lot size (200, 2,000 and 20,000 active cars by default) builds a
+PlateIndex of random national plates, then times
+  * build: add() per car
+  * hit:   best_match() for a misread of an active plate (one or two
+           6/8-style confusions, or one wrong character)
+  * miss:  best_match() for a plate that is not inside
+  * scan:  the same misreads against every active plate with
+           plate_distance (what a naive fallback would do)
+and reports how many misreads were matched back to the right car.
+
+Usage:
+    python benchmarks/bench_plate_index.py [--sizes 200 2000 20000] [--queries 2000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR / 'src'))
+
+from plate_index import (  # noqa: E402
+    CONFUSABLE_PAIRS, DEFAULT_MAX_DISTANCE, PlateIndex, match_key, plate_distance,
+)
+from plate_parser import PERSIAN_LETTERS  # noqa: E402
+
+_PARTNERS = {}
+for _a, _b in CONFUSABLE_PAIRS:
+    _PARTNERS.setdefault(_a, []).append(_b)
+    _PARTNERS.setdefault(_b, []).append(_a)
+
+
+def random_plate(rng):
+    return (f"{rng.randint(10, 99)}{rng.choice(PERSIAN_LETTERS)}"
+            f"{rng.randint(100, 999)}-{rng.randint(10, 99)}")
+
+
+def misread(plate, rng):
+    """یک یا دو اشتباه رایج، یا یک حرف کاملاً اشتباه"""
+    chars = list(plate)
+    positions = [i for i, ch in enumerate(chars) if ch in _PARTNERS]
+    kind = rng.random()
+    if kind < 0.8 and positions:
+        for i in rng.sample(positions, min(len(positions), 1 if kind < 0.5 else 2)):
+            chars[i] = rng.choice(_PARTNERS[chars[i]])
+    else:
+        i = rng.choice([i for i, ch in enumerate(chars) if ch.isdigit()])
+        chars[i] = str((int(chars[i]) + 2) % 10)
+    return ''.join(chars)
+
+
+def per_call_us(fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def linear_scan(keys, query):
+    key = match_key(query)
+    return min(keys, key=lambda k: plate_distance(key, k, limit=DEFAULT_MAX_DISTANCE))
+
+
+def run(size, n_queries, rng):
+    plates = set()
+    while len(plates) < size:
+        plates.add(random_plate(rng))
+    plates = sorted(plates)
+
+    index = PlateIndex()
+    build_us = per_call_us(lambda item: index.add(*item), list(enumerate(plates)))
+
+    targets = [rng.choice(plates) for _ in range(n_queries)]
+    reads = [misread(p, rng) for p in targets]
+    absent = [random_plate(rng) for _ in range(n_queries)]
+
+    hit_us = per_call_us(index.best_match, reads)
+    miss_us = per_call_us(index.best_match, absent)
+
+    keys = [match_key(p) for p in plates]
+    scan_reads = reads[:max(10, n_queries * 200 // size)]
+    scan_us = per_call_us(lambda q: linear_scan(keys, q), scan_reads)
+
+    matched = sum(
+        1 for read, target in zip(reads, targets)
+        if (index.best_match(read) or (None,))[0] == target
+    )
+    wrong = sum(
+        1 for read, target in zip(reads, targets)
+        if index.best_match(read) not in (None,) and index.best_match(read)[0] != target
+    )
+    print(f"{size:>6} cars   build {build_us:>6.1f} µs/car   hit {hit_us:>7.1f} µs   "
+          f"miss {miss_us:>7.1f} µs   scan {scan_us:>9.1f} µs   "
+          f"matched {matched / n_queries:>5.1%}   wrong {wrong / n_queries:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 2000, 20000])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        run(size, args.queries, rng)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+Benchmark: plate validation / region lookup, legacy code vs plate_parser.
+
+Runs a realistic mix of OCR-style plate strings (valid national plates
+with assorted separators, free-zone plates and junk) through
+  * the legacy validate_plate_format / get_plate_region / format_plate
+    (frozen copies in tests/test_plate_parser.py)
+  * plate_parser with cold caches (every string seen for the first time)
+  * plate_parser with warm caches (the repeating-plates case of a gate
+    camera or a GUI table refresh)
+and prints the time per call.
+
+Usage:
+    python benchmarks/bench_plate_parser.py [--plates 2000] [--repeat 20]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR / 'src'))
+sys.path.insert(0, str(BACKEND_DIR / 'tests'))
+
+import plate_parser  # noqa: E402
+import test_plate_parser as legacy  # noqa: E402
+
+
+def make_plates(n, seed=1):
+    rng = random.Random(seed)
+    letters = plate_parser.PERSIAN_LETTERS
+    plates = []
+    for _ in range(n):
+        series, serial, region = rng.randint(10, 99), rng.randint(100, 999), rng.randint(10, 99)
+        letter = rng.choice(letters)
+        kind = rng.random()
+        if kind < 0.4:
+            plates.append(f"{series}{letter}{serial}-{region}")
+        elif kind < 0.6:
+            plates.append(f"{series} {letter} {serial} ایران {region}")
+        elif kind < 0.8:
+            plates.append(f"{rng.randint(10000, 99999)}{rng.choice(['22', '33', '44', '55', '77', '11'])}")
+        else:
+            plates.append(f"{series}{letter}{serial}x{region}")
+    return plates
+
+
+def per_call(fn, plates, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for p in plates:
+            fn(p)
+    return (time.perf_counter() - start) / (repeat * len(plates)) * 1e6
+
+
+def clear_caches():
+    plate_parser._parse.cache_clear()
+    plate_parser.get_plate_region.cache_clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--plates', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    plates = make_plates(args.plates)
+    cases = (
+        ("validate", legacy.legacy_validate_plate_format, plate_parser.is_valid_plate),
+        ("region", legacy.legacy_get_plate_region, plate_parser.get_plate_region),
+        ("format_plate", legacy.legacy_format_plate, plate_parser.format_plate),
+    )
+
+    print(f"plates={args.plates} repeat={args.repeat}   (µs per call)")
+    for name, old, new in cases:
+        legacy_us = per_call(old, plates, args.repeat)
+
+        # سرد: هر رشته فقط یک بار، بعد از خالی کردن کش
+        clear_caches()
+        cold_us = per_call(new, plates, 1)
+        warm_us = per_call(new, plates, args.repeat)
+        print(f"{name:<13} legacy {legacy_us:>6.2f}   cold {cold_us:>6.2f}   "
+              f"warm {warm_us:>6.2f}   ({legacy_us / warm_us:.0f}x warm)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+"""
+Benchmark: full daily PDF report for a large day, pandas vs streaming.
+
+Builds a throwaway database with --rows entries and exits on each of
+--days days, then measures time (and with --memory, peak Python memory
+via tracemalloc in a second, much slower run) for
+  * the pandas way: read_sql_query both tables, then iterrows() over
+    every row into the PDF
+  * reports.generate_day_report(), streaming keyset chunks from SQLite
+and finally all days sequentially vs reports.generate_reports() across
+worker processes.
+
+Needs reportlab (and pandas for the baseline).
+
+Usage:
+    python benchmarks/bench_reports.py [--rows 50000] [--days 4] [--workers 4] [--memory]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR / 'src'))
+
+import database as db  # noqa: E402
+import reports  # noqa: E402
+
+
+def populate(n_rows, n_days):
+    db.DB_PATH = Path(tempfile.mkdtemp()) / 'bench_parking.db'
+    db.init_db()
+    conn = db.get_conn()
+    cur = conn.cursor()
+    days = [f"2024-01-{d + 1:02d}" for d in range(n_days)]
+    for day in days:
+        for i in range(n_rows):
+            plate = f"{10 + i % 90}ب{100 + i % 900}-{10 + i % 77}"
+            cur.execute(
+                "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, ?, ?)",
+                (plate, f"captures/entry/{i}.jpg", f"{day} 08:{i % 60:02d}:00"),
+            )
+            cur.execute("""
+                INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (cur.lastrowid, plate, f"captures/exit/{i}.jpg",
+                  f"{day} 10:{i % 60:02d}:00", 30 + i % 300, 20000))
+    conn.commit()
+    conn.close()
+    return days
+
+
+def pandas_report(day, out_path):
+    """The old DataFrame + iterrows() approach, extended to every row."""
+    import pandas as pd
+
+    conn = db.get_conn()
+    entries_df = pd.read_sql_query(
+        "SELECT * FROM entries WHERE timestamp_in >= ? AND timestamp_in < ?",
+        conn, params=(day, day + "~"),
+    )
+    exits_df = pd.read_sql_query(
+        "SELECT * FROM exits WHERE timestamp_out >= ? AND timestamp_out < ?",
+        conn, params=(day, day + "~"),
+    )
+    conn.close()
+
+    c = reports.canvas.Canvas(out_path, pagesize=reports.A4)
+    _, h = reports.A4
+    y = h - 25 * reports.mm
+    c.setFont("Helvetica", 8)
+    for df, keys in ((entries_df, ("id", "plate", "timestamp_in")),
+                     (exits_df, ("id", "plate", "timestamp_out", "duration_minutes", "cost"))):
+        for _, row in df.iterrows():
+            c.drawString(20 * reports.mm, y, "  ".join(str(row[k]) for k in keys))
+            y -= 4.5 * reports.mm
+            if y < 20 * reports.mm:
+                c.showPage()
+                c.setFont("Helvetica", 8)
+                y = h - 25 * reports.mm
+    c.showPage()
+    c.save()
+
+
+def measure(fn, memory):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    if not memory:
+        return elapsed, ""
+
+    # tracemalloc slows everything down a lot, so it gets its own run
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, f"   peak {peak / 1024 / 1024:>7.1f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--days', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--memory', action='store_true', help="also measure peak memory")
+    args = parser.parse_args()
+
+    print(f"rows/day={args.rows} days={args.days} workers={args.workers} cpus={os.cpu_count()}")
+    days = populate(args.rows, args.days)
+    out_dir = tempfile.mkdtemp()
+    day = days[0]
+
+    try:
+        import pandas  # noqa: F401
+        t, peak = measure(
+            lambda: pandas_report(day, os.path.join(out_dir, 'pandas.pdf')), args.memory
+        )
+        print(f"one day  pandas:    {t:>7.2f} s{peak}")
+    except ImportError:
+        print("one day  pandas:    skipped (pandas not installed)")
+
+    t, peak = measure(
+        lambda: reports.generate_day_report(day, os.path.join(out_dir, 'stream.pdf')), args.memory
+    )
+    print(f"one day  streaming: {t:>7.2f} s{peak}   "
+          f"({os.path.getsize(os.path.join(out_dir, 'stream.pdf')) // 1024} KiB PDF)")
+
+    start = time.perf_counter()
+    for d in days:
+        reports.generate_day_report(d, os.path.join(out_dir, f'seq-{d}.pdf'))
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reports.generate_reports(days, out_dir=out_dir, workers=args.workers)
+    parallel = time.perf_counter() - start
+    print(f"{args.days} days   sequential: {sequential:>7.2f} s   "
+          f"parallel: {parallel:>7.2f} s   speedup: {sequential / parallel:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
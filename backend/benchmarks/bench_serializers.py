@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+Benchmark: rows serialized per second, ModelSerializer vs fast path.
+
+Builds a throwaway SQLite database with N entries/exits, then times
+serializing + rendering the same rows with the DRF ModelSerializers
+(EntrySerializer / ExitSerializer + JSONRenderer) and with the fast path
+(FastEntrySerializer / FastExitSerializer + FastJSONRenderer).
+
+Usage:
+    python benchmarks/bench_serializers.py [--rows 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / 'src'))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+
+from django.conf import settings  # noqa: E402
+
+TMP_DIR = tempfile.mkdtemp()
+TMP_DB = Path(TMP_DIR) / 'bench_parking.db'
+settings.DATABASES['default']['NAME'] = TMP_DB
+
+import django  # noqa: E402
+django.setup()
+
+import database as db  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from api.models import Entry, Exit  # noqa: E402
+from api.renderers import FastJSONRenderer, ORJSON_AVAILABLE  # noqa: E402
+from api.serializers import (  # noqa: E402
+    EntrySerializer, ExitSerializer, FastEntrySerializer, FastExitSerializer,
+)
+
+
+def populate(n_rows):
+    db.DB_PATH = TMP_DB
+    db.init_db()
+    conn = db.get_conn()
+    cur = conn.cursor()
+    cur.executemany(
+        "INSERT INTO entries (id, plate, image_in, timestamp_in) VALUES (?, ?, ?, ?)",
+        (
+            (i, f"{10 + i % 90}ب{100 + i % 900}-{10 + i % 90}",
+             f"captures/entry/{i}.jpg", f"2024-01-{1 + i % 28:02d} 08:{i % 60:02d}:00")
+            for i in range(1, n_rows + 1)
+        ),
+    )
+    cur.executemany("""
+        INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+        SELECT id, plate, 'captures/exit/' || id || '.jpg', timestamp_in, 60, 20000
+        FROM entries WHERE id = ?
+    """, ((i,) for i in range(1, n_rows + 1)))
+    conn.commit()
+    conn.close()
+
+
+def time_best(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(name, model, model_serializer, fast_serializer, n_rows, repeat):
+    queryset = model.objects.order_by('-id')
+    slow_renderer = JSONRenderer()
+    fast_renderer = FastJSONRenderer()
+    fast = fast_serializer()
+
+    def slow_path():
+        slow_renderer.render(model_serializer(queryset, many=True).data)
+
+    def fast_path():
+        fast_renderer.render(fast.to_representation(fast.get_values_queryset(queryset)))
+
+    slow = time_best(slow_path, repeat)
+    quick = time_best(fast_path, repeat)
+    print(f"{name:8s} ModelSerializer: {n_rows / slow:>12,.0f} rows/s   "
+          f"fast path: {n_rows / quick:>12,.0f} rows/s   speedup: {slow / quick:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    populate(args.rows)
+    print(f"rows={args.rows} repeat={args.repeat} orjson={'yes' if ORJSON_AVAILABLE else 'no'}")
+    bench('entries', Entry, EntrySerializer, FastEntrySerializer, args.rows, args.repeat)
+    bench('exits', Exit, ExitSerializer, FastExitSerializer, args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Load test: /api/detect-plate/ under upload bursts, bounded vs unbounded queue.
+
+Runs the async view in-process through django.test.AsyncClient with
+detect_plate_in_image replaced by a sleep of --service-ms (a stand-in for
+one CPU inference), so only the request path and the executor are
+measured. For each burst size, `--bursts` bursts of concurrent uploads are
+sent and the script reports p50/p95/p99/max latency of the accepted
+requests and how many were rejected with 429, for
+  * bounded:   the default executor (PARKING_INFERENCE_WORKERS /
+               PARKING_INFERENCE_QUEUE, or --workers/--queue)
+  * unbounded: same workers, no queue limit (every request waits its turn,
+               as on the old synchronous views)
+
+Usage:
+    python benchmarks/load_detect.py [--bursts-of 4 16 64] [--bursts 5] [--service-ms 40]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(BACKEND_DIR / 'src'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.test import AsyncClient  # noqa: E402
+
+from api.inference import InferenceExecutor  # noqa: E402
+from api import inference  # noqa: E402
+
+
+def fake_inference(service_s):
+    def detect(image_bytes):
+        time.sleep(service_s)
+        return {'success': True, 'plate': '12ب345-67', 'confidence': 0.9,
+                'bbox': {'x1': 0, 'y1': 0, 'x2': 1, 'y2': 1}}
+    return detect
+
+
+async def one_request(client):
+    image = SimpleUploadedFile('gate.jpg', b'\xff\xd8fake-jpeg', content_type='image/jpeg')
+    start = time.perf_counter()
+    response = await client.post('/api/detect-plate/', {'image': image})
+    return response.status_code, (time.perf_counter() - start) * 1000
+
+
+async def run_bursts(size, bursts, gap_s):
+    client = AsyncClient()
+    latencies, rejected = [], 0
+    for _ in range(bursts):
+        results = await asyncio.gather(*(one_request(client) for _ in range(size)))
+        for code, ms in results:
+            if code == 200:
+                latencies.append(ms)
+            elif code == 429:
+                rejected += 1
+            else:
+                raise RuntimeError(f"unexpected status {code}")
+        await asyncio.sleep(gap_s)
+    return latencies, rejected
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def report(label, size, bursts, latencies, rejected):
+    total = size * bursts
+    print(f"{label:<9} burst {size:>4}   accepted {len(latencies):>5}/{total:<5} "
+          f"429 {rejected:>5}   p50 {percentile(latencies, 50):>8.1f} ms   "
+          f"p95 {percentile(latencies, 95):>8.1f} ms   p99 {percentile(latencies, 99):>8.1f} ms   "
+          f"max {max(latencies, default=0):>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--bursts-of', type=int, nargs='+', default=[4, 16, 64])
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--service-ms', type=float, default=40.0)
+    parser.add_argument('--workers', type=int, default=inference.executor.workers)
+    parser.add_argument('--queue', type=int, default=inference.executor.max_pending)
+    args = parser.parse_args()
+
+    # هر 429 یک خط هشدار در django.request است
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    service_s = args.service_ms / 1000
+    # فاصله بین انفجارها: بیشتر از زمان تخلیه صف محدود
+    gap_s = service_s * (args.workers + args.queue) / args.workers
+
+    print(f"service {args.service_ms:.0f} ms/inference, {args.workers} worker(s), "
+          f"queue {args.queue}, {args.bursts} bursts per size")
+    modes = [
+        ('bounded', lambda: InferenceExecutor(args.workers, args.queue)),
+        ('unbounded', lambda: InferenceExecutor(args.workers, 10 ** 6)),
+    ]
+    with mock.patch('api.views.detect_plate_in_image', fake_inference(service_s)):
+        for size in args.bursts_of:
+            for label, make in modes:
+                executor = make()
+                with mock.patch('api.views.inference_executor', executor):
+                    latencies, rejected = asyncio.run(run_bursts(size, args.bursts, gap_s))
+                executor.shutdown()
+                report(label, size, args.bursts, latencies, rejected)
+
+
+if __name__ == '__main__':
+    main()
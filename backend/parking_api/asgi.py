@@ -3,6 +3,12 @@ ASGI config for parking_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The push feed at /api/events/stream/ (Server-Sent Events) should be
+served through this entry point so that idle subscribers cost a
+coroutine rather than a worker thread, e.g.:
+
+    uvicorn parking_api.asgi:application --host 0.0.0.0 --port 8000
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
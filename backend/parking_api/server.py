@@ -0,0 +1,390 @@
+"""
+Pre-forking API server used by `run_backend.py --api`.
+
+The master process sets up Django and loads both YOLO models once, then
+forks the workers. The model weights live in tensor buffers that the
+workers only read, so those pages stay shared copy-on-write: N workers
+cost roughly one copy of the weights plus their own private heap.
+gc.freeze() right before forking keeps the collector from writing to (and
+so copying) every object the master created.
+
+Each worker:
+  * pins torch intra-op threads (torch_threads, default cpu_count // workers)
+    so the workers together do not oversubscribe the cores
+  * serves the Django WSGI application from the inherited listening socket
+    with one thread per connection
+  * reports its RSS (shared / private) once ready
+  * starts with an empty metrics registry and writes it to a directory
+    shared with the other workers, so /api/metrics/ on any worker returns
+    the totals of all of them (see metrics.enable_multiprocess)
+  * retires after max_requests (plus jitter) requests: it stops accepting,
+    tells the master (which forks the replacement right away), ends its
+    SSE streams (clients reconnect to another worker), gives the requests
+    in flight up to drain_timeout seconds to finish and exits
+
+SIGTERM or Ctrl+C on the master stops the workers the same graceful way;
+workers still alive drain_timeout + STOP_GRACE seconds later, or on a
+second Ctrl+C, are killed. On platforms without os.fork (Windows) the
+server runs in a single process.
+"""
+
+import gc
+import os
+import random
+import select
+import shutil
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from wsgiref.simple_server import WSGIServer, WSGIRequestHandler
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8000
+DEFAULT_MAX_REQUESTS = 1000
+DEFAULT_MAX_REQUESTS_JITTER = 100
+
+# حداکثر زمان (ثانیه) برای تمام شدن درخواست‌های جاری worker در حال بازنشستگی
+DEFAULT_DRAIN_TIMEOUT = 30.0
+# فرصت اضافه master بعد از drain_timeout قبل از SIGKILL در توقف
+STOP_GRACE = 5.0
+
+# worker که زودتر از این (ثانیه) با خطا بمیرد، با تأخیر جایگزین می‌شود
+CRASH_BACKOFF = 1.0
+# فاصله بررسی workerهای خارج‌شده توسط master
+REAP_INTERVAL = 0.5
+
+
+def default_workers():
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def memory_usage(pid='self'):
+    """RSS / shared / private یک پروسه به مگابایت (از /proc در لینوکس)"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                parts = value.split()
+                if len(parts) == 2 and parts[1] == 'kB':
+                    fields[name] = int(parts[0])
+    except OSError:
+        try:
+            import resource
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return {'rss': peak / 1024, 'shared': None, 'private': None}
+        except (ImportError, OSError):
+            return None
+    shared = fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)
+    private = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return {'rss': fields.get('Rss', 0) / 1024, 'shared': shared / 1024, 'private': private / 1024}
+
+
+def format_memory(usage):
+    if usage is None:
+        return 'RSS unknown'
+    if usage['shared'] is None:
+        return f"peak RSS {usage['rss']:.0f} MB"
+    return (f"RSS {usage['rss']:.0f} MB "
+            f"(shared {usage['shared']:.0f} MB, private {usage['private']:.0f} MB)")
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """WSGIRequestHandler without a log line per request on stderr"""
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+class WorkerServer(socketserver.ThreadingMixIn, WSGIServer):
+    """
+    WSGI server of one worker, on a socket bound by the master.
+
+    Counts requests and shuts itself down after max_requests. Requests
+    in flight are tracked so drain() can wait for them with a deadline;
+    on_retire() is called once when retiring starts.
+    """
+    daemon_threads = True
+    block_on_close = False  # drain() waits instead, with a timeout
+
+    def __init__(self, listener, app, max_requests=None, on_retire=None):
+        socketserver.BaseServer.__init__(self, listener.getsockname()[:2], QuietRequestHandler)
+        self.socket = listener
+        host, port = listener.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(app)
+        self.max_requests = max_requests
+        self.handled = 0
+        self.on_retire = on_retire
+        self._retiring = False
+        self._active = 0
+        self._idle = threading.Condition()
+
+    def process_request(self, request, client_address):
+        with self._idle:
+            self._active += 1
+        super().process_request(request, client_address)
+        self.handled += 1
+        if self.max_requests and self.handled >= self.max_requests:
+            self.retire()
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def retire(self):
+        """بستن نرم: درخواست جدید نمی‌پذیرد، درخواست‌های جاری تمام می‌شوند"""
+        if not self._retiring:
+            self._retiring = True
+            if self.on_retire is not None:
+                self.on_retire()
+            # shutdown() تا خروج serve_forever صبر می‌کند؛ از همان نخ صدا زده نشود
+            threading.Thread(target=self.shutdown, daemon=True).start()
+
+    def drain(self, timeout):
+        """
+        صبر برای درخواست‌های جاری، حداکثر timeout ثانیه.
+        Returns the number of requests still running (0 = all finished).
+        """
+        with self._idle:
+            self._idle.wait_for(lambda: self._active == 0, timeout)
+            return self._active
+
+
+def load_application(preload=True):
+    """Django + (اختیاری) مدل‌های YOLO را در master بارگذاری می‌کند"""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+
+    from django.core.wsgi import get_wsgi_application
+    app = get_wsgi_application()
+
+    from api.views import db
+    db.init_db()
+
+    if preload:
+        # عملیات torch در master فقط تک‌نخی: استخر نخ OpenMP بعد از fork در workerها قفل می‌شود
+        pin_torch_threads(1)
+        from api.yolo_service import warm_up
+        if not warm_up():
+            print("⚠ Models will be loaded by each worker on first request (not shared)")
+    return app
+
+
+def pin_torch_threads(threads):
+    if threads is None:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def _stop_serving(server, drain_timeout, name):
+    """پایان serve_forever: بستن سوکت و صبر محدود برای درخواست‌های جاری"""
+    server.server_close()
+    left = server.drain(drain_timeout)
+    if left:
+        print(f"  {name}: {left} requests still running after {drain_timeout:.0f}s, "
+              f"closing them", flush=True)
+
+
+def _worker_main(number, listener, app, max_requests, torch_threads, drain_timeout,
+                 notify_fd, metrics_dir):
+    pin_torch_threads(torch_threads)
+
+    # نخ‌های پس‌زمینه master بعد از fork وجود ندارند؛ در هر worker از نو
+    from api.views import db, event_bus, metrics
+    metrics.enable_multiprocess(metrics_dir)
+    db.load_recent_entries()
+
+    def on_retire():
+        # master همین حالا جایگزین را fork می‌کند، نه بعد از خروج این worker
+        try:
+            os.write(notify_fd, f"{os.getpid()}\n".encode())
+        except OSError:
+            pass
+        # استریم‌های SSE تمام می‌شوند تا drain منتظر آن‌ها نماند
+        event_bus.bus.close()
+
+    server = WorkerServer(listener, app, max_requests=max_requests, on_retire=on_retire)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.retire())
+    # SIGTERMی که هنگام راه‌اندازی رسیده همین حالا به retire می‌رسد
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGINT, signal.SIGTERM})
+
+    name = f"worker {number} (pid {os.getpid()})"
+    print(f"  {name} ready: {format_memory(memory_usage())}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        _stop_serving(server, drain_timeout, name)
+        metrics.write_snapshot()
+    print(f"  {name} exiting after {server.handled} requests", flush=True)
+
+
+def _serve_single(listener, app, torch_threads, drain_timeout):
+    pin_torch_threads(torch_threads)
+    from api.views import db, event_bus
+    db.load_recent_entries()
+    server = WorkerServer(listener, app)
+    print(f"  single process ready: {format_memory(memory_usage())}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        event_bus.bus.close()
+        _stop_serving(server, drain_timeout, 'single process')
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, torch_threads=None,
+          max_requests=DEFAULT_MAX_REQUESTS, max_requests_jitter=DEFAULT_MAX_REQUESTS_JITTER,
+          preload=True, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+    """
+    Run the API until SIGTERM / Ctrl+C.
+
+    Args:
+        workers (int): worker processes (default: CPU count, at most 4)
+        torch_threads (int): torch intra-op threads per worker
+            (default: CPU count // workers, at least 1)
+        max_requests (int): recycle a worker after this many requests
+            (0 = never); each worker adds a random 0..max_requests_jitter
+            (at most a tenth of max_requests)
+        preload (bool): load and warm up the YOLO models in the master before forking
+        drain_timeout (float): seconds a retiring worker waits for the
+            requests in flight before it exits anyway
+    """
+    workers = workers or default_workers()
+    if torch_threads is None:
+        torch_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    listener = socket.create_server((host, port), backlog=128)
+    app = load_application(preload=preload)
+    print(f"Master (pid {os.getpid()}) loaded: {format_memory(memory_usage())}")
+    print(f"Listening on http://{host}:{listener.getsockname()[1]}  "
+          f"workers={workers}  torch threads/worker={torch_threads}  "
+          f"max requests={max_requests or 'unlimited'}", flush=True)
+
+    if not hasattr(os, 'fork'):
+        _serve_single(listener, app, torch_threads, drain_timeout)
+        return
+
+    children = {}  # pid -> (worker number, start time)
+    retiring = set()  # pidهایی که جایگزینشان fork شده و در حال drain هستند
+    stopping = False
+    kill_at = None
+    # workerها شروع بازنشستگی را با نوشتن pid خود در این pipe اعلام می‌کنند
+    notify_r, notify_w = os.pipe()
+    # متریک‌های همه workerها (metrics.enable_multiprocess)
+    import metrics
+    metrics_dir = tempfile.mkdtemp(prefix='parking-metrics-')
+
+    def spawn(number):
+        # jitter: workers started together should not all retire together
+        jitter = min(max_requests_jitter, max_requests // 10) if max_requests else 0
+        limit = max_requests + random.randint(0, jitter) if max_requests else None
+        # تا نصب handlerهای worker، سیگنال‌ها مسدودند؛ وگرنه stop() مربوط به
+        # master در worker تازه اجرا می‌شود
+        mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGINT, signal.SIGTERM})
+        pid = os.fork()
+        if pid == 0:
+            # Ctrl+C به کل گروه پروسه می‌رسد؛ worker فقط با SIGTERM از master بسته می‌شود
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                os.close(notify_r)
+                _worker_main(number, listener, app, limit, torch_threads, drain_timeout,
+                             notify_w, metrics_dir)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(code)
+        signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+        children[pid] = (number, time.monotonic())
+
+    def kill_all(sig):
+        for pid in list(children):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def stop(signum, frame):
+        nonlocal stopping, kill_at
+        if stopping:
+            # بار دوم: بدون صبر
+            print("\nKilling workers", flush=True)
+            kill_at = time.monotonic()
+            return
+        stopping = True
+        kill_at = time.monotonic() + drain_timeout + STOP_GRACE
+        print("\nStopping workers... (Ctrl+C again to kill them)", flush=True)
+        kill_all(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    gc.collect()
+    gc.freeze()
+    for number in range(1, workers + 1):
+        spawn(number)
+
+    pending = b''
+    while children:
+        ready, _, _ = select.select([notify_r], [], [], REAP_INTERVAL)
+        if ready:
+            pending += os.read(notify_r, 4096)
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                pid = int(line)
+                if pid in children and pid not in retiring and not stopping:
+                    retiring.add(pid)
+                    spawn(children[pid][0])
+
+        while children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                children.clear()
+                break
+            if pid == 0:
+                break
+            if pid not in children:
+                continue
+            number, started = children.pop(pid)
+            metrics.mark_process_dead(pid, metrics_dir)
+            if stopping or pid in retiring:
+                retiring.discard(pid)
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code != 0:
+                print(f"  worker {number} (pid {pid}) died with exit code {code}", flush=True)
+                if time.monotonic() - started < CRASH_BACKOFF:
+                    time.sleep(CRASH_BACKOFF)
+            spawn(number)
+
+        if kill_at is not None and time.monotonic() >= kill_at:
+            kill_all(signal.SIGKILL)
+            kill_at = None
+
+    os.close(notify_r)
+    os.close(notify_w)
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    listener.close()
+    print("All workers stopped", flush=True)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -51,6 +54,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
     'api.middleware.TokenAuthenticationMiddleware',
 ]
 
@@ -154,3 +158,13 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 # Media files (for uploaded images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Request profiling (api.profiling) - off unless a rate or threshold is set
+PARKING_PROFILE = {
+    'SAMPLE_RATE': float(os.environ.get('PARKING_PROFILE_SAMPLE_RATE', 0)),  # 0..1
+    'SLOW_MS': float(os.environ.get('PARKING_PROFILE_SLOW_MS', 0)),  # 0 = off
+    'INTERVAL_MS': 5,
+    # outside the source tree, so kept profiles never show up in git status
+    'DIR': Path(os.environ.get('PARKING_PROFILE_DIR', Path(tempfile.gettempdir()) / 'parking-profiles')),
+    'KEEP': 200,
+}
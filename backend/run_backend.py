@@ -53,14 +53,37 @@ def run_gui():
         sys.exit(1)
 
 
-def run_api():
-    """Run as REST API server (placeholder for future implementation)"""
+def run_api(host, port, workers, torch_threads, max_requests):
+    """Run the REST API with pre-forked workers sharing the preloaded models"""
     print("=" * 60)
     print("Parking Management System - API Server")
     print("=" * 60)
-    print("API server mode not yet implemented.")
-    print("Please use GUI mode for now.")
-    sys.exit(1)
+
+    # parking_api (Django project) lives next to this file, not in src/
+    sys.path.insert(0, str(Path(__file__).parent))
+    from parking_api.server import serve
+
+    serve(
+        host=host,
+        port=port,
+        workers=workers,
+        torch_threads=torch_threads,
+        max_requests=max_requests,
+    )
+
+
+def run_archiver(days):
+    """Run the rolling archiver as a long-lived service"""
+    print("=" * 60)
+    print("Parking Management System - Rolling Archiver")
+    print("=" * 60)
+
+    from database import init_db
+    from rolling_archive import run_forever
+
+    init_db()
+    print(f"Archiving closed sessions older than {days} days (every hour)")
+    run_forever(older_than_days=days)
 
 
 def main():
@@ -71,7 +94,9 @@ def main():
 Examples:
   python backend/run_backend.py              # Run GUI (default)
   python backend/run_backend.py --gui        # Run GUI explicitly
-  python backend/run_backend.py --api        # Run API server (future)
+  python backend/run_backend.py --api        # Run API server
+  python backend/run_backend.py --api --workers 4 --port 8000
+  python backend/run_backend.py --archiver   # Run rolling archiver service
   python backend/run_backend.py --help       # Show this help message
         """,
     )
@@ -79,7 +104,28 @@ Examples:
     parser.add_argument(
         "--gui", action="store_true", default=True, help="Run GUI application (default)"
     )
-    parser.add_argument("--api", action="store_true", help="Run REST API server (experimental)")
+    parser.add_argument("--api", action="store_true", help="Run REST API server")
+    parser.add_argument("--host", default="0.0.0.0", help="API server host (default: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8000, help="API server port (default: 8000)")
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="API worker processes (default: CPU count, at most 4)",
+    )
+    parser.add_argument(
+        "--torch-threads", type=int, default=None,
+        help="torch intra-op threads per API worker (default: CPU count / workers)",
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=1000,
+        help="Recycle an API worker after this many requests, 0 = never (default: 1000)",
+    )
+    parser.add_argument(
+        "--archiver", action="store_true", help="Run the rolling archiver service"
+    )
+    parser.add_argument(
+        "--retention-days", type=int, default=30,
+        help="Days of closed sessions kept in parking.db by the archiver (default: 30)",
+    )
     parser.add_argument("--version", action="version", version="Parking Management System v1.0.0")
 
     args = parser.parse_args()
@@ -96,7 +142,9 @@ Examples:
 
     try:
         if args.api:
-            run_api()
+            run_api(args.host, args.port, args.workers, args.torch_threads, args.max_requests)
+        elif args.archiver:
+            run_archiver(args.retention_days)
         else:
             run_gui()
     except KeyboardInterrupt:
@@ -0,0 +1,198 @@
+"""
+جستجو در آرشیو چند روز (بدون باز کردن روز به روز)
+
+query_archive() streams archived rows that match a date range, a plate
+and cost / duration ranges, touching as little data as possible:
+
+  * day pruning:     only archives/<day>/ partitions inside [start, end]
+  * part pruning:    per-part stats in summary.json (int min/max, distinct
+                     plates) skip files that cannot contain a match
+  * projection:      only the requested and filtered columns are decoded
+  * pushdown:        parquet parts are read with pyarrow row filters
+
+archive_totals() answers cross-day revenue questions from the summaries
+alone.
+"""
+
+import os
+
+import archive_utils
+from archive_utils import (
+    ARCHIVE_TABLES,
+    iter_archive_rows,
+    list_archived_days,
+    part_files,
+    read_archive_summary,
+)
+
+# فیلترهای بازه‌ای -> ستون جدول exits
+RANGE_FILTERS = {
+    "cost": "cost",
+    "duration": "duration_minutes",
+}
+
+# روز آرشیوشده تغییر نمی‌کند؛ کلید cache شامل mtime است تا بازسازی روز دیده شود
+_summary_cache = {}
+
+
+def _summary(day_dir):
+    path = os.path.join(day_dir, "summary.json")
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = _summary_cache.get(day_dir)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    summary = read_archive_summary(day_dir)
+    for table in summary.get("tables", {}).values():
+        for stats in table.get("part_stats", []):
+            if "plates" in stats:
+                stats["plates"] = frozenset(stats["plates"])
+    _summary_cache[day_dir] = (mtime, summary)
+    return summary
+
+
+def _days(start, end, archive_root):
+    days = sorted(list_archived_days(archive_root))
+    return [
+        day for day in days
+        if (start is None or day >= start) and (end is None or day <= end)
+    ]
+
+
+def _part_may_match(stats, plate, ranges):
+    if plate is not None and "plates" in stats and plate not in stats["plates"]:
+        return False
+    for col, (low, high) in ranges.items():
+        if col not in stats["min"]:
+            continue
+        if low is not None and stats["max"][col] < low:
+            return False
+        if high is not None and stats["min"][col] > high:
+            return False
+    return True
+
+
+def _row_matches(row, plate, ranges):
+    if plate is not None and row["plate"] != plate:
+        return False
+    for col, (low, high) in ranges.items():
+        value = row[col]
+        if value is None:
+            return False
+        if low is not None and value < low:
+            return False
+        if high is not None and value > high:
+            return False
+    return True
+
+
+def _parquet_filters(plate, ranges):
+    filters = []
+    if plate is not None:
+        filters.append(("plate", "=", plate))
+    for col, (low, high) in ranges.items():
+        if low is not None:
+            filters.append((col, ">=", low))
+        if high is not None:
+            filters.append((col, "<=", high))
+    return filters or None
+
+
+def _iter_part(path, table, needed, plate, ranges):
+    if path.endswith(".parquet") and archive_utils.PARQUET_AVAILABLE:
+        return archive_utils.pq.read_table(
+            path, columns=needed, filters=_parquet_filters(plate, ranges)
+        ).to_pylist()
+    return archive_utils.iter_part_rows(path, table, needed)
+
+
+def _candidate_rows(day_dir, table, needed, plate, ranges):
+    """ردیف‌های روز که ممکن است مطابق باشند (با هرس بخش‌ها)"""
+    summary = _summary(day_dir)
+    table_info = (summary or {}).get("tables", {}).get(table, {})
+    part_stats = {stats["file"]: stats for stats in table_info.get("part_stats", [])}
+
+    paths = part_files(day_dir, table)
+    if not paths:
+        # چیدمان قدیمی (یک فایل CSV برای هر جدول)
+        yield from iter_archive_rows(day_dir, table, needed)
+        return
+
+    for path in paths:
+        stats = part_stats.get(os.path.basename(path))
+        if stats is not None and not _part_may_match(stats, plate, ranges):
+            continue
+        yield from _iter_part(path, table, needed, plate, ranges)
+
+
+def query_archive(table="exits", start=None, end=None, plate=None, cost=None,
+                  duration=None, columns=None, archive_root=None):
+    """
+    جستجو در آرشیو روزها؛ generator از dict ها به ترتیب زمانی.
+
+    Args:
+        table: 'exits' or 'entries'
+        start, end: 'YYYY-MM-DD' (inclusive), None for open ends
+        plate: exact plate text
+        cost, duration: (low, high) inclusive ranges, exits only; either
+            bound may be None
+        columns: columns to return (default: all columns of the table)
+    """
+    if table not in ARCHIVE_TABLES:
+        raise ValueError(f"Unknown archive table: {table}")
+
+    table_columns = [name for name, _ in ARCHIVE_TABLES[table]["columns"]]
+    if columns is None:
+        columns = table_columns
+    unknown = set(columns) - set(table_columns)
+    if unknown:
+        raise ValueError(f"Unknown columns for {table}: {', '.join(sorted(unknown))}")
+
+    ranges = {}
+    for name, bounds in (("cost", cost), ("duration", duration)):
+        if bounds is None:
+            continue
+        if table != "exits":
+            raise ValueError(f"'{name}' filter is only available for exits")
+        ranges[RANGE_FILTERS[name]] = tuple(bounds)
+
+    filter_columns = list(ranges) + (["plate"] if plate is not None else [])
+    needed = list(columns) + [col for col in filter_columns if col not in columns]
+    project = len(needed) != len(columns)
+    root = archive_root or archive_utils.ARCHIVE_ROOT
+
+    for day in _days(start, end, archive_root):
+        day_dir = os.path.join(root, day)
+        for row in _candidate_rows(day_dir, table, needed, plate, ranges):
+            if not _row_matches(row, plate, ranges):
+                continue
+            yield {col: row[col] for col in columns} if project else row
+
+
+def archive_totals(start=None, end=None, archive_root=None):
+    """
+    مجموع ورود، خروج و درآمد روزهای آرشیوشده در بازه، از summary.json ها.
+    Days in the old CSV layout (no summary) fall back to scanning the cost column.
+    """
+    root = archive_root or archive_utils.ARCHIVE_ROOT
+    totals = {"days": 0, "entries": 0, "exits": 0, "revenue": 0}
+
+    for day in _days(start, end, archive_root):
+        day_dir = os.path.join(root, day)
+        summary = _summary(day_dir)
+        totals["days"] += 1
+        if summary is not None:
+            for key in ("entries", "exits", "revenue"):
+                totals[key] += summary["totals"][key]
+            continue
+
+        totals["entries"] += sum(1 for _ in iter_archive_rows(day_dir, "entries", ["id"]))
+        for row in iter_archive_rows(day_dir, "exits", ["cost"]):
+            totals["exits"] += 1
+            totals["revenue"] += row["cost"] or 0
+
+    return totals
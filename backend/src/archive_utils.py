@@ -1,23 +1,492 @@
+"""
+آرشیو روزانه داده‌های پارکینگ
+
+archive_day(day) copies the day's entries and exits out of SQLite into
+archives/<day>/:
+
+    entries/part-00000.parquet ...   (or part-00000.csv.gz without pyarrow)
+    exits/part-00000.parquet ...
+    summary.json                     (row counts, column types, day totals)
+
+Rows are read in short keyset-paginated chunks (one small read per
+chunk, connection closed in between) so camera writes are never held up
+behind a long read. Work in progress lives in archives/.partial-<day>/
+together with a progress file; an interrupted run resumes from the last
+written chunk, and the finished directory is moved into place with a
+single os.replace, so archives/<day>/ is either complete or absent.
+
+Archiving a day again appends: rows added since the last run (id above
+the archived last_id of each table) go into new part files and
+summary.json is rewritten to include them. Nothing is rewritten when
+there is nothing new. archive_before_reset() archives every day that
+still has rows and checks that the archives hold every one of them, so
+reset_database() can be limited to rows that are known to be archived.
+"""
+
+import csv
+import gzip
+import json
 import os
+import shutil
+import time
 from datetime import datetime
 
+from database import get_conn, finalize_daily_stats
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PARQUET_AVAILABLE = False
+
 # Define archive root directory
 ARCHIVE_ROOT = os.path.join(os.path.dirname(__file__), "archives")
 
-def archive_day(date=None):
+CHUNK_SIZE = 5000
+
+# ستون‌ها و نوع‌ها؛ ستون زمان برای انتخاب ردیف‌های همان روز
+ARCHIVE_TABLES = {
+    "entries": {
+        "time_column": "timestamp_in",
+        "columns": [
+            ("id", "int"),
+            ("plate", "str"),
+            ("image_in", "str"),
+            ("timestamp_in", "str"),
+        ],
+    },
+    "exits": {
+        "time_column": "timestamp_out",
+        "columns": [
+            ("id", "int"),
+            ("entry_id", "int"),
+            ("plate", "str"),
+            ("image_out", "str"),
+            ("timestamp_out", "str"),
+            ("duration_minutes", "int"),
+            ("cost", "int"),
+        ],
+    },
+}
+
+_CASTS = {"int": int, "str": str}
+
+
+def _day_string(date):
+    if date is None:
+        date = datetime.now()
+    if isinstance(date, str):
+        date = datetime.strptime(date, "%Y-%m-%d")
+    return date.strftime("%Y-%m-%d")
+
+
+def _write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+# ----------------- نوشتن بخش‌ها -----------------
+
+
+def _write_part_parquet(path, columns, rows):
+    arrow_types = {"int": pa.int64(), "str": pa.string()}
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+    data = {name: [row[i] for row in rows] for i, (name, _) in enumerate(columns)}
+    pq.write_table(pa.Table.from_pydict(data, schema=schema), path, compression="zstd")
+
+
+def _write_part_csv(path, columns, rows):
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([name for name, _ in columns])
+        writer.writerows(rows)
+
+
+def _part_stats(name, columns, rows):
+    """
+    آمار هر بخش برای هرس کردن در کوئری‌ها (archive_query):
+    min/max of every int column and the distinct plates in the part.
+    """
+    stats = {"file": name, "rows": len(rows), "min": {}, "max": {}}
+    for i, (col, kind) in enumerate(columns):
+        if col == "plate":
+            stats["plates"] = sorted({row[i] for row in rows})
+        elif kind == "int":
+            values = [row[i] for row in rows if row[i] is not None]
+            if values:
+                stats["min"][col] = min(values)
+                stats["max"][col] = max(values)
+    return stats
+
+
+def _fetch_chunk(table, spec, day, after_id, chunk_size):
+    """یک تکه کوچک از ردیف‌های روز، بعد از after_id (keyset pagination)"""
+    names = ", ".join(name for name, _ in spec["columns"])
+    time_column = spec["time_column"]
+    conn = get_conn()
+    try:
+        return conn.execute(f"""
+            SELECT {names} FROM {table}
+            WHERE {time_column} >= ? AND {time_column} < ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (day, day + "~", after_id, chunk_size)).fetchall()
+    finally:
+        conn.close()
+
+
+def iter_day_rows(table, date, chunk_size=CHUNK_SIZE):
+    """
+    ردیف‌های یک روز مستقیم از SQLite به صورت dict، تکه به تکه.
+    Each chunk is a short read, so a long consumer (a report, an export)
+    never keeps a read transaction open against the cameras' writes.
+    """
+    spec = ARCHIVE_TABLES[table]
+    names = [name for name, _ in spec["columns"]]
+    day = _day_string(date)
+    after_id = 0
+    while True:
+        rows = _fetch_chunk(table, spec, day, after_id, chunk_size)
+        for row in rows:
+            yield dict(zip(names, row))
+        if len(rows) < chunk_size:
+            return
+        after_id = rows[-1][0]
+
+
+def _export_table(work_dir, table, spec, day, progress, progress_path,
+                  file_format, chunk_size, pause):
+    state = progress["tables"].setdefault(
+        table, {"last_id": 0, "parts": 0, "rows": 0, "part_stats": []}
+    )
+    if state.get("done"):
+        return state
+
+    table_dir = os.path.join(work_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    write_part = _write_part_parquet if file_format == "parquet" else _write_part_csv
+    suffix = ".parquet" if file_format == "parquet" else ".csv.gz"
+
+    while True:
+        rows = _fetch_chunk(table, spec, day, state["last_id"], chunk_size)
+        if not rows:
+            break
+
+        part_name = f"part-{state['parts']:05d}{suffix}"
+        part_path = os.path.join(table_dir, part_name)
+        write_part(part_path + ".tmp", spec["columns"], rows)
+        os.replace(part_path + ".tmp", part_path)
+
+        state["part_stats"].append(_part_stats(part_name, spec["columns"], rows))
+        state["parts"] += 1
+        state["rows"] += len(rows)
+        state["last_id"] = rows[-1][0]
+        _write_json(progress_path, progress)
+
+        if len(rows) < chunk_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    state["done"] = True
+    _write_json(progress_path, progress)
+    return state
+
+
+def _archived_last_id(day_dir, table, info):
+    """بزرگ‌ترین id آرشیوشده یک جدول (summary های قدیمی last_id ندارند)"""
+    if "last_id" in info:
+        return info["last_id"]
+    ids = [stats["max"]["id"] for stats in info.get("part_stats", []) if "id" in stats["max"]]
+    if ids:
+        return max(ids)
+    return max((row["id"] for row in iter_archive_rows(day_dir, table, ["id"])), default=0)
+
+
+def _existing_archive(final_dir):
+    """summary آرشیو موجود (با last_id هر جدول) یا None"""
+    summary = read_archive_summary(final_dir)
+    if summary is None:
+        if os.path.exists(final_dir):
+            raise RuntimeError(f"{final_dir} exists but is not a complete archive")
+        return None
+    for table in ARCHIVE_TABLES:
+        info = summary["tables"].setdefault(table, {"rows": 0, "parts": 0, "part_stats": []})
+        if info["rows"] and not part_files(final_dir, table):
+            raise RuntimeError(f"{final_dir} uses the old flat CSV layout and cannot be extended")
+        info["last_id"] = _archived_last_id(final_dir, table, info)
+    return summary
+
+
+def _publish_parts(work_dir, final_dir, progress):
+    """
+    انتقال بخش‌های جدید به آرشیو موجود.
+    Part names continue the existing numbering, so nothing is overwritten;
+    a part already moved by an interrupted run is simply skipped.
+    """
+    for table, state in progress["tables"].items():
+        os.makedirs(os.path.join(final_dir, table), exist_ok=True)
+        for stats in state["part_stats"][state["first_part"]:]:
+            source = os.path.join(work_dir, table, stats["file"])
+            if os.path.exists(source):
+                os.replace(source, os.path.join(final_dir, table, stats["file"]))
+
+
+def archive_day(date=None, chunk_size=CHUNK_SIZE, pause=0.0, archive_root=None):
     """
     Archive parking data for a specific day.
-    
+
     Args:
-        date: datetime object or None for today
+        date: datetime object, 'YYYY-MM-DD' string or None for today
+        chunk_size: rows per read / per part file
+        pause: seconds to sleep between chunks (throttle on a busy gate)
+        archive_root: defaults to ARCHIVE_ROOT
+
+    Returns the archive summary dict; tables[<table>]["last_id"] is the
+    highest id it holds. Archiving an already archived day appends the
+    rows added since (returns the summary unchanged if there are none).
     """
-    if date is None:
-        date = datetime.now()
-    
+    day = _day_string(date)
+    root = archive_root or ARCHIVE_ROOT
+    final_dir = os.path.join(root, day)
+    previous = _existing_archive(final_dir)
+
     # Create archive directory if it doesn't exist
-    if not os.path.exists(ARCHIVE_ROOT):
-        os.makedirs(ARCHIVE_ROOT)
-    
-    # Archive logic would go here
-    print(f"Archiving data for {date.strftime('%Y-%m-%d')}")
-    return True
+    os.makedirs(root, exist_ok=True)
+
+    work_dir = os.path.join(root, f".partial-{day}")
+    progress_path = os.path.join(work_dir, "progress.json")
+    progress = None
+    if os.path.exists(progress_path):
+        # ادامه کار نیمه‌تمام قبلی
+        with open(progress_path, encoding="utf-8") as f:
+            progress = json.load(f)
+        if previous is not None and all(
+            state.get("done") and state["parts"] == previous["tables"][table]["parts"]
+            for table, state in progress["tables"].items()
+        ):
+            # اجرای قبلی تا انتشار پیش رفته بود؛ از نو شروع کن
+            progress = None
+    if progress is None:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        os.makedirs(work_dir)
+        progress = {
+            "day": day,
+            "format": "parquet" if PARQUET_AVAILABLE else "csv.gz",
+            "tables": {},
+        }
+        if previous is not None:
+            # ادامه آرشیو موجود: فقط ردیف‌های بعد از last_id هر جدول
+            progress["format"] = previous.get("format", progress["format"])
+            for table, info in previous["tables"].items():
+                progress["tables"][table] = {
+                    "last_id": info["last_id"],
+                    "parts": info["parts"],
+                    "rows": info["rows"],
+                    "part_stats": info["part_stats"],
+                    "first_part": info["parts"],
+                }
+        _write_json(progress_path, progress)
+
+    file_format = progress["format"]
+    if file_format == "parquet" and not PARQUET_AVAILABLE:
+        raise RuntimeError(f"Archive of {day} was started as parquet but pyarrow is not installed")
+
+    tables = {}
+    for table, spec in ARCHIVE_TABLES.items():
+        state = _export_table(
+            work_dir, table, spec, day, progress, progress_path,
+            file_format, chunk_size, pause,
+        )
+        tables[table] = {
+            "rows": state["rows"],
+            "parts": state["parts"],
+            "last_id": state["last_id"],
+            "columns": dict(spec["columns"]),
+            "part_stats": state["part_stats"],
+        }
+
+    if previous is not None and all(
+        tables[table]["parts"] == previous["tables"][table]["parts"] for table in tables
+    ):
+        # چیز تازه‌ای برای آرشیو نبود
+        shutil.rmtree(work_dir, ignore_errors=True)
+        return previous
+
+    # آمار روزانه را قبل از پاک شدن داده‌های خام نهایی کن
+    stats = finalize_daily_stats(day) or {}
+
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    summary = {
+        "day": day,
+        "format": file_format,
+        "created_at": previous["created_at"] if previous else now,
+        "updated_at": now,
+        "tables": tables,
+        "totals": {
+            "entries": stats.get("entries", 0),
+            "exits": stats.get("exits", 0),
+            "revenue": stats.get("revenue", 0),
+            "avg_duration": stats.get("avg_duration", 0.0),
+            "histogram": stats.get("histogram", []),
+        },
+    }
+    if previous is None:
+        _write_json(os.path.join(work_dir, "summary.json"), summary)
+        os.remove(progress_path)
+        os.replace(work_dir, final_dir)
+    else:
+        _publish_parts(work_dir, final_dir, progress)
+        _write_json(os.path.join(final_dir, "summary.json"), summary)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"Archived {day}: {tables['entries']['rows']} entries, {tables['exits']['rows']} exits")
+    return summary
+
+
+def archived_ids(day, table, archive_root=None):
+    """idهای یک جدول در آرشیو یک روز"""
+    day_dir = os.path.join(archive_root or ARCHIVE_ROOT, day)
+    return {row["id"] for row in iter_archive_rows(day_dir, table, ["id"])}
+
+
+def archive_before_reset(archive_root=None, chunk_size=CHUNK_SIZE):
+    """
+    آرشیو همه روزهایی که هنوز در entries/exits ردیف دارند، پیش از ریست.
+
+    Takes the current highest id of each table, archives every day that
+    has rows up to it (so the whole period since the last reset, plus any
+    stray older day), then checks that each of those rows is in its day's
+    archive. Returns {table: max id} for reset_database(upto=...), so rows
+    written while this ran are left alone. Raises RuntimeError if any row
+    is missing from the archives; nothing should be deleted then.
+    """
+    root = archive_root or ARCHIVE_ROOT
+    conn = get_conn()
+    try:
+        upto = {
+            table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            for table in ARCHIVE_TABLES
+        }
+        rows = {
+            table: conn.execute(f"""
+                SELECT id, substr({spec['time_column']}, 1, 10) FROM {table}
+                WHERE id <= ?
+            """, (upto[table],)).fetchall()
+            for table, spec in ARCHIVE_TABLES.items()
+        }
+    finally:
+        conn.close()
+
+    days = sorted({day for table_rows in rows.values() for _, day in table_rows})
+    for day in days:
+        archive_day(day, chunk_size=chunk_size, archive_root=root)
+
+    for table, table_rows in rows.items():
+        by_day = {}
+        for row_id, day in table_rows:
+            by_day.setdefault(day, set()).add(row_id)
+        for day, ids in by_day.items():
+            missing = ids - archived_ids(day, table, root)
+            if missing:
+                raise RuntimeError(
+                    f"{len(missing)} {table} rows of {day} are not in the archive "
+                    f"(e.g. id {min(missing)})"
+                )
+    return upto
+
+
+# ----------------- خواندن آرشیو -----------------
+
+
+def list_archived_days(archive_root=None):
+    """روزهای آرشیوشده کامل (جدیدترین اول)"""
+    root = archive_root or ARCHIVE_ROOT
+    if not os.path.exists(root):
+        return []
+    return sorted(
+        (
+            d for d in os.listdir(root)
+            if not d.startswith(".") and os.path.isdir(os.path.join(root, d))
+        ),
+        reverse=True,
+    )
+
+
+def read_archive_summary(day_dir):
+    path = os.path.join(day_dir, "summary.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _cast(kind, value):
+    if value == "" and kind != "str":
+        return None
+    return _CASTS[kind](value)
+
+
+def _iter_csv(f, kinds, columns):
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    wanted = [
+        (i, col, kinds.get(col, "str"))
+        for i, col in enumerate(header)
+        if columns is None or col in columns
+    ]
+    for row in reader:
+        yield {col: _cast(kind, row[i]) for i, col, kind in wanted}
+
+
+def part_files(day_dir, table):
+    """مسیر فایل‌های بخش یک جدول، به ترتیب"""
+    table_dir = os.path.join(day_dir, table)
+    if not os.path.isdir(table_dir):
+        return []
+    return [
+        os.path.join(table_dir, name)
+        for name in sorted(os.listdir(table_dir))
+        if name.endswith((".parquet", ".csv.gz"))
+    ]
+
+
+def iter_part_rows(path, table, columns=None):
+    """
+    ردیف‌های یک فایل بخش؛ columns (اختیاری) فقط همان ستون‌ها را می‌خواند.
+    """
+    kinds = dict(ARCHIVE_TABLES[table]["columns"])
+    if path.endswith(".parquet"):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError("pyarrow is required to read this archive")
+        yield from pq.read_table(path, columns=columns).to_pylist()
+    else:
+        with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+            yield from _iter_csv(f, kinds, columns)
+
+
+def iter_archive_rows(day_dir, table, columns=None):
+    """
+    ردیف‌های یک جدول آرشیو به صورت dict (با نوع درست)، بخش به بخش.
+    Also reads the old flat <table>.csv layout.
+    """
+    paths = part_files(day_dir, table)
+    if not paths:
+        legacy_csv = os.path.join(day_dir, f"{table}.csv")
+        if os.path.exists(legacy_csv):
+            with open(legacy_csv, newline="", encoding="utf-8") as f:
+                yield from _iter_csv(f, dict(ARCHIVE_TABLES[table]["columns"]), columns)
+        return
+
+    for path in paths:
+        yield from iter_part_rows(path, table, columns)
+
+
+def read_archive_table(day_dir, table):
+    return list(iter_archive_rows(day_dir, table))
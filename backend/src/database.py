@@ -1,16 +1,144 @@
+import calendar
 import sqlite3
-from datetime import datetime, date
+import json
+from bisect import bisect_right
+from datetime import datetime, date, timedelta
 import os
+import threading
+import time
 from pathlib import Path
 
+import event_bus
+import metrics
+import plate_parser
+import sql_trace
+from plate_index import DEFAULT_MAX_DISTANCE, PlateIndex
+from recent_plates import RecentPlates
+
 # Use absolute path to database file in src directory
 DB_PATH = Path(__file__).parent / "parking.db"
 
 
 def get_conn():
-    return sqlite3.connect(str(DB_PATH))
+    # هر دستور ثبت می‌شود (زمان، سطرها، انتظار قفل)؛ sql_trace
+    return sql_trace.connect(DB_PATH)
+
+
+def _log_event(cur, event_type, payload):
+    """
+    ثبت یک رویداد در لاگ تغییرات (events) در همان تراکنش نوشتن.
+    Every write that other processes may want to react to must call this
+    before commit, so the change and its log row land atomically.
+    Returns the event's sequence number.
+    """
+    cur.execute("""
+        INSERT INTO events (event_type, payload, created_at)
+        VALUES (?, ?, ?)
+    """, (
+        event_type,
+        json.dumps(payload, ensure_ascii=False),
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    ))
+    return cur.lastrowid
+
+
+# مرزهای هیستوگرام مدت توقف (دقیقه)؛ ۷ بازه: <30، 30-60، ...، >=1440
+DURATION_BUCKETS = (30, 60, 120, 240, 480, 1440)
+
+
+def _duration_bucket(minutes):
+    return bisect_right(DURATION_BUCKETS, minutes)
+
+
+def _record_daily_entry(cur, day):
+    """افزایش شمارنده ورود روز در daily_stats (در همان تراکنش)"""
+    cur.execute("""
+        INSERT INTO daily_stats (day, entries) VALUES (?, 1)
+        ON CONFLICT(day) DO UPDATE SET entries = entries + 1
+    """, (day,))
+
+
+def _record_daily_exit(cur, day, duration, cost):
+    """به‌روزرسانی تجمیعی خروج روز: تعداد، درآمد، مجموع مدت و هیستوگرام"""
+    cur.execute("SELECT histogram FROM daily_stats WHERE day=?", (day,))
+    row = cur.fetchone()
+    histogram = json.loads(row[0]) if row else [0] * (len(DURATION_BUCKETS) + 1)
+    histogram[_duration_bucket(duration)] += 1
+
+    cur.execute("""
+        INSERT INTO daily_stats (day, exits, revenue, duration_sum, histogram)
+        VALUES (?, 1, ?, ?, ?)
+        ON CONFLICT(day) DO UPDATE SET
+            exits = exits + 1,
+            revenue = revenue + excluded.revenue,
+            duration_sum = duration_sum + excluded.duration_sum,
+            histogram = excluded.histogram
+    """, (day, cost, duration, json.dumps(histogram)))
+
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# نسخه اسکیما در PRAGMA user_version؛ هر مهاجرت فقط یک بار اجرا می‌شود
+SCHEMA_VERSION = 1
+
+# ستون‌های زمان عددی (ثانیه) کنار ستون‌های متنی قدیمی: (جدول، ستون عددی، ستون متنی)
+# Generated from the TEXT column by SQLite itself, so every writer (and
+# every reader of the old columns) keeps working unchanged.
+EPOCH_COLUMNS = (
+    ('entries', 'ts_in', 'timestamp_in'),
+    ('active_cars', 'ts_in', 'timestamp_in'),
+    ('exits', 'ts_out', 'timestamp_out'),
+    ('auth_tokens', 'created_ts', 'created_at'),
+    ('auth_tokens', 'expires_ts', 'expires_at'),
+)
+
+
+def to_ts(dt):
+    """
+    datetime محلی -> ثانیه، هم‌مقیاس با ستون‌های ts_* .
+    Like strftime('%s', text) in SQLite this reads the local wall-clock
+    time as if it were UTC, so differences match the old datetime math.
+    """
+    return calendar.timegm(dt.timetuple())
 
 
+def parse_ts(timestamp):
+    return to_ts(datetime.strptime(timestamp, TIME_FORMAT))
+
+
+def _migrate_schema():
+    """
+    مهاجرت‌های اسکیما بر اساس PRAGMA user_version.
+    Runs under BEGIN IMMEDIATE so two processes starting at once do not
+    both apply the same step.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        version = cur.execute("PRAGMA user_version").fetchone()[0]
+
+        if version < 1:
+            # ۱: ستون‌های زمان عددی (generated) و ایندکس بازه روی آن‌ها
+            for table, column, source in EPOCH_COLUMNS:
+                existing = {row[1] for row in cur.execute(f"PRAGMA table_xinfo({table})")}
+                if column not in existing:
+                    cur.execute(f"""
+                        ALTER TABLE {table} ADD COLUMN {column} INTEGER
+                        GENERATED ALWAYS AS (CAST(strftime('%s', {source}) AS INTEGER)) VIRTUAL
+                    """)
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_ts_in ON entries(ts_in)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_exits_ts_out ON exits(ts_out)")
+            cur.execute("CREATE INDEX IF NOT EXISTS idx_auth_tokens_expires_ts ON auth_tokens(expires_ts)")
+
+        if version < SCHEMA_VERSION:
+            cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='init_db')
 def init_db(default_capacity=200, default_price_per_hour=20000):
     conn = get_conn()
     cur = conn.cursor()
@@ -119,6 +247,35 @@ def init_db(default_capacity=200, default_price_per_hour=20000):
         )
     """)
 
+    # لاگ تغییرات (append-only)؛ seq ترتیب سراسری تغییرات است
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS events (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            event_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+
+    # آمار تجمیعی روزانه (برای گزارش درآمد بدون اسکن exits)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            day TEXT PRIMARY KEY,
+            entries INTEGER NOT NULL DEFAULT 0,
+            exits INTEGER NOT NULL DEFAULT 0,
+            revenue INTEGER NOT NULL DEFAULT 0,
+            duration_sum INTEGER NOT NULL DEFAULT 0,
+            histogram TEXT NOT NULL DEFAULT '[0,0,0,0,0,0,0]',
+            finalized INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # ایندکس‌ها برای فیلتر تاریخچه بر اساس پلاک و بازه زمانی
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_plate ON entries(plate)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_entries_timestamp_in ON entries(timestamp_in)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_exits_plate ON exits(plate)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_exits_timestamp_out ON exits(timestamp_out)")
+
     # ظرفیت پیش‌فرض
     cur.execute("SELECT value FROM settings WHERE key='capacity'")
     if cur.fetchone() is None:
@@ -138,10 +295,22 @@ def init_db(default_capacity=200, default_price_per_hour=20000):
     conn.commit()
     conn.close()
 
+    _migrate_schema()
+
+    # دیتابیس قدیمی: آمار روزانه را یک‌بار از روی داده‌های موجود بساز
+    conn = get_conn()
+    needs_backfill = conn.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM daily_stats) AND EXISTS (SELECT 1 FROM entries)"
+    ).fetchone()[0]
+    conn.close()
+    if needs_backfill:
+        rebuild_daily_stats()
+
 
 # ----------------- ورود -----------------
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='register_entry')
 def register_entry(plate, image_path):
     """ثبت ورود خودرو"""
     conn = get_conn()
@@ -162,15 +331,111 @@ def register_entry(plate, image_path):
         VALUES (?, ?, ?)
     """, (entry_id, plate, t_in))
 
+    _record_daily_entry(cur, t_in[:10])
+    _log_event(cur, 'entry', {
+        'entry_id': entry_id,
+        'plate': plate,
+        'image_in': image_path,
+        'timestamp_in': t_in,
+    })
     conn.commit()
     conn.close()
+
+    _note_recent_entry(plate, t_in)
+    event_bus.notify()
     return entry_id
 
 
+# ----------------- تطبیق فازی پلاک خروج -----------------
+
+# رویدادهایی که مجموعه خودروهای داخل را تغییر می‌دهند
+_INDEX_EVENT_TYPES = ('entry', 'exit', 'reset')
+_INDEX_MAX_CHANGES = 500
+
+_plate_index = None
+_plate_index_lock = threading.Lock()
+
+
+def _build_plate_index():
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN")
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+        version = cur.fetchone()[0]
+        cur.execute("SELECT entry_id, plate FROM active_cars")
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+
+    index = PlateIndex()
+    for entry_id, plate in rows:
+        index.add(entry_id, plate)
+    index.version = version
+    index.source = str(DB_PATH)
+    return index
+
+
+def _sync_plate_index(index):
+    """
+    اعمال ورود/خروج‌های جدید از لاگ تغییرات روی ایندکس.
+    The log is shared by every process (entry gate, exit gate, API), so
+    the index sees cars that entered through another process. Returns
+    None when a full rebuild is needed instead.
+    """
+    if index is None or index.source != str(DB_PATH):
+        return None
+
+    conn = get_conn()
+    try:
+        head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+    finally:
+        conn.close()
+    if head == index.version:
+        return index
+    # لاگ عقب رفته (دیتابیس از نو ساخته شده) یا رویدادهای لازم حذف شده‌اند
+    if head < index.version or index.version < events_pruned_upto():
+        return None
+
+    changes = changes_since(index.version, limit=_INDEX_MAX_CHANGES + 1,
+                            event_types=_INDEX_EVENT_TYPES)
+    if len(changes) > _INDEX_MAX_CHANGES:
+        return None
+    for change in changes:
+        payload = change['payload']
+        if change['event_type'] == 'entry':
+            index.add(payload['entry_id'], payload['plate'])
+        elif change['event_type'] == 'exit':
+            index.remove(payload['entry_id'])
+        else:
+            return None
+    index.version = max(head, changes[-1]['seq']) if changes else head
+    return index
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='find_active_plate')
+def find_active_plate(plate, max_distance=DEFAULT_MAX_DISTANCE):
+    """
+    نزدیک‌ترین پلاک داخل پارکینگ به متن OCR: (plate, distance) یا None.
+    Uses the in-memory fuzzy index (plate_index.PlateIndex); distance is
+    in half-edits, so a 6/8 or ب/پ misread costs 1 and any other wrong
+    character 2. Ambiguous matches return None.
+    """
+    global _plate_index
+    with _plate_index_lock:
+        index = _sync_plate_index(_plate_index)
+        if index is None:
+            index = _build_plate_index()
+        _plate_index = index
+        return index.best_match(plate, max_distance)
+
+
 # ----------------- خروج -----------------
 
 
-def register_exit(plate, image_path):
+@metrics.timed(metrics.DB_CALL_SECONDS, function='register_exit')
+def register_exit(plate, image_path, fuzzy=False):
     """
     ثبت خروج بر اساس آخرین ورود فعال همین پلاک
     
@@ -179,28 +444,45 @@ def register_exit(plate, image_path):
     - If registered and sufficient balance, automatically deducts parking cost
     - Creates transaction record linking exit to wallet payment
     - Maintains backward compatibility with non-registered users
+
+    If no car inside has exactly this plate and fuzzy is True (opt-in), the
+    exit is matched to the closest active plate (find_active_plate) instead;
+    the result then carries the stored plate plus ocr_plate / match_distance
+    and needs_confirmation. A fuzzy match is never paid from the owner's
+    wallet automatically (payment_status 'needs_confirmation'): the match
+    may be the wrong car, so an operator has to confirm it first.
     """
     conn = get_conn()
     cur = conn.cursor()
 
     try:
         # آخرین ورود فعال
-        cur.execute("""
-            SELECT entry_id, timestamp_in
+        active_query = """
+            SELECT entry_id, timestamp_in, ts_in
             FROM active_cars
             WHERE plate=?
-        """, (plate,))
+        """
+        cur.execute(active_query, (plate,))
         row = cur.fetchone()
 
+        # خطای OCR: نزدیک‌ترین پلاک داخل پارکینگ
+        ocr_plate = match_distance = None
+        if row is None and fuzzy:
+            match = find_active_plate(plate)
+            if match is not None:
+                ocr_plate = plate
+                plate, match_distance = match
+                cur.execute(active_query, (plate,))
+                row = cur.fetchone()
+
         if row is None:
             conn.close()
             return None  # این خودرو داخل نیست
 
-        entry_id, t_in = row
+        entry_id, t_in, ts_in = row
         t_out_dt = datetime.now()
-        t_in_dt = datetime.strptime(t_in, "%Y-%m-%d %H:%M:%S")
 
-        duration = int((t_out_dt - t_in_dt).total_seconds() / 60)  # دقیقه
+        duration = int((to_ts(t_out_dt) - ts_in) / 60)  # دقیقه
 
         # تعرفه
         cur.execute("SELECT value FROM settings WHERE key='price_per_hour'")
@@ -228,19 +510,26 @@ def register_exit(plate, image_path):
         # حذف از active_cars
         cur.execute("DELETE FROM active_cars WHERE entry_id=?", (entry_id,))
 
-        # Check if plate is registered to a user (automatic payment processing)
-        cur.execute("""
-            SELECT user_id
-            FROM user_plates
-            WHERE plate = ? AND is_active = 1
-            LIMIT 1
-        """, (plate,))
-        
-        plate_owner_row = cur.fetchone()
-        
+        _record_daily_exit(cur, t_out_dt.strftime("%Y-%m-%d"), duration, cost)
+
         payment_status = 'manual'  # Default for non-registered users
         payment_error = None
         transaction_id = None
+        plate_owner_row = None
+
+        if ocr_plate is not None:
+            # تطبیق فازی: بدون پرداخت خودکار تا اپراتور تأیید کند
+            payment_status = 'needs_confirmation'
+        else:
+            # Check if plate is registered to a user (automatic payment processing)
+            cur.execute("""
+                SELECT user_id
+                FROM user_plates
+                WHERE plate = ? AND is_active = 1
+                LIMIT 1
+            """, (plate,))
+            
+            plate_owner_row = cur.fetchone()
         
         if plate_owner_row is not None:
             # Plate is registered - attempt automatic payment
@@ -279,6 +568,16 @@ def register_exit(plate, image_path):
                     
                     transaction_id = cur.lastrowid
                     payment_status = 'auto_paid'
+
+                    _log_event(cur, 'wallet', {
+                        'user_id': user_id,
+                        'wallet_id': wallet_id,
+                        'transaction_id': transaction_id,
+                        'transaction_type': 'payment',
+                        'amount': cost,
+                        'new_balance': new_balance,
+                        'exit_id': exit_id,
+                    })
                 else:
                     # Insufficient balance
                     payment_status = 'insufficient_balance'
@@ -288,8 +587,6 @@ def register_exit(plate, image_path):
                 payment_status = 'wallet_not_found'
                 payment_error = 'Wallet not found for registered user'
 
-        conn.commit()
-        
         result = {
             "entry_id": entry_id,
             "exit_id": exit_id,
@@ -299,12 +596,26 @@ def register_exit(plate, image_path):
             "payment_status": payment_status,
         }
         
+        if ocr_plate is not None:
+            result["ocr_plate"] = ocr_plate
+            result["match_distance"] = match_distance
+            result["needs_confirmation"] = True
+
         # Add optional fields if automatic payment was attempted
         if payment_error is not None:
             result["payment_error"] = payment_error
         if transaction_id is not None:
             result["transaction_id"] = transaction_id
-            
+
+        _log_event(cur, 'exit', {
+            **result,
+            'timestamp_in': t_in,
+            'image_out': image_path,
+            'timestamp_out': t_out_dt.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        conn.commit()
+
+        event_bus.notify()
         return result
         
     except Exception as e:
@@ -316,6 +627,7 @@ def register_exit(plate, image_path):
     # ----------------- وضعیت‌ها -----------------
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='count_active_cars')
 def count_active_cars():
     conn = get_conn()
     cur = conn.cursor()
@@ -325,6 +637,7 @@ def count_active_cars():
     return c
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_capacity')
 def get_capacity():
     conn = get_conn()
     cur = conn.cursor()
@@ -334,6 +647,7 @@ def get_capacity():
     return int(row[0]) if row else 0
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='set_capacity')
 def set_capacity(new_capacity: int):
     """تغییر ظرفیت پارکینگ"""
     conn = get_conn()
@@ -342,14 +656,18 @@ def set_capacity(new_capacity: int):
         "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
         ("capacity", str(new_capacity)),
     )
+    _log_event(cur, 'settings', {'key': 'capacity', 'value': new_capacity})
     conn.commit()
     conn.close()
+    event_bus.notify()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_free_slots')
 def get_free_slots():
     return max(0, get_capacity() - count_active_cars())
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_price_per_hour')
 def get_price_per_hour():
     """گرفتن تعرفه هر ساعت"""
     conn = get_conn()
@@ -360,6 +678,7 @@ def get_price_per_hour():
     return int(row[0]) if row else 0
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='set_price_per_hour')
 def set_price_per_hour(value: int):
     """تنظیم تعرفه هر ساعت توقف"""
     conn = get_conn()
@@ -368,27 +687,439 @@ def set_price_per_hour(value: int):
         "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
         ("price_per_hour", str(value)),
     )
+    _log_event(cur, 'settings', {'key': 'price_per_hour', 'value': value})
+    conn.commit()
+    conn.close()
+    event_bus.notify()
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_change_version')
+def get_change_version():
+    """
+    نسخه فعلی تغییرات = آخرین seq در لاگ رویدادها (برای ETag داشبورد)
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+    version = cur.fetchone()[0]
+    conn.close()
+    return version
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='changes_since')
+def changes_since(seq, limit=500, event_types=None):
+    """
+    رویدادهای بعد از seq داده‌شده به ترتیب.
+    Consumers keep the last seq they applied and ask only for the delta;
+    returns a list of {seq, event_type, payload, created_at} dicts.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+
+    query = """
+        SELECT seq, event_type, payload, created_at
+        FROM events
+        WHERE seq > ?
+    """
+    params = [seq]
+    if event_types:
+        query += f" AND event_type IN ({','.join('?' * len(event_types))})"
+        params.extend(event_types)
+    query += " ORDER BY seq LIMIT ?"
+    params.append(limit)
+
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    conn.close()
+
+    return [
+        {
+            'seq': row[0],
+            'event_type': row[1],
+            'payload': json.loads(row[2]),
+            'created_at': row[3],
+        }
+        for row in rows
+    ]
+
+
+# رویدادهای قدیمی‌تر از این تعداد روز از لاگ حذف می‌شوند
+EVENT_RETENTION_DAYS = 7
+
+
+def _prune_events(cur, older_than_days=EVENT_RETENTION_DAYS):
+    """
+    حذف رویدادهای قدیمی در تراکنش جاری.
+    Deletes events older than the cutoff but always keeps the newest one,
+    so the change version never goes backwards. The highest deleted seq is
+    kept in settings ('events_pruned_upto'): a cursor below it can no
+    longer be served from the log and the client has to resync.
+    Returns the number of deleted events.
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime(TIME_FORMAT)
+    # seq و created_at هم‌جهت رشد می‌کنند؛ اولین رویداد تازه مرز حذف است
+    cur.execute("SELECT seq FROM events WHERE created_at >= ? ORDER BY seq LIMIT 1", (cutoff,))
+    row = cur.fetchone()
+    if row is not None:
+        upto = row[0] - 1
+    else:
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+        upto = cur.fetchone()[0] - 1
+    if upto <= 0:
+        return 0
+
+    cur.execute("DELETE FROM events WHERE seq <= ?", (upto,))
+    deleted = cur.rowcount
+    if deleted:
+        cur.execute(
+            "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+            ("events_pruned_upto", str(upto)),
+        )
+    return deleted
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='prune_events')
+def prune_events(older_than_days=EVENT_RETENTION_DAYS):
+    """حذف رویدادهای قدیمی‌تر از older_than_days روز از لاگ تغییرات"""
+    conn = get_conn()
+    cur = conn.cursor()
+    deleted = _prune_events(cur, older_than_days)
     conn.commit()
     conn.close()
+    return deleted
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='events_pruned_upto')
+def events_pruned_upto():
+    """
+    بزرگ‌ترین seq حذف‌شده از لاگ (۰ یعنی چیزی حذف نشده).
+    A consumer whose cursor is below this value missed events that are
+    gone and must reload a snapshot instead of reading the delta.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT value FROM settings WHERE key='events_pruned_upto'")
+    row = cur.fetchone()
+    conn.close()
+    return int(row[0]) if row else 0
+
+
+# رویدادهایی که برای کلاینت‌های عمومی (API / SSE) منتشر می‌شوند؛ کیف پول خصوصی است
+FEED_EVENT_TYPES = ('entry', 'exit', 'settings', 'reset')
+
+
+def _bus_events_since(seq):
+    if seq < events_pruned_upto():
+        # رویدادهای بعد از seq دیگر در لاگ نیستند؛ مصرف‌کننده باید از نو بارگذاری کند
+        head = get_change_version()
+        return [event_bus.Event(head, 'resync', {'next_since': head})]
+    return [
+        event_bus.Event(c['seq'], c['event_type'], c['payload'])
+        for c in changes_since(seq, event_types=FEED_EVENT_TYPES)
+    ]
+
+
+# فید رویدادها (SSE) مستقیماً از لاگ تغییرات خوانده می‌شود
+event_bus.bus.attach_log(_bus_events_since, get_change_version)
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_dashboard_snapshot')
+def get_dashboard_snapshot(limit=20):
+    """
+    وضعیت پارکینگ + آخرین ورود/خروج‌ها در یک اتصال و یک تراکنش خواندنی.
+    Returns a consistent snapshot together with the change version it
+    corresponds to.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+
+    try:
+        cur.execute("BEGIN")
+        cur.execute("""
+            SELECT key, value FROM settings
+            WHERE key IN ('capacity', 'price_per_hour')
+        """)
+        values = dict(cur.fetchall())
+
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+        version = cur.fetchone()[0]
+        capacity = int(values.get('capacity', 0))
+
+        cur.execute("SELECT COUNT(*) FROM active_cars")
+        active = cur.fetchone()[0]
+
+        cur.execute("""
+            SELECT id, plate, image_in, timestamp_in
+            FROM entries
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,))
+        recent_entries = [
+            {'id': r[0], 'plate': r[1], 'image_in': r[2], 'timestamp_in': r[3]}
+            for r in cur.fetchall()
+        ]
+
+        cur.execute("""
+            SELECT id, entry_id, plate, image_out, timestamp_out, duration_minutes, cost
+            FROM exits
+            ORDER BY id DESC
+            LIMIT ?
+        """, (limit,))
+        recent_exits = [
+            {
+                'id': r[0],
+                'entry': r[1],
+                'plate': r[2],
+                'image_out': r[3],
+                'timestamp_out': r[4],
+                'duration_minutes': r[5],
+                'cost': r[6],
+            }
+            for r in cur.fetchall()
+        ]
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return {
+        'version': version,
+        'status': {
+            'capacity': capacity,
+            'active_cars': active,
+            'free_slots': max(0, capacity - active),
+            'price_per_hour': int(values.get('price_per_hour', 0)),
+        },
+        'recent_entries': recent_entries,
+        'recent_exits': recent_exits,
+    }
+
+
+# ----------------- خروجی تاریخچه -----------------
+
+
+# ستون‌های خروجی هر جدول تاریخچه و ستون زمان آن
+HISTORY_TABLES = {
+    'entries': ('timestamp_in', ('id', 'plate', 'image_in', 'timestamp_in')),
+    'exits': ('timestamp_out', (
+        'id', 'entry_id', 'plate', 'image_out', 'timestamp_out', 'duration_minutes', 'cost',
+    )),
+}
+
+
+def iter_history(table, start=None, end=None, end_inclusive=False, plate=None, chunk_size=2000):
+    """
+    ردیف‌های تاریخچه (tuple) به ترتیب id، تکه به تکه با keyset pagination.
+
+    start / end are 'YYYY-MM-DD HH:MM:SS' strings (end is exclusive unless
+    end_inclusive). Every chunk is its own short read, so a slow consumer
+    (an HTTP download) never holds a read lock against the cameras' writes.
+    """
+    time_column, columns = HISTORY_TABLES[table]
+    where = ["id > ?"]
+    params = []
+    if start is not None:
+        where.append(f"{time_column} >= ?")
+        params.append(start)
+    if end is not None:
+        where.append(f"{time_column} {'<=' if end_inclusive else '<'} ?")
+        params.append(end)
+    if plate is not None:
+        where.append("plate = ?")
+        params.append(plate)
+
+    sql = f"""
+        SELECT {', '.join(columns)} FROM {table}
+        WHERE {' AND '.join(where)}
+        ORDER BY id
+        LIMIT ?
+    """
+    after_id = 0
+    while True:
+        conn = get_conn()
+        try:
+            rows = conn.execute(sql, (after_id, *params, chunk_size)).fetchall()
+        finally:
+            conn.close()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        after_id = rows[-1][0]
+
+
+# ----------------- آمار روزانه -----------------
+
+
+def _histogram_sql():
+    """ستون‌های SUM برای هر بازه هیستوگرام (هم‌خوان با _duration_bucket)"""
+    bounds = (None,) + DURATION_BUCKETS + (None,)
+    parts = []
+    for low, high in zip(bounds, bounds[1:]):
+        conds = []
+        if low is not None:
+            conds.append(f"duration_minutes >= {low}")
+        if high is not None:
+            conds.append(f"duration_minutes < {high}")
+        parts.append(f"SUM({' AND '.join(conds)})")
+    return ", ".join(parts)
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='rebuild_daily_stats')
+def rebuild_daily_stats(day=None):
+    """
+    بازسازی آمار روزانه از روی جدول‌های entries / exits.
+    Only days that still have raw rows are rewritten, and finalized days
+    are never rewritten, so days whose data was archived (fully or partly
+    deleted) keep their stored totals.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+
+    entry_where = exit_where = ""
+    params = ()
+    if day is not None:
+        entry_where = "WHERE timestamp_in >= ? AND timestamp_in < ?"
+        exit_where = "WHERE timestamp_out >= ? AND timestamp_out < ?"
+        params = (day, day + "~")
+
+    try:
+        cur.execute(f"""
+            SELECT substr(timestamp_in, 1, 10) AS d, COUNT(*)
+            FROM entries {entry_where}
+            GROUP BY d
+        """, params)
+        stats = {d: [n, 0, 0, 0, [0] * (len(DURATION_BUCKETS) + 1)] for d, n in cur.fetchall()}
+
+        cur.execute(f"""
+            SELECT substr(timestamp_out, 1, 10) AS d, COUNT(*), SUM(cost),
+                   SUM(duration_minutes), {_histogram_sql()}
+            FROM exits {exit_where}
+            GROUP BY d
+        """, params)
+        for row in cur.fetchall():
+            entry = stats.setdefault(row[0], [0, 0, 0, 0, None])
+            entry[1:] = [row[1], row[2], row[3], list(row[4:])]
+
+        cur.executemany("""
+            INSERT INTO daily_stats (day, entries, exits, revenue, duration_sum, histogram)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                entries = excluded.entries,
+                exits = excluded.exits,
+                revenue = excluded.revenue,
+                duration_sum = excluded.duration_sum,
+                histogram = excluded.histogram
+            WHERE daily_stats.finalized = 0
+        """, [
+            (d, e, x, r, ds, json.dumps(h))
+            for d, (e, x, r, ds, h) in stats.items()
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='finalize_daily_stats')
+def finalize_daily_stats(day):
+    """
+    بستن آمار یک روز توسط آرشیوکننده: بازسازی دقیق از داده خام و علامت finalized.
+    Call before the day's rows are deleted. Returns the day's stats.
+    """
+    rebuild_daily_stats(day)
+
+    conn = get_conn()
+    conn.execute("""
+        INSERT INTO daily_stats (day, finalized) VALUES (?, 1)
+        ON CONFLICT(day) DO UPDATE SET finalized = 1
+    """, (day,))
+    conn.commit()
+    conn.close()
+    return get_daily_stats(day)
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_daily_stats')
+def get_daily_stats(day):
+    """آمار یک روز یا None"""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT day, entries, exits, revenue, duration_sum, histogram, finalized
+        FROM daily_stats
+        WHERE day = ?
+    """, (day,))
+    row = cur.fetchone()
+    conn.close()
+
+    if row is None:
+        return None
+
+    return {
+        'day': row[0],
+        'entries': row[1],
+        'exits': row[2],
+        'revenue': row[3],
+        'duration_sum': row[4],
+        'avg_duration': row[4] / row[2] if row[2] else 0.0,
+        'histogram': json.loads(row[5]),
+        'finalized': bool(row[6]),
+    }
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_income_report')
+def get_income_report(today=None):
+    """
+    درآمد امروز، روزهای قبل و مجموع از daily_stats (یک ردیف برای هر روز)
+    """
+    if today is None:
+        today = date.today().strftime("%Y-%m-%d")
+
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT revenue FROM daily_stats WHERE day = ?", (today,))
+    row = cur.fetchone()
+    income_today = row[0] if row else 0
+
+    cur.execute("SELECT COALESCE(SUM(revenue), 0) FROM daily_stats WHERE day <> ?", (today,))
+    income_archived = cur.fetchone()[0]
+    conn.close()
+
+    return {
+        'today': income_today,
+        'archived': income_archived,
+        'total': income_today + income_archived,
+    }
 
 
 # ----------------- ریست و تاریخ ریست -----------------
 
 
-def reset_database():
+@metrics.timed(metrics.DB_CALL_SECONDS, function='reset_database')
+def reset_database(upto=None):
     """
     حذف تمام اطلاعات ورود، خروج و خودروهای فعال.
-    تنظیمات (capacity, price_per_hour و last_reset) حفظ می‌شوند.
+    تنظیمات (capacity, price_per_hour و last_reset) و آمار روزانه (daily_stats) حفظ می‌شوند.
+
+    upto={'entries': id, 'exits': id} (from archive_utils.archive_before_reset)
+    limits the delete to rows up to those ids, i.e. rows known to be
+    archived; anything written after the check stays.
     """
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("DELETE FROM entries")
-    cur.execute("DELETE FROM exits")
-    cur.execute("DELETE FROM active_cars")
+    if upto is None:
+        cur.execute("DELETE FROM entries")
+        cur.execute("DELETE FROM exits")
+        cur.execute("DELETE FROM active_cars")
+    else:
+        cur.execute("DELETE FROM entries WHERE id <= ?", (upto['entries'],))
+        cur.execute("DELETE FROM exits WHERE id <= ?", (upto['exits'],))
+        cur.execute("DELETE FROM active_cars WHERE entry_id <= ?", (upto['entries'],))
+    _log_event(cur, 'reset', {'upto': upto} if upto else {})
+    _prune_events(cur)
     conn.commit()
     conn.close()
+    event_bus.notify()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_last_reset')
 def get_last_reset():
     conn = get_conn()
     cur = conn.cursor()
@@ -400,6 +1131,7 @@ def get_last_reset():
     return row[0]
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='set_last_reset')
 def set_last_reset(date_str):
     conn = get_conn()
     cur = conn.cursor()
@@ -413,34 +1145,147 @@ def set_last_reset(date_str):
 
 # ----------------- جلوگیری از ثبت تکراری ورود -----------------
 
+# بیشترین بازه‌ای که پنجره حافظه پوشش می‌دهد (دقیقه)
+DEDUP_HORIZON_MINUTES = 15
 
-def was_recently_recorded(plate, minutes=5):
+_recent_entries = None
+_recent_entries_lock = threading.Lock()
+_recent_follower = None
+
+
+def _dedup_key(plate):
+    return plate_parser.plate_key(plate) or plate
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='load_recent_entries')
+def load_recent_entries():
     """
-    آیا این پلاک در X دقیقه اخیر ورود جدید داشته؟
-    برای جلوگیری از ثبت دوباره همان ماشین که جلوی دوربین می‌ایستد.
+    ساخت پنجره ورودهای اخیر از دیتابیس (یک بار در شروع پروسه).
+    Later entries come from register_entry in this process and from a
+    change-log follower thread for the other processes (camera scripts,
+    API, GUI), so dedup checks themselves never query SQLite.
     """
+    global _recent_entries
+    now = to_ts(datetime.now())
+
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN")
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+        version = cur.fetchone()[0]
+        cur.execute("""
+            SELECT plate, MAX(ts_in)
+            FROM entries
+            WHERE ts_in >= ?
+            GROUP BY plate
+        """, (now - DEDUP_HORIZON_MINUTES * 60,))
+        rows = cur.fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+
+    window = RecentPlates(horizon=DEDUP_HORIZON_MINUTES * 60)
+    for plate, ts_in in rows:
+        window.record(_dedup_key(plate), ts_in, now=now)
+    window.version = version
+    window.source = str(DB_PATH)
+
+    with _recent_entries_lock:
+        _recent_entries = window
+    _start_recent_follower()
+    return window
+
+
+def _note_recent_entry(plate, t_in):
+    window = _recent_entries
+    if window is not None and window.source == str(DB_PATH):
+        ts_in = parse_ts(t_in)
+        window.record(_dedup_key(plate), ts_in, now=ts_in)
+
+
+def _follow_recent_entries():
+    """ورودهای پروسه‌های دیگر را از لاگ تغییرات به پنجره اضافه می‌کند"""
+    while True:
+        try:
+            window = _recent_entries
+            if window.source != str(DB_PATH):
+                load_recent_entries()
+                continue
+
+            for event in event_bus.bus.wait(window.version, timeout=30):
+                if event.id <= window.version:
+                    # لاگ از نو شروع شده (دیتابیس جدید)
+                    window.source = None
+                    break
+                if event.type == 'entry':
+                    window.record(_dedup_key(event.data['plate']),
+                                  parse_ts(event.data['timestamp_in']),
+                                  now=to_ts(datetime.now()))
+                elif event.type == 'resync':
+                    # رویدادهای از دست رفته از لاگ حذف شده‌اند
+                    window.source = None
+                    break
+                elif event.type == 'reset':
+                    if event.data.get('upto'):
+                        # ریست جزئی: ورودهای بعد از آن مانده‌اند، از نو بارگذاری کن
+                        window.source = None
+                        break
+                    window.clear()
+                window.version = event.id
+        except Exception:
+            time.sleep(1)
+
+
+def _start_recent_follower():
+    global _recent_follower
+    with _recent_entries_lock:
+        if _recent_follower is not None and _recent_follower.is_alive():
+            return
+        _recent_follower = threading.Thread(
+            target=_follow_recent_entries, name='recent-entries-follower', daemon=True
+        )
+        _recent_follower.start()
+
+
+def _last_entry_within(plate, minutes):
+    """ورود با همان کلید پلاک (هر نوشتاری) در minutes دقیقه اخیر، از جدول entries"""
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("""
-        SELECT timestamp_in FROM entries
-        WHERE plate=?
-        ORDER BY id DESC
-        LIMIT 1
-    """, (plate,))
-    row = cur.fetchone()
+        SELECT DISTINCT plate FROM entries
+        WHERE ts_in > ?
+    """, (to_ts(datetime.now()) - minutes * 60,))
+    rows = cur.fetchall()
     conn.close()
 
-    if row is None:
-        return False  # تا حالا ورود ثبت نشده
+    key = _dedup_key(plate)
+    return any(_dedup_key(candidate) == key for (candidate,) in rows)
 
-    last_time = datetime.strptime(row[0], "%Y-%m-%d %H:%M:%S")
-    diff_minutes = (datetime.now() - last_time).total_seconds() / 60.0
-    return diff_minutes < minutes
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='was_recently_recorded')
+def was_recently_recorded(plate, minutes=5):
+    """
+    آیا این پلاک در X دقیقه اخیر ورود جدید داشته؟
+    برای جلوگیری از ثبت دوباره همان ماشین که جلوی دوربین می‌ایستد.
+
+    Answered from the in-memory window (recent_plates.RecentPlates);
+    spellings of the same plate count as one. Windows longer than
+    DEDUP_HORIZON_MINUTES fall back to the entries table.
+    """
+    if minutes > DEDUP_HORIZON_MINUTES:
+        return _last_entry_within(plate, minutes)
+
+    window = _recent_entries
+    if window is None or window.source != str(DB_PATH):
+        window = load_recent_entries()
+    return window.seen_within(_dedup_key(plate), minutes * 60, now=to_ts(datetime.now()))
 
 
 # ----------------- User Management -----------------
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='create_user')
 def create_user(phone_number, role='user'):
     """
     Create a new user with the given phone number and role.
@@ -473,6 +1318,7 @@ def create_user(phone_number, role='user'):
         conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_user_by_phone')
 def get_user_by_phone(phone_number):
     """Get user by phone number. Returns user dict or None."""
     conn = get_conn()
@@ -499,6 +1345,7 @@ def get_user_by_phone(phone_number):
     }
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='delete_user')
 def delete_user(user_id):
     """Delete a user and all associated data."""
     conn = get_conn()
@@ -524,11 +1371,8 @@ def delete_user(user_id):
         conn.close()
 
 
-def get_user_by_id(user_id):
-    """Get user by ID. Returns user dict or None."""
-    conn = get_conn()
-    cur = conn.cursor()
-    
+def _fetch_user(cur, user_id):
+    """کاربر با شناسه، روی اتصال فراخواننده (بدون اتصال دوم)"""
     cur.execute("""
         SELECT id, phone_number, role, created_at, is_active
         FROM users
@@ -536,7 +1380,6 @@ def get_user_by_id(user_id):
     """, (user_id,))
     
     row = cur.fetchone()
-    conn.close()
     
     if row is None:
         return None
@@ -550,11 +1393,18 @@ def get_user_by_id(user_id):
     }
 
 
-def get_wallet_by_user_id(user_id):
-    """Get wallet for a user. Returns wallet dict or None."""
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_user_by_id')
+def get_user_by_id(user_id):
+    """Get user by ID. Returns user dict or None."""
     conn = get_conn()
-    cur = conn.cursor()
-    
+    try:
+        return _fetch_user(conn.cursor(), user_id)
+    finally:
+        conn.close()
+
+
+def _fetch_wallet(cur, user_id):
+    """کیف پول کاربر، روی اتصال فراخواننده (بدون اتصال دوم)"""
     cur.execute("""
         SELECT id, user_id, balance, last_updated
         FROM wallets
@@ -562,7 +1412,6 @@ def get_wallet_by_user_id(user_id):
     """, (user_id,))
     
     row = cur.fetchone()
-    conn.close()
     
     if row is None:
         return None
@@ -575,6 +1424,17 @@ def get_wallet_by_user_id(user_id):
     }
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_wallet_by_user_id')
+def get_wallet_by_user_id(user_id):
+    """Get wallet for a user. Returns wallet dict or None."""
+    conn = get_conn()
+    try:
+        return _fetch_wallet(conn.cursor(), user_id)
+    finally:
+        conn.close()
+
+
+@metrics.timed(metrics.DB_CALL_SECONDS, function='create_transaction')
 def create_transaction(wallet_id, transaction_type, amount, description='', exit_id=None):
     """
     Create a transaction record.
@@ -598,6 +1458,7 @@ def create_transaction(wallet_id, transaction_type, amount, description='', exit
         conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_transaction_by_id')
 def get_transaction_by_id(transaction_id):
     """Get transaction by ID. Returns transaction dict or None."""
     conn = get_conn()
@@ -626,6 +1487,7 @@ def get_transaction_by_id(transaction_id):
     }
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='add_user_plate')
 def add_user_plate(user_id, plate):
     """
     Register a plate for a user.
@@ -652,11 +1514,8 @@ def add_user_plate(user_id, plate):
         conn.close()
 
 
-def get_user_plate_by_id(plate_id):
-    """Get user plate by ID. Returns plate dict or None."""
-    conn = get_conn()
-    cur = conn.cursor()
-    
+def _fetch_user_plate(cur, plate_id):
+    """پلاک کاربر با شناسه، روی اتصال فراخواننده (بدون اتصال دوم)"""
     cur.execute("""
         SELECT id, user_id, plate, registered_at, is_active
         FROM user_plates
@@ -664,7 +1523,6 @@ def get_user_plate_by_id(plate_id):
     """, (plate_id,))
     
     row = cur.fetchone()
-    conn.close()
     
     if row is None:
         return None
@@ -678,6 +1536,16 @@ def get_user_plate_by_id(plate_id):
     }
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_user_plate_by_id')
+def get_user_plate_by_id(plate_id):
+    """Get user plate by ID. Returns plate dict or None."""
+    conn = get_conn()
+    try:
+        return _fetch_user_plate(conn.cursor(), plate_id)
+    finally:
+        conn.close()
+
+
 # ----------------- Authentication & Token Management -----------------
 
 import secrets
@@ -689,6 +1557,7 @@ def generate_token():
     return secrets.token_urlsafe(32)
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='create_auth_token')
 def create_auth_token(user_id, expiry_hours=720):
     """
     Create an authentication token for a user.
@@ -719,6 +1588,7 @@ def create_auth_token(user_id, expiry_hours=720):
         conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='validate_token')
 def validate_token(token):
     """
     Validate an authentication token.
@@ -727,11 +1597,12 @@ def validate_token(token):
     conn = get_conn()
     cur = conn.cursor()
     
+    # Expired tokens simply do not match (expires_ts is an integer column)
     cur.execute("""
-        SELECT user_id, expires_at
+        SELECT user_id
         FROM auth_tokens
-        WHERE token = ?
-    """, (token,))
+        WHERE token = ? AND expires_ts >= ?
+    """, (token, to_ts(datetime.now())))
     
     row = cur.fetchone()
     conn.close()
@@ -739,16 +1610,10 @@ def validate_token(token):
     if row is None:
         return None
     
-    user_id, expires_at_str = row
-    expires_at = datetime.strptime(expires_at_str, "%Y-%m-%d %H:%M:%S")
-    
-    # Check if token is expired
-    if datetime.now() > expires_at:
-        return None
-    
-    return user_id
+    return row[0]
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='delete_token')
 def delete_token(token):
     """Delete an authentication token (for logout)."""
     conn = get_conn()
@@ -760,6 +1625,7 @@ def delete_token(token):
     conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='delete_user_tokens')
 def delete_user_tokens(user_id):
     """Delete all tokens for a user."""
     conn = get_conn()
@@ -793,124 +1659,12 @@ def validate_plate_format(plate):
     - Various separators allowed: space, dash, pipe, or none
     - Letter can be at different positions in the string
     
-    Examples of valid plates:
-    - "12ب345-67"
-    - "12 ب 345 67"
-    - "13الف111-10"
-    - "12ب345"
+    The rules live in plate_parser (shared with the OCR paths).
     """
-    import re
-    
-    if not plate or not isinstance(plate, str):
-        return False
-    
-    # Normalize: remove common separators and "ایران"
-    normalized = plate.strip()
-    normalized = normalized.replace(' ', '').replace('-', '').replace('|', '').replace('ایران', '')
-    
-    if not normalized:
-        return False
-    
-    # Persian letters used in Iranian plates (sorted by length, longest first to match multi-char letters first)
-    persian_letters = [
-        'الف', 'ب', 'پ', 'ت', 'ث', 'ج', 'د', 'ز', 'س', 'ش',
-        'ص', 'ط', 'ع', 'ف', 'ق', 'ک', 'گ', 'ل', 'م', 'ن',
-        'و', 'ه', 'ی'
-    ]
-    
-    # Find Persian letter position and the letter itself
-    # We need to check for multi-character letters first (like 'الف')
-    letter_start = -1
-    letter_end = -1
-    letter = ''
-    
-    # First, try to find multi-character letters
-    for persian_letter in persian_letters:
-        idx = normalized.find(persian_letter)
-        if idx != -1:
-            letter_start = idx
-            letter_end = idx + len(persian_letter)
-            letter = persian_letter
-            break
-    
-    # If no multi-character letter found, look for single Persian characters
-    if letter_start == -1:
-        for i, char in enumerate(normalized):
-            if re.match(r'[آ-ی]', char):
-                letter_start = i
-                letter_end = i + 1
-                letter = char
-                break
-    
-    if letter_start == -1:
-        return False
-    
-    # Extract numbers before and after the letter
-    before = normalized[:letter_start]
-    after = normalized[letter_end:]
-    
-    # Check if all non-letter characters are digits
-    if before and not before.isdigit():
-        return False
-    if after and not after.isdigit():
-        return False
-    
-    # Valid formats:
-    # 1. Full format: 2 digits + letter + 3 digits + 2 digits (total 7 digits)
-    # 2. Short format: 2 digits + letter + 3 digits (total 5 digits)
-    
-    total_digits = len(before) + len(after)
-    
-    # Must have at least 5 digits (short format) and at most 7 digits (full format)
-    if total_digits < 5 or total_digits > 7:
-        return False
-    
-    # For full format (7 digits), we need:
-    # - At least 2 digits before or after the letter for series
-    # - At least 3 digits for serial
-    # - Exactly 2 digits for region
-    if total_digits == 7:
-        # Letter in middle: 2 before + 5 after OR 5 before + 2 after
-        if (len(before) == 2 and len(after) == 5) or (len(before) == 5 and len(after) == 2):
-            return True
-        # Letter at start: 0 before + 7 after
-        if len(before) == 0 and len(after) == 7:
-            return True
-        # Letter at end: 7 before + 0 after
-        if len(before) == 7 and len(after) == 0:
-            return True
-        return False
-    
-    # For short format (5 digits), we need:
-    # - At least 2 digits for series
-    # - At least 3 digits for serial
-    if total_digits == 5:
-        # Letter in middle: 2 before + 3 after OR 3 before + 2 after
-        if (len(before) == 2 and len(after) == 3) or (len(before) == 3 and len(after) == 2):
-            return True
-        # Letter at start: 0 before + 5 after
-        if len(before) == 0 and len(after) == 5:
-            return True
-        # Letter at end: 5 before + 0 after
-        if len(before) == 5 and len(after) == 0:
-            return True
-        return False
-    
-    # For 6 digits (edge case)
-    if total_digits == 6:
-        # Could be valid in some formats
-        if (len(before) == 2 and len(after) == 4) or (len(before) == 4 and len(after) == 2):
-            return True
-        if (len(before) == 3 and len(after) == 3):
-            return True
-        if len(before) == 0 and len(after) == 6:
-            return True
-        if len(before) == 6 and len(after) == 0:
-            return True
-    
-    return False
+    return plate_parser.is_valid_plate(plate)
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_or_create_user')
 def get_or_create_user(phone_number):
     """
     Get existing user by phone number or create a new one.
@@ -934,6 +1688,7 @@ def get_or_create_user(phone_number):
 # ----------------- Wallet Management -----------------
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_wallet_balance')
 def get_wallet_balance(user_id):
     """
     Get the current wallet balance for a user.
@@ -945,6 +1700,7 @@ def get_wallet_balance(user_id):
     return wallet['balance']
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='charge_wallet')
 def charge_wallet(user_id, amount):
     """
     Charge (add funds to) a user's wallet.
@@ -982,8 +1738,17 @@ def charge_wallet(user_id, amount):
         """, (wallet_id, amount, timestamp))
         
         transaction_id = cur.lastrowid
-        
+
+        _log_event(cur, 'wallet', {
+            'user_id': user_id,
+            'wallet_id': wallet_id,
+            'transaction_id': transaction_id,
+            'transaction_type': 'charge',
+            'amount': amount,
+            'new_balance': new_balance,
+        })
         conn.commit()
+        event_bus.notify()
         
         return {
             'new_balance': new_balance,
@@ -997,6 +1762,7 @@ def charge_wallet(user_id, amount):
         conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='deduct_from_wallet')
 def deduct_from_wallet(user_id, amount, description='', exit_id=None):
     """
     Deduct funds from a user's wallet (for parking payments).
@@ -1039,8 +1805,18 @@ def deduct_from_wallet(user_id, amount, description='', exit_id=None):
         """, (wallet_id, amount, timestamp, description, exit_id))
         
         transaction_id = cur.lastrowid
-        
+
+        _log_event(cur, 'wallet', {
+            'user_id': user_id,
+            'wallet_id': wallet_id,
+            'transaction_id': transaction_id,
+            'transaction_type': 'payment',
+            'amount': amount,
+            'new_balance': new_balance,
+            'exit_id': exit_id,
+        })
         conn.commit()
+        event_bus.notify()
         
         return {
             'new_balance': new_balance,
@@ -1054,6 +1830,7 @@ def deduct_from_wallet(user_id, amount, description='', exit_id=None):
         conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_wallet_transactions')
 def get_wallet_transactions(user_id, limit=50, offset=0):
     """
     Get transaction history for a user's wallet.
@@ -1062,21 +1839,18 @@ def get_wallet_transactions(user_id, limit=50, offset=0):
     conn = get_conn()
     cur = conn.cursor()
     
-    # Get wallet_id
-    wallet = get_wallet_by_user_id(user_id)
-    if wallet is None:
+    # Wallet id and total count in one query, on this connection
+    cur.execute("""
+        SELECT w.id, (SELECT COUNT(*) FROM transactions t WHERE t.wallet_id = w.id)
+        FROM wallets w
+        WHERE w.user_id = ?
+    """, (user_id,))
+    row = cur.fetchone()
+    if row is None:
         conn.close()
         return []
     
-    wallet_id = wallet['id']
-    
-    # Get total count
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM transactions
-        WHERE wallet_id = ?
-    """, (wallet_id,))
-    total_count = cur.fetchone()[0]
+    wallet_id, total_count = row
     
     # Get transactions
     cur.execute("""
@@ -1111,6 +1885,7 @@ def get_wallet_transactions(user_id, limit=50, offset=0):
 # ----------------- Plate Management -----------------
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_user_plates')
 def get_user_plates(user_id):
     """
     Get all active plates registered to a user.
@@ -1142,6 +1917,7 @@ def get_user_plates(user_id):
     return plates
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='register_user_plate')
 def register_user_plate(user_id, plate):
     """
     Register a plate for a user.
@@ -1156,6 +1932,7 @@ def register_user_plate(user_id, plate):
     return add_user_plate(user_id, plate)
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='delete_user_plate')
 def delete_user_plate(plate_id, user_id=None):
     """
     Delete (deactivate) a user's plate.
@@ -1167,7 +1944,7 @@ def delete_user_plate(plate_id, user_id=None):
     
     try:
         # Get the plate
-        plate = get_user_plate_by_id(plate_id)
+        plate = _fetch_user_plate(cur, plate_id)
         
         if plate is None:
             raise ValueError(f"Plate not found with id {plate_id}")
@@ -1193,6 +1970,7 @@ def delete_user_plate(plate_id, user_id=None):
         conn.close()
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_plate_owner')
 def get_plate_owner(plate):
     """
     Find the user who owns a specific plate.
@@ -1220,6 +1998,7 @@ def get_plate_owner(plate):
 # ----------------- Admin Functions -----------------
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='get_all_users')
 def get_all_users(limit=100, offset=0):
     """
     Get all users in the system (admin function).
@@ -1259,6 +2038,7 @@ def get_all_users(limit=100, offset=0):
     }
 
 
+@metrics.timed(metrics.DB_CALL_SECONDS, function='update_user_role')
 def update_user_role(user_id, new_role):
     """
     Update a user's role (admin function).
@@ -1275,7 +2055,7 @@ def update_user_role(user_id, new_role):
     
     try:
         # Check if user exists
-        user = get_user_by_id(user_id)
+        user = _fetch_user(cur, user_id)
         if user is None:
             raise ValueError(f"User not found with id {user_id}")
         
@@ -1293,4 +2073,4 @@ def update_user_role(user_id, new_role):
         conn.rollback()
         raise e
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
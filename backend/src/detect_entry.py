@@ -3,18 +3,19 @@ import torch
 import time
 import os
 import math
-import re
 from collections import deque, Counter
 from datetime import datetime
 
 from database import (
     init_db,
+    load_recent_entries,
     register_entry,
     was_recently_recorded,
     count_active_cars,
     get_capacity,
     get_free_slots,
 )
+import metrics
 
 # Patch for cv2 thread compatibility (مشکل ultralytics با بعضی نسخه‌های OpenCV)
 if not hasattr(cv2, "setNumThreads"):
@@ -53,32 +54,8 @@ def load_char_model(device="cpu"):
 # توابع OCR (پلاک ملی + مناطق آزاد)
 ##########################################
 
-def normalize(ch):
-    if ch == "ه\u200d":
-        ch = "ه"
-    if ch.startswith("ژ"):
-        ch = "ژ"
-    return ch
-
-def clean(txt):
-    return re.sub(r"[^0-9آ-ی]", "", txt)
-
-def format_plate(txt):
-    s = clean(txt)
-
-    # 1) پلاک ملی
-    m1 = re.match(r"^(\d{2})([آ-ی])(\d{3})(\d{2})$", s)
-    if m1:
-        a, b, c, d = m1.groups()
-        return f"{a} {b} {c} {d}"
-
-    # 2) پلاک منطقه آزاد (۵+۲)
-    m2 = re.match(r"^(\d{5})(\d{2})$", s)
-    if m2:
-        serial, region = m2.groups()
-        return f"{serial} {region}"
-
-    return s
+# پیاده‌سازی مشترک در plate_parser (همان خروجی قبلی)
+from plate_parser import normalize_char as normalize, clean_ocr_text as clean, format_plate  # noqa: E402
 
 
 
@@ -120,6 +97,21 @@ def assign_id(center, trackers, max_dist=80):
     return None
 
 
+##########################################
+# Metrics
+##########################################
+
+# پورت /metrics این دوربین (با PARKING_METRICS_PORT قابل تغییر)
+METRICS_PORT = 9101
+
+FRAME_SECONDS = metrics.CAMERA_FRAME_SECONDS.labels(camera="entry")
+PLATE_SECONDS = metrics.INFERENCE_SECONDS.labels(source="entry_camera", stage="plate_detect")
+CHARS_SECONDS = metrics.INFERENCE_SECONDS.labels(source="entry_camera", stage="char_recognize")
+TRACKS = metrics.CAMERA_TRACKS.labels(camera="entry")
+TRACKS_CREATED = metrics.CAMERA_TRACKS_CREATED.labels(camera="entry")
+CONFIRM_SECONDS = metrics.VOTE_CONFIRM_SECONDS.labels(camera="entry")
+
+
 ##########################################
 # MAIN: ENTRY CAMERA
 ##########################################
@@ -129,8 +121,18 @@ def main():
     print("ENTRY CAMERA ACTIVE")
     print("Using device:", device)
 
+    metrics_port = int(os.environ.get("PARKING_METRICS_PORT", METRICS_PORT))
+    try:
+        metrics.start_http_server(metrics_port)
+        print(f"Metrics on http://localhost:{metrics_port}/metrics")
+    except OSError as e:
+        # متریک‌ها اختیاری‌اند؛ پورت گرفته‌شده نباید دوربین را متوقف کند
+        print(f"Metrics disabled: cannot listen on port {metrics_port} ({e})")
+
     # اطمینان از آماده بودن دیتابیس و تنظیمات
     init_db()
+    # پنجره ورودهای اخیر (حذف تکراری بدون کوئری در حلقه دوربین)
+    load_recent_entries()
 
     # پوشه‌ی ذخیره عکس ورود
     save_dir = os.path.join("captures", "entry")
@@ -162,9 +164,11 @@ def main():
             break
 
         tnow = time.time()
+        frame_start = time.perf_counter()
         h, w = frame.shape[:2]
         # تشخیص پلاک‌ها
-        plate_results = plate_model(frame)
+        with PLATE_SECONDS.time():
+            plate_results = plate_model(frame)
         dets = plate_results.xyxy[0].cpu().numpy()
 
         for *xyxy, conf, cls in dets:
@@ -184,9 +188,11 @@ def main():
                     "buffer": deque(maxlen=BUFFER_SIZE),
                     "confirmed": "",
                     "last_seen": tnow,
+                    "first_seen": tnow,
                     "bbox": (x1, y1, x2, y2),
                 }
                 next_id += 1
+                TRACKS_CREATED.inc()
 
             trackers[tid]["center"] = (cx, cy)
             trackers[tid]["last_seen"] = tnow
@@ -204,7 +210,8 @@ def main():
                 continue
 
             plate_img_resized = cv2.resize(plate_img, (320, 80))
-            text = decode_plate(plate_img_resized, char_model, conf_thres=0.5)
+            with CHARS_SECONDS.time():
+                text = decode_plate(plate_img_resized, char_model, conf_thres=0.5)
 
             # فیلتر رشته‌های خیلی کوتاه/عجیب
             if text and 6 <= len(clean(text)) <= 9:
@@ -241,10 +248,12 @@ def main():
 
             if count >= MIN_VOTES:
                 final_plate = best
+                CONFIRM_SECONDS.observe(tnow - data["first_seen"])
 
                 # جلوگیری از ثبت دوباره در X دقیقه اخیر
                 if was_recently_recorded(final_plate, minutes=5):
                     print("ENTRY REJECTED (recent duplicate):", final_plate)
+                    metrics.PLATES_CONFIRMED.labels(camera="entry", result="duplicate").inc()
                     data["confirmed"] = final_plate
                     buf.clear()
                     continue
@@ -264,9 +273,13 @@ def main():
                 # ثبت در دیتابیس (ورود)
                 entry_id = register_entry(final_plate, img_path)
 
+                metrics.PLATES_CONFIRMED.labels(camera="entry", result="registered").inc()
+
                 free = get_free_slots()
                 active = count_active_cars()
                 cap_val = get_capacity()
+                metrics.ACTIVE_CARS.set(active)
+                metrics.CAPACITY.set(cap_val)
                 print(
                     f"Entry ID={entry_id} | Plate={final_plate} | Active={active} | Free={free}/{cap_val}"
                 )
@@ -274,6 +287,9 @@ def main():
                 # پاک کردن بافر این Track
                 buf.clear()
 
+        TRACKS.set(len(trackers))
+        FRAME_SECONDS.observe(time.perf_counter() - frame_start)
+
         cv2.imshow("ENTRY CAMERA", frame)
         if cv2.waitKey(1) & 0xFF == ord("q"):
             break
@@ -5,7 +5,6 @@ from collections import deque, Counter
 import os
 import math
 from datetime import datetime
-import re
 
 from database import (
     register_exit,
@@ -13,6 +12,7 @@ from database import (
     get_capacity,
     get_free_slots,
 )
+import metrics
 
 # Patch for cv2 thread compatibility
 if not hasattr(cv2, "setNumThreads"):
@@ -51,32 +51,8 @@ def load_char_model(device="cpu"):
 # Plate OCR Utils (ملی + مناطق آزاد)
 ##########################################
 
-def normalize(ch):
-    if ch == "ه\u200d":
-        ch = "ه"
-    if ch.startswith("ژ"):
-        ch = "ژ"
-    return ch
-
-def clean(txt):
-    return re.sub(r"[^0-9آ-ی]", "", txt)
-
-def format_plate(txt):
-    s = clean(txt)
-
-    # 1) پلاک ملی
-    m1 = re.match(r"^(\d{2})([آ-ی])(\d{3})(\d{2})$", s)
-    if m1:
-        a, b, c, d = m1.groups()
-        return f"{a} {b} {c} {d}"
-
-    # 2) پلاک منطقه آزاد (۵+۲)
-    m2 = re.match(r"^(\d{5})(\d{2})$", s)
-    if m2:
-        serial, region = m2.groups()
-        return f"{serial} {region}"
-
-    return s
+# پیاده‌سازی مشترک در plate_parser (همان خروجی قبلی)
+from plate_parser import normalize_char as normalize, clean_ocr_text as clean, format_plate  # noqa: E402
 
 def decode_plate(img, model):
     results = model(img)
@@ -104,6 +80,21 @@ def assign_id(center, trackers, max_dist=80):
     return None
 
 
+##########################################
+# Metrics
+##########################################
+
+# پورت /metrics این دوربین (با PARKING_METRICS_PORT قابل تغییر)
+METRICS_PORT = 9102
+
+FRAME_SECONDS = metrics.CAMERA_FRAME_SECONDS.labels(camera="exit")
+PLATE_SECONDS = metrics.INFERENCE_SECONDS.labels(source="exit_camera", stage="plate_detect")
+CHARS_SECONDS = metrics.INFERENCE_SECONDS.labels(source="exit_camera", stage="char_recognize")
+TRACKS = metrics.CAMERA_TRACKS.labels(camera="exit")
+TRACKS_CREATED = metrics.CAMERA_TRACKS_CREATED.labels(camera="exit")
+CONFIRM_SECONDS = metrics.VOTE_CONFIRM_SECONDS.labels(camera="exit")
+
+
 ##########################################
 # EXIT CAMERA MAIN
 ##########################################
@@ -113,6 +104,14 @@ def main():
     print("EXIT CAMERA ACTIVE")
     print("Using device:", device)
 
+    metrics_port = int(os.environ.get("PARKING_METRICS_PORT", METRICS_PORT))
+    try:
+        metrics.start_http_server(metrics_port)
+        print(f"Metrics on http://localhost:{metrics_port}/metrics")
+    except OSError as e:
+        # متریک‌ها اختیاری‌اند؛ پورت گرفته‌شده نباید دوربین را متوقف کند
+        print(f"Metrics disabled: cannot listen on port {metrics_port} ({e})")
+
     save_dir = "captures/exit"
     os.makedirs(save_dir, exist_ok=True)
 
@@ -141,9 +140,11 @@ def main():
             break
 
         tnow = time.time()
+        frame_start = time.perf_counter()
         h, w = frame.shape[:2]
 
-        results = plate_model(frame)
+        with PLATE_SECONDS.time():
+            results = plate_model(frame)
         dets = results.xyxy[0].cpu().numpy()
 
         for *xyxy, conf, cls in dets:
@@ -163,9 +164,11 @@ def main():
                     "buffer": deque(maxlen=BUFFER_SIZE),
                     "confirmed": "",
                     "last_seen": tnow,
+                    "first_seen": tnow,
                     "bbox": (x1, y1, x2, y2)
                 }
                 nextID += 1
+                TRACKS_CREATED.inc()
 
             trackers[tid]["center"] = (cx, cy)
             trackers[tid]["last_seen"] = tnow
@@ -183,7 +186,8 @@ def main():
                 continue
 
             crop = cv2.resize(crop, (320, 80))
-            text = decode_plate(crop, char_model)
+            with CHARS_SECONDS.time():
+                text = decode_plate(crop, char_model)
 
             if text and 6 <= len(clean(text)) <= 9:
                 trackers[tid]["buffer"].append(text)
@@ -210,6 +214,7 @@ def main():
             if count >= MIN_VOTES:
                 final_plate = best
                 data["confirmed"] = final_plate
+                CONFIRM_SECONDS.observe(tnow - data["first_seen"])
 
                 print("EXIT CONFIRMED:", final_plate)
 
@@ -222,12 +227,20 @@ def main():
                 img_path = os.path.join(save_dir, filename)
                 cv2.imwrite(img_path, car_img)
 
-                # register exit
-                info = register_exit(final_plate, img_path)
+                # register exit (تطبیق فازی فقط اینجا؛ بدون پرداخت خودکار)
+                info = register_exit(final_plate, img_path, fuzzy=True)
 
                 if info is None:
                     print("⚠ EXIT BLOCKED - Car was not inside:", final_plate)
+                    metrics.PLATES_CONFIRMED.labels(camera="exit", result="not_inside").inc()
                 else:
+                    metrics.PLATES_CONFIRMED.labels(
+                        camera="exit", result="fuzzy_match" if "ocr_plate" in info else "registered"
+                    ).inc()
+                    if "ocr_plate" in info:
+                        print(f"~ fuzzy match: read {final_plate} -> {info['plate']} "
+                              f"(needs operator confirmation, not charged)")
+                        final_plate = info["plate"]
                     print(
                         f"EXIT OK | plate={final_plate} | "
                         f"duration={info['duration']} min | cost={info['cost']}"
@@ -235,7 +248,13 @@ def main():
 
                 buf.clear()
 
-                print(f"Cars inside={count_active_cars()} | Free={get_free_slots()}/{get_capacity()}")
+                active, cap_val = count_active_cars(), get_capacity()
+                metrics.ACTIVE_CARS.set(active)
+                metrics.CAPACITY.set(cap_val)
+                print(f"Cars inside={active} | Free={get_free_slots()}/{cap_val}")
+
+        TRACKS.set(len(trackers))
+        FRAME_SECONDS.observe(time.perf_counter() - frame_start)
 
         cv2.imshow("EXIT CAMERA", frame)
         if cv2.waitKey(1) & 0xFF == ord("q"):
@@ -0,0 +1,205 @@
+"""
+Event bus for parking events (entry / exit / settings / wallet / reset).
+
+Two modes:
+
+* In-memory: publish() appends to a ring buffer and wakes subscribers.
+* Log-backed: attach_log() points the bus at the durable `events` table
+  written by database.py. Subscribers then read deltas straight from the
+  log (so any seq still in the table can be resumed, across restarts and
+  across processes), and the bus only fans out wake-ups. Writers in this
+  process call notify() after commit; writes made by other processes
+  (the camera scripts, the desktop GUI) are picked up by a single
+  watcher thread that polls the log head.
+
+Works for both blocking (thread) consumers and asyncio consumers.
+
+close() tells long-lived subscribers (the SSE streams) that the process
+is shutting down: it wakes every waiter and `closed` becomes True, so the
+streams end and their clients reconnect to another worker.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+
+@dataclass
+class Event:
+    id: int
+    type: str
+    data: dict
+    timestamp: float = field(default_factory=time.time)
+
+
+class EventBus:
+    def __init__(self, maxlen=1000):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=maxlen)
+        self._last_id = 0
+        self._generation = 0
+        self._async_waiters = set()  # {(loop, asyncio.Event)}
+        self._closed = False
+
+        # Log-backed mode (see attach_log)
+        self._fetch = None
+        self._head = None
+        self._poll_interval = 1.0
+        self._watcher = None
+
+    @property
+    def last_id(self):
+        """Id of the newest event (log head in log-backed mode)."""
+        if self._head is not None:
+            return self._head()
+        return self._last_id
+
+    def attach_log(self, fetch, head, poll_interval=1.0):
+        """
+        Serve events from a durable log instead of the ring buffer.
+
+        fetch(last_id) -> list[Event] newer than last_id (in order)
+        head() -> id of the newest event in the log
+        """
+        self._fetch = fetch
+        self._head = head
+        self._poll_interval = poll_interval
+
+    def _wake(self):
+        with self._cond:
+            self._generation += 1
+            waiters = list(self._async_waiters)
+            self._cond.notify_all()
+
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # Event loop already closed; the waiter is gone
+                pass
+
+    def publish(self, event_type, data):
+        """Append an event and wake every waiting subscriber."""
+        with self._cond:
+            self._last_id += 1
+            event = Event(self._last_id, event_type, data)
+            self._events.append(event)
+        self._wake()
+        return event
+
+    def notify(self):
+        """Tell subscribers the log has new rows (log-backed mode)."""
+        self._wake()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        """Wake every waiter and ask streaming subscribers to finish."""
+        self._closed = True
+        self._wake()
+
+    def _ensure_watcher(self):
+        if self._head is None:
+            return
+        with self._cond:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watcher = threading.Thread(
+                target=self._watch_log, name='event-log-watcher', daemon=True
+            )
+            self._watcher.start()
+
+    def _watch_log(self):
+        """Wake subscribers when another process appends to the log."""
+        last_head = None
+        while True:
+            try:
+                head = self._head()
+            except Exception:
+                head = last_head
+            if head != last_head:
+                if last_head is not None:
+                    self._wake()
+                last_head = head
+            time.sleep(self._poll_interval)
+
+    def since(self, last_id):
+        """
+        Events with id > last_id.
+
+        An id newer than anything published (e.g. from before a server
+        restart, or a log that was recreated) is treated as a fresh
+        subscription and gets everything available.
+        """
+        if last_id is not None and last_id > self.last_id:
+            last_id = 0
+        if self._fetch is not None:
+            return self._fetch(last_id or 0)
+        with self._cond:
+            if last_id is None:
+                last_id = 0
+            return [e for e in self._events if e.id > last_id]
+
+    def wait(self, last_id, timeout=15.0):
+        """Block until events newer than last_id exist (or timeout)."""
+        self._ensure_watcher()
+        with self._cond:
+            generation = self._generation
+        events = self.since(last_id)
+        if events:
+            return events
+
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._generation != generation, timeout=timeout
+            )
+        return self.since(last_id)
+
+    async def _since_async(self, last_id):
+        if self._fetch is not None:
+            # Log reads hit SQLite; keep them off the event loop
+            return await asyncio.to_thread(self.since, last_id)
+        return self.since(last_id)
+
+    async def wait_async(self, last_id, timeout=15.0):
+        """asyncio version of wait(); never blocks the event loop."""
+        self._ensure_watcher()
+        events = await self._since_async(last_id)
+        if events:
+            return events
+
+        loop = asyncio.get_running_loop()
+        flag = asyncio.Event()
+        waiter = (loop, flag)
+        with self._cond:
+            self._async_waiters.add(waiter)
+        try:
+            # Re-check after registering so an event published in between
+            # is not missed
+            events = await self._since_async(last_id)
+            if events:
+                return events
+            try:
+                await asyncio.wait_for(flag.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+            return await self._since_async(last_id)
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+
+# Process-wide bus used by database.py and the API
+bus = EventBus()
+
+
+def publish(event_type, data):
+    return bus.publish(event_type, data)
+
+
+def notify():
+    bus.notify()
@@ -1,6 +1,7 @@
 import sys
 import os
 import sqlite3
+import json
 from dataclasses import dataclass
 from typing import Optional
 
@@ -26,6 +27,37 @@ class ExitInfo:
     cost: int
 
 
+EXIT_QUERY = """
+    SELECT 
+        x.id,
+        e.plate,
+        e.timestamp_in,
+        e.image_in,
+        x.timestamp_out,
+        x.image_out,
+        x.duration_minutes,
+        x.cost
+    FROM exits x
+    JOIN entries e ON x.entry_id = e.id
+"""
+
+
+def _row_to_exit(row) -> Optional[ExitInfo]:
+    if not row:
+        return None
+
+    return ExitInfo(
+        exit_id=row[0],
+        plate=row[1],
+        timestamp_in=row[2],
+        image_in=row[3],
+        timestamp_out=row[4],
+        image_out=row[5],
+        duration_minutes=row[6],
+        cost=row[7],
+    )
+
+
 def get_last_exit() -> Optional[ExitInfo]:
     if not os.path.exists(DB_PATH):
         return None
@@ -34,34 +66,42 @@ def get_last_exit() -> Optional[ExitInfo]:
     cur = conn.cursor()
 
     try:
+        cur.execute(EXIT_QUERY + " ORDER BY x.id DESC LIMIT 1")
+        return _row_to_exit(cur.fetchone())
+    finally:
+        conn.close()
+
+
+def get_new_exit(since_seq: int):
+    """
+    فقط تغییرات بعد از since_seq را از لاگ رویدادها می‌خواند.
+    Returns (head_seq, ExitInfo or None): the newest exit logged after
+    since_seq, if any. When nothing changed this is one indexed lookup.
+    """
+    if not os.path.exists(DB_PATH):
+        return since_seq, None
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    try:
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+        head = cur.fetchone()[0]
+        if head == since_seq:
+            return head, None
+
         cur.execute("""
-            SELECT 
-                x.id,
-                e.plate,
-                e.timestamp_in,
-                e.image_in,
-                x.timestamp_out,
-                x.image_out,
-                x.duration_minutes,
-                x.cost
-            FROM exits x
-            JOIN entries e ON x.entry_id = e.id
-            ORDER BY x.id DESC LIMIT 1
-        """)
+            SELECT payload FROM events
+            WHERE seq > ? AND event_type = 'exit'
+            ORDER BY seq DESC LIMIT 1
+        """, (since_seq,))
         row = cur.fetchone()
         if not row:
-            return None
-
-        return ExitInfo(
-            exit_id=row[0],
-            plate=row[1],
-            timestamp_in=row[2],
-            image_in=row[3],
-            timestamp_out=row[4],
-            image_out=row[5],
-            duration_minutes=row[6],
-            cost=row[7],
-        )
+            return head, None
+
+        exit_id = json.loads(row[0])['exit_id']
+        cur.execute(EXIT_QUERY + " WHERE x.id = ?", (exit_id,))
+        return head, _row_to_exit(cur.fetchone())
     finally:
         conn.close()
 
@@ -100,6 +140,7 @@ class ExitDisplay(QWidget):
         super().__init__()
 
         self.last_exit_id = None
+        self.last_seq = None
 
         # ---- فونت وزیر را لود کن ----
         font_family = "Vazirmatn"
@@ -201,7 +242,17 @@ class ExitDisplay(QWidget):
         self.timer.start(1000)
 
     def check_update(self):
-        info = get_last_exit()
+        try:
+            if self.last_seq is None:
+                # اولین بار: آخرین خروج فعلی را نشان بده
+                self.last_seq, _ = get_new_exit(-1)
+                info = get_last_exit()
+            else:
+                self.last_seq, info = get_new_exit(self.last_seq)
+        except sqlite3.OperationalError:
+            # دیتابیس قدیمی بدون جدول events
+            info = get_last_exit()
+
         if not info:
             return
 
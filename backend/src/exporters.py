@@ -0,0 +1,104 @@
+"""
+خروجی CSV و Excel بدون نگه داشتن کل داده در حافظه
+
+Both writers take row iterables (tuples or dicts) and never materialize
+them, so the same code serves the REST export endpoint (streamed to the
+client) and the GUI's archive export (run off the UI thread).
+
+    iter_csv(columns, rows)   -> str chunks (UTF-8 BOM first, for Excel)
+    write_xlsx(path, sheets)  -> xlsxwriter in constant_memory mode
+    iter_xlsx(sheets)         -> bytes chunks of a finished workbook
+"""
+
+import csv
+import io
+import os
+import tempfile
+
+try:
+    import xlsxwriter
+    XLSX_AVAILABLE = True
+except ImportError:
+    xlsxwriter = None
+    XLSX_AVAILABLE = False
+
+CSV_CHUNK_ROWS = 500
+FILE_CHUNK_SIZE = 64 * 1024
+
+# محدودیت نام شیت در اکسل
+_SHEET_NAME_MAX = 31
+
+
+def _values(row, columns):
+    if isinstance(row, dict):
+        return [row.get(col) for col in columns]
+    return row
+
+
+def iter_csv(columns, rows, chunk_rows=CSV_CHUNK_ROWS):
+    """
+    CSV به صورت تکه‌های رشته؛ هر تکه چند صد ردیف.
+    Starts with a BOM so Excel opens Persian plates correctly.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow(_values(row, columns))
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    yield buffer.getvalue()
+
+
+def write_xlsx(path, sheets):
+    """
+    sheets: iterable of (sheet name, columns, rows).
+    Rows are written one by one with constant_memory, so each row is
+    flushed to disk as soon as the next one starts. Returns {sheet: rows}.
+    """
+    if not XLSX_AVAILABLE:
+        raise RuntimeError("xlsxwriter is required for Excel export")
+
+    counts = {}
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    try:
+        header = workbook.add_format({"bold": True})
+        for name, columns, rows in sheets:
+            sheet = workbook.add_worksheet(name[:_SHEET_NAME_MAX])
+            sheet.write_row(0, 0, columns, header)
+            n = 0
+            for n, row in enumerate(rows, start=1):
+                sheet.write_row(n, 0, _values(row, columns))
+            counts[name] = n
+    finally:
+        workbook.close()
+    return counts
+
+
+def iter_xlsx(sheets, chunk_size=FILE_CHUNK_SIZE):
+    """
+    ساخت فایل اکسل در یک فایل موقت و ارسال تکه به تکه (bytes).
+    An xlsx is a zip that is only complete on close, so it is built on
+    disk (constant memory) and then streamed; the temp file is removed
+    when the generator finishes or is closed.
+    """
+    fd, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(path, sheets)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
@@ -0,0 +1,203 @@
+"""
+لایه داده سبک برای تب‌های زنده رابط گرافیکی
+
+Plain sqlite3 + row tuples, no pandas and no Qt: the worker thread
+(gui_worker.py) calls these to build full snapshots or change-log
+deltas that the table models apply directly.
+"""
+
+from collections import deque
+
+from database import get_conn, changes_since, events_pruned_upto
+
+# تلاش برای ایمپورت تشخیص نوع پلاک (ملی / مناطق آزاد و...)
+try:
+    from plate_utils import get_plate_region
+except ImportError:
+    def get_plate_region(_plate: str) -> str | None:
+        # اگر plate_utils نداری، موقتاً همیشه National برمی‌گردونیم
+        return "National"
+
+
+# تعداد ردیف‌های نمایش داده‌شده در تب‌های تاریخچه
+HISTORY_ROWS = 100
+
+# اگر تعداد تغییرات از این بیشتر باشد، بارگذاری کامل ارزان‌تر است
+MAX_INCREMENTAL_CHANGES = 500
+
+
+def plate_region(plate):
+    return get_plate_region(plate) or "National"
+
+
+class RefreshTimings:
+    """
+    زمان‌بندی رفرش‌ها (میلی‌ثانیه)
+    fetch = worker thread (DB read + row preparation),
+    apply = UI thread (model update); apply is what the user feels as a stall.
+    """
+
+    def __init__(self, maxlen=200):
+        self.fetch = deque(maxlen=maxlen)
+        self.apply = deque(maxlen=maxlen)
+        self.coalesced = 0
+        self.failures = 0
+
+    def record_fetch(self, ms):
+        self.fetch.append(ms)
+
+    def record_apply(self, ms):
+        self.apply.append(ms)
+
+    @staticmethod
+    def _stats(samples):
+        if not samples:
+            return {'count': 0, 'last': 0.0, 'avg': 0.0, 'max': 0.0}
+        values = list(samples)
+        return {
+            'count': len(values),
+            'last': values[-1],
+            'avg': sum(values) / len(values),
+            'max': max(values),
+        }
+
+    def summary(self):
+        return {
+            'fetch_ms': self._stats(self.fetch),
+            'apply_ms': self._stats(self.apply),
+            'coalesced': self.coalesced,
+            'failures': self.failures,
+        }
+
+
+def load_snapshot():
+    """
+    وضعیت کامل تب‌های زنده در یک تراکنش خواندنی
+    Returns {version, capacity, active, entries, exits} with ready row tuples.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("BEGIN")
+        cur.execute("SELECT COALESCE(MAX(seq), 0) FROM events")
+        version = cur.fetchone()[0]
+
+        cur.execute("SELECT value FROM settings WHERE key='capacity'")
+        row = cur.fetchone()
+        capacity = int(row[0]) if row else 0
+
+        cur.execute("""
+            SELECT ac.entry_id, ac.plate, ac.timestamp_in, e.image_in
+            FROM active_cars ac
+            JOIN entries e ON ac.entry_id = e.id
+            ORDER BY ac.entry_id DESC
+        """)
+        active = [
+            (entry_id, plate, plate_region(plate), t_in, image_in)
+            for entry_id, plate, t_in, image_in in cur.fetchall()
+        ]
+
+        cur.execute(
+            "SELECT id, plate, timestamp_in, image_in FROM entries ORDER BY id DESC LIMIT ?",
+            (HISTORY_ROWS,),
+        )
+        entries = [
+            (entry_id, plate, plate_region(plate), t_in, image_in)
+            for entry_id, plate, t_in, image_in in cur.fetchall()
+        ]
+
+        cur.execute("""
+            SELECT id, plate, timestamp_out, duration_minutes, cost, image_out
+            FROM exits ORDER BY id DESC LIMIT ?
+        """, (HISTORY_ROWS,))
+        exits = [
+            (exit_id, plate, plate_region(plate), t_out, duration, cost, image_out)
+            for exit_id, plate, t_out, duration, cost, image_out in cur.fetchall()
+        ]
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return {
+        'version': version,
+        'capacity': capacity,
+        'active': active,
+        'entries': entries,
+        'exits': exits,
+    }
+
+
+def prepare_changes(changes):
+    """
+    تبدیل رویدادهای لاگ به ردیف‌های آماده برای مدل‌ها
+    Returns {entries, exits (newest first), exited entry ids, capacity or None}.
+    """
+    entries = []
+    exits = []
+    exited = set()
+    capacity = None
+
+    for change in changes:
+        payload = change['payload']
+        if change['event_type'] == 'entry':
+            entries.append((
+                payload['entry_id'],
+                payload['plate'],
+                plate_region(payload['plate']),
+                payload['timestamp_in'],
+                payload['image_in'],
+            ))
+        elif change['event_type'] == 'exit':
+            exits.append((
+                payload['exit_id'],
+                payload['plate'],
+                plate_region(payload['plate']),
+                payload['timestamp_out'],
+                payload['duration'],
+                payload['cost'],
+                payload['image_out'],
+            ))
+            exited.add(payload['entry_id'])
+        elif change['event_type'] == 'settings' and payload.get('key') == 'capacity':
+            capacity = int(payload['value'])
+
+    # جدیدترین ردیف بالای جدول
+    entries.reverse()
+    exits.reverse()
+    return {
+        'entries': entries,
+        'exits': exits,
+        'exited': exited,
+        'capacity': capacity,
+    }
+
+
+def fetch_update(version, full=False):
+    """
+    آنچه از نسخه version به بعد تغییر کرده
+    Returns (kind, payload, new_version): kind is None (nothing changed),
+    'changes' (see prepare_changes) or 'snapshot' (see load_snapshot).
+    """
+    if not full and version is not None:
+        conn = get_conn()
+        try:
+            head = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM events").fetchone()[0]
+        finally:
+            conn.close()
+
+        if head == version:
+            return None, None, version
+
+        # اگر لاگ عقب رفته (دیتابیس از نو ساخته شده) یا رویدادهای بعد از
+        # version حذف شده‌اند بارگذاری کامل
+        if head > version and version >= events_pruned_upto():
+            changes = changes_since(version, limit=MAX_INCREMENTAL_CHANGES + 1)
+            if len(changes) <= MAX_INCREMENTAL_CHANGES and not any(
+                c['event_type'] == 'reset' for c in changes
+            ):
+                delta = prepare_changes(changes)
+                delta['version'] = changes[-1]['seq'] if changes else head
+                return 'changes', delta, delta['version']
+
+    snapshot = load_snapshot()
+    return 'snapshot', snapshot, snapshot['version']
@@ -0,0 +1,160 @@
+"""
+مدل‌های جدول برای رابط گرافیکی (gui_qt.py)
+
+Rows are kept as plain tuples and the views are told exactly which rows
+were inserted or removed, so a refresh costs time proportional to what
+changed instead of rebuilding every cell. Image thumbnails are loaded
+only when a row is actually painted, and cached.
+"""
+
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt5.QtGui import QPixmap
+
+
+ALIGN_CENTER = Qt.AlignCenter
+ALIGN_RIGHT = Qt.AlignRight | Qt.AlignVCenter
+ALIGN_LEFT = Qt.AlignLeft | Qt.AlignVCenter
+
+
+@dataclass(frozen=True)
+class Column:
+    title: str
+    field: int  # index into the row tuple
+    align: int = ALIGN_RIGHT
+
+
+class ThumbnailCache:
+    """LRU cache of scaled-down pixmaps keyed by image path"""
+
+    def __init__(self, width=48, height=32, maxsize=256):
+        self.width = width
+        self.height = height
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+
+    def get(self, path):
+        if not path:
+            return None
+
+        pix = self._cache.get(path)
+        if pix is not None:
+            self._cache.move_to_end(path)
+            return pix
+
+        # فایل‌های ناموجود کش نمی‌شوند؛ ممکن است بعداً ذخیره شوند
+        if not os.path.exists(path):
+            return None
+        pix = QPixmap(path)
+        if pix.isNull():
+            return None
+
+        pix = pix.scaled(self.width, self.height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._cache[path] = pix
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return pix
+
+    def clear(self):
+        self._cache.clear()
+
+
+class RowTableModel(QAbstractTableModel):
+    """
+    جدول فقط‌خواندنی روی لیستی از tuple ها (جدیدترین ردیف بالا)
+
+    key_field identifies a row (entry_id / exit id) for removals,
+    image_field is the column that gets a lazy thumbnail, and max_rows
+    trims the oldest rows after an insert.
+    """
+
+    def __init__(self, columns, key_field=0, image_field=None, max_rows=None,
+                 thumbnails=None, parent=None):
+        super().__init__(parent)
+        self.columns = list(columns)
+        self.key_field = key_field
+        self.image_field = image_field
+        self.max_rows = max_rows
+        self.thumbnails = thumbnails
+        self._rows = []
+
+    # ---------- Qt model API ----------
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = self.columns[index.column()]
+
+        if role == Qt.DisplayRole:
+            value = row[column.field]
+            return "" if value is None else str(value)
+        if role == Qt.TextAlignmentRole:
+            return int(column.align)
+        if (
+            role == Qt.DecorationRole
+            and self.thumbnails is not None
+            and column.field == self.image_field
+        ):
+            return self.thumbnails.get(row[column.field])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section].title
+        return super().headerData(section, orientation, role)
+
+    # ---------- به‌روزرسانی ----------
+
+    def set_rows(self, rows):
+        """بارگذاری کامل (اولین بار یا بعد از ریست)"""
+        self.beginResetModel()
+        self._rows = list(rows)
+        if self.max_rows is not None:
+            del self._rows[self.max_rows:]
+        self.endResetModel()
+
+    def insert_rows(self, rows):
+        """ردیف‌های جدید (جدیدترین اول) را بالای جدول اضافه می‌کند"""
+        rows = list(rows)
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._rows[0:0] = rows
+        self.endInsertRows()
+
+        if self.max_rows is not None and len(self._rows) > self.max_rows:
+            self.beginRemoveRows(QModelIndex(), self.max_rows, len(self._rows) - 1)
+            del self._rows[self.max_rows:]
+            self.endRemoveRows()
+
+    def remove_keys(self, keys):
+        """حذف ردیف‌هایی که کلیدشان در keys است"""
+        keys = set(keys)
+        if not keys:
+            return
+        # از پایین به بالا تا اندیس‌ها جابه‌جا نشوند
+        for pos in range(len(self._rows) - 1, -1, -1):
+            if self._rows[pos][self.key_field] in keys:
+                self.beginRemoveRows(QModelIndex(), pos, pos)
+                del self._rows[pos]
+                self.endRemoveRows()
+
+    # ---------- دسترسی ----------
+
+    def row_tuple(self, row):
+        return self._rows[row]
+
+    def image_path(self, row):
+        if self.image_field is None or not 0 <= row < len(self._rows):
+            return None
+        return self._rows[row][self.image_field]
@@ -1,17 +1,16 @@
 import sys
 import os
-import sqlite3
 import datetime
 import shutil
-
-import pandas as pd
+import time
 
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QTabWidget, QTableWidget, QTableWidgetItem,
-    QMessageBox, QGroupBox, QSpinBox, QHeaderView, QComboBox
+    QTableView, QMessageBox, QGroupBox, QSpinBox, QHeaderView, QComboBox,
+    QLineEdit
 )
-from PyQt5.QtCore import QTimer, Qt
+from PyQt5.QtCore import QTimer, Qt, QThread
 from PyQt5.QtGui import QPixmap, QFont, QIcon
 
 from database import (
@@ -23,25 +22,33 @@ from database import (
     set_capacity,
     get_price_per_hour,
     set_price_per_hour,
+    get_income_report,
 )
-from archive_utils import archive_day, ARCHIVE_ROOT
-
-# تلاش برای ایمپورت تشخیص نوع پلاک (ملی / مناطق آزاد و...)
-try:
-    from plate_utils import get_plate_region
-except ImportError:
-    def get_plate_region(_plate: str) -> str | None:
-        # اگر plate_utils نداری، موقتاً همیشه National برمی‌گردونیم
-        return "National"
+from archive_utils import (
+    archive_before_reset, ARCHIVE_ROOT, ARCHIVE_TABLES, list_archived_days,
+    read_archive_table, iter_archive_rows,
+)
+from exporters import write_xlsx
+from archive_query import query_archive
+from reports import REPORT_NAME, generate_day_report
+from gui_models import (
+    Column, RowTableModel, ThumbnailCache,
+    ALIGN_CENTER, ALIGN_RIGHT, ALIGN_LEFT,
+)
+from gui_worker import DataWorker, ExportTask
+from gui_data import HISTORY_ROWS
 
 DB_PATH = "parking.db"
 
+# اعمال داده روی جدول‌ها بیشتر از این (میلی‌ثانیه) = گیر کردن محسوس UI
+UI_STALL_WARN_MS = 50
 
-def query(sql, params=()):
-    conn = sqlite3.connect(DB_PATH)
-    df = pd.read_sql_query(sql, conn, params=params)
-    conn.close()
-    return df
+
+def _to_number(value, cast=int):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return 0
 
 
 def full_reset_system():
@@ -154,6 +161,9 @@ class MainWindow(QMainWindow):
         # ---------- تب‌ها ----------
         self.tabs = QTabWidget()
 
+        # تصاویر کوچک جدول‌ها فقط هنگام نمایش ردیف بارگذاری می‌شوند
+        self.thumbnails = ThumbnailCache()
+
         # === تب ۱: خودروهای داخل ===
         self._build_tab_active()
         self.tabs.addTab(self.tab_active, "خودروهای داخل")
@@ -175,9 +185,9 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(main_widget)
 
         # ---------- رویداد انتخاب ردیف‌ها ----------
-        self.table_active.itemSelectionChanged.connect(self.on_active_selected)
-        self.table_entries.itemSelectionChanged.connect(self.on_entry_selected)
-        self.table_exits.itemSelectionChanged.connect(self.on_exit_selected)
+        self.table_active.selectionModel().currentRowChanged.connect(self.on_active_selected)
+        self.table_entries.selectionModel().currentRowChanged.connect(self.on_entry_selected)
+        self.table_exits.selectionModel().currentRowChanged.connect(self.on_exit_selected)
 
         # ---------- دکمه‌ها ----------
         btn_refresh.clicked.connect(self.refresh_all)
@@ -190,14 +200,30 @@ class MainWindow(QMainWindow):
         # رویدادهای تب آرشیو
         self.cmb_days.currentIndexChanged.connect(self.on_archive_day_changed)
         self.btn_refresh_days.clicked.connect(self.refresh_archive_days)
+        self.btn_search_archive.clicked.connect(self.search_archive)
         self.btn_refresh_income.clicked.connect(self.refresh_income_report)
         self.btn_open_pdf.clicked.connect(self.open_archive_pdf)
         self.btn_export_excel.clicked.connect(self.export_archive_excel)
 
+        # ---------- کارگر پس‌زمینه برای خواندن دیتابیس ----------
+        # خواندن از دیتابیس روی ترد جدا انجام می‌شود؛ ترد UI فقط مدل‌ها را به‌روز می‌کند
+        self._capacity = 0
+        self.worker_thread = QThread(self)
+        self.worker = DataWorker()
+        self.worker.moveToThread(self.worker_thread)
+        self.worker.snapshot_ready.connect(self.on_snapshot)
+        self.worker.changes_ready.connect(self.on_changes)
+        self.worker.failed.connect(self.on_refresh_failed)
+        self.worker_thread.start()
+
+        # خروجی اکسل روی ترد جدا (ExportTask)
+        self.export_task = None
+
         # ---------- تایمر رفرش خودکار ----------
+        # فقط تغییرات جدید از لاگ رویدادها خوانده و به مدل‌ها اعمال می‌شوند
         self.timer = QTimer(self)
         self.timer.setInterval(2000)  # هر ۲ ثانیه
-        self.timer.timeout.connect(self.refresh_all)
+        self.timer.timeout.connect(self.refresh_if_changed)
         self.timer.start()
 
         # ---------- مقداردهی اولیه ----------
@@ -208,21 +234,36 @@ class MainWindow(QMainWindow):
 
     # ================= ساخت تب‌ها =================
 
+    def _build_table_view(self, model):
+        view = QTableView()
+        view.setModel(model)
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        view.setSelectionBehavior(QTableView.SelectRows)
+        view.setSelectionMode(QTableView.SingleSelection)
+        view.horizontalHeader().setDefaultAlignment(
+            Qt.AlignRight | Qt.AlignVCenter
+        )
+        view.verticalHeader().setDefaultSectionSize(26)
+        return view
+
     def _build_tab_active(self):
         self.tab_active = QWidget()
         active_layout = QHBoxLayout(self.tab_active)
 
-        self.table_active = QTableWidget()
-        self.table_active.setColumnCount(5)
-        self.table_active.setHorizontalHeaderLabels(
-            ["entry_id", "پلاک", "منطقه", "زمان ورود", "مسیر تصویر"]
+        # ردیف: (entry_id, plate, region, timestamp_in, image_in)
+        self.model_active = RowTableModel(
+            [
+                Column("entry_id", 0, ALIGN_CENTER),
+                Column("پلاک", 1, ALIGN_RIGHT),
+                Column("منطقه", 2, ALIGN_CENTER),
+                Column("زمان ورود", 3, ALIGN_RIGHT),
+                Column("مسیر تصویر", 4, ALIGN_LEFT),
+            ],
+            key_field=0,
+            image_field=4,
+            thumbnails=self.thumbnails,
         )
-        self.table_active.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table_active.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_active.horizontalHeader().setDefaultAlignment(
-            Qt.AlignRight | Qt.AlignVCenter
-        )
-        self.table_active.verticalHeader().setDefaultSectionSize(26)
+        self.table_active = self._build_table_view(self.model_active)
 
         self.lbl_active_img = QLabel("تصویر خودرو نمایش داده می‌شود")
         self.lbl_active_img.setAlignment(Qt.AlignCenter)
@@ -235,17 +276,21 @@ class MainWindow(QMainWindow):
         self.tab_entries = QWidget()
         entries_layout = QHBoxLayout(self.tab_entries)
 
-        self.table_entries = QTableWidget()
-        self.table_entries.setColumnCount(5)
-        self.table_entries.setHorizontalHeaderLabels(
-            ["id", "پلاک", "منطقه", "زمان ورود", "مسیر تصویر"]
-        )
-        self.table_entries.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table_entries.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_entries.horizontalHeader().setDefaultAlignment(
-            Qt.AlignRight | Qt.AlignVCenter
+        # ردیف: (id, plate, region, timestamp_in, image_in)
+        self.model_entries = RowTableModel(
+            [
+                Column("id", 0, ALIGN_CENTER),
+                Column("پلاک", 1, ALIGN_RIGHT),
+                Column("منطقه", 2, ALIGN_CENTER),
+                Column("زمان ورود", 3, ALIGN_RIGHT),
+                Column("مسیر تصویر", 4, ALIGN_LEFT),
+            ],
+            key_field=0,
+            image_field=4,
+            max_rows=HISTORY_ROWS,
+            thumbnails=self.thumbnails,
         )
-        self.table_entries.verticalHeader().setDefaultSectionSize(26)
+        self.table_entries = self._build_table_view(self.model_entries)
 
         self.lbl_entry_img = QLabel("تصویر ورود نمایش داده می‌شود")
         self.lbl_entry_img.setAlignment(Qt.AlignCenter)
@@ -258,17 +303,23 @@ class MainWindow(QMainWindow):
         self.tab_exits = QWidget()
         exits_layout = QHBoxLayout(self.tab_exits)
 
-        self.table_exits = QTableWidget()
-        self.table_exits.setColumnCount(7)
-        self.table_exits.setHorizontalHeaderLabels(
-            ["id", "پلاک", "منطقه", "زمان خروج", "مدت (دقیقه)", "هزینه", "مسیر تصویر"]
+        # ردیف: (id, plate, region, timestamp_out, duration_minutes, cost, image_out)
+        self.model_exits = RowTableModel(
+            [
+                Column("id", 0, ALIGN_CENTER),
+                Column("پلاک", 1, ALIGN_RIGHT),
+                Column("منطقه", 2, ALIGN_CENTER),
+                Column("زمان خروج", 3, ALIGN_RIGHT),
+                Column("مدت (دقیقه)", 4, ALIGN_CENTER),
+                Column("هزینه", 5, ALIGN_CENTER),
+                Column("مسیر تصویر", 6, ALIGN_LEFT),
+            ],
+            key_field=0,
+            image_field=6,
+            max_rows=HISTORY_ROWS,
+            thumbnails=self.thumbnails,
         )
-        self.table_exits.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table_exits.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_exits.horizontalHeader().setDefaultAlignment(
-            Qt.AlignRight | Qt.AlignVCenter
-        )
-        self.table_exits.verticalHeader().setDefaultSectionSize(26)
+        self.table_exits = self._build_table_view(self.model_exits)
 
         self.lbl_exit_img = QLabel("تصویر خروج نمایش داده می‌شود")
         self.lbl_exit_img.setAlignment(Qt.AlignCenter)
@@ -297,6 +348,27 @@ class MainWindow(QMainWindow):
 
         layout.addWidget(top_box)
 
+        # --- جستجو در همه روزهای آرشیو ---
+        search_box = QGroupBox("جستجو در همه روزها")
+        search_layout = QHBoxLayout(search_box)
+
+        self.txt_search_plate = QLineEdit()
+        self.txt_search_plate.setPlaceholderText("پلاک")
+        self.txt_search_from = QLineEdit()
+        self.txt_search_from.setPlaceholderText("از تاریخ (YYYY-MM-DD)")
+        self.txt_search_to = QLineEdit()
+        self.txt_search_to.setPlaceholderText("تا تاریخ (YYYY-MM-DD)")
+        self.btn_search_archive = QPushButton("جستجو")
+
+        search_layout.addWidget(QLabel("پلاک:"))
+        search_layout.addWidget(self.txt_search_plate)
+        search_layout.addWidget(self.txt_search_from)
+        search_layout.addWidget(self.txt_search_to)
+        search_layout.addWidget(self.btn_search_archive)
+        search_layout.addStretch()
+
+        layout.addWidget(search_box)
+
         # --- خلاصه آماری روز منتخب ---
         summary_box = QGroupBox("خلاصه روز انتخاب‌شده")
         summary_layout = QHBoxLayout(summary_box)
@@ -409,7 +481,8 @@ class MainWindow(QMainWindow):
         new_cap = self.spin_capacity.value()
         set_capacity(new_cap)
         QMessageBox.information(self, "ظرفیت", "ظرفیت ذخیره شد.")
-        self.refresh_capacity()
+        self._capacity = new_cap
+        self.update_status_labels()
 
     def save_price(self):
         new_price = self.spin_price.value()
@@ -417,59 +490,68 @@ class MainWindow(QMainWindow):
         QMessageBox.information(self, "تعرفه", "تعرفه ذخیره شد.")
 
     # ================= رفرش داده‌ها =================
-    def refresh_all(self):
-        self.refresh_capacity()
-        self.refresh_active()
-        self.refresh_entries()
-        self.refresh_exits()
+    def refresh_if_changed(self):
+        self.worker.schedule()
 
-    def refresh_capacity(self):
-        try:
-            capacity = get_capacity()
-        except Exception:
-            capacity = 0
+    def refresh_all(self):
+        self.worker.schedule(full=True)
+
+    def on_snapshot(self, snapshot):
+        start = time.perf_counter()
+        self._capacity = snapshot["capacity"]
+        self.model_active.set_rows(snapshot["active"])
+        self.model_entries.set_rows(snapshot["entries"])
+        self.model_exits.set_rows(snapshot["exits"])
+        self.update_status_labels()
+        self._record_apply(start)
+
+    def on_changes(self, delta):
+        """
+        اعمال تغییرات آماده‌شده توسط کارگر روی مدل‌ها؛
+        only the new/removed rows are touched.
+        """
+        start = time.perf_counter()
+        if delta["capacity"] is not None:
+            self._capacity = delta["capacity"]
+
+        exited = delta["exited"]
+        self.model_entries.insert_rows(delta["entries"])
+        self.model_exits.insert_rows(delta["exits"])
+        self.model_active.remove_keys(exited)
+        self.model_active.insert_rows(
+            row for row in delta["entries"] if row[0] not in exited
+        )
+        self.update_status_labels()
+        self._record_apply(start)
+
+    def on_refresh_failed(self, message):
+        # مثلاً قفل بودن دیتابیس؛ تیک بعدی تایمر دوباره تلاش می‌کند
+        self.statusBar().showMessage(f"خطا در خواندن دیتابیس: {message}", 5000)
+
+    def _record_apply(self, start):
+        apply_ms = (time.perf_counter() - start) * 1000
+        timings = self.worker.timings
+        timings.record_apply(apply_ms)
+        fetch_ms = timings.fetch[-1] if timings.fetch else 0.0
+        self.statusBar().showMessage(
+            f"رفرش: خواندن {fetch_ms:.1f}ms / نمایش {apply_ms:.1f}ms"
+        )
+        if apply_ms > UI_STALL_WARN_MS:
+            print(f"[GUI] slow table update: {apply_ms:.1f}ms (fetch {fetch_ms:.1f}ms)")
 
-        df_active = query("SELECT COUNT(*) AS c FROM active_cars")
-        active = int(df_active["c"].iloc[0]) if not df_active.empty else 0
-        free = max(0, capacity - active)
+    def update_status_labels(self):
+        # تعداد خودروهای داخل = تعداد ردیف‌های مدل خودروهای فعال
+        active = self.model_active.rowCount()
+        free = max(0, self._capacity - active)
 
-        self.lbl_capacity.setText(f"کل ظرفیت: {capacity}")
+        self.lbl_capacity.setText(f"کل ظرفیت: {self._capacity}")
         self.lbl_active.setText(f"خودروهای داخل: {active}")
         self.lbl_free.setText(f"جای خالی: {free}")
 
-    def refresh_active(self):
-        df = query("""
-            SELECT ac.entry_id, ac.plate, ac.timestamp_in, e.image_in
-            FROM active_cars ac
-            JOIN entries e ON ac.entry_id = e.id
-        """)
-        if not df.empty:
-            df["region"] = df["plate"].apply(lambda p: get_plate_region(p) or "National")
-        self.fill_table_active(df)
-
-    def refresh_entries(self):
-        df = query("SELECT * FROM entries ORDER BY id DESC LIMIT 100")
-        if not df.empty:
-            df["region"] = df["plate"].apply(lambda p: get_plate_region(p) or "National")
-        self.fill_table_entries(df)
-
-    def refresh_exits(self):
-        df = query("SELECT * FROM exits ORDER BY id DESC LIMIT 100")
-        if not df.empty:
-            df["region"] = df["plate"].apply(lambda p: get_plate_region(p) or "National")
-        self.fill_table_exits(df)
-
     # ================= آرشیو: لیست روزها =================
     def refresh_archive_days(self):
         self.cmb_days.clear()
-        if not os.path.exists(ARCHIVE_ROOT):
-            return
-        days = [
-            d for d in os.listdir(ARCHIVE_ROOT)
-            if os.path.isdir(os.path.join(ARCHIVE_ROOT, d))
-        ]
-        days = sorted(days, reverse=True)
-        self.cmb_days.addItems(days)
+        self.cmb_days.addItems(list_archived_days())
 
     def on_archive_day_changed(self, index: int):
         if index < 0:
@@ -481,31 +563,36 @@ class MainWindow(QMainWindow):
 
     def load_archive_day(self, day: str):
         day_dir = os.path.join(ARCHIVE_ROOT, day)
-        entries_csv = os.path.join(day_dir, "entries.csv")
-        exits_csv = os.path.join(day_dir, "exits.csv")
+        entries = read_archive_table(day_dir, "entries")
+        exits = read_archive_table(day_dir, "exits")
 
-        if os.path.exists(entries_csv):
-            entries_df = pd.read_csv(entries_csv)
-        else:
-            entries_df = pd.DataFrame()
+        self.fill_archive_entries_table(entries)
+        self.fill_archive_exits_table(exits)
+        self.update_archive_summary(entries, exits)
 
-        if os.path.exists(exits_csv):
-            exits_df = pd.read_csv(exits_csv)
-        else:
-            exits_df = pd.DataFrame()
+    def search_archive(self):
+        """جستجوی پلاک / بازه تاریخ در همه روزهای آرشیو"""
+        plate = self.txt_search_plate.text().strip() or None
+        start = self.txt_search_from.text().strip() or None
+        end = self.txt_search_to.text().strip() or None
+
+        entries = list(query_archive("entries", start=start, end=end, plate=plate))
+        exits = list(query_archive("exits", start=start, end=end, plate=plate))
 
-        self.fill_archive_entries_table(entries_df)
-        self.fill_archive_exits_table(exits_df)
-        self.update_archive_summary(entries_df, exits_df)
+        self.fill_archive_entries_table(entries)
+        self.fill_archive_exits_table(exits)
+        self.update_archive_summary(entries, exits)
 
-    def update_archive_summary(self, entries_df: pd.DataFrame, exits_df: pd.DataFrame):
-        total_entries = len(entries_df)
-        total_exits = len(exits_df)
+    def update_archive_summary(self, entries: list, exits: list):
+        total_entries = len(entries)
+        total_exits = len(exits)
         active_end = total_entries - total_exits
 
-        if not exits_df.empty and "cost" in exits_df.columns:
-            total_revenue = int(exits_df["cost"].sum())
-            avg_duration = float(exits_df["duration_minutes"].mean())
+        if exits and "cost" in exits[0]:
+            total_revenue = sum(_to_number(r.get("cost")) for r in exits)
+            avg_duration = sum(
+                _to_number(r.get("duration_minutes"), float) for r in exits
+            ) / total_exits
         else:
             total_revenue = 0
             avg_duration = 0.0
@@ -516,88 +603,43 @@ class MainWindow(QMainWindow):
         self.lbl_sum_revenue.setText(f"درآمد روز (تومان): {total_revenue}")
         self.lbl_sum_avg_duration.setText(f"میانگین مدت توقف (دقیقه): {avg_duration:.1f}")
 
-    def fill_archive_entries_table(self, df: pd.DataFrame):
-        self.table_archive_entries.setRowCount(0)
-        if df.empty:
+    def _fill_archive_table(self, table, rows: list, columns):
+        """columns: لیست (نام ستون CSV، تراز متن)"""
+        table.setRowCount(0)
+        if not rows:
             return
-        self.table_archive_entries.setRowCount(len(df))
-        for r, (_, row) in enumerate(df.iterrows()):
-            # id
-            item_id = QTableWidgetItem(str(row.get("id", "")))
-            item_id.setTextAlignment(Qt.AlignCenter)
-            self.table_archive_entries.setItem(r, 0, item_id)
-            # plate
-            item_plate = QTableWidgetItem(str(row.get("plate", "")))
-            item_plate.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_archive_entries.setItem(r, 1, item_plate)
-            # timestamp_in
-            item_ts = QTableWidgetItem(str(row.get("timestamp_in", "")))
-            item_ts.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_archive_entries.setItem(r, 2, item_ts)
-            # image_in
-            item_img = QTableWidgetItem(str(row.get("image_in", "")))
-            item_img.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            self.table_archive_entries.setItem(r, 3, item_img)
-
-    def fill_archive_exits_table(self, df: pd.DataFrame):
-        self.table_archive_exits.setRowCount(0)
-        if df.empty:
-            return
-        self.table_archive_exits.setRowCount(len(df))
-        for r, (_, row) in enumerate(df.iterrows()):
-            # id
-            item_id = QTableWidgetItem(str(row.get("id", "")))
-            item_id.setTextAlignment(Qt.AlignCenter)
-            self.table_archive_exits.setItem(r, 0, item_id)
-            # plate
-            item_plate = QTableWidgetItem(str(row.get("plate", "")))
-            item_plate.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_archive_exits.setItem(r, 1, item_plate)
-            # timestamp_out
-            item_ts = QTableWidgetItem(str(row.get("timestamp_out", "")))
-            item_ts.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_archive_exits.setItem(r, 2, item_ts)
-            # duration_minutes
-            item_dur = QTableWidgetItem(str(row.get("duration_minutes", "")))
-            item_dur.setTextAlignment(Qt.AlignCenter)
-            self.table_archive_exits.setItem(r, 3, item_dur)
-            # cost
-            item_cost = QTableWidgetItem(str(row.get("cost", "")))
-            item_cost.setTextAlignment(Qt.AlignCenter)
-            self.table_archive_exits.setItem(r, 4, item_cost)
-            # image_out
-            item_img = QTableWidgetItem(str(row.get("image_out", "")))
-            item_img.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            self.table_archive_exits.setItem(r, 5, item_img)
+        table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            for c, (key, align) in enumerate(columns):
+                item = QTableWidgetItem(str(row.get(key, "")))
+                item.setTextAlignment(align)
+                table.setItem(r, c, item)
+
+    def fill_archive_entries_table(self, rows: list):
+        self._fill_archive_table(self.table_archive_entries, rows, [
+            ("id", Qt.AlignCenter),
+            ("plate", Qt.AlignRight | Qt.AlignVCenter),
+            ("timestamp_in", Qt.AlignRight | Qt.AlignVCenter),
+            ("image_in", Qt.AlignLeft | Qt.AlignVCenter),
+        ])
+
+    def fill_archive_exits_table(self, rows: list):
+        self._fill_archive_table(self.table_archive_exits, rows, [
+            ("id", Qt.AlignCenter),
+            ("plate", Qt.AlignRight | Qt.AlignVCenter),
+            ("timestamp_out", Qt.AlignRight | Qt.AlignVCenter),
+            ("duration_minutes", Qt.AlignCenter),
+            ("cost", Qt.AlignCenter),
+            ("image_out", Qt.AlignLeft | Qt.AlignVCenter),
+        ])
 
     # ================= گزارش درآمد کلی =================
     def refresh_income_report(self):
-        # درآمد امروز (دیتابیس فعلی)
-        df_exits_today = query("SELECT cost, timestamp_out FROM exits")
-        today_str = datetime.date.today().strftime("%Y-%m-%d")
-        if not df_exits_today.empty:
-            df_today = df_exits_today[
-                df_exits_today["timestamp_out"].astype(str).str.startswith(today_str)
-            ]
-            income_today = int(df_today["cost"].sum()) if not df_today.empty else 0
-        else:
-            income_today = 0
-
-        # درآمد آرشیو (از تمام exits.csv ها)
-        income_archived = 0
-        if os.path.exists(ARCHIVE_ROOT):
-            for d in os.listdir(ARCHIVE_ROOT):
-                day_dir = os.path.join(ARCHIVE_ROOT, d)
-                exits_csv = os.path.join(day_dir, "exits.csv")
-                if os.path.exists(exits_csv):
-                    try:
-                        df = pd.read_csv(exits_csv)
-                        if "cost" in df.columns and not df.empty:
-                            income_archived += int(df["cost"].sum())
-                    except Exception:
-                        pass
-
-        total = income_today + income_archived
+        # درآمد از جدول تجمیعی daily_stats (یک ردیف برای هر روز)
+        report = get_income_report()
+        income_today = report["today"]
+        income_archived = report["archived"]
+        total = report["total"]
 
         self.lbl_income_today.setText(f"درآمد امروز: {income_today} تومان")
         self.lbl_income_archived.setText(f"درآمد از آرشیو روزها: {income_archived} تومان")
@@ -622,10 +664,14 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "آرشیو", "هیچ روزی انتخاب نشده یا پوشه آرشیو وجود ندارد.")
             return
 
-        pdf_path = os.path.join(day_dir, "summary.pdf")
+        pdf_path = os.path.join(day_dir, REPORT_NAME)
         if not os.path.exists(pdf_path):
-            QMessageBox.warning(self, "آرشیو", "فایل summary.pdf برای این روز یافت نشد.")
-            return
+            # گزارش در اولین باز شدن از روی آرشیو ساخته می‌شود
+            try:
+                generate_day_report(os.path.basename(day_dir))
+            except Exception as e:
+                QMessageBox.critical(self, "خطا", f"امکان ساخت گزارش PDF نیست:\n{e}")
+                return
 
         try:
             os.startfile(pdf_path)  # در ویندوز
@@ -637,136 +683,47 @@ class MainWindow(QMainWindow):
         if day_dir is None:
             QMessageBox.warning(self, "آرشیو", "هیچ روزی انتخاب نشده یا پوشه آرشیو وجود ندارد.")
             return
-
-        entries_csv = os.path.join(day_dir, "entries.csv")
-        exits_csv = os.path.join(day_dir, "exits.csv")
-
-        if not os.path.exists(entries_csv) and not os.path.exists(exits_csv):
-            QMessageBox.warning(self, "آرشیو", "هیچ داده‌ای (entries/exits) برای این روز یافت نشد.")
+        if self.export_task is not None and self.export_task.isRunning():
+            QMessageBox.information(self, "خروجی اکسل", "خروجی قبلی هنوز در حال ساخت است.")
             return
 
+        excel_path = os.path.join(day_dir, "report.xlsx")
+
+        def job():
+            # ردیف‌ها مستقیم از فایل‌های آرشیو به اکسل (constant_memory) می‌روند
+            counts = write_xlsx(excel_path, [
+                (table, [name for name, _ in ARCHIVE_TABLES[table]["columns"]],
+                 iter_archive_rows(day_dir, table))
+                for table in ("entries", "exits")
+            ])
+            if not any(counts.values()):
+                os.remove(excel_path)
+                raise RuntimeError("هیچ داده‌ای (entries/exits) برای این روز یافت نشد.")
+            return excel_path
+
+        self.btn_export_excel.setEnabled(False)
+        self.export_task = ExportTask(job, self)
+        self.export_task.done.connect(self.on_export_done)
+        self.export_task.failed.connect(self.on_export_failed)
+        self.export_task.finished.connect(lambda: self.btn_export_excel.setEnabled(True))
+        self.export_task.start()
+
+    def on_export_done(self, excel_path: str):
         try:
-            entries_df = pd.read_csv(entries_csv) if os.path.exists(entries_csv) else pd.DataFrame()
-            exits_df = pd.read_csv(exits_csv) if os.path.exists(exits_csv) else pd.DataFrame()
-
-            excel_path = os.path.join(day_dir, "report.xlsx")
-            with pd.ExcelWriter(excel_path, engine="xlsxwriter") as writer:
-                if not entries_df.empty:
-                    entries_df.to_excel(writer, sheet_name="entries", index=False)
-                if not exits_df.empty:
-                    exits_df.to_excel(writer, sheet_name="exits", index=False)
-
-            try:
-                os.startfile(excel_path)
-            except Exception:
-                QMessageBox.information(self, "خروجی اکسل", f"فایل اکسل ساخته شد:\n{excel_path}")
+            os.startfile(excel_path)
+        except Exception:
+            QMessageBox.information(self, "خروجی اکسل", f"فایل اکسل ساخته شد:\n{excel_path}")
 
-        except Exception as e:
-            QMessageBox.critical(self, "خطا", f"خطا در ساخت فایل اکسل:\n{e}")
+    def on_export_failed(self, message: str):
+        QMessageBox.critical(self, "خطا", f"خطا در ساخت فایل اکسل:\n{message}")
 
-    # ================= پر کردن جدول‌های اصلی (راست‌چین) =================
-    def fill_table_active(self, df):
-        self.table_active.setRowCount(0)
-        if df.empty:
-            return
-        self.table_active.setRowCount(len(df))
-        for r, (_, row) in enumerate(df.iterrows()):
-            # entry_id
-            item_id = QTableWidgetItem(str(row["entry_id"]))
-            item_id.setTextAlignment(Qt.AlignCenter)
-            self.table_active.setItem(r, 0, item_id)
-
-            # plate
-            item_plate = QTableWidgetItem(str(row["plate"]))
-            item_plate.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_active.setItem(r, 1, item_plate)
-
-            # region
-            item_region = QTableWidgetItem(str(row["region"]))
-            item_region.setTextAlignment(Qt.AlignCenter)
-            self.table_active.setItem(r, 2, item_region)
-
-            # timestamp_in
-            item_ts = QTableWidgetItem(str(row["timestamp_in"]))
-            item_ts.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_active.setItem(r, 3, item_ts)
-
-            # image_in
-            item_img = QTableWidgetItem(str(row["image_in"]))
-            item_img.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            self.table_active.setItem(r, 4, item_img)
-
-    def fill_table_entries(self, df):
-        self.table_entries.setRowCount(0)
-        if df.empty:
-            return
-        self.table_entries.setRowCount(len(df))
-        for r, (_, row) in enumerate(df.iterrows()):
-            # id
-            item_id = QTableWidgetItem(str(row["id"]))
-            item_id.setTextAlignment(Qt.AlignCenter)
-            self.table_entries.setItem(r, 0, item_id)
-
-            # plate
-            item_plate = QTableWidgetItem(str(row["plate"]))
-            item_plate.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_entries.setItem(r, 1, item_plate)
-
-            # region
-            item_region = QTableWidgetItem(str(row["region"]))
-            item_region.setTextAlignment(Qt.AlignCenter)
-            self.table_entries.setItem(r, 2, item_region)
-
-            # timestamp_in
-            item_ts = QTableWidgetItem(str(row["timestamp_in"]))
-            item_ts.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_entries.setItem(r, 3, item_ts)
-
-            # image_in
-            item_img = QTableWidgetItem(str(row["image_in"]))
-            item_img.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            self.table_entries.setItem(r, 4, item_img)
-
-    def fill_table_exits(self, df):
-        self.table_exits.setRowCount(0)
-        if df.empty:
-            return
-        self.table_exits.setRowCount(len(df))
-        for r, (_, row) in enumerate(df.iterrows()):
-            # id
-            item_id = QTableWidgetItem(str(row["id"]))
-            item_id.setTextAlignment(Qt.AlignCenter)
-            self.table_exits.setItem(r, 0, item_id)
-
-            # plate
-            item_plate = QTableWidgetItem(str(row["plate"]))
-            item_plate.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_exits.setItem(r, 1, item_plate)
-
-            # region
-            item_region = QTableWidgetItem(str(row["region"]))
-            item_region.setTextAlignment(Qt.AlignCenter)
-            self.table_exits.setItem(r, 2, item_region)
-
-            # timestamp_out
-            item_ts = QTableWidgetItem(str(row["timestamp_out"]))
-            item_ts.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
-            self.table_exits.setItem(r, 3, item_ts)
-
-            # duration_minutes
-            item_dur = QTableWidgetItem(str(row["duration_minutes"]))
-            item_dur.setTextAlignment(Qt.AlignCenter)
-            self.table_exits.setItem(r, 4, item_dur)
-
-            # cost
-            item_cost = QTableWidgetItem(str(row["cost"]))
-            item_cost.setTextAlignment(Qt.AlignCenter)
-            self.table_exits.setItem(r, 5, item_cost)
-
-            # image_out
-            item_img = QTableWidgetItem(str(row["image_out"]))
-            item_img.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-            self.table_exits.setItem(r, 6, item_img)
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.export_task is not None:
+            self.export_task.wait()
+        self.worker_thread.quit()
+        self.worker_thread.wait(3000)
+        super().closeEvent(event)
 
     # ================= نمایش تصویر =================
     def _load_image_to_label(self, label: QLabel, path: str):
@@ -787,32 +744,19 @@ class MainWindow(QMainWindow):
         label.setPixmap(pix)
         label.setText("")
 
-    def on_active_selected(self):
-        sel = self.table_active.selectedItems()
-        if not sel:
-            return
-        row = sel[0].row()
-        img_item = self.table_active.item(row, 4)
-        if img_item:
-            self._load_image_to_label(self.lbl_active_img, img_item.text())
-
-    def on_entry_selected(self):
-        sel = self.table_entries.selectedItems()
-        if not sel:
-            return
-        row = sel[0].row()
-        img_item = self.table_entries.item(row, 4)
-        if img_item:
-            self._load_image_to_label(self.lbl_entry_img, img_item.text())
-
-    def on_exit_selected(self):
-        sel = self.table_exits.selectedItems()
-        if not sel:
-            return
-        row = sel[0].row()
-        img_item = self.table_exits.item(row, 6)
-        if img_item:
-            self._load_image_to_label(self.lbl_exit_img, img_item.text())
+    def _show_selected_image(self, model, label, current):
+        path = model.image_path(current.row())
+        if path:
+            self._load_image_to_label(label, path)
+
+    def on_active_selected(self, current, _previous=None):
+        self._show_selected_image(self.model_active, self.lbl_active_img, current)
+
+    def on_entry_selected(self, current, _previous=None):
+        self._show_selected_image(self.model_entries, self.lbl_entry_img, current)
+
+    def on_exit_selected(self, current, _previous=None):
+        self._show_selected_image(self.model_exits, self.lbl_exit_img, current)
 
     # ================= دکمه‌های ریست / آرشیو =================
     def reset_day_archive(self):
@@ -824,23 +768,21 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Reset Day", "اولین اجرای سیستم؛ تاریخ ریست ثبت شد.")
             return
 
+        # همه روزهای از last_reset تا امروز (و هر روز جامانده) آرشیو و بررسی می‌شوند؛
+        # اگر ردیفی در آرشیو نباشد دیتابیس ریست نمی‌شود تا داده‌ای از دست نرود
+        try:
+            upto = archive_before_reset()
+        except Exception as e:
+            QMessageBox.critical(self, "Reset Day", f"خطا در ساخت آرشیو؛ دیتابیس ریست نشد:\n{e}")
+            return
+
+        reset_database(upto=upto)
+        set_last_reset(today_str)
         if last_reset != today_str:
-            archive_day(last_reset)
-            reset_database()
-            set_last_reset(today_str)
-            QMessageBox.information(
-                self,
-                "Reset Day",
-                f"آرشیو روز {last_reset} ساخته شد و دیتابیس برای روز جدید ریست شد."
-            )
+            message = f"روزهای {last_reset} تا {today_str} آرشیو شدند و دیتابیس برای روز جدید ریست شد."
         else:
-            archive_day(today_str)
-            reset_database()
-            QMessageBox.information(
-                self,
-                "Reset Day",
-                f"روز {today_str} آرشیو و دیتابیس خالی شد."
-            )
+            message = f"روز {today_str} آرشیو و دیتابیس خالی شد."
+        QMessageBox.information(self, "Reset Day", message)
 
         self.refresh_all()
         self.refresh_archive_days()
@@ -0,0 +1,108 @@
+"""
+کارگر پس‌زمینه برای خواندن داده‌های رابط گرافیکی
+
+All database reads for the live tabs happen on a worker QThread, so a
+camera write holding the SQLite lock can no longer freeze the window.
+The worker prepares row tuples (region already computed, see
+gui_data.py) and hands them to the UI thread through signals; the UI
+only applies them to the models.
+
+Refresh requests are coalesced: while a fetch is running, any number of
+schedule() calls collapse into a single follow-up fetch.
+
+ExportTask runs one file export (see exporters.py) on its own QThread.
+"""
+
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot, QMetaObject, Qt
+
+from gui_data import RefreshTimings, fetch_update
+
+
+class DataWorker(QObject):
+    """
+    روی یک QThread جدا اجرا می‌شود (moveToThread)
+
+    snapshot_ready(dict): full state, see load_snapshot()
+    changes_ready(dict): delta, see prepare_changes() (+ 'version')
+    failed(str): the fetch failed (e.g. database locked); retried on the next tick
+    """
+
+    snapshot_ready = pyqtSignal(object)
+    changes_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.timings = RefreshTimings()
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._pending = False
+        self._full = False
+        self._version = None
+
+    def schedule(self, full=False):
+        """
+        درخواست رفرش؛ از ترد UI صدا زده می‌شود و هیچ‌وقت بلاک نمی‌کند.
+        """
+        with self._lock:
+            self._full = self._full or full
+            if self._pending:
+                self.timings.coalesced += 1
+            self._pending = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+        QMetaObject.invokeMethod(self, "_run", Qt.QueuedConnection)
+
+    @pyqtSlot()
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._scheduled = False
+                    return
+                full = self._full
+                self._pending = False
+                self._full = False
+
+            start = time.perf_counter()
+            try:
+                kind, payload, self._version = fetch_update(self._version, full)
+            except Exception as e:
+                self.timings.failures += 1
+                self.failed.emit(str(e))
+                continue
+            self.timings.record_fetch((time.perf_counter() - start) * 1000)
+
+            if kind == 'snapshot':
+                self.snapshot_ready.emit(payload)
+            elif kind == 'changes':
+                self.changes_ready.emit(payload)
+
+
+class ExportTask(QThread):
+    """
+    یک خروجی فایل روی ترد جدا؛ UI فقط نتیجه را از سیگنال‌ها می‌گیرد.
+
+    job: callable writing the file and returning its path
+    done(str): path of the finished file
+    failed(str): error message
+    """
+
+    done = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, job, parent=None):
+        super().__init__(parent)
+        self._job = job
+
+    def run(self):
+        try:
+            path = self._job()
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.done.emit(path)
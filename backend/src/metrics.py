@@ -0,0 +1,703 @@
+"""
+متریک‌های پروسه (سبک Prometheus) برای API و دوربین‌ها
+
+A small dependency-free metrics registry: counters, gauges and histograms
+with labels, rendered in the Prometheus text exposition format (0.0.4).
+The Django API serves it at /api/metrics/; the camera scripts, which are
+separate processes, serve the same registry on their own port with
+start_http_server().
+
+All backend metrics are declared at the bottom of this module, so one
+file lists everything a dashboard can rely on. Every process exports the
+full list; a metric a process never touches simply has no samples.
+
+Thread-safe. Updates are a dict lookup plus a few additions under a lock.
+
+Histograms declared with a `phase` also report each timed call to the
+trace in `current_trace`, if one is set. This is how the profiling
+middleware (api.profiling) gets a per-phase breakdown of a request
+without any extra calls in database.py or yolo_service.
+
+Pre-fork workers (parking_api.server) share one scrape target, so a
+worker alone would report only its own counters and a scrape landing on
+another worker would see them go backwards. In that mode every worker
+calls enable_multiprocess(directory) right after fork: its registry is
+reset (nothing inherited from the master) and its values are written to
+<directory>/<pid>.json every SNAPSHOT_INTERVAL seconds. render() then
+writes the current process' snapshot and sums all snapshots, like
+prometheus_client's multiprocess mode. The master calls
+mark_process_dead(pid) for every worker it reaps: the worker's counters
+and histograms are folded into dead.json, so totals never drop when a
+worker retires. Gauges are either summed over live workers
+(multiprocess='sum') or taken from the process serving the scrape
+(multiprocess='self', the default).
+"""
+
+import contextvars
+import copy
+import functools
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# ردیاب درخواست جاری (api.profiling.RequestProfile)؛ None یعنی بدون ردیابی
+current_trace = contextvars.ContextVar('parking_current_trace', default=None)
+
+# ثانیه؛ از چند میلی‌ثانیه (کوئری) تا چند ثانیه (استنتاج روی CPU)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# فاصله (ثانیه) نوشتن snapshot هر worker در حالت چندپروسه‌ای
+SNAPSHOT_INTERVAL = 1.0
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """پایه مشترک: نام، توضیح، برچسب‌ها و نمونه‌ها به ازای هر ترکیب برچسب"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels()")
+        return self.labels()
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+
+    def reset(self):
+        """صفر کردن مقدارها؛ برچسب‌ها و set_function حفظ می‌شوند"""
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+    def snapshot(self):
+        """[[label values, state]] برای نوشتن در فایل snapshot"""
+        with self._lock:
+            children = list(self._children.items())
+        out = []
+        for key, child in children:
+            state = child.state()
+            if state is not None:
+                out.append([list(key), state])
+        return out
+
+    def _with_states(self, states):
+        """کپی این متریک با مقدارهای states ({label values: state})"""
+        view = copy.copy(self)
+        view._lock = threading.Lock()
+        view._children = {}
+        for key, state in states.items():
+            child = view._new_child()
+            child.restore(state)
+            view._children[key] = child
+        return view
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)]"""
+        with self._lock:
+            children = list(self._children.items())
+        out = []
+        for key, child in children:
+            out.extend((suffix, key, extra, value) for suffix, extra, value in child.samples())
+        return out
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, key, extra, value in self.samples():
+            labels = _format_labels(self.labelnames, key, extra)
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("counters only go up")
+        with self._lock:
+            self.value += amount
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+    def state(self):
+        return self.value
+
+    def restore(self, state):
+        self.value = state
+
+    def samples(self):
+        return [('', (), self.value)]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+        self._function = None
+
+    def set(self, value):
+        with self._lock:
+            self.value = float(value)
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """مقدار در لحظه خواندن از function() گرفته می‌شود"""
+        self._function = function
+
+    def reset(self):
+        with self._lock:
+            self.value = 0.0
+
+    def state(self):
+        samples = self.samples()
+        return samples[0][2] if samples else None
+
+    def restore(self, state):
+        self.value = state
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                return [('', (), float(self._function()))]
+            except Exception:
+                return []
+        return [('', (), self.value)]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess='self'):
+        """multiprocess: 'sum' (جمع workerهای زنده) یا 'self' (پروسه پاسخ‌دهنده)"""
+        if multiprocess not in ('sum', 'self'):
+            raise ValueError("multiprocess must be 'sum' or 'self'")
+        super().__init__(name, documentation, labelnames)
+        self.multiprocess = multiprocess
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _Timer:
+    """context manager زمان‌گیری برای یک هیستوگرام"""
+
+    def __init__(self, child):
+        self._child = child
+
+    def __enter__(self):
+        self._phase = _begin_phase(self._child)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+        if self._phase is not None:
+            self._phase[0].end_phase(self._phase[1])
+        return False
+
+
+def _begin_phase(child):
+    """(trace, handle) اگر این هیستوگرام فاز دارد و درخواست ردیابی می‌شود"""
+    if child.phase is None:
+        return None
+    trace = current_trace.get()
+    if trace is None:
+        return None
+    return trace, trace.begin_phase(child.phase)
+
+
+class _HistogramChild:
+
+    def __init__(self, buckets, phase=None):
+        self._lock = threading.Lock()
+        self.phase = phase
+        self._upper = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value):
+        i = bisect_left(self._upper, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def time(self):
+        return _Timer(self)
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self._sum = 0.0
+
+    def state(self):
+        with self._lock:
+            return [list(self._counts), self._sum]
+
+    def restore(self, state):
+        self._counts, self._sum = list(state[0]), state[1]
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        out = []
+        cumulative = 0
+        for upper, n in zip(self._upper + (math.inf,), counts):
+            cumulative += n
+            out.append(('_bucket', (('le', _format_value(float(upper))),), cumulative))
+        out.append(('_count', (), cumulative))
+        out.append(('_sum', (), total))
+        return out
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, phase=None):
+        """phase: نام فاز در ردیابی، با برچسب‌ها قالب‌بندی می‌شود (مثل 'db.{function}')"""
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        self.phase = phase
+
+    def labels(self, *values, **kwargs):
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = super().labels(*values)
+            if self.phase is not None:
+                child.phase = self.phase.format(**dict(zip(self.labelnames, key)))
+        return child
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    """مجموعه متریک‌ها به ترتیب تعریف؛ تعریف دوباره همان نام، همان شیء را برمی‌گرداند"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess='self'):
+        return self._get_or_create(Gauge, name, documentation, labelnames,
+                                   multiprocess=multiprocess)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, phase=None):
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets, phase=phase,
+        )
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+    def reset(self):
+        """صفر کردن همه متریک‌ها (در worker بعد از fork)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render_merged(self, own, others, dead):
+        """
+        خروجی جمع چند پروسه.
+        own: snapshot this process just wrote, others: snapshots of the
+        other live workers, dead: folded totals of exited workers.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        parts = []
+        for metric in metrics:
+            sources = [own]
+            if metric.kind != 'gauge' or metric.multiprocess == 'sum':
+                sources.extend(others)
+            if metric.kind != 'gauge':
+                sources.append(dead)
+            states = {}
+            for snapshot in sources:
+                _merge_into(states, snapshot.get(metric.name, ()))
+            parts.append(metric._with_states(states).render())
+        return '\n'.join(parts) + '\n'
+
+
+def _merge_into(states, samples):
+    """جمع نمونه‌های یک snapshot با states ({label values: state})"""
+    for key, state in samples:
+        key = tuple(key)
+        current = states.get(key)
+        if current is None:
+            states[key] = copy.deepcopy(state)
+        elif isinstance(state, list):
+            current[0] = [a + b for a, b in zip(current[0], state[0])]
+            current[1] += state[1]
+        else:
+            states[key] = current + state
+
+
+REGISTRY = Registry()
+
+# پوشه snapshotها در حالت چندپروسه‌ای (None = تک‌پروسه)
+_multiprocess_dir = None
+
+_DEAD_FILE = 'dead.json'
+_LOCK_FILE = 'lock'
+
+
+def _dir_lock(directory, exclusive):
+    """قفل فایل مشترک تا ادغام worker مرده و خواندن snapshotها هم‌زمان نشوند"""
+    import fcntl  # حالت چندپروسه‌ای فقط با fork (POSIX) استفاده می‌شود
+
+    class _Lock:
+        def __enter__(self):
+            self._file = open(os.path.join(directory, _LOCK_FILE), 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            return self
+
+        def __exit__(self, *exc):
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            return False
+
+    return _Lock()
+
+
+def _read_json(path, default):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def write_snapshot():
+    """نوشتن مقدارهای این پروسه در <dir>/<pid>.json؛ برمی‌گرداند همان snapshot"""
+    snapshot = REGISTRY.snapshot()
+    if _multiprocess_dir is not None:
+        _write_json(os.path.join(_multiprocess_dir, f"{os.getpid()}.json"), snapshot)
+    return snapshot
+
+
+def _snapshot_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+def enable_multiprocess(directory, interval=SNAPSHOT_INTERVAL):
+    """
+    حالت چندپروسه‌ای در یک worker (درست بعد از fork صدا زده شود).
+    Clears whatever the registry inherited from the master and starts
+    writing this process' snapshot to directory.
+    """
+    global _multiprocess_dir
+    REGISTRY.reset()
+    _multiprocess_dir = directory
+    write_snapshot()
+    thread = threading.Thread(target=_snapshot_loop, args=(interval,),
+                              name='metrics-snapshot', daemon=True)
+    thread.start()
+
+
+def mark_process_dead(pid, directory):
+    """
+    ادغام شمارنده‌ها و هیستوگرام‌های یک worker خارج‌شده در dead.json.
+    Called by the master after reaping the worker; its gauges are dropped.
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    if not os.path.exists(path):
+        return
+    with _dir_lock(directory, exclusive=True):
+        snapshot = _read_json(path, {})
+        dead_path = os.path.join(directory, _DEAD_FILE)
+        dead = _read_json(dead_path, {})
+        for name, samples in snapshot.items():
+            metric = REGISTRY.get(name)
+            if metric is None or metric.kind == 'gauge':
+                continue
+            states = {tuple(key): state for key, state in dead.get(name, ())}
+            _merge_into(states, samples)
+            dead[name] = [[list(key), state] for key, state in states.items()]
+        _write_json(dead_path, dead)
+        os.remove(path)
+
+
+def render():
+    if _multiprocess_dir is None:
+        return REGISTRY.render()
+    # اول snapshot خود را می‌نویسد تا هر مقدار از فایل‌ها (یکنواخت) خوانده شود
+    own = write_snapshot()
+    own_file = f"{os.getpid()}.json"
+    others = []
+    with _dir_lock(_multiprocess_dir, exclusive=False):
+        dead = _read_json(os.path.join(_multiprocess_dir, _DEAD_FILE), {})
+        for name in os.listdir(_multiprocess_dir):
+            if name.endswith('.json') and name not in (own_file, _DEAD_FILE):
+                others.append(_read_json(os.path.join(_multiprocess_dir, name), {}))
+    return REGISTRY.render_merged(own, others, dead)
+
+
+# هیستوگرام‌هایی که یک فراخوانی timed روی آن‌ها در جریان است
+_active_timed = contextvars.ContextVar('parking_active_timed', default=frozenset())
+
+
+def timed(histogram, **labels):
+    """
+    decorator: زمان هر فراخوانی در histogram (با برچسب‌های ثابت)
+
+    A call made while another timed call on the same histogram is running
+    (e.g. charge_wallet -> get_wallet_by_user_id) is part of the outer
+    call's time and is neither recorded again nor traced as a phase.
+    """
+    child = histogram.labels(**labels) if histogram.labelnames else histogram.labels()
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            active = _active_timed.get()
+            if histogram in active:
+                return fn(*args, **kwargs)
+            token = _active_timed.set(active | {histogram})
+            phase = _begin_phase(child)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - start)
+                if phase is not None:
+                    phase[0].end_phase(phase[1])
+                _active_timed.reset(token)
+        return wrapper
+    return decorate
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, addr='0.0.0.0'):
+    """سرور /metrics در یک نخ پس‌زمینه (برای پروسه‌های دوربین)"""
+    server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True)
+    thread.start()
+    return server
+
+
+##########################################
+# متریک‌های سیستم پارکینگ
+##########################################
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'parking_http_request_duration_seconds',
+    'API request latency per view',
+    ('view', 'method', 'status'),
+)
+
+INFERENCE_SECONDS = REGISTRY.histogram(
+    'parking_inference_duration_seconds',
+    'Plate recognition latency per stage (decode, plate_detect, char_recognize; total per API request)',
+    ('source', 'stage'),
+    phase='inference.{stage}',
+)
+
+DB_CALL_SECONDS = REGISTRY.histogram(
+    'parking_db_call_duration_seconds',
+    'Time spent in each timed database.py function (nested timed calls count toward the outer one)',
+    ('function',),
+    phase='db.{function}',
+)
+
+DB_LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    'parking_db_lock_wait_seconds',
+    'Time a statement waited for a SQLite lock (only statements that had to wait)',
+    ('function',),
+)
+
+CAMERA_TRACKS = REGISTRY.gauge(
+    'parking_camera_tracks',
+    'Plate tracks currently followed by a gate camera',
+    ('camera',),
+)
+
+CAMERA_TRACKS_CREATED = REGISTRY.counter(
+    'parking_camera_tracks_created_total',
+    'Plate tracks started by a gate camera',
+    ('camera',),
+)
+
+CAMERA_FRAME_SECONDS = REGISTRY.histogram(
+    'parking_camera_frame_duration_seconds',
+    'Processing time of one camera frame (detection, OCR and voting)',
+    ('camera',),
+)
+
+VOTE_CONFIRM_SECONDS = REGISTRY.histogram(
+    'parking_vote_confirm_seconds',
+    'Time from the first sighting of a track to its confirmed plate',
+    ('camera',),
+    buckets=(0.25, 0.5, 1, 1.5, 2, 3, 5, 8, 13, 20, 30),
+)
+
+PLATES_CONFIRMED = REGISTRY.counter(
+    'parking_plates_confirmed_total',
+    'Plates confirmed by voting, by outcome',
+    ('camera', 'result'),
+)
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    'parking_queue_depth',
+    'Jobs waiting or running in an in-process queue',
+    ('queue',),
+    multiprocess='sum',
+)
+
+ACTIVE_CARS = REGISTRY.gauge(
+    'parking_active_cars',
+    'Cars currently inside the parking',
+)
+
+CAPACITY = REGISTRY.gauge(
+    'parking_capacity',
+    'Configured parking capacity',
+)
@@ -0,0 +1,209 @@
+"""
+ایندکس فازی پلاک‌های داخل پارکینگ (برای خروج با خطای OCR)
+
+The exit camera often misreads one character (6/8, ب/پ, ...), and the
+exact `active_cars WHERE plate=?` lookup then rejects the car. PlateIndex
+keeps the plates currently inside in memory and finds the closest one
+under a confusion-aware edit distance:
+
+    * common OCR confusions cost 1, any other edit costs 2 (half-edits)
+    * keys are compared in one canonical spelling (plate_parser.plate_key
+      without separators, ASCII digits, «الف» as one character)
+
+Lookups use a deletion neighbourhood (SymSpell-style): every key is
+stored under itself and each of its one-character deletions, so all keys
+within one edit of the query are found with a handful of dict probes,
+independent of how many cars are inside. Confusion variants of the query
+are probed as exact keys; the candidates are then checked with the real
+distance. add() / remove() update the index incrementally.
+
+This module is pure data; database.py keeps the process-wide index in
+sync with the change log (see database.find_active_plate).
+"""
+
+from itertools import combinations, product
+
+from plate_parser import ASCII_DIGITS, clean_ocr_text, plate_key
+
+# جفت‌های پرتکرار اشتباه OCR (رقم‌ها و حروف هم‌شکل)
+CONFUSABLE_PAIRS = (
+    ('6', '8'), ('0', '8'), ('3', '8'), ('8', '9'), ('5', '6'), ('1', '7'),
+    ('ب', 'پ'), ('پ', 'ت'), ('ت', 'ث'), ('ج', 'چ'), ('د', 'ذ'), ('ر', 'ز'),
+    ('ز', 'ژ'), ('س', 'ش'), ('ص', 'ض'), ('ط', 'ظ'), ('ک', 'گ'),
+)
+
+# هزینه‌ها بر حسب «نیم ویرایش» تا فاصله عدد صحیح بماند
+CONFUSION_COST = 1
+EDIT_COST = 2
+
+# پیش‌فرض: یک حرف اشتباه دلخواه یا دو اشتباه رایج
+DEFAULT_MAX_DISTANCE = 2
+
+_CONFUSABLE = {}
+for _a, _b in CONFUSABLE_PAIRS:
+    _CONFUSABLE[_a] = _CONFUSABLE.get(_a, ()) + (_b,)
+    _CONFUSABLE[_b] = _CONFUSABLE.get(_b, ()) + (_a,)
+del _a, _b
+
+_ALEF = 'الف'
+
+
+def match_key(plate):
+    """شکل یکسان پلاک برای مقایسه: «12ب34567»"""
+    key = plate_key(plate) or clean_ocr_text(plate)
+    return key.replace('-', '').replace(_ALEF, 'ا').translate(ASCII_DIGITS)
+
+
+def _sub_cost(a, b):
+    if a == b:
+        return 0
+    if b in _CONFUSABLE.get(a, ()):
+        return CONFUSION_COST
+    return EDIT_COST
+
+
+def plate_distance(a, b, limit=None):
+    """
+    فاصله ویرایشی وزن‌دار بین دو کلید (match_key).
+    With limit, stops early and returns limit + 1 once the distance is
+    known to exceed it.
+    """
+    if a == b:
+        return 0
+    if limit is not None and abs(len(a) - len(b)) * EDIT_COST > limit:
+        return limit + 1
+
+    previous = list(range(0, (len(b) + 1) * EDIT_COST, EDIT_COST))
+    for i, ca in enumerate(a, start=1):
+        current = [i * EDIT_COST]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(
+                previous[j] + EDIT_COST,
+                current[j - 1] + EDIT_COST,
+                previous[j - 1] + _sub_cost(ca, cb),
+            ))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _deletions(key):
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+def _confusion_variants(key, changes):
+    """key با دقیقاً changes جایگزینی رایج، هر کدام در جایگاهی متفاوت"""
+    spots = [(i, _CONFUSABLE[ch]) for i, ch in enumerate(key) if ch in _CONFUSABLE]
+    chars = list(key)
+    for combo in combinations(spots, changes):
+        for replacement in product(*(partners for _, partners in combo)):
+            for (i, _), ch in zip(combo, replacement):
+                chars[i] = ch
+            yield ''.join(chars)
+        for i, _ in combo:
+            chars[i] = key[i]
+
+
+class PlateIndex:
+    """
+    پلاک‌های فعال: entry_id -> plate، قابل جستجوی فازی.
+    Several active entries may share one key (the same plate written with
+    different separators); they are kept in insertion order.
+    """
+
+    def __init__(self):
+        self._keys = {}         # entry_id -> key
+        self._plates = {}       # key -> {entry_id: plate}
+        self._neighbours = {}   # key or one-deletion of a key -> {keys}
+        self.version = 0
+        self.source = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, entry_id):
+        return entry_id in self._keys
+
+    def clear(self):
+        self._keys.clear()
+        self._plates.clear()
+        self._neighbours.clear()
+
+    def add(self, entry_id, plate):
+        if entry_id in self._keys:
+            self.remove(entry_id)
+        key = match_key(plate)
+        self._keys[entry_id] = key
+        plates = self._plates.get(key)
+        if plates is None:
+            plates = self._plates[key] = {}
+            for variant in _deletions(key) | {key}:
+                self._neighbours.setdefault(variant, set()).add(key)
+        plates[entry_id] = plate
+
+    def remove(self, entry_id):
+        key = self._keys.pop(entry_id, None)
+        if key is None:
+            return
+        plates = self._plates[key]
+        del plates[entry_id]
+        if plates:
+            return
+        del self._plates[key]
+        for variant in _deletions(key) | {key}:
+            keys = self._neighbours[variant]
+            keys.discard(key)
+            if not keys:
+                del self._neighbours[variant]
+
+    def _candidates(self, key, max_distance):
+        """
+        کلیدهای ذخیره‌شده که ممکن است تا max_distance فاصله داشته باشند.
+        Confusion-only variants are probed as exact keys; variants that
+        leave room for one more arbitrary edit are also probed through
+        the deletion neighbourhood.
+        """
+        plates = self._plates
+        neighbours = self._neighbours
+        found = set()
+        for changes in range(max_distance // CONFUSION_COST + 1):
+            with_edit = changes * CONFUSION_COST + EDIT_COST <= max_distance
+            for variant in _confusion_variants(key, changes):
+                if variant in plates:
+                    found.add(variant)
+                if with_edit:
+                    for probe in _deletions(variant) | {variant}:
+                        keys = neighbours.get(probe)
+                        if keys:
+                            found |= keys
+        return found
+
+    def best_match(self, plate, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        نزدیک‌ترین پلاک فعال: (plate, distance) یا None.
+        Returns None when nothing is within max_distance, or when two
+        different plates are equally close (never guess between cars).
+        Finds every plate that is at most one non-confusion edit away.
+        """
+        key = match_key(plate)
+        if not key:
+            return None
+
+        plates = self._plates.get(key)
+        if plates:
+            return next(iter(plates.values())), 0
+
+        best = None
+        best_distance = max_distance + 1
+        tied = False
+        for candidate in self._candidates(key, max_distance):
+            distance = plate_distance(key, candidate, limit=max_distance)
+            if distance < best_distance:
+                best, best_distance, tied = candidate, distance, False
+            elif distance == best_distance:
+                tied = True
+
+        if best is None or tied:
+            return None
+        return next(iter(self._plates[best].values())), best_distance
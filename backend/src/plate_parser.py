@@ -0,0 +1,187 @@
+"""
+تجزیه و یکسان‌سازی متن پلاک (مشترک بین همه مسیرهای OCR، API و دیتابیس)
+
+One table of plate letters, patterns compiled once at import, and a
+single tokenizer that splits plate text into (series, letter, serial,
+region):
+
+    "12 ب 345 - ایران 67"  ->  ParsedPlate('12', 'ب', '345', '67')
+    plate_key(...)          ->  "12ب345-67"
+
+parse_plate / get_plate_region are memoized; OCR and the GUI see the
+same plates over and over. The acceptance rules are exactly those of the
+old database.validate_plate_format, and the gate-script helpers
+(normalize / clean / format_plate) and yolo_service.clean_plate_text
+keep their previous output (tests/test_plate_parser.py pins all of it).
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+# حروف پلاک؛ «الف» اول تا قبل از حرف‌های تکی خودش پیدا شود
+PERSIAN_LETTERS = (
+    'الف', 'ب', 'پ', 'ت', 'ث', 'ج', 'د', 'ز', 'س', 'ش',
+    'ص', 'ط', 'ع', 'ف', 'ق', 'ک', 'گ', 'ل', 'م', 'ن',
+    'و', 'ه', 'ی',
+)
+
+FREE_ZONE_REGIONS = {
+    "22": "KISH",
+    "33": "ARVAND",
+    "44": "MAKU",
+    "55": "ARAS",
+    "77": "CHABAHAR",
+}
+
+# (digits before letter, digits after letter) shapes accepted as a plate
+VALID_SHAPES = frozenset({
+    # کامل: ۲ + حرف + ۳ + ۲
+    (2, 5), (5, 2), (0, 7), (7, 0),
+    # کوتاه: ۲ + حرف + ۳
+    (2, 3), (3, 2), (0, 5), (5, 0),
+    # ۶ رقمی
+    (2, 4), (4, 2), (3, 3), (0, 6), (6, 0),
+})
+
+_SEPARATORS = str.maketrans('', '', ' -|')
+_COUNTRY_WORD = 'ایران'
+_LETTER_RE = re.compile('|'.join(PERSIAN_LETTERS))
+_PERSIAN_CHAR_RE = re.compile(r'[آ-ی]')
+_NON_DIGIT_RE = re.compile(r'\D')
+_WHITESPACE_RE = re.compile(r'\s+')
+_OCR_JUNK_RE = re.compile(r'[^0-9آ-ی]')
+_NATIONAL_RE = re.compile(r'^(\d{2})([آ-ی])(\d{3})(\d{2})$')
+_FREE_ZONE_RE = re.compile(r'^(\d{5})(\d{2})$')
+
+# ارقام فارسی و عربی -> لاتین (برای کلید ذخیره‌سازی)
+ASCII_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩', '01234567890123456789')
+
+ParsedPlate = namedtuple('ParsedPlate', 'series letter serial region')
+
+
+def _normalize(text):
+    """حذف فاصله، خط تیره، | و کلمه «ایران»"""
+    return text.strip().translate(_SEPARATORS).replace(_COUNTRY_WORD, '')
+
+
+def _ascii_digits(digits):
+    digits = digits.translate(ASCII_DIGITS)
+    if digits.isascii():
+        return digits
+    return ''.join(str(unicodedata.digit(ch)) for ch in digits)
+
+
+@lru_cache(maxsize=4096)
+def _parse(text):
+    normalized = _normalize(text)
+    if not normalized:
+        return None
+
+    match = _LETTER_RE.search(normalized) or _PERSIAN_CHAR_RE.search(normalized)
+    if match is None:
+        return None
+
+    before = normalized[:match.start()]
+    after = normalized[match.end():]
+    if (before and not before.isdigit()) or (after and not after.isdigit()):
+        return None
+    if (len(before), len(after)) not in VALID_SHAPES:
+        return None
+
+    digits = before + after
+    return ParsedPlate(digits[:2], match.group(), digits[2:5], digits[5:])
+
+
+def parse_plate(text):
+    """
+    متن پلاک -> ParsedPlate(series, letter, serial, region) یا None.
+    region is '' for the short (no region) form.
+    """
+    if not text or not isinstance(text, str):
+        return None
+    return _parse(text)
+
+
+def is_valid_plate(text):
+    return parse_plate(text) is not None
+
+
+def plate_key(text):
+    """
+    کلید یکسان برای ذخیره و مقایسه: «12ب345-67» (ارقام لاتین).
+    Every spelling of the same plate (separators, 'ایران', Persian
+    digits) gets the same key; returns None for text that is not a plate.
+    """
+    parsed = parse_plate(text)
+    if parsed is None:
+        return None
+    series, letter, serial, region = parsed
+    head = _ascii_digits(series) + letter + _ascii_digits(serial)
+    return f"{head}-{_ascii_digits(region)}" if region else head
+
+
+# نتیجه برای هر پلاک ثابت است؛ جدول‌های GUI برای هر ردیف صدا می‌زنند
+@lru_cache(maxsize=4096)
+def get_plate_region(plate_str: str):
+    """
+    منطقه پلاک فقط وقتی تشخیص داده می‌شود که:
+      - پلاک از نوع مناطق آزاد باشد (فقط عدد)
+      - ساختار ۵ رقم + ۲ رقم باشد
+    پلاک ملی که وسطش حرف دارد، هرگز منطقه آزاد نیست.
+    """
+    digits = _NON_DIGIT_RE.sub('', plate_str)
+    if len(digits) != 7 or _PERSIAN_CHAR_RE.search(plate_str):
+        return None
+    return FREE_ZONE_REGIONS.get(digits[5:])
+
+
+# ----------------- خروجی OCR -----------------
+
+
+def normalize_char(ch):
+    """یکسان‌سازی نام کلاس کاراکتر مدل YOLO"""
+    if ch == "ه\u200d":
+        ch = "ه"
+    if ch.startswith("ژ"):
+        ch = "ژ"
+    return ch
+
+
+def clean_ocr_text(txt):
+    """فقط رقم لاتین و حروف فارسی"""
+    return _OCR_JUNK_RE.sub("", txt)
+
+
+def format_plate(txt):
+    """
+    متن OCR -> «12 ب 345 67» (ملی) یا «12345 22» (منطقه آزاد)؛
+    anything else is returned cleaned but unformatted.
+    """
+    s = clean_ocr_text(txt)
+
+    m = _NATIONAL_RE.match(s)
+    if m:
+        return " ".join(m.groups())
+
+    m = _FREE_ZONE_RE.match(s)
+    if m:
+        return " ".join(m.groups())
+
+    return s
+
+
+def clean_plate_text(text):
+    """Clean and format plate text"""
+    if not text:
+        return None
+
+    # Remove extra spaces
+    text = _WHITESPACE_RE.sub('', text)
+
+    # Basic validation - should have numbers and possibly Persian letters
+    if len(text) < 5:
+        return None
+
+    return text
@@ -0,0 +1,87 @@
+"""
+پنجره حذف تکراری ورودها (پلاک -> آخرین زمان دیده‌شدن) در حافظه
+
+was_recently_recorded() used to open a connection, query the latest entry
+of the plate and parse its timestamp string, for every candidate the gate
+camera or the API produced. RecentPlates answers the same question from a
+dict of epoch seconds.
+
+Expiry uses a timing wheel: time is cut into ticks of `tick` seconds and
+each key is also filed in the slot of the tick it was last recorded in.
+Moving to a new tick empties the slot that now becomes reusable,
+dropping keys whose last record is older than the horizon. Expiry costs
+O(keys that expire) and never scans the whole map.
+
+Thread-safe; database.py owns the process-wide instance and keeps it fed
+from register_entry and the change log.
+"""
+
+import threading
+import time
+
+DEFAULT_HORIZON = 15 * 60  # seconds
+DEFAULT_TICK = 10
+
+
+class RecentPlates:
+    """plate key -> آخرین زمان ورود (epoch)، با انقضای چرخ زمانی"""
+
+    def __init__(self, horizon=DEFAULT_HORIZON, tick=DEFAULT_TICK):
+        self.horizon = horizon
+        self.tick = tick
+        self._slots = -(-horizon // tick) + 1
+        self._wheel = [set() for _ in range(self._slots)]
+        self._last_seen = {}
+        self._cursor = None
+        self._lock = threading.Lock()
+        self.version = 0
+        self.source = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._last_seen)
+
+    def clear(self):
+        with self._lock:
+            self._last_seen.clear()
+            for slot in self._wheel:
+                slot.clear()
+
+    def _advance(self, now):
+        current = int(now // self.tick)
+        if self._cursor is None:
+            self._cursor = current
+            return
+        if current <= self._cursor:
+            return
+
+        first = max(self._cursor + 1, current - self._slots + 1)
+        for t in range(first, current + 1):
+            slot = self._wheel[t % self._slots]
+            # هر کلیدی که آخرین بار قبل از این مرز دیده شده، منقضی است
+            oldest_kept = (t - self._slots + 1) * self.tick
+            for key in slot:
+                if self._last_seen.get(key, oldest_kept) < oldest_kept:
+                    del self._last_seen[key]
+            slot.clear()
+        self._cursor = current
+
+    def record(self, key, epoch, now=None):
+        now = time.time() if now is None else now
+        if epoch <= now - self.horizon:
+            return
+        # ساعت پروسه دیگر کمی جلوتر است؛ زمان آینده = همین حالا
+        epoch = min(epoch, now)
+        with self._lock:
+            self._advance(now)
+            if epoch > self._last_seen.get(key, epoch - 1):
+                self._last_seen[key] = epoch
+                self._wheel[int(epoch // self.tick) % self._slots].add(key)
+
+    def seen_within(self, key, seconds, now=None):
+        """آیا key در seconds ثانیه اخیر ثبت شده؟ (seconds <= horizon)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._advance(now)
+            last = self._last_seen.get(key)
+        return last is not None and now - last < seconds
@@ -1,86 +1,294 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib import colors
+"""
+گزارش PDF روزانه (کامل، نه فقط چند ردیف نمونه)
 
-def generate_daily_report_pdf(date_str, summary: dict, entries_df, exits_df, out_path: str):
+generate_daily_report_pdf() consumes entry / exit rows from any iterator
+(archive parts or keyset chunks straight from SQLite), draws each row as
+it arrives and computes the day summary in the same pass. Rows are never
+collected into lists or DataFrames; memory grows only with the PDF itself
+(reportlab keeps finished pages until save). The summary box on page 1
+and the "of N" page count are PDF forms filled in after the last row.
+
+generate_reports() builds many days' reports in parallel worker processes.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import database
+from archive_utils import ARCHIVE_ROOT, iter_archive_rows, iter_day_rows
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.units import mm
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    A4 = canvas = mm = None
+    REPORTLAB_AVAILABLE = False
+
+REPORT_NAME = "summary.pdf"
+
+ROW_HEIGHT = 4.5  # mm
+FONT_SIZE = 8
+ROW_FONT = "Courier"  # تک‌فاصله: هر ردیف یک خط متن با ستون‌های هم‌تراز
+
+# ستون‌های جدول هر بخش: (عنوان، کلید ردیف، عرض بر حسب کاراکتر)
+ENTRY_COLUMNS = [
+    ("id", "id", 10),
+    ("plate", "plate", 16),
+    ("time in", "timestamp_in", 21),
+]
+EXIT_COLUMNS = [
+    ("id", "id", 10),
+    ("plate", "plate", 16),
+    ("time out", "timestamp_out", 21),
+    ("duration (min)", "duration_minutes", 16),
+    ("cost (Toman)", "cost", 14),
+]
+
+
+def _format_row(columns, values):
+    return "".join(
+        ("" if value is None else str(value)).ljust(width)
+        for (_, _, width), value in zip(columns, values)
+    )
+
+
+@dataclass
+class ReportSummary:
+    """خلاصه روز که هم‌زمان با نوشتن ردیف‌ها جمع می‌شود"""
+    entries: int = 0
+    exits: int = 0
+    revenue: int = 0
+    duration_sum: int = 0
+    max_duration: int = 0
+
+    def add_entry(self, row):
+        self.entries += 1
+
+    def add_exit(self, row):
+        duration = row.get("duration_minutes") or 0
+        self.exits += 1
+        self.revenue += row.get("cost") or 0
+        self.duration_sum += duration
+        self.max_duration = max(self.max_duration, duration)
+
+    @property
+    def active_end(self):
+        return self.entries - self.exits
+
+    @property
+    def avg_duration(self):
+        return self.duration_sum / self.exits if self.exits else 0.0
+
+    def as_dict(self):
+        return {
+            "total_entries": self.entries,
+            "total_exits": self.exits,
+            "active_end": self.active_end,
+            "total_revenue": self.revenue,
+            "avg_duration": self.avg_duration,
+            "max_duration": self.max_duration,
+        }
+
+
+class _ReportCanvas:
+    """
+    صفحه‌بندی تدریجی: هر ردیف رسم می‌شود و در صورت پر شدن صفحه، صفحه بعد.
+    Rows of a page go into one text object (one text line per row), which
+    is much cheaper than a drawString call per cell.
+    """
+
+    def __init__(self, out_path, title):
+        self.c = canvas.Canvas(out_path, pagesize=A4, pageCompression=1)
+        self.width, self.height = A4
+        self.title = title
+        self.page = 0
+        self.columns = None
+        self.keys = None
+        self.text = None
+        self.summary_top = None
+        self._new_page()
+
+    def _flush_text(self):
+        if self.text is not None:
+            self.c.drawText(self.text)
+            self.text = None
+
+    def _new_page(self):
+        if self.page:
+            self._flush_text()
+            self.c.showPage()
+        self.page += 1
+        self.y = self.height - 20 * mm
+
+        self.c.setFont("Helvetica", FONT_SIZE)
+        self.c.drawString(20 * mm, 10 * mm, self.title)
+        self.c.drawRightString(self.width - 22 * mm, 10 * mm, f"Page {self.page} of")
+        self.c.doForm("page_count")
+
+        if self.columns:
+            self._draw_header()
+
+    def _draw_header(self):
+        self.c.setFont(ROW_FONT + "-Bold", FONT_SIZE)
+        titles = [title for title, _, _ in self.columns]
+        self.c.drawString(20 * mm, self.y, _format_row(self.columns, titles))
+        self.y -= ROW_HEIGHT * mm
+
+    def heading(self, text, size=12):
+        self._flush_text()
+        self.c.setFont("Helvetica-Bold", size)
+        self.c.drawString(20 * mm, self.y, text)
+        self.y -= (size / 2 + 3) * mm
+
+    def reserve_summary(self, height):
+        """جای جعبه خلاصه در صفحه اول؛ محتوا بعد از آخرین ردیف رسم می‌شود"""
+        self.summary_top = self.y
+        self.c.doForm("summary")
+        self.y -= height
+
+    def section(self, title, columns):
+        self.columns = None
+        if self.y < 40 * mm:
+            self._new_page()
+        self.y -= 4 * mm
+        self.heading(title)
+        self.columns = columns
+        self.keys = [key for _, key, _ in columns]
+        self._draw_header()
+
+    def row(self, row):
+        if self.y < 20 * mm:
+            self._new_page()
+        if self.text is None:
+            self.text = self.c.beginText(20 * mm, self.y)
+            self.text.setFont(ROW_FONT, FONT_SIZE, leading=ROW_HEIGHT * mm)
+        self.text.textLine(_format_row(self.columns, [row.get(key) for key in self.keys]))
+        self.y -= ROW_HEIGHT * mm
+
+    def empty(self, text):
+        self.c.setFont("Helvetica", FONT_SIZE)
+        self.c.drawString(20 * mm, self.y, text)
+        self.y -= ROW_HEIGHT * mm
+
+    def finish(self, summary_lines):
+        self._flush_text()
+        self.columns = None
+        self.c.showPage()
+
+        self.c.beginForm("page_count")
+        self.c.setFont("Helvetica", FONT_SIZE)
+        self.c.drawString(self.width - 21 * mm, 10 * mm, str(self.page))
+        self.c.endForm()
+
+        self.c.beginForm("summary")
+        self.c.setFont("Helvetica", 11)
+        y = self.summary_top
+        for line in summary_lines:
+            self.c.drawString(25 * mm, y, line)
+            y -= 6 * mm
+        self.c.endForm()
+
+        self.c.save()
+
+
+def generate_daily_report_pdf(date_str, entries, exits, out_path: str):
     """
-    summary شامل کلیدهای زیر باشد:
-      total_entries, total_exits, active_end, total_revenue, avg_duration
-    entries_df و exits_df هم DataFrame های همان روز هستند.
+    entries و exits: iterable از dict های ردیف (از آرشیو یا SQLite).
+    Rows are written in the order they arrive; returns the summary dict.
     """
-    c = canvas.Canvas(out_path, pagesize=A4)
-    w, h = A4
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError("reportlab is required to generate PDF reports")
 
-    y = h - 25 * mm
+    summary = ReportSummary()
+    pdf = _ReportCanvas(out_path, f"Parking Daily Report - {date_str}")
 
     # عنوان
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(25 * mm, y, f"Parking Daily Report - {date_str}")
-    y -= 15 * mm
-
-    # خلاصه آماری
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(25 * mm, y, "Summary:")
-    y -= 8 * mm
-
-    c.setFont("Helvetica", 11)
-    lines = [
-        f"Total entries: {summary.get('total_entries', 0)}",
-        f"Total exits: {summary.get('total_exits', 0)}",
-        f"Active cars at end of day: {summary.get('active_end', 0)}",
-        f"Total revenue (Toman): {summary.get('total_revenue', 0)}",
-        f"Average duration (min): {summary.get('avg_duration', 0):.1f}",
-    ]
-    for line in lines:
-        c.drawString(30 * mm, y, line)
-        y -= 6 * mm
-
-    y -= 8 * mm
-
-    # چند پلاک نمونه ورود
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(25 * mm, y, "Sample entries:")
-    y -= 8 * mm
-
-    c.setFont("Helvetica", 10)
-    if entries_df is not None and not entries_df.empty:
-        for _, row in entries_df.head(10).iterrows():
-            c.drawString(
-                30 * mm,
-                y,
-                f"{row['plate']}  -  in: {row['timestamp_in']}",
-            )
-            y -= 5 * mm
-            if y < 30 * mm:
-                c.showPage()
-                y = h - 25 * mm
-    else:
-        c.drawString(30 * mm, y, "No entries.")
-        y -= 5 * mm
-
-    y -= 8 * mm
-
-    # چند پلاک نمونه خروج
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(25 * mm, y, "Sample exits:")
-    y -= 8 * mm
-
-    c.setFont("Helvetica", 10)
-    if exits_df is not None and not exits_df.empty:
-        for _, row in exits_df.head(10).iterrows():
-            c.drawString(
-                30 * mm,
-                y,
-                f"{row['plate']}  -  out: {row['timestamp_out']}  -  dur: {row['duration_minutes']} min  -  cost: {row['cost']}",
-            )
-            y -= 5 * mm
-            if y < 30 * mm:
-                c.showPage()
-                y = h - 25 * mm
-    else:
-        c.drawString(30 * mm, y, "No exits.")
-        y -= 5 * mm
-
-    c.showPage()
-    c.save()
\ No newline at end of file
+    pdf.heading(f"Parking Daily Report - {date_str}", size=16)
+    pdf.heading("Summary:")
+    pdf.reserve_summary(6 * 6 * mm + 4 * mm)
+
+    pdf.section("Entries:", ENTRY_COLUMNS)
+    for row in entries:
+        summary.add_entry(row)
+        pdf.row(row)
+    if not summary.entries:
+        pdf.empty("No entries.")
+
+    pdf.section("Exits:", EXIT_COLUMNS)
+    for row in exits:
+        summary.add_exit(row)
+        pdf.row(row)
+    if not summary.exits:
+        pdf.empty("No exits.")
+
+    pdf.finish([
+        f"Total entries: {summary.entries}",
+        f"Total exits: {summary.exits}",
+        f"Active cars at end of day: {summary.active_end}",
+        f"Total revenue (Toman): {summary.revenue}",
+        f"Average duration (min): {summary.avg_duration:.1f}",
+        f"Longest stay (min): {summary.max_duration}",
+    ])
+    return summary.as_dict()
+
+
+def day_rows(day, table, archive_root=None):
+    """ردیف‌های روز از آرشیو (اگر آرشیو شده) وگرنه مستقیم از SQLite"""
+    day_dir = os.path.join(archive_root or ARCHIVE_ROOT, day)
+    if os.path.isdir(day_dir):
+        return iter_archive_rows(day_dir, table)
+    return iter_day_rows(table, day)
+
+
+def generate_day_report(day, out_path=None, archive_root=None):
+    """
+    گزارش یک روز؛ پیش‌فرض مسیر خروجی archives/<day>/summary.pdf است.
+    out_path is required for days that are not archived yet.
+    """
+    if out_path is None:
+        day_dir = os.path.join(archive_root or ARCHIVE_ROOT, day)
+        if not os.path.isdir(day_dir):
+            raise ValueError(f"{day} is not archived; pass out_path")
+        out_path = os.path.join(day_dir, REPORT_NAME)
+
+    # اول در فایل موقت، تا PDF نیمه‌کاره جای گزارش قبلی را نگیرد
+    tmp_path = out_path + ".tmp"
+    summary = generate_daily_report_pdf(
+        day,
+        day_rows(day, "entries", archive_root),
+        day_rows(day, "exits", archive_root),
+        tmp_path,
+    )
+    os.replace(tmp_path, out_path)
+    return summary
+
+
+def _report_job(db_path, day, out_path, archive_root):
+    # پروسه‌های spawn شده (ویندوز) مسیر دیتابیس والد را ندارند
+    database.DB_PATH = Path(db_path)
+    return generate_day_report(day, out_path, archive_root)
+
+
+def generate_reports(days, out_dir=None, workers=None, archive_root=None):
+    """
+    ساخت گزارش چند روز به صورت موازی در چند پروسه.
+    Reports go to out_dir/<day>.pdf, or next to each day's archive when
+    out_dir is None. Returns {day: summary}.
+    """
+    if not REPORTLAB_AVAILABLE:
+        raise RuntimeError("reportlab is required to generate PDF reports")
+
+    jobs = {
+        day: os.path.join(out_dir, f"{day}.pdf") if out_dir else None
+        for day in days
+    }
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            day: pool.submit(_report_job, str(database.DB_PATH), day, out_path, archive_root)
+            for day, out_path in jobs.items()
+        }
+        return {day: future.result() for day, future in futures.items()}
@@ -0,0 +1,232 @@
+"""
+آرشیو چرخشی (rolling) به جای ریست کامل روزانه
+
+Keeps parking.db small without wiping it: every run archives each day
+older than the retention window with archive_utils.archive_day (same
+archives/<day>/ partitions as the manual daily archive), then deletes
+that day's closed sessions from the hot tables:
+
+    exits with timestamp_out on the day, and the entries they closed
+
+active_cars and the entries of cars still inside are never touched.
+Each run also prunes the change log (events older than
+database.EVENT_RETENTION_DAYS).
+Only rows the archive is known to hold are deleted: exits up to the
+day's archived last_id, and entries up to the archived last_id of the
+day they entered (that day is archived again first, which appends any
+entry added after its archive). Anything newer stays for the next run.
+
+Deletes run in small BEGIN IMMEDIATE batches. Each batch's lock time is
+measured and the batch size adapts to stay under max_lock_ms, with a
+short pause between batches so the entry/exit cameras always get the
+write lock quickly.
+
+Usage:
+    python src/rolling_archive.py [--days 30] [--loop 3600]
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import database
+from archive_utils import archive_day
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_INTERVAL = 3600  # ثانیه بین دو اجرا در حالت loop
+
+BATCH_SIZE = 200
+MIN_BATCH_SIZE = 10
+MAX_BATCH_SIZE = 500
+MAX_LOCK_MS = 5.0
+PAUSE = 0.05
+
+
+def _cutoff_day(older_than_days, today=None):
+    if older_than_days < 1:
+        raise ValueError("older_than_days must be at least 1")
+    today = today or date.today()
+    return (today - timedelta(days=older_than_days)).strftime("%Y-%m-%d")
+
+
+def _days_to_archive(cutoff):
+    """روزهای قبل از cutoff که هنوز داده خام در دیتابیس اصلی دارند"""
+    conn = database.get_conn()
+    try:
+        rows = conn.execute("""
+            SELECT day FROM daily_stats
+            WHERE day < ?
+              AND (
+                  EXISTS (SELECT 1 FROM exits
+                          WHERE timestamp_out >= day AND timestamp_out < day || '~')
+                  OR NOT finalized
+              )
+            ORDER BY day
+        """, (cutoff,)).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+
+def _entry_days(day, max_exit_id):
+    """روزهای ورودِ جلسه‌هایی که از این روز پاک می‌شوند"""
+    conn = database.get_conn()
+    try:
+        rows = conn.execute("""
+            SELECT DISTINCT substr(e.timestamp_in, 1, 10)
+            FROM exits x JOIN entries e ON e.id = x.entry_id
+            WHERE x.timestamp_out >= ? AND x.timestamp_out < ? AND x.id <= ?
+        """, (day, day + "~", max_exit_id)).fetchall()
+    finally:
+        conn.close()
+    return [row[0] for row in rows]
+
+
+def _delete_batch(conn, day, batch_size, max_exit_id, entry_limits):
+    """
+    حذف یک دسته از جلسه‌های بسته‌شده یک روز در یک تراکنش کوتاه.
+    Only exits up to max_exit_id, and entries up to entry_limits[entry day]
+    (the archived last_id of entries for that day), are deleted.
+    Returns (exits deleted, entries deleted, lock time in ms).
+    """
+    start = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute("""
+            SELECT x.id, x.entry_id, substr(e.timestamp_in, 1, 10)
+            FROM exits x LEFT JOIN entries e ON e.id = x.entry_id
+            WHERE x.timestamp_out >= ? AND x.timestamp_out < ? AND x.id <= ?
+            ORDER BY x.id
+            LIMIT ?
+        """, (day, day + "~", max_exit_id, batch_size)).fetchall()
+
+        exit_ids = [row[0] for row in rows]
+        entry_ids = [
+            entry_id for _, entry_id, entry_day in rows
+            if entry_day is not None and entry_id <= entry_limits.get(entry_day, 0)
+        ]
+        deleted_entries = 0
+        if entry_ids:
+            marks = ",".join("?" * len(entry_ids))
+            # خودروهایی که (به هر دلیل) هنوز داخل هستند دست نمی‌خورند
+            deleted_entries = conn.execute(f"""
+                DELETE FROM entries
+                WHERE id IN ({marks})
+                  AND id NOT IN (SELECT entry_id FROM active_cars)
+            """, entry_ids).rowcount
+        if exit_ids:
+            marks = ",".join("?" * len(exit_ids))
+            conn.execute(f"DELETE FROM exits WHERE id IN ({marks})", exit_ids)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(exit_ids), deleted_entries, (time.perf_counter() - start) * 1000
+
+
+def _purge_day(day, stats, batch_size, max_lock_ms, pause, max_exit_id, entry_limits):
+    conn = database.get_conn()
+    conn.isolation_level = None  # کنترل دستی تراکنش‌ها
+    try:
+        while True:
+            exits, entries, lock_ms = _delete_batch(
+                conn, day, batch_size, max_exit_id, entry_limits
+            )
+            stats["exits"] += exits
+            stats["entries"] += entries
+            stats["batches"] += 1
+            stats["max_lock_ms"] = max(stats["max_lock_ms"], lock_ms)
+
+            if exits < batch_size:
+                return batch_size
+
+            # اندازه دسته را با زمان قفل تطبیق بده
+            if lock_ms > max_lock_ms:
+                batch_size = max(MIN_BATCH_SIZE, batch_size // 2)
+            elif lock_ms < max_lock_ms / 2:
+                batch_size = min(MAX_BATCH_SIZE, batch_size * 2)
+
+            if pause:
+                time.sleep(pause)
+    finally:
+        conn.close()
+
+
+def archive_closed_sessions(older_than_days=DEFAULT_RETENTION_DAYS, batch_size=BATCH_SIZE,
+                            max_lock_ms=MAX_LOCK_MS, pause=PAUSE, today=None,
+                            archive_root=None):
+    """
+    یک دور آرشیو چرخشی: آرشیو روزهای قدیمی‌تر از older_than_days و حذف
+    جلسه‌های بسته‌شده آن‌ها از جدول‌های اصلی.
+
+    Days are processed oldest first. A day's rows are deleted only after
+    its archive is complete, and only up to the ids that archive holds;
+    if archiving a day fails the run stops there, so no row is ever
+    deleted without being archived.
+
+    Returns {'days', 'exits', 'entries', 'batches', 'max_lock_ms', 'events'}.
+    """
+    cutoff = _cutoff_day(older_than_days, today)
+    stats = {"days": [], "exits": 0, "entries": 0, "batches": 0, "max_lock_ms": 0.0,
+             "events": 0}
+
+    for day in _days_to_archive(cutoff):
+        summary = archive_day(day, pause=pause, archive_root=archive_root)
+        max_exit_id = summary["tables"]["exits"]["last_id"]
+        entry_limits = {day: summary["tables"]["entries"]["last_id"]}
+        for entry_day in _entry_days(day, max_exit_id):
+            if entry_day not in entry_limits:
+                entry_summary = archive_day(entry_day, pause=pause, archive_root=archive_root)
+                entry_limits[entry_day] = entry_summary["tables"]["entries"]["last_id"]
+        batch_size = _purge_day(day, stats, batch_size, max_lock_ms, pause,
+                                max_exit_id, entry_limits)
+        stats["days"].append(day)
+
+    stats["events"] = database.prune_events()
+
+    if stats["days"]:
+        print(
+            f"Rolling archive: {len(stats['days'])} days, {stats['exits']} exits, "
+            f"{stats['entries']} entries removed in {stats['batches']} batches "
+            f"(max lock {stats['max_lock_ms']:.1f} ms)"
+        )
+    return stats
+
+
+def run_forever(interval=DEFAULT_INTERVAL, **kwargs):
+    """اجرای دوره‌ای؛ خطای یک دور باعث توقف سرویس نمی‌شود"""
+    while True:
+        try:
+            archive_closed_sessions(**kwargs)
+        except (OSError, RuntimeError, sqlite3.Error) as e:
+            print(f"Rolling archive failed: {e}")
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling archive of closed parking sessions")
+    parser.add_argument("--days", type=int, default=DEFAULT_RETENTION_DAYS,
+                        help="keep this many days of closed sessions in parking.db")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="initial delete batch size")
+    parser.add_argument("--max-lock-ms", type=float, default=MAX_LOCK_MS,
+                        help="target write-lock time per batch")
+    parser.add_argument("--pause", type=float, default=PAUSE, help="seconds between batches")
+    parser.add_argument("--loop", type=int, metavar="SECONDS",
+                        help="run again every SECONDS instead of once")
+    args = parser.parse_args()
+
+    options = dict(
+        older_than_days=args.days,
+        batch_size=args.batch,
+        max_lock_ms=args.max_lock_ms,
+        pause=args.pause,
+    )
+    if args.loop:
+        run_forever(args.loop, **options)
+    else:
+        archive_closed_sessions(**options)
+
+
+if __name__ == "__main__":
+    main()
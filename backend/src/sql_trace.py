@@ -0,0 +1,483 @@
+"""
+ردیابی کوئری‌های SQLite زیر database.get_conn()
+
+get_conn() opens its connections through connect() below, which plugs a
+thin Connection/Cursor subclass into sqlite3. Every statement is recorded
+with the database function that ran it, its duration (execute plus the
+time spent fetching its rows), the rows it returned or changed, and the
+time it spent waiting for a lock. On top of that record:
+
+  * stats: per (caller, statement) totals in this process. top() and
+    report() list the most expensive ones; admins get the same list from
+    /api/admin/queries/. Each process (API worker, camera script) keeps
+    its own.
+  * slow-query log: a statement slower than SLOW_QUERY_MS (env
+    PARKING_SLOW_QUERY_MS, 0 = off) is printed with its caller.
+  * QueryBudget: a context manager / decorator for tests. It fails when
+    the code inside runs more statements or opens more connections than
+    allowed, which is how an N+1 pattern (a helper opening its own
+    connection per call) shows up.
+
+Lock wait: connections keep sqlite3's native busy timeout, which waits
+inside C where the time cannot be seen on its own. By default the lock
+wait reported is the duration of BEGIN IMMEDIATE / BEGIN EXCLUSIVE,
+which do nothing but take the write lock. For an exact per-statement
+figure set PARKING_SQL_LOCK_RETRY=1 (diagnostics only): connections are
+then opened with timeout=0 and the busy retry runs here instead, with
+SQLite's back-off schedule, the same deadline and the same rule (retry
+only while holding no lock, and on COMMIT).
+
+PARKING_SQL_TRACE=0 turns all of this off and get_conn() returns plain
+sqlite3 connections.
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+
+import metrics
+
+ENABLED = os.environ.get('PARKING_SQL_TRACE', '1') != '0'
+SLOW_QUERY_MS = float(os.environ.get('PARKING_SLOW_QUERY_MS', 100))
+# انتظار قفل دقیق با تلاش مجدد در پایتون (فقط برای عیب‌یابی)
+LOCK_RETRY = os.environ.get('PARKING_SQL_LOCK_RETRY', '0') == '1'
+
+# حد تعداد دستورهای متمایز در آمار (بقیه در یک ردیف جمع می‌شوند)
+MAX_STATEMENTS = 1000
+OTHER = ('-', '<other statements>')
+
+# زمان‌بندی انتظار sqliteDefaultBusyCallback (میلی‌ثانیه)
+BUSY_DELAYS_MS = (1, 2, 5, 10, 15, 20, 25, 25, 25, 50, 50, 100)
+
+_IN_LIST = re.compile(r'\?(\s*,\s*\?)+')
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize(sql):
+    """یک خط، فاصله‌های اضافه حذف، فهرست‌های (?, ?, ...) یکسان"""
+    return _IN_LIST.sub('?, ...', ' '.join(sql.split()))
+
+
+def _caller():
+    """
+    module.function اولین فریم بیرون از این ماژول.
+    Private helpers (_log_event, _fetch_wallet, ...) are charged to the
+    function in their module that called them.
+    """
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    module = frame.f_globals.get('__name__')
+    while (frame.f_code.co_name.startswith('_') and frame.f_back is not None
+           and frame.f_back.f_globals.get('__name__') == module):
+        frame = frame.f_back
+    return f"{module}.{frame.f_code.co_name}"
+
+
+def _is_busy(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is not None:
+        return code & 0xFF == sqlite3.SQLITE_BUSY
+    return str(error).startswith('database is locked')
+
+
+def _holds_no_lock(sql):
+    """BEGIN (DEFERRED) تراکنش را باز می‌کند ولی هنوز قفلی نمی‌گیرد"""
+    words = sql.split(None, 2)[:2]
+    return bool(words) and words[0].upper() == 'BEGIN' and (
+        len(words) == 1 or words[1].upper() not in ('IMMEDIATE', 'EXCLUSIVE')
+    )
+
+
+def _takes_write_lock(sql):
+    """BEGIN IMMEDIATE / EXCLUSIVE: کل زمان اجرا انتظار قفل است"""
+    words = sql.split(None, 2)[:2]
+    return len(words) == 2 and words[0].upper() == 'BEGIN' and (
+        words[1].upper() in ('IMMEDIATE', 'EXCLUSIVE')
+    )
+
+
+##########################################
+# Stats
+##########################################
+
+class QueryStats:
+    """مجموع هر (تابع، دستور) در این پروسه"""
+
+    ORDERINGS = ('total_ms', 'calls', 'max_ms', 'lock_wait_ms', 'rows')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}  # (caller, sql) -> [calls, seconds, max, rows, lock_wait, errors]
+
+    def record(self, caller, sql, seconds, rows, lock_wait, error=False):
+        key = (caller, sql)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= MAX_STATEMENTS:
+                    key = OTHER
+                entry = self._stats.setdefault(key, [0, 0.0, 0.0, 0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += rows
+            entry[4] += lock_wait
+            entry[5] += error
+
+    def top(self, n=10, by='total_ms'):
+        if by not in self.ORDERINGS:
+            raise ValueError(f"by must be one of {self.ORDERINGS}")
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._stats.items()]
+        results = [
+            {
+                'caller': caller,
+                'sql': sql,
+                'calls': calls,
+                'total_ms': round(seconds * 1000, 3),
+                'avg_ms': round(seconds * 1000 / calls, 3),
+                'max_ms': round(longest * 1000, 3),
+                'rows': rows,
+                'lock_wait_ms': round(lock_wait * 1000, 3),
+                'errors': errors,
+            }
+            for (caller, sql), (calls, seconds, longest, rows, lock_wait, errors) in items
+        ]
+        results.sort(key=lambda r: r[by], reverse=True)
+        return results[:n]
+
+    def report(self, n=10, by='total_ms'):
+        """top() به صورت جدول متنی"""
+        lines = [f"{'total ms':>10} {'calls':>7} {'avg ms':>8} {'max ms':>8} "
+                 f"{'lock ms':>8} {'rows':>8}  caller / statement"]
+        for r in self.top(n, by):
+            lines.append(f"{r['total_ms']:>10.1f} {r['calls']:>7} {r['avg_ms']:>8.2f} "
+                         f"{r['max_ms']:>8.2f} {r['lock_wait_ms']:>8.1f} {r['rows']:>8}  "
+                         f"{r['caller']}: {r['sql'][:120]}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+stats = QueryStats()
+
+
+def top(n=10, by='total_ms'):
+    return stats.top(n, by)
+
+
+def report(n=10, by='total_ms'):
+    return stats.report(n, by)
+
+
+##########################################
+# Query budget (tests)
+##########################################
+
+_budget = contextvars.ContextVar('parking_query_budget', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryBudget(contextlib.ContextDecorator):
+    """
+    سقف تعداد دستور و اتصال برای کد داخل بلوک.
+
+        with QueryBudget(2, max_connections=1):
+            db.get_wallet_transactions(user_id)
+
+    COMMIT is not counted. Budgets nest; every enclosing budget counts
+    the statements too. The check runs when the block exits without an
+    exception.
+    """
+
+    def __init__(self, max_queries, max_connections=None):
+        self.max_queries = max_queries
+        self.max_connections = max_connections
+        self.queries = []
+        self.connections = 0
+
+    def __enter__(self):
+        self.queries = []
+        self.connections = 0
+        self._parent = _budget.get()
+        self._token = _budget.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _budget.reset(self._token)
+        if exc_type is None:
+            self.check()
+        return False
+
+    def _add_query(self, caller, sql):
+        budget = self
+        while budget is not None:
+            budget.queries.append((caller, sql))
+            budget = budget._parent
+
+    def _add_connection(self):
+        budget = self
+        while budget is not None:
+            budget.connections += 1
+            budget = budget._parent
+
+    def check(self):
+        problems = []
+        if len(self.queries) > self.max_queries:
+            problems.append(f"{len(self.queries)} queries (budget {self.max_queries})")
+        if self.max_connections is not None and self.connections > self.max_connections:
+            problems.append(f"{self.connections} connections (budget {self.max_connections})")
+        if problems:
+            listing = '\n'.join(f"  {caller}: {sql}" for caller, sql in self.queries)
+            raise QueryBudgetExceeded(', '.join(problems) + '\n' + listing)
+
+
+##########################################
+# Connection / cursor
+##########################################
+
+class _Query:
+    __slots__ = ('caller', 'sql', 'seconds', 'lock_wait', 'rows')
+
+    def __init__(self, caller, sql, seconds, lock_wait, rows):
+        self.caller = caller
+        self.sql = sql
+        self.seconds = seconds
+        self.lock_wait = lock_wait
+        self.rows = rows
+
+
+def _finish(query, error=False):
+    stats.record(query.caller, query.sql, query.seconds, query.rows, query.lock_wait, error)
+    if SLOW_QUERY_MS > 0 and query.seconds * 1000 >= SLOW_QUERY_MS:
+        print(f"⚠ Slow query {query.seconds * 1000:.1f} ms "
+              f"(lock wait {query.lock_wait * 1000:.1f} ms, {query.rows} rows) "
+              f"in {query.caller}: {query.sql[:300]}")
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor that records each statement. A statement that returns rows is
+    recorded once they are all fetched, or when the cursor runs the next
+    statement or is closed (with its connection).
+    """
+
+    _query = None
+
+    def _finish(self):
+        query = self._query
+        if query is not None:
+            self._query = None
+            _finish(query)
+
+    def _fetched(self, started, rows, done):
+        query = self._query
+        if query is not None:
+            query.seconds += time.perf_counter() - started
+            query.rows += rows
+            if done:
+                self._finish()
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        return self.connection._run(self, sqlite3.Cursor.execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        if not isinstance(seq_of_parameters, (list, tuple)):
+            # ممکن است دوباره اجرا شود (انتظار قفل)، پس یک iterator کافی نیست
+            seq_of_parameters = list(seq_of_parameters)
+        return self.connection._run(self, sqlite3.Cursor.executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._finish()
+        return self.connection._run(self, sqlite3.Cursor.executescript, sql_script, None)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors are TracedCursor; see the module docstring"""
+
+    def __init__(self, database, timeout=5.0, *args, **kwargs):
+        # بدون LOCK_RETRY انتظار قفل با همان busy handler خود SQLite است
+        self.lock_retry = LOCK_RETRY
+        super().__init__(database, 0 if self.lock_retry else timeout, *args, **kwargs)
+        self.busy_timeout = timeout
+        self._holds_lock = False
+        self._cursors = weakref.WeakSet()
+        budget = _budget.get()
+        if budget is not None:
+            budget._add_connection()
+
+    def cursor(self, factory=TracedCursor):
+        cur = super().cursor(factory)
+        if isinstance(cur, TracedCursor):
+            self._cursors.add(cur)
+        return cur
+
+    # sqlite3.Connection.execute* صدازدن cursor() را دور می‌زنند
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def _retry(self, attempt, started, error):
+        """مکث پیش از تلاش بعدی، یا همان خطا وقتی مهلت تمام شده"""
+        remaining = started + self.busy_timeout - time.perf_counter()
+        if remaining <= 0:
+            raise error
+        delay = BUSY_DELAYS_MS[min(attempt, len(BUSY_DELAYS_MS) - 1)] / 1000
+        time.sleep(min(delay, remaining))
+
+    def _run(self, cursor, method, sql, parameters):
+        caller = _caller()
+        text = normalize(sql)
+        budget = _budget.get()
+        if budget is not None:
+            budget._add_query(caller, text)
+
+        script = parameters is None
+        # مثل SQLite: فقط وقتی هنوز قفلی در دست نیست صبر کن
+        may_wait = self.lock_retry and not (self._holds_lock and self.in_transaction)
+        started = attempt_started = time.perf_counter()
+        attempt = 0
+        try:
+            while True:
+                attempt_started = time.perf_counter()
+                try:
+                    if script:
+                        self._run_script(cursor, method, sql)
+                    else:
+                        method(cursor, sql, parameters)
+                    break
+                except sqlite3.OperationalError as e:
+                    if script or not may_wait or not _is_busy(e):
+                        raise
+                    self._retry(attempt, started, e)
+                    attempt += 1
+        except Exception:
+            _finish(_Query(caller, text, time.perf_counter() - started,
+                           attempt_started - started, 0), error=True)
+            raise
+
+        lock_wait = attempt_started - started
+        if not self.lock_retry and _takes_write_lock(sql):
+            lock_wait = time.perf_counter() - started
+        if lock_wait > 0:
+            metrics.DB_LOCK_WAIT_SECONDS.labels(function=caller).observe(lock_wait)
+        self._holds_lock = self.in_transaction and not _holds_no_lock(sql)
+
+        query = _Query(caller, text, time.perf_counter() - started, lock_wait,
+                       max(cursor.rowcount, 0))
+        if cursor.description is None:
+            _finish(query)
+        else:
+            cursor._query = query
+        return cursor
+
+    def _run_script(self, cursor, method, sql_script):
+        if not self.lock_retry:
+            method(cursor, sql_script)
+            return
+        # اسکریپت چند دستور است و نمی‌شود از وسط دوباره اجرایش کرد؛
+        # انتظار قفل را همان SQLite انجام می‌دهد
+        pragma = sqlite3.Connection.execute
+        pragma(self, f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        try:
+            method(cursor, sql_script)
+        finally:
+            pragma(self, "PRAGMA busy_timeout = 0")
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        caller = _caller()
+        started = attempt_started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt_started = time.perf_counter()
+            try:
+                super().commit()
+                break
+            except sqlite3.OperationalError as e:
+                # COMMIT تنها جایی است که SQLite با قفل در دست هم صبر می‌کند
+                if not self.lock_retry or not _is_busy(e):
+                    raise
+                self._retry(attempt, started, e)
+                attempt += 1
+        lock_wait = attempt_started - started
+        if lock_wait > 0:
+            metrics.DB_LOCK_WAIT_SECONDS.labels(function=caller).observe(lock_wait)
+        self._holds_lock = False
+        _finish(_Query(caller, 'COMMIT', time.perf_counter() - started, lock_wait, 0))
+
+    def close(self):
+        for cur in list(self._cursors):
+            cur._finish()
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        # نسخه C مستقیماً commit داخلی را صدا می‌زند
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+def connect(database, **kwargs):
+    """sqlite3.connect با TracedConnection (اگر ردیابی روشن باشد)"""
+    if ENABLED:
+        kwargs.setdefault('factory', TracedConnection)
+    return sqlite3.connect(str(database), **kwargs)
@@ -0,0 +1,85 @@
+"""
+Tests for the pre-forking API server (run_backend.py --api).
+"""
+
+import sys
+import os
+import unittest
+import socket
+import threading
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from parking_api.server import WorkerServer, memory_usage, format_memory
+
+
+def hello_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [environ['PATH_INFO'].encode()]
+
+
+class TestWorkerServer(unittest.TestCase):
+
+    def test_retires_after_max_requests(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        server = WorkerServer(listener, hello_app, max_requests=2)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            for path in ('/a', '/b'):
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as response:
+                    self.assertEqual(response.read(), path.encode())
+            # بعد از max_requests درخواست، serve_forever خودش تمام می‌شود
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(server.handled, 2)
+        finally:
+            if thread.is_alive():
+                server.shutdown()
+            server.server_close()
+
+    def test_retire_notifies_and_drain_is_bounded(self):
+        release = threading.Event()
+        retired = []
+
+        def slow_app(environ, start_response):
+            release.wait(10)
+            return hello_app(environ, start_response)
+
+        listener = socket.create_server(('127.0.0.1', 0))
+        port = listener.getsockname()[1]
+        server = WorkerServer(listener, slow_app, max_requests=1,
+                              on_retire=lambda: retired.append(True))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        client = threading.Thread(
+            target=lambda: urllib.request.urlopen(f'http://127.0.0.1:{port}/a', timeout=10).read()
+        )
+        client.start()
+        try:
+            # بازنشستگی همان لحظه اعلام می‌شود، نه بعد از تمام شدن درخواست
+            thread.join(timeout=5)
+            self.assertFalse(thread.is_alive())
+            self.assertEqual(retired, [True])
+            server.server_close()
+            self.assertEqual(server.drain(0.1), 1)
+
+            release.set()
+            self.assertEqual(server.drain(5), 0)
+        finally:
+            release.set()
+            client.join(timeout=5)
+            if thread.is_alive():
+                server.shutdown()
+            server.server_close()
+
+    def test_memory_report(self):
+        usage = memory_usage()
+        self.assertIsNotNone(usage)
+        self.assertGreater(usage['rss'], 0)
+        self.assertIn('RSS', format_memory(usage))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Tests for archive_utils.archive_day: chunked export, summary, atomic
+publish and resume after an interrupted run.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import json
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import archive_utils
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_visits(day, count, other_day=None):
+    conn = db.get_conn()
+    cur = conn.cursor()
+    for i in range(count):
+        cur.execute(
+            "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, ?, ?)",
+            (f"12ب{100 + i}-67", f"in/{i}.jpg", f"{day} 08:{i % 60:02d}:00"),
+        )
+        cur.execute("""
+            INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+            VALUES (?, ?, ?, ?, 60, 20000)
+        """, (cur.lastrowid, f"12ب{100 + i}-67", f"out/{i}.jpg", f"{day} 09:{i % 60:02d}:00"))
+    if other_day:
+        cur.execute(
+            "INSERT INTO entries (plate, image_in, timestamp_in) VALUES ('99ی999-99', '', ?)",
+            (f"{other_day} 08:00:00",),
+        )
+    conn.commit()
+    conn.close()
+
+
+class TestArchiveDay(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.root = os.path.join(self.test_dir, 'archives')
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_archive_writes_parts_and_summary(self):
+        insert_visits('2024-01-01', 7, other_day='2024-01-02')
+
+        summary = archive_utils.archive_day('2024-01-01', chunk_size=3, archive_root=self.root)
+
+        self.assertEqual(summary['tables']['entries']['rows'], 7)
+        self.assertEqual(summary['tables']['entries']['parts'], 3)
+        self.assertEqual(summary['tables']['exits']['rows'], 7)
+        self.assertEqual(summary['totals']['revenue'], 7 * 20000)
+        self.assertEqual(archive_utils.list_archived_days(self.root), ['2024-01-01'])
+
+        day_dir = os.path.join(self.root, '2024-01-01')
+        with open(os.path.join(day_dir, 'summary.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['day'], '2024-01-01')
+
+        exits = archive_utils.read_archive_table(day_dir, 'exits')
+        self.assertEqual(len(exits), 7)
+        self.assertEqual(exits[0]['cost'], 20000)
+        self.assertIsInstance(exits[0]['entry_id'], int)
+        self.assertEqual(exits[0]['plate'], '12ب100-67')
+
+        # The daily rollup is finalized for the archived day
+        self.assertTrue(db.get_daily_stats('2024-01-01')['finalized'])
+
+    def test_archive_is_idempotent(self):
+        insert_visits('2024-01-01', 2)
+        first = archive_utils.archive_day('2024-01-01', archive_root=self.root)
+        second = archive_utils.archive_day('2024-01-01', archive_root=self.root)
+        self.assertEqual(first, second)
+
+    def test_rearchive_appends_new_rows(self):
+        insert_visits('2024-01-01', 2)
+        first = archive_utils.archive_day('2024-01-01', archive_root=self.root)
+        db.reset_database()
+        insert_visits('2024-01-01', 1)
+
+        second = archive_utils.archive_day('2024-01-01', archive_root=self.root)
+
+        self.assertEqual(second['tables']['entries']['rows'], 3)
+        self.assertEqual(second['tables']['entries']['parts'],
+                         first['tables']['entries']['parts'] + 1)
+        self.assertEqual(second['created_at'], first['created_at'])
+        day_dir = os.path.join(self.root, '2024-01-01')
+        ids = [row['id'] for row in archive_utils.read_archive_table(day_dir, 'entries')]
+        self.assertEqual(ids, [1, 2, 3])
+        self.assertEqual(second['tables']['entries']['last_id'], 3)
+        self.assertFalse(os.path.exists(os.path.join(self.root, '.partial-2024-01-01')))
+
+    def test_archive_before_reset_covers_every_day(self):
+        insert_visits('2024-01-01', 2)
+        archive_utils.archive_day('2024-01-01', archive_root=self.root)
+        insert_visits('2024-01-01', 1)  # بعد از آرشیو اول
+        insert_visits('2024-01-02', 2)
+        insert_visits('2024-01-03', 1)
+
+        upto = archive_utils.archive_before_reset(archive_root=self.root)
+        insert_visits('2024-01-03', 1)  # بعد از بررسی: نباید پاک شود
+        db.reset_database(upto=upto)
+
+        self.assertEqual(archive_utils.list_archived_days(self.root),
+                         ['2024-01-03', '2024-01-02', '2024-01-01'])
+        archived = set()
+        for day in ('2024-01-01', '2024-01-02', '2024-01-03'):
+            archived |= archive_utils.archived_ids(day, 'exits', self.root)
+        self.assertEqual(archived, set(range(1, upto['exits'] + 1)))
+
+        conn = db.get_conn()
+        left = conn.execute("SELECT id FROM exits").fetchall()
+        conn.close()
+        self.assertEqual(left, [(upto['exits'] + 1,)])
+
+    def test_archive_before_reset_refuses_when_rows_are_missing(self):
+        insert_visits('2024-01-01', 2)
+        with mock.patch.object(archive_utils, 'archived_ids', return_value=set()):
+            with self.assertRaises(RuntimeError):
+                archive_utils.archive_before_reset(archive_root=self.root)
+
+    def test_interrupted_archive_resumes(self):
+        insert_visits('2024-01-01', 5)
+        real_write = archive_utils._write_part_csv
+        calls = []
+
+        def failing_write(*args):
+            calls.append(args[0])
+            if len(calls) == 3:
+                raise OSError('disk full')
+            real_write(*args)
+
+        with mock.patch.object(archive_utils, '_write_part_csv', failing_write), \
+                mock.patch.object(archive_utils, 'PARQUET_AVAILABLE', False):
+            with self.assertRaises(OSError):
+                archive_utils.archive_day('2024-01-01', chunk_size=2, archive_root=self.root)
+
+        # Nothing published, work in progress kept
+        self.assertFalse(os.path.exists(os.path.join(self.root, '2024-01-01')))
+        self.assertTrue(os.path.exists(os.path.join(self.root, '.partial-2024-01-01')))
+        self.assertEqual(archive_utils.list_archived_days(self.root), [])
+
+        with mock.patch.object(archive_utils, 'PARQUET_AVAILABLE', False):
+            summary = archive_utils.archive_day('2024-01-01', chunk_size=2, archive_root=self.root)
+
+        self.assertEqual(summary['tables']['entries']['rows'], 5)
+        day_dir = os.path.join(self.root, '2024-01-01')
+        ids = [row['id'] for row in archive_utils.read_archive_table(day_dir, 'entries')]
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(len(ids), 5)
+        self.assertFalse(os.path.exists(os.path.join(self.root, '.partial-2024-01-01')))
+
+    def test_reads_legacy_flat_csv(self):
+        day_dir = os.path.join(self.root, '2023-12-31')
+        os.makedirs(day_dir)
+        with open(os.path.join(day_dir, 'exits.csv'), 'w', encoding='utf-8') as f:
+            f.write('id,plate,cost\n1,12ب345-67,20000\n')
+        rows = archive_utils.read_archive_table(day_dir, 'exits')
+        self.assertEqual(rows[0]['plate'], '12ب345-67')
+
+
+if __name__ == '__main__':
+    unittest.main()
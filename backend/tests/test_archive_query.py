@@ -0,0 +1,126 @@
+"""
+Tests for archive_query: cross-day search with day / part pruning and
+column projection, and summary-based totals.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import archive_utils
+import archive_query
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_visit(plate, day, duration, cost):
+    conn = db.get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+        (plate, f"{day} 08:00:00"),
+    )
+    cur.execute("""
+        INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+        VALUES (?, ?, '', ?, ?, ?)
+    """, (cur.lastrowid, plate, f"{day} 10:00:00", duration, cost))
+    conn.commit()
+    conn.close()
+
+
+class TestArchiveQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.root = os.path.join(self.test_dir, 'archives')
+
+        for day in ('2024-01-01', '2024-01-02', '2024-01-03'):
+            insert_visit('12ب345-67', day, 60, 20000)
+            insert_visit('22ج111-11', day, 300, 100000)
+        db.rebuild_daily_stats()
+        for day in ('2024-01-01', '2024-01-02', '2024-01-03'):
+            archive_utils.archive_day(day, chunk_size=1, archive_root=self.root)
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def query(self, *args, **kwargs):
+        return list(archive_query.query_archive(*args, archive_root=self.root, **kwargs))
+
+    def test_filters_and_projection(self):
+        rows = self.query('exits', plate='12ب345-67', columns=['timestamp_out'])
+        self.assertEqual(
+            rows,
+            [{'timestamp_out': f'2024-01-0{d} 10:00:00'} for d in (1, 2, 3)],
+        )
+
+        rows = self.query('exits', start='2024-01-02', cost=(50000, None))
+        self.assertEqual([(r['plate'], r['cost']) for r in rows], [('22ج111-11', 100000)] * 2)
+
+        rows = self.query('exits', duration=(0, 100), end='2024-01-01')
+        self.assertEqual([r['plate'] for r in rows], ['12ب345-67'])
+
+        self.assertEqual(len(self.query('entries', plate='22ج111-11')), 3)
+
+    def test_prunes_days_and_parts(self):
+        with mock.patch.object(
+            archive_utils, 'iter_part_rows', wraps=archive_utils.iter_part_rows
+        ) as reader:
+            rows = self.query('exits', start='2024-01-02', end='2024-01-02', plate='12ب345-67')
+
+        self.assertEqual(len(rows), 1)
+        # One day out of three, one part out of two
+        self.assertEqual(reader.call_count, 1)
+
+    def test_rejects_bad_filters(self):
+        with self.assertRaises(ValueError):
+            self.query('entries', cost=(0, 10))
+        with self.assertRaises(ValueError):
+            self.query('exits', columns=['nope'])
+        with self.assertRaises(ValueError):
+            self.query('wallets')
+
+    def test_totals_from_summaries(self):
+        totals = archive_query.archive_totals(start='2024-01-02', archive_root=self.root)
+        self.assertEqual(totals, {'days': 2, 'entries': 4, 'exits': 4, 'revenue': 240000})
+
+    def test_legacy_day_is_scanned(self):
+        day_dir = os.path.join(self.root, '2023-12-31')
+        os.makedirs(day_dir)
+        with open(os.path.join(day_dir, 'exits.csv'), 'w', encoding='utf-8') as f:
+            f.write('id,entry_id,plate,image_out,timestamp_out,duration_minutes,cost\n'
+                    '1,1,12ب345-67,,2023-12-31 10:00:00,60,20000\n')
+
+        rows = self.query('exits', plate='12ب345-67', cost=(20000, 20000))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['id'], 1)
+        self.assertEqual(rows[0]['cost'], 20000)
+
+        totals = archive_query.archive_totals(end='2023-12-31', archive_root=self.root)
+        self.assertEqual(totals['revenue'], 20000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+"""
+Tests for the append-only change log (events table), changes_since and
+the /api/changes/ endpoint.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.test import Client
+from rest_framework import status
+
+# Add src directory to path
+SRC_DIR = os.path.join(os.path.dirname(__file__), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+import database as db
+import event_bus
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def age_events(upto_seq, created_at='2020-01-01 00:00:00'):
+    """Make events up to upto_seq look old enough to be pruned."""
+    conn = db.get_conn()
+    conn.execute("UPDATE events SET created_at = ? WHERE seq <= ?", (created_at, upto_seq))
+    conn.commit()
+    conn.close()
+
+
+class TestChangeLog(unittest.TestCase):
+    """Test that writes append to the log in the same transaction."""
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_writes_are_logged_in_order(self):
+        entry_id = db.register_entry('12ب345-67', 'in.jpg')
+        result = db.register_exit('12ب345-67', 'out.jpg')
+        db.set_capacity(150)
+        db.set_price_per_hour(30000)
+        db.reset_database()
+
+        changes = db.changes_since(0)
+        self.assertEqual(
+            [c['event_type'] for c in changes],
+            ['entry', 'exit', 'settings', 'settings', 'reset'],
+        )
+        self.assertEqual([c['seq'] for c in changes], sorted(c['seq'] for c in changes))
+        self.assertEqual(changes[0]['payload']['entry_id'], entry_id)
+        self.assertEqual(changes[1]['payload']['exit_id'], result['exit_id'])
+        self.assertEqual(changes[2]['payload'], {'key': 'capacity', 'value': 150})
+        self.assertEqual(db.get_change_version(), changes[-1]['seq'])
+
+    def test_changes_since_returns_only_delta(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        seq = db.get_change_version()
+        db.register_entry('22ج111-11', 'in.jpg')
+
+        delta = db.changes_since(seq)
+        self.assertEqual(len(delta), 1)
+        self.assertEqual(delta[0]['payload']['plate'], '22ج111-11')
+        self.assertEqual(db.changes_since(delta[0]['seq']), [])
+
+    def test_wallet_operations_are_logged(self):
+        user_id = db.create_user('09123456789')
+        db.charge_wallet(user_id, 50000)
+        db.deduct_from_wallet(user_id, 20000, 'test')
+        db.add_user_plate(user_id, '12ب345-67')
+        db.register_entry('12ب345-67', 'in.jpg')
+        db.register_exit('12ب345-67', 'out.jpg')
+
+        wallet = db.changes_since(0, event_types=['wallet'])
+        self.assertEqual(
+            [c['payload']['transaction_type'] for c in wallet],
+            ['charge', 'payment', 'payment'],
+        )
+        self.assertEqual(wallet[0]['payload']['new_balance'], 50000)
+        self.assertEqual(wallet[2]['payload']['new_balance'], 10000)
+        self.assertIsNotNone(wallet[2]['payload']['exit_id'])
+
+    def test_failed_write_leaves_no_log_row(self):
+        user_id = db.create_user('09123456789')
+        with self.assertRaises(ValueError):
+            db.deduct_from_wallet(user_id, 1000)
+        self.assertEqual(db.changes_since(0), [])
+
+    def test_prune_keeps_recent_events_and_head(self):
+        for plate in ('12ب345-67', '22ج111-11', '33د222-22'):
+            db.register_entry(plate, 'in.jpg')
+        age_events(2)
+        self.assertEqual(db.prune_events(), 2)
+        self.assertEqual(db.events_pruned_upto(), 2)
+        self.assertEqual([c['seq'] for c in db.changes_since(0)], [3])
+
+        # حتی وقتی همه قدیمی‌اند آخرین رویداد می‌ماند و نسخه عقب نمی‌رود
+        age_events(3)
+        self.assertEqual(db.prune_events(), 0)
+        self.assertEqual(db.get_change_version(), 3)
+
+    def test_reset_prunes_old_events(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        age_events(1)
+        db.reset_database()
+        self.assertEqual([c['event_type'] for c in db.changes_since(0)], ['reset'])
+        self.assertEqual(db.events_pruned_upto(), 1)
+
+    def test_stale_cursor_gets_resync_event(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        db.register_entry('22ج111-11', 'in.jpg')
+        db.register_entry('33د222-22', 'in.jpg')
+        age_events(2)
+        db.prune_events()
+
+        events = event_bus.bus.since(1)
+        self.assertEqual([(e.type, e.id) for e in events], [('resync', 3)])
+        # cursor خود رویداد حذف‌شده آخر هنوز کامل است
+        self.assertEqual([e.id for e in event_bus.bus.since(2)], [3])
+
+    def test_other_process_writes_wake_subscribers(self):
+        """A write from another process reaches the bus via the log watcher."""
+        start = event_bus.bus.last_id
+        received = []
+
+        def subscribe():
+            received.extend(event_bus.bus.wait(start, timeout=10))
+
+        thread = threading.Thread(target=subscribe)
+        thread.start()
+        # Let the watcher observe the current log head first
+        time.sleep(1.5)
+
+        script = (
+            "import sys; sys.path.insert(0, sys.argv[1]); import database as db; "
+            "from pathlib import Path; db.DB_PATH = Path(sys.argv[2]); "
+            "db.register_entry('12ب345-67', 'in.jpg')"
+        )
+        subprocess.run(
+            [sys.executable, '-c', script, SRC_DIR, str(self.db_path)], check=True
+        )
+
+        thread.join(timeout=15)
+        self.assertEqual([e.type for e in received], ['entry'])
+        self.assertEqual(received[0].data['plate'], '12ب345-67')
+
+
+class TestChangesAPI(unittest.TestCase):
+    """Test GET /api/changes/."""
+
+    def setUp(self):
+        self.client = Client()
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_incremental_polling(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        db.register_entry('22ج111-11', 'in.jpg')
+        db.register_exit('12ب345-67', 'out.jpg')
+
+        response = self.client.get('/api/changes/', {'since': 0, 'limit': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([c['event_type'] for c in data['results']], ['entry', 'entry'])
+        self.assertTrue(data['has_more'])
+
+        data = self.client.get('/api/changes/', {'since': data['next_since']}).json()
+        self.assertEqual([c['event_type'] for c in data['results']], ['exit'])
+        self.assertFalse(data['has_more'])
+
+        data = self.client.get('/api/changes/', {'since': data['next_since']}).json()
+        self.assertEqual(data['results'], [])
+
+    def test_type_filter_and_wallet_events_hidden(self):
+        user_id = db.create_user('09123456789')
+        db.charge_wallet(user_id, 1000)
+        db.register_entry('12ب345-67', 'in.jpg')
+
+        data = self.client.get('/api/changes/').json()
+        self.assertEqual([c['event_type'] for c in data['results']], ['entry'])
+
+        response = self.client.get('/api/changes/', {'types': 'wallet'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['code'], 'INVALID_PARAMETER')
+
+    def test_stale_since_requires_resync(self):
+        for plate in ('12ب345-67', '22ج111-11', '33د222-22'):
+            db.register_entry(plate, 'in.jpg')
+        age_events(2)
+        db.prune_events()
+
+        response = self.client.get('/api/changes/', {'since': 1})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        data = response.json()
+        self.assertEqual(data['code'], 'RESYNC_REQUIRED')
+        self.assertEqual(data['details'], {'next_since': 3, 'oldest_seq': 3})
+
+        data = self.client.get('/api/changes/', {'since': 2}).json()
+        self.assertEqual([c['seq'] for c in data['results']], [3])
+
+    def test_invalid_since_returns_400(self):
+        response = self.client.get('/api/changes/', {'since': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Tests for the daily_stats rollup table and the income report built on it.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import sqlite3
+from datetime import date
+from pathlib import Path
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_visit(plate, t_in, t_out, duration, cost):
+    """Insert a finished visit directly (bypassing the rollup)."""
+    conn = db.get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+        (plate, t_in),
+    )
+    cur.execute("""
+        INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+        VALUES (?, ?, '', ?, ?, ?)
+    """, (cur.lastrowid, plate, t_out, duration, cost))
+    conn.commit()
+    conn.close()
+
+
+class TestDailyStats(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.today = date.today().strftime("%Y-%m-%d")
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_register_paths_update_rollup(self):
+        db.register_entry('12ب345-67', 'a.jpg')
+        db.register_entry('22ج111-11', 'b.jpg')
+        result = db.register_exit('12ب345-67', 'c.jpg')
+
+        stats = db.get_daily_stats(self.today)
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['exits'], 1)
+        self.assertEqual(stats['revenue'], result['cost'])
+        self.assertEqual(stats['histogram'][0], 1)
+        self.assertEqual(sum(stats['histogram']), 1)
+        self.assertFalse(stats['finalized'])
+
+    def test_rebuild_matches_raw_rows(self):
+        insert_visit('12ب345-67', '2024-01-01 08:00:00', '2024-01-01 08:20:00', 20, 20000)
+        insert_visit('22ج111-11', '2024-01-01 09:00:00', '2024-01-01 11:00:00', 120, 40000)
+        insert_visit('33د222-22', '2024-01-01 09:00:00', '2024-01-02 10:00:00', 1500, 500000)
+
+        db.rebuild_daily_stats()
+
+        first = db.get_daily_stats('2024-01-01')
+        self.assertEqual((first['entries'], first['exits'], first['revenue']), (3, 2, 60000))
+        self.assertEqual(first['duration_sum'], 140)
+        self.assertEqual(first['histogram'], [1, 0, 0, 1, 0, 0, 0])
+
+        second = db.get_daily_stats('2024-01-02')
+        self.assertEqual((second['entries'], second['exits']), (0, 1))
+        self.assertEqual(second['histogram'][db._duration_bucket(1500)], 1)
+        self.assertEqual(db._duration_bucket(1500), 6)
+
+    def test_finalized_totals_survive_reset(self):
+        insert_visit('12ب345-67', '2024-01-01 08:00:00', '2024-01-01 09:00:00', 60, 20000)
+        db.finalize_daily_stats('2024-01-01')
+        db.reset_database()
+
+        stats = db.get_daily_stats('2024-01-01')
+        self.assertTrue(stats['finalized'])
+        self.assertEqual(stats['revenue'], 20000)
+
+        # Rebuilding after the raw rows are gone must not zero the day
+        db.rebuild_daily_stats()
+        self.assertEqual(db.get_daily_stats('2024-01-01')['revenue'], 20000)
+
+    def test_income_report(self):
+        insert_visit('12ب345-67', '2024-01-01 08:00:00', '2024-01-01 09:00:00', 60, 20000)
+        db.rebuild_daily_stats()
+        db.register_entry('22ج111-11', 'a.jpg')
+        result = db.register_exit('22ج111-11', 'b.jpg')
+
+        report = db.get_income_report()
+        self.assertEqual(report['today'], result['cost'])
+        self.assertEqual(report['archived'], 20000)
+        self.assertEqual(report['total'], 20000 + result['cost'])
+
+    def test_init_db_backfills_existing_database(self):
+        insert_visit('12ب345-67', '2024-01-01 08:00:00', '2024-01-01 09:00:00', 60, 20000)
+        conn = sqlite3.connect(str(self.db_path))
+        conn.execute("DROP TABLE daily_stats")
+        conn.commit()
+        conn.close()
+
+        db.init_db()
+        self.assertEqual(db.get_daily_stats('2024-01-01')['revenue'], 20000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+Tests for the combined dashboard endpoint and its ETag / 304 handling.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.db import connections
+from django.test import Client
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    # The ORM-backed list endpoints read the same file
+    connection = connections['default']
+    connection.close()
+    original_name = connection.settings_dict['NAME']
+    connection.settings_dict['NAME'] = db_path
+    return db_path, (original_path, original_name), test_dir
+
+
+def cleanup_test_db(db_path, original, test_dir):
+    """Clean up test database and restore original paths."""
+    connection = connections['default']
+    connection.close()
+    db.DB_PATH, connection.settings_dict['NAME'] = original
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+class TestDashboardAPI(unittest.TestCase):
+    """Test /api/dashboard/ snapshot content and conditional GET."""
+
+    def setUp(self):
+        self.client = Client()
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_snapshot_contains_status_and_recent_activity(self):
+        db.set_capacity(10)
+        db.register_entry('12ب345-67', 'in1.jpg')
+        db.register_entry('22ج111-11', 'in2.jpg')
+        db.register_exit('12ب345-67', 'out1.jpg')
+
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(data['status']['capacity'], 10)
+        self.assertEqual(data['status']['active_cars'], 1)
+        self.assertEqual(data['status']['free_slots'], 9)
+        self.assertEqual([e['plate'] for e in data['recent_entries']], ['22ج111-11', '12ب345-67'])
+        self.assertEqual(len(data['recent_exits']), 1)
+        self.assertEqual(data['version'], db.get_change_version())
+
+    def test_rows_match_the_list_endpoints(self):
+        db.register_entry('12ب345-67', 'in1.jpg')
+        db.register_entry('22ج111-11', 'in2.jpg')
+        db.register_exit('12ب345-67', 'out1.jpg')
+
+        data = self.client.get('/api/dashboard/').json()
+        entries = self.client.get('/api/entries/').json()['results']
+        exits = self.client.get('/api/exits/').json()['results']
+
+        self.assertEqual(data['recent_entries'], entries)
+        self.assertEqual(data['recent_exits'], exits)
+        self.assertIn('entry', data['recent_exits'][0])
+        self.assertIn('T', data['recent_entries'][0]['timestamp_in'])
+
+    def test_unchanged_dashboard_returns_304(self):
+        first = self.client.get('/api/dashboard/')
+        etag = first['ETag']
+        self.assertTrue(etag)
+
+        second = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second.content, b'')
+
+    def test_writes_change_the_etag(self):
+        etag = self.client.get('/api/dashboard/')['ETag']
+
+        db.register_entry('12ب345-67', 'in1.jpg')
+
+        response = self.client.get('/api/dashboard/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['status']['active_cars'], 1)
+
+    def test_change_version_is_monotonic(self):
+        versions = [db.get_change_version()]
+        db.register_entry('12ب345-67', 'in1.jpg')
+        versions.append(db.get_change_version())
+        db.set_price_per_hour(30000)
+        versions.append(db.get_change_version())
+        db.register_exit('12ب345-67', 'out1.jpg')
+        versions.append(db.get_change_version())
+        db.reset_database()
+        versions.append(db.get_change_version())
+        self.assertEqual(versions, sorted(set(versions)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Tests for the async detection endpoints and the bounded inference executor.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import threading
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.test import Client
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+from api.inference import InferenceExecutor, QueueFull
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def fake_detection(plate):
+    return {
+        'success': True,
+        'plate': plate,
+        'confidence': 0.93,
+        'bbox': {'x1': 1, 'y1': 2, 'x2': 3, 'y2': 4},
+    }
+
+
+def image():
+    return SimpleUploadedFile('gate.jpg', b'\xff\xd8fake-jpeg', content_type='image/jpeg')
+
+
+class TestInferenceExecutor(unittest.TestCase):
+
+    def test_rejects_when_full_and_frees_slots(self):
+        executor = InferenceExecutor(workers=1, max_pending=1)
+        release = threading.Event()
+        try:
+            running = executor.submit(release.wait)
+            queued = executor.submit(lambda: 'queued')
+            with self.assertRaises(QueueFull):
+                executor.submit(lambda: 'rejected')
+            self.assertEqual(executor.in_flight, 2)
+
+            release.set()
+            running.result(timeout=5)
+            self.assertEqual(queued.result(timeout=5), 'queued')
+            self.assertEqual(executor.submit(lambda: 'again').result(timeout=5), 'again')
+            self.assertEqual(executor.in_flight, 0)
+        finally:
+            release.set()
+            executor.shutdown()
+
+
+class TestDetectionEndpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.client = Client()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_detect_plate(self):
+        with mock.patch('api.views.detect_plate_in_image', return_value=fake_detection('12ب345-67')):
+            response = self.client.post('/api/detect-plate/', {'image': image()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['plate'], '12ب345-67')
+
+        response = self.client.post('/api/detect-plate/', {})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get('/api/detect-plate/').status_code,
+                         status.HTTP_405_METHOD_NOT_ALLOWED)
+
+        failed = {'success': False, 'error': 'No plate detected'}
+        with mock.patch('api.views.detect_plate_in_image', return_value=failed):
+            response = self.client.post('/api/detect-plate/', {'image': image()})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), failed)
+
+    def test_entry_then_exit(self):
+        with mock.patch('api.views.detect_plate_in_image', return_value=fake_detection('22ج111-11')):
+            response = self.client.post('/api/detect-entry/', {'image': image()})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            entry_id = response.json()['entry_id']
+            self.assertEqual(db.count_active_cars(), 1)
+
+            # همان پلاک بلافاصله دوباره: تکراری
+            response = self.client.post('/api/detect-entry/', {'image': image()})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.json()['error'], 'Vehicle was recently recorded')
+
+            response = self.client.post('/api/detect-exit/', {'image': image()})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertTrue(data['success'])
+            self.assertEqual(data['entry_id'], entry_id)
+            self.assertEqual(data['confidence'], 0.93)
+
+            response = self.client.post('/api/detect-exit/', {'image': image()})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_busy_executor_returns_429(self):
+        executor = InferenceExecutor(workers=1, max_pending=0)
+        release = threading.Event()
+        try:
+            with mock.patch('api.views.inference_executor', executor), \
+                    mock.patch('api.views.detect_plate_in_image',
+                               return_value=fake_detection('12ب345-67')) as detect:
+                blocker = executor.submit(release.wait)
+
+                for url in ('/api/detect-plate/', '/api/detect-entry/', '/api/detect-exit/'):
+                    response = self.client.post(url, {'image': image()})
+                    self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+                    self.assertEqual(response.json()['code'], 'INFERENCE_BUSY')
+                    self.assertIn('Retry-After', response)
+                detect.assert_not_called()
+                self.assertEqual(db.count_active_cars(), 0)
+
+                release.set()
+                blocker.result(timeout=5)
+                response = self.client.post('/api/detect-plate/', {'image': image()})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+        finally:
+            release.set()
+            executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+Tests for the entry/exit event bus and the SSE feed endpoint.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import threading
+import asyncio
+import json
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.test import Client
+from rest_framework import status
+
+from api import views
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import event_bus
+from event_bus import EventBus
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def read_sse_messages(response, count):
+    """Read `count` SSE messages (skipping retry/keepalive lines)."""
+    messages = []
+    chunks = iter(response.streaming_content)
+    while len(messages) < count:
+        chunk = next(chunks).decode('utf-8')
+        if not chunk.startswith('id:'):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        messages.append({
+            'id': int(fields['id']),
+            'event': fields['event'],
+            'data': json.loads(fields['data']),
+        })
+    response.close()
+    return messages
+
+
+class TestEventBus(unittest.TestCase):
+    """Test the in-process event bus."""
+
+    def test_since_returns_only_newer_events(self):
+        bus = EventBus()
+        first = bus.publish('entry', {'plate': 'a'})
+        bus.publish('exit', {'plate': 'a'})
+        self.assertEqual([e.type for e in bus.since(first.id)], ['exit'])
+
+    def test_ring_buffer_is_bounded(self):
+        bus = EventBus(maxlen=3)
+        for i in range(10):
+            bus.publish('entry', {'n': i})
+        self.assertEqual([e.data['n'] for e in bus.since(0)], [7, 8, 9])
+
+    def test_unknown_future_id_replays_buffer(self):
+        bus = EventBus()
+        bus.publish('entry', {})
+        self.assertEqual(len(bus.since(999)), 1)
+
+    def test_wait_async_wakes_on_publish_from_thread(self):
+        bus = EventBus()
+
+        async def scenario():
+            timer = threading.Timer(0.05, bus.publish, args=('entry', {'plate': 'x'}))
+            timer.start()
+            events = await bus.wait_async(0, timeout=5)
+            timer.join()
+            return events
+
+        events = asyncio.run(scenario())
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].data['plate'], 'x')
+
+    def test_wait_times_out_with_no_events(self):
+        bus = EventBus()
+        self.assertEqual(bus.wait(bus.last_id, timeout=0.01), [])
+
+    def test_close_wakes_waiters_and_ends_streams(self):
+        bus = EventBus()
+        bus.publish('entry', {'plate': 'x'})
+        timer = threading.Timer(0.05, bus.close)
+        timer.start()
+        with mock.patch.object(event_bus, 'bus', bus):
+            # بدون close این generator هرگز تمام نمی‌شود
+            messages = list(views._sse_sync(0))
+        timer.join()
+        self.assertTrue(bus.closed)
+        self.assertEqual(sum('event: entry' in m for m in messages), 1)
+
+
+class TestEventStreamAPI(unittest.TestCase):
+    """Test /api/events/stream/ fed by register_entry / register_exit."""
+
+    def setUp(self):
+        self.client = Client()
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_register_paths_publish_and_stream_resumes(self):
+        start = event_bus.bus.last_id
+        entry_id = db.register_entry('12ب345-67', 'in.jpg')
+        db.register_exit('12ب345-67', 'out.jpg')
+
+        response = self.client.get('/api/events/stream/', HTTP_LAST_EVENT_ID=str(start))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        messages = read_sse_messages(response, 2)
+        self.assertEqual([m['event'] for m in messages], ['entry', 'exit'])
+        self.assertEqual(messages[0]['data']['entry_id'], entry_id)
+        self.assertEqual(messages[1]['data']['entry_id'], entry_id)
+        self.assertIn('cost', messages[1]['data'])
+
+        # Resume after the entry event: only the exit is replayed
+        response = self.client.get(
+            '/api/events/stream/', {'last_event_id': messages[0]['id']}
+        )
+        resumed = read_sse_messages(response, 1)
+        self.assertEqual(resumed[0]['id'], messages[1]['id'])
+        self.assertEqual(resumed[0]['event'], 'exit')
+
+    def test_post_not_allowed(self):
+        response = self.client.post('/api/events/stream/')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+"""
+Tests for the streaming CSV / Excel export endpoint (/api/export/).
+"""
+
+import sys
+import os
+import unittest
+import csv
+import io
+import zipfile
+import threading
+from unittest import mock
+import tempfile
+import shutil
+from pathlib import Path
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.db import connections
+from django.test import Client
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import exporters
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    # The ORM-backed list endpoints read the same file
+    connection = connections['default']
+    connection.close()
+    original_name = connection.settings_dict['NAME']
+    connection.settings_dict['NAME'] = db_path
+    return db_path, (original_path, original_name), test_dir
+
+
+def cleanup_test_db(db_path, original, test_dir):
+    """Clean up test database and restore original paths."""
+    connection = connections['default']
+    connection.close()
+    db.DB_PATH, connection.settings_dict['NAME'] = original
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_history(rows):
+    """Insert (plate, timestamp_in, timestamp_out or None) tuples."""
+    conn = db.get_conn()
+    cur = conn.cursor()
+    for plate, t_in, t_out in rows:
+        cur.execute(
+            "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+            (plate, t_in),
+        )
+        entry_id = cur.lastrowid
+        if t_out is not None:
+            cur.execute("""
+                INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+                VALUES (?, ?, '', ?, 60, 20000)
+            """, (entry_id, plate, t_out))
+    conn.commit()
+    conn.close()
+
+
+class TestExportAPI(unittest.TestCase):
+    """Test CSV and XLSX downloads, filters and validation."""
+
+    def setUp(self):
+        self.client = Client()
+        self.db_path, self.original, self.test_dir = setup_test_db()
+        insert_history([
+            ('12ب345-67', '2024-01-01 08:00:00', '2024-01-01 09:00:00'),
+            ('12ب345-67', '2024-01-02 08:00:00', '2024-01-02 10:00:00'),
+            ('22ج111-11', '2024-01-02 12:00:00', None),
+            ('33د222-22', '2024-01-03 07:30:00', '2024-01-03 08:30:00'),
+        ])
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original, self.test_dir)
+
+    def read_csv(self, response):
+        body = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(body.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(body[1:])))
+
+    def test_csv_export_streams_filtered_rows(self):
+        response = self.client.get('/api/export/entries.csv?date_from=2024-01-02&date_to=2024-01-02')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="entries.csv"', response['Content-Disposition'])
+
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0], ['id', 'plate', 'image_in', 'timestamp_in'])
+        self.assertEqual([r[1] for r in rows[1:]], ['12ب345-67', '22ج111-11'])
+
+        rows = self.read_csv(self.client.get('/api/export/exits.csv?plate=12ب345-67'))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[1][-1], '20000')
+
+    def test_export_reads_in_chunks(self):
+        # Only this thread's reads: background threads (the recent-entries
+        # follower) may open their own connections meanwhile
+        opened = []
+        get_conn = db.get_conn
+
+        def counting_get_conn():
+            if threading.current_thread() is threading.main_thread():
+                opened.append(1)
+            return get_conn()
+
+        with mock.patch('api.views.STREAM_CHUNK_SIZE', 1), \
+                mock.patch.object(db, 'get_conn', side_effect=counting_get_conn):
+            rows = self.read_csv(self.client.get('/api/export/entries.csv'))
+        self.assertEqual(len(rows), 5)
+        # One short read per row plus the final empty chunk
+        self.assertEqual(len(opened), 5)
+
+    @unittest.skipUnless(exporters.XLSX_AVAILABLE, "xlsxwriter is not installed")
+    def test_xlsx_export(self):
+        response = self.client.get('/api/export/history.xlsx?date_to=2024-01-02')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('application/vnd.openxmlformats'))
+
+        book = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        names = book.namelist()
+        self.assertIn('xl/worksheets/sheet1.xml', names)
+        self.assertIn('xl/worksheets/sheet2.xml', names)
+        # constant_memory writes inline strings into the sheet itself
+        self.assertIn('22ج111-11', book.read('xl/worksheets/sheet1.xml').decode('utf-8'))
+
+    def test_invalid_requests(self):
+        for url in (
+            '/api/export/wallets.csv',
+            '/api/export/entries.pdf',
+            '/api/export/history.csv',
+            '/api/export/entries.csv?date_from=yesterday',
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, url)
+            self.assertFalse(response.json()['success'])
+
+    def test_xlsx_unavailable(self):
+        with mock.patch.object(exporters, 'XLSX_AVAILABLE', False):
+            response = self.client.get('/api/export/entries.xlsx')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertEqual(response.json()['code'], 'EXPORT_UNAVAILABLE')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for the GUI live-tab data layer (gui_data.py): snapshots, change
+deltas and memoized region tagging. Does not need PyQt5.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import gui_data
+from plate_utils import get_plate_region
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+class TestGuiData(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_snapshot_rows(self):
+        first = db.register_entry('12ب345-67', 'a.jpg')
+        second = db.register_entry('1234522', 'b.jpg')
+        db.register_exit('12ب345-67', 'c.jpg')
+
+        snapshot = gui_data.load_snapshot()
+        self.assertEqual(snapshot['version'], db.get_change_version())
+        self.assertEqual(snapshot['capacity'], 200)
+        self.assertEqual([r[0] for r in snapshot['active']], [second])
+        self.assertEqual(snapshot['active'][0][2], 'KISH')
+        self.assertEqual([r[0] for r in snapshot['entries']], [second, first])
+        self.assertEqual(snapshot['entries'][1][2], 'National')
+        self.assertEqual(snapshot['exits'][0][1], '12ب345-67')
+
+    def test_fetch_update_returns_delta(self):
+        db.register_entry('12ب345-67', 'a.jpg')
+        kind, snapshot, version = gui_data.fetch_update(None)
+        self.assertEqual(kind, 'snapshot')
+
+        self.assertEqual(gui_data.fetch_update(version)[0], None)
+
+        entry_id = db.register_entry('22ج111-11', 'b.jpg')
+        db.register_exit('12ب345-67', 'c.jpg')
+        db.set_capacity(150)
+
+        kind, delta, new_version = gui_data.fetch_update(version)
+        self.assertEqual(kind, 'changes')
+        self.assertEqual(new_version, db.get_change_version())
+        self.assertEqual([r[0] for r in delta['entries']], [entry_id])
+        self.assertEqual([r[1] for r in delta['exits']], ['12ب345-67'])
+        self.assertEqual(delta['exited'], {snapshot['active'][0][0]})
+        self.assertEqual(delta['capacity'], 150)
+
+    def test_reset_forces_snapshot(self):
+        db.register_entry('12ب345-67', 'a.jpg')
+        version = db.get_change_version()
+        db.reset_database()
+        self.assertEqual(gui_data.fetch_update(version)[0], 'snapshot')
+
+    def test_pruned_log_forces_snapshot(self):
+        db.register_entry('12ب345-67', 'a.jpg')
+        db.register_entry('22ج111-11', 'b.jpg')
+        db.register_entry('33د222-22', 'c.jpg')
+        conn = db.get_conn()
+        conn.execute("UPDATE events SET created_at = '2020-01-01 00:00:00' WHERE seq <= 2")
+        conn.commit()
+        conn.close()
+        db.prune_events()
+
+        self.assertEqual(gui_data.fetch_update(1)[0], 'snapshot')
+        self.assertEqual(gui_data.fetch_update(2)[0], 'changes')
+
+    def test_region_is_memoized(self):
+        get_plate_region.cache_clear()
+        get_plate_region('1234522')
+        get_plate_region('1234522')
+        self.assertEqual(get_plate_region.cache_info().hits, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
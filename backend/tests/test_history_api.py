@@ -0,0 +1,159 @@
+"""
+Tests for the paginated / filterable entry and exit history endpoints.
+"""
+
+import sys
+import os
+import unittest
+import json
+import tempfile
+import shutil
+from pathlib import Path
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.db import connections
+from django.test import Client
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    # The ORM-backed list endpoints read the same file
+    connection = connections['default']
+    connection.close()
+    original_name = connection.settings_dict['NAME']
+    connection.settings_dict['NAME'] = db_path
+    return db_path, (original_path, original_name), test_dir
+
+
+def cleanup_test_db(db_path, original, test_dir):
+    """Clean up test database and restore original paths."""
+    connection = connections['default']
+    connection.close()
+    db.DB_PATH, connection.settings_dict['NAME'] = original
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_history(rows):
+    """Insert (plate, timestamp_in, timestamp_out or None) tuples."""
+    conn = db.get_conn()
+    cur = conn.cursor()
+    for plate, t_in, t_out in rows:
+        cur.execute(
+            "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+            (plate, t_in),
+        )
+        entry_id = cur.lastrowid
+        if t_out is not None:
+            cur.execute("""
+                INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+                VALUES (?, ?, '', ?, 60, 20000)
+            """, (entry_id, plate, t_out))
+    conn.commit()
+    conn.close()
+
+
+class TestHistoryAPI(unittest.TestCase):
+    """Test cursor pagination, filters and NDJSON streaming on entries/exits."""
+
+    def setUp(self):
+        self.client = Client()
+        self.db_path, self.original, self.test_dir = setup_test_db()
+        insert_history([
+            ('12ب345-67', '2024-01-01 08:00:00', '2024-01-01 09:00:00'),
+            ('12ب345-67', '2024-01-02 08:00:00', '2024-01-02 10:00:00'),
+            ('22ج111-11', '2024-01-02 12:00:00', None),
+            ('33د222-22', '2024-01-03 07:30:00', '2024-01-03 08:30:00'),
+        ])
+
+        # Mark the open visit as active
+        conn = db.get_conn()
+        conn.execute("""
+            INSERT INTO active_cars (entry_id, plate, timestamp_in)
+            SELECT id, plate, timestamp_in FROM entries WHERE plate = '22ج111-11'
+        """)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original, self.test_dir)
+
+    def test_entries_are_cursor_paginated(self):
+        response = self.client.get('/api/entries/?page_size=3')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = response.json()
+        self.assertEqual(len(data['results']), 3)
+        self.assertIsNotNone(data['next'])
+        self.assertNotIn('count', data)
+
+        # Newest first
+        ids = [row['id'] for row in data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+        second = self.client.get(data['next']).json()
+        self.assertEqual(len(second['results']), 1)
+        self.assertIsNone(second['next'])
+
+    def test_filter_by_plate(self):
+        data = self.client.get('/api/entries/', {'plate': '12ب345-67'}).json()
+        self.assertEqual(len(data['results']), 2)
+        for row in data['results']:
+            self.assertEqual(row['plate'], '12ب345-67')
+
+    def test_filter_by_date_range_includes_whole_end_day(self):
+        data = self.client.get(
+            '/api/exits/', {'date_from': '2024-01-02', 'date_to': '2024-01-02'}
+        ).json()
+        self.assertEqual(len(data['results']), 1)
+        self.assertEqual(data['results'][0]['plate'], '12ب345-67')
+
+    def test_invalid_date_returns_400(self):
+        response = self.client.get('/api/entries/', {'date_from': '01/02/2024'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['code'], 'INVALID_DATE_RANGE')
+
+    def test_stream_returns_ndjson(self):
+        response = self.client.get('/api/exits/stream/', {'date_from': '2024-01-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        body = b''.join(response.streaming_content).decode('utf-8')
+        lines = [json.loads(line) for line in body.splitlines() if line]
+        self.assertEqual([row['plate'] for row in lines], ['12ب345-67', '33د222-22'])
+        self.assertIn('entry', lines[0])
+        self.assertIn('cost', lines[0])
+
+    def test_fast_path_matches_model_serializers(self):
+        from api.models import Entry, Exit, ActiveCar
+        from api.serializers import EntrySerializer, ExitSerializer, ActiveCarSerializer
+
+        cases = [
+            ('/api/entries/', EntrySerializer(Entry.objects.order_by('-id'), many=True)),
+            ('/api/exits/', ExitSerializer(Exit.objects.order_by('-id'), many=True)),
+        ]
+        for url, serializer in cases:
+            results = self.client.get(url).json()['results']
+            self.assertEqual(results, json.loads(json.dumps(serializer.data)))
+
+        active = self.client.get('/api/active-cars/').json()
+        expected = ActiveCarSerializer(ActiveCar.objects.all(), many=True).data
+        self.assertEqual(active, json.loads(json.dumps(expected)))
+
+
+if __name__ == '__main__':
+    unittest.main()
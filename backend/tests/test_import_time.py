@@ -0,0 +1,56 @@
+"""
+Cold-start budget for the Django API: `python -X importtime` in a fresh
+interpreter, URLconf (and so every view module) included.
+"""
+
+import sys
+import os
+import re
+import subprocess
+import unittest
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# ماژول‌های سنگین بینایی فقط با اولین درخواست تشخیص پلاک
+VISION_MODULES = ('torch', 'cv2', 'numpy', 'yolov5', 'api.yolo_service', 'yolo_loader')
+
+# بودجه بارگذاری parking_api.urls (میکروثانیه) - امروز حدود 0.15 ثانیه، با torch بیش از 2 ثانیه
+URLCONF_IMPORT_BUDGET_US = 1_000_000
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)\s*$')
+
+
+def import_times(code):
+    """{module: cumulative µs} of the imports made by `code` in a fresh interpreter"""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='parking_api.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise AssertionError(result.stderr[-2000:])
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+class TestApiColdStart(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.times = import_times("import django; django.setup(); import parking_api.urls")
+
+    def test_vision_stack_not_imported(self):
+        loaded = [name for name in VISION_MODULES if name in self.times]
+        self.assertEqual(loaded, [], f"imported at startup: {loaded}")
+
+    def test_urlconf_import_budget(self):
+        self.assertIn('parking_api.urls', self.times)
+        self.assertLess(self.times['parking_api.urls'], URLCONF_IMPORT_BUDGET_US)
+
+
+if __name__ == '__main__':
+    unittest.main()
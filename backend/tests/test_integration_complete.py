@@ -6,6 +6,10 @@ Tests complete user journeys and backward compatibility.
 import pytest
 import sys
 import os
+import tempfile
+import shutil
+import uuid
+from pathlib import Path
 from datetime import datetime
 
 # Add src directory to path
@@ -15,42 +19,16 @@ import database as db
 
 @pytest.fixture(scope='function')
 def clean_db():
-    """Clean database before each test"""
-    # Initialize database
+    """Fresh temporary database for each test (never the real parking.db)"""
+    test_dir = tempfile.mkdtemp()
+    original_path = db.DB_PATH
+    db.DB_PATH = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
     db.init_db()
-    
-    # Clean up test data
-    conn = db.get_conn()
-    cur = conn.cursor()
-    
-    # Delete test data
-    cur.execute("DELETE FROM auth_tokens")
-    cur.execute("DELETE FROM transactions")
-    cur.execute("DELETE FROM user_plates")
-    cur.execute("DELETE FROM wallets")
-    cur.execute("DELETE FROM users")
-    cur.execute("DELETE FROM exits")
-    cur.execute("DELETE FROM active_cars")
-    cur.execute("DELETE FROM entries")
-    
-    conn.commit()
-    conn.close()
-    
+
     yield
-    
-    # Cleanup after test
-    conn = db.get_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM auth_tokens")
-    cur.execute("DELETE FROM transactions")
-    cur.execute("DELETE FROM user_plates")
-    cur.execute("DELETE FROM wallets")
-    cur.execute("DELETE FROM users")
-    cur.execute("DELETE FROM exits")
-    cur.execute("DELETE FROM active_cars")
-    cur.execute("DELETE FROM entries")
-    conn.commit()
-    conn.close()
+
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
 
 
 class TestCompleteUserJourney:
@@ -0,0 +1,200 @@
+"""
+Tests for the metrics registry, the camera exporter and /api/metrics/.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import urllib.request
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.test import Client
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import metrics
+from metrics import Registry
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def sample(text, line_prefix):
+    """مقدار اولین نمونه‌ای که با line_prefix شروع می‌شود"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_exposition_format(self):
+        registry = Registry()
+        requests = registry.counter('app_requests_total', 'Requests', ('path',))
+        requests.labels(path='/a"b').inc()
+        requests.labels(path='/a"b').inc(2)
+        inside = registry.gauge('app_inside', 'Inside')
+        inside.set_function(lambda: 7)
+        latency = registry.histogram('app_latency_seconds', 'Latency', buckets=(0.1, 1))
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(3)
+        self.assertIs(registry.counter('app_requests_total', 'Requests', ('path',)), requests)
+
+        text = registry.render()
+        self.assertIn('# TYPE app_requests_total counter', text)
+        self.assertEqual(sample(text, 'app_requests_total{path="/a\\"b"}'), 3)
+        self.assertEqual(sample(text, 'app_inside'), 7)
+        self.assertEqual(sample(text, 'app_latency_seconds_bucket{le="0.1"}'), 1)
+        self.assertEqual(sample(text, 'app_latency_seconds_bucket{le="1"}'), 2)
+        self.assertEqual(sample(text, 'app_latency_seconds_bucket{le="+Inf"}'), 3)
+        self.assertEqual(sample(text, 'app_latency_seconds_count'), 3)
+        self.assertAlmostEqual(sample(text, 'app_latency_seconds_sum'), 3.55)
+
+        with self.assertRaises(ValueError):
+            requests.inc()
+        with self.assertRaises(ValueError):
+            registry.gauge('app_requests_total', 'Requests')
+
+    def test_camera_exporter(self):
+        metrics.CAMERA_TRACKS.labels(camera='test').set(3)
+        server = metrics.start_http_server(0, addr='127.0.0.1')
+        try:
+            port = server.server_address[1]
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics', timeout=5) as response:
+                text = response.read().decode('utf-8')
+                self.assertIn('version=0.0.4', response.headers['Content-Type'])
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(sample(text, 'parking_camera_tracks{camera="test"}'), 3)
+
+
+class TestMultiprocess(unittest.TestCase):
+    """Metrics of pre-fork workers summed over a shared directory."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_reset_keeps_labels_and_functions(self):
+        registry = Registry()
+        requests = registry.counter('app_requests_total', 'Requests')
+        requests.inc(5)
+        inside = registry.gauge('app_inside', 'Inside')
+        inside.set_function(lambda: 7)
+        registry.reset()
+        text = registry.render()
+        self.assertEqual(sample(text, 'app_requests_total'), 0)
+        self.assertEqual(sample(text, 'app_inside'), 7)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs os.fork')
+    def test_workers_are_summed_and_totals_survive_exit(self):
+        confirmed = metrics.PLATES_CONFIRMED.labels(camera='mp-test', result='registered')
+        depth = metrics.QUEUE_DEPTH.labels(queue='mp-test')
+        tracks = metrics.CAMERA_TRACKS.labels(camera='mp-test')
+
+        pid = os.fork()
+        if pid == 0:
+            # worker: شمارنده‌های به ارث رسیده صفر می‌شوند
+            metrics.enable_multiprocess(self.dir)
+            confirmed.inc(5)
+            depth.set(3)
+            tracks.set(4)
+            metrics.write_snapshot()
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        before = confirmed.state()
+        confirmed.inc(2)
+        depth.set(1)
+        tracks.set(1)
+        with mock.patch.object(metrics, '_multiprocess_dir', self.dir):
+            text = metrics.render()
+            prefix = 'parking_plates_confirmed_total{camera="mp-test",result="registered"}'
+            self.assertEqual(sample(text, prefix), before + 7)
+            self.assertEqual(sample(text, 'parking_queue_depth{queue="mp-test"}'), 4)
+            self.assertEqual(sample(text, 'parking_camera_tracks{camera="mp-test"}'), 1)
+
+            # worker خارج شد: شمارنده‌ها می‌مانند، gauge آن حذف می‌شود
+            metrics.mark_process_dead(pid, self.dir)
+            self.assertFalse(os.path.exists(os.path.join(self.dir, f'{pid}.json')))
+            text = metrics.render()
+            self.assertEqual(sample(text, prefix), before + 7)
+            self.assertEqual(sample(text, 'parking_queue_depth{queue="mp-test"}'), 1)
+
+
+class TestBackendMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.client = Client()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_database_functions_are_timed(self):
+        calls = metrics.DB_CALL_SECONDS.labels(function='register_entry')
+        before = calls.count
+        db.register_entry('12ب345-67', 'in.jpg')
+        self.assertEqual(calls.count, before + 1)
+        self.assertEqual(db.register_entry.__name__, 'register_entry')
+
+    def test_nested_database_calls_are_counted_once(self):
+        user_id = db.create_user('09121111111')
+        outer = metrics.DB_CALL_SECONDS.labels(function='charge_wallet')
+        inner = metrics.DB_CALL_SECONDS.labels(function='get_wallet_by_user_id')
+        before = (outer.count, inner.count)
+        db.charge_wallet(user_id, 1000)
+        self.assertEqual((outer.count, inner.count), (before[0] + 1, before[1]))
+
+    def test_metrics_endpoint(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        self.assertEqual(self.client.get('/api/status/').status_code, status.HTTP_200_OK)
+
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode('utf-8')
+
+        self.assertGreaterEqual(sample(
+            text,
+            'parking_http_request_duration_seconds_count{view="parking-status",method="GET",status="200"}',
+        ), 1)
+        self.assertEqual(sample(text, 'parking_active_cars'), 1)
+        self.assertEqual(sample(text, 'parking_capacity'), db.get_capacity())
+        self.assertIsNotNone(sample(text, 'parking_queue_depth{queue="inference"}'))
+        self.assertGreaterEqual(
+            sample(text, 'parking_db_call_duration_seconds_count{function="count_active_cars"}'), 1
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""
+Tests for model preparation, warm-up timings and the /api/ready/ endpoint.
+"""
+
+import os
+import time
+import unittest
+from unittest import mock
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+import torch
+from django.test import Client
+from rest_framework import status
+
+from api import yolo_service
+from api.inference import readiness
+
+
+class YoloConv(torch.nn.Module):
+    """Same layout as the YOLOv5 Conv block"""
+
+    def __init__(self, c_in, c_out):
+        super().__init__()
+        self.conv = torch.nn.Conv2d(c_in, c_out, 3, padding=1, bias=False)
+        self.bn = torch.nn.BatchNorm2d(c_out)
+        self.act = torch.nn.SiLU()
+
+    def forward(self, x):
+        return self.act(self.bn(self.conv(x)))
+
+    def forward_fuse(self, x):
+        return self.act(self.conv(x))
+
+
+class FakeModel:
+    """Callable standing in for a loaded YOLO model"""
+
+    def __init__(self):
+        self.shapes = []
+
+    def __call__(self, image):
+        self.shapes.append(image.shape)
+
+
+class TestPrepareModel(unittest.TestCase):
+
+    def test_fuses_conv_bn_without_changing_output(self):
+        torch.manual_seed(0)
+        model = torch.nn.Sequential(YoloConv(3, 8), YoloConv(8, 4))
+        # آمار BN غیر پیش‌فرض تا ادغام واقعاً چیزی را عوض کند
+        model.train()
+        for _ in range(3):
+            model(torch.randn(4, 3, 16, 16))
+        model.eval()
+
+        x = torch.randn(2, 3, 16, 16)
+        with torch.inference_mode():
+            expected = model(x)
+
+        self.assertEqual(yolo_service.prepare_model(model), 2)
+        self.assertFalse(model.training)
+        self.assertFalse(any(isinstance(m, torch.nn.BatchNorm2d) for m in model.modules()))
+        self.assertTrue(model[0].conv.weight.is_contiguous(memory_format=torch.channels_last))
+        with torch.inference_mode():
+            self.assertTrue(torch.allclose(model(x), expected, atol=1e-5))
+
+
+class TestWarmUp(unittest.TestCase):
+
+    def setUp(self):
+        readiness.reset()
+
+    def tearDown(self):
+        readiness.reset()
+
+    def test_records_timings_at_production_sizes(self):
+        plate, chars = FakeModel(), FakeModel()
+        with mock.patch.object(yolo_service, 'get_plate_model', return_value=plate), \
+                mock.patch.object(yolo_service, 'get_char_model', return_value=chars):
+            self.assertTrue(yolo_service.warm_up(runs=2))
+            # گرم‌کردن دوباره کاری نمی‌کند
+            self.assertTrue(yolo_service.warm_up(runs=2))
+
+        self.assertEqual(plate.shapes, [yolo_service.WARMUP_FRAME_SHAPE] * 2)
+        self.assertEqual(chars.shapes, [yolo_service.WARMUP_PLATE_SHAPE] * 2)
+        snapshot = readiness.snapshot()
+        self.assertTrue(snapshot['ready'])
+        self.assertEqual(set(snapshot['models']), {'plate', 'chars'})
+        for timings in snapshot['models'].values():
+            self.assertEqual(
+                set(timings),
+                {'input_shape', 'load_ms', 'first_run_ms', 'warm_run_ms', 'fused_layers'},
+            )
+
+    def test_failure_is_reported(self):
+        with mock.patch.object(yolo_service, 'get_plate_model',
+                               side_effect=FileNotFoundError('plateYolo.pt')):
+            self.assertFalse(yolo_service.warm_up())
+        snapshot = readiness.snapshot()
+        self.assertEqual(snapshot['state'], 'failed')
+        self.assertIn('plateYolo.pt', snapshot['error'])
+
+
+class TestReadyEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        readiness.reset()
+        self.client = Client()
+
+    def tearDown(self):
+        readiness.reset()
+
+    def test_probe_starts_warm_up(self):
+        def fake_warm_up():
+            readiness.begin()
+            readiness.record('plate', load_ms=1.0)
+            readiness.finish()
+            return True
+
+        with mock.patch('api.views.warm_up_models', side_effect=fake_warm_up) as warm:
+            response = self.client.get('/api/ready/')
+            self.assertIn(response.status_code,
+                          (status.HTTP_503_SERVICE_UNAVAILABLE, status.HTTP_200_OK))
+
+            deadline = time.time() + 5
+            while not readiness.ready and time.time() < deadline:
+                time.sleep(0.02)
+            response = self.client.get('/api/ready/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertTrue(data['ready'])
+        self.assertEqual(data['models']['plate'], {'load_ms': 1.0})
+        self.assertIn('in_flight', data['inference'])
+        warm.assert_called_once()
+
+    def test_not_ready_while_warming(self):
+        readiness.begin()
+        with mock.patch('api.views.warm_up_models') as warm:
+            response = self.client.get('/api/ready/')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['state'], 'warming')
+        warm.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Tests for the fuzzy active-plate index and the exit fallback built on it.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+from plate_index import PlateIndex, match_key, plate_distance
+
+from hypothesis import given, settings, strategies as st
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+plate_keys = st.text(alphabet='0123456789بپتجچسشک', min_size=5, max_size=9)
+
+
+class TestPlateDistance(unittest.TestCase):
+
+    def test_confusions_are_cheaper(self):
+        self.assertEqual(plate_distance(match_key('12ب345-67'), match_key('12 ب 345 67')), 0)
+        self.assertEqual(plate_distance(match_key('12ب345-67'), match_key('12پ345-67')), 1)
+        self.assertEqual(plate_distance(match_key('16ب345-67'), match_key('18ب345-67')), 1)
+        self.assertEqual(plate_distance(match_key('12ب345-67'), match_key('12ب345-17')), 2)
+        self.assertEqual(plate_distance(match_key('12ب345-67'), match_key('12ب35-67')), 2)
+
+    def test_limit_cuts_off(self):
+        self.assertEqual(plate_distance('1234567', '7654321', limit=2), 3)
+
+    @settings(max_examples=300, deadline=None)
+    @given(a=plate_keys, b=plate_keys, c=plate_keys)
+    def test_metric(self, a, b, c):
+        self.assertEqual(plate_distance(a, b), plate_distance(b, a))
+        self.assertLessEqual(plate_distance(a, c), plate_distance(a, b) + plate_distance(b, c))
+
+
+class TestPlateIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PlateIndex()
+        self.index.add(1, '12ب345-67')
+        self.index.add(2, '36ج111-11')
+        self.index.add(3, '36ج111-18')
+
+    def test_best_match(self):
+        self.assertEqual(self.index.best_match('12 ب 345 67'), ('12ب345-67', 0))
+        self.assertEqual(self.index.best_match('12پ345-67'), ('12ب345-67', 1))
+        self.assertEqual(self.index.best_match('12پ345-87'), ('12ب345-67', 2))
+        self.assertEqual(self.index.best_match('12ب345-27'), ('12ب345-67', 2))
+        self.assertIsNone(self.index.best_match('12ب345-27', max_distance=1))
+        self.assertIsNone(self.index.best_match('99ط999-99'))
+
+    def test_ambiguous_match_is_rejected(self):
+        # «36ج111-16» is one 6/8 confusion away from -18 and one edit from -11
+        self.assertEqual(self.index.best_match('36ج111-16'), ('36ج111-18', 1))
+        self.index.add(4, '36ج111-15')
+        self.assertIsNone(self.index.best_match('36ج111-16'))
+
+    def test_remove(self):
+        self.index.remove(1)
+        self.assertIsNone(self.index.best_match('12پ345-67'))
+        self.assertEqual(len(self.index), 2)
+        self.index.remove(1)
+
+    @settings(max_examples=200, deadline=None)
+    @given(stored=st.lists(plate_keys, min_size=1, max_size=15, unique=True), query=plate_keys)
+    def test_matches_linear_scan(self, stored, query):
+        index = PlateIndex()
+        for entry_id, plate in enumerate(stored):
+            index.add(entry_id, plate)
+
+        distances = sorted((plate_distance(query, plate), plate) for plate in stored)
+        best_distance, best_plate = distances[0]
+        tied = len(distances) > 1 and distances[1][0] == best_distance
+        expected = None if best_distance > 2 or tied else (best_plate, best_distance)
+        self.assertEqual(index.best_match(query), expected)
+
+
+class TestFuzzyExit(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_exit_with_misread_plate(self):
+        entry_id = db.register_entry('16ب345-67', 'in.jpg')
+
+        # پیش‌فرض: فقط تطبیق دقیق
+        self.assertIsNone(db.register_exit('18پ345-67', 'out.jpg'))
+        result = db.register_exit('18پ345-67', 'out.jpg', fuzzy=True)
+        self.assertEqual(result['entry_id'], entry_id)
+        self.assertEqual(result['plate'], '16ب345-67')
+        self.assertEqual(result['ocr_plate'], '18پ345-67')
+        self.assertEqual(result['match_distance'], 2)
+        self.assertTrue(result['needs_confirmation'])
+        self.assertEqual(db.count_active_cars(), 0)
+
+        # بعد از خروج دیگر چیزی برای تطبیق نیست
+        self.assertIsNone(db.register_exit('16ب345-67', 'out.jpg', fuzzy=True))
+
+    def test_fuzzy_match_is_not_auto_paid(self):
+        user_id = db.create_user('09121111111')
+        db.charge_wallet(user_id, 100000)
+        db.add_user_plate(user_id, '16ب345-67')
+        db.register_entry('16ب345-67', 'in.jpg')
+
+        result = db.register_exit('18پ345-67', 'out.jpg', fuzzy=True)
+
+        self.assertEqual(result['payment_status'], 'needs_confirmation')
+        self.assertNotIn('transaction_id', result)
+        self.assertEqual(db.get_wallet_balance(user_id), 100000)
+        self.assertEqual(db.get_wallet_transactions(user_id)['count'], 1)  # فقط شارژ
+
+    def test_exact_exit_is_unchanged(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        result = db.register_exit('12ب345-67', 'out.jpg', fuzzy=True)
+        self.assertNotIn('ocr_plate', result)
+        self.assertNotIn('needs_confirmation', result)
+
+    def test_index_follows_change_log(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        self.assertEqual(db.find_active_plate('12پ345-67'), ('12ب345-67', 1))
+
+        # ورود و ریست از مسیرهای دیگر هم از طریق لاگ دیده می‌شوند
+        db.register_entry('44د222-22', 'in.jpg')
+        self.assertEqual(db.find_active_plate('44ذ222-22'), ('44د222-22', 1))
+        db.reset_database()
+        self.assertIsNone(db.find_active_plate('44ذ222-22'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,287 @@
+"""
+Tests for plate_parser: the shared, precompiled plate tokenizer.
+
+The legacy_* functions below are frozen copies of the implementations
+plate_parser replaced (database.validate_plate_format,
+plate_utils.get_plate_region, the gate scripts' format_plate and
+yolo_service.clean_plate_text); Hypothesis checks the new code gives the
+same answer on both plate-like and arbitrary text.
+"""
+
+import sys
+import os
+import re
+import unittest
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import plate_parser
+import plate_utils
+
+from hypothesis import given, settings, strategies as st
+
+
+# ----------------- پیاده‌سازی‌های قدیمی (مرجع) -----------------
+
+
+def legacy_validate_plate_format(plate):
+    """
+    Validate Iranian license plate format.
+    Returns True if valid, False otherwise.
+    
+    Valid formats:
+    - Full format: 2 digits + Persian letter + 3 digits + 2 digits (e.g., "12ب345-67", "13الف111-10")
+    - Short format: 2 digits + Persian letter + 3 digits (e.g., "12ب345")
+    - Various separators allowed: space, dash, pipe, or none
+    - Letter can be at different positions in the string
+    
+    Examples of valid plates:
+    - "12ب345-67"
+    - "12 ب 345 67"
+    - "13الف111-10"
+    - "12ب345"
+    """
+    import re
+    
+    if not plate or not isinstance(plate, str):
+        return False
+    
+    # Normalize: remove common separators and "ایران"
+    normalized = plate.strip()
+    normalized = normalized.replace(' ', '').replace('-', '').replace('|', '').replace('ایران', '')
+    
+    if not normalized:
+        return False
+    
+    # Persian letters used in Iranian plates (sorted by length, longest first to match multi-char letters first)
+    persian_letters = [
+        'الف', 'ب', 'پ', 'ت', 'ث', 'ج', 'د', 'ز', 'س', 'ش',
+        'ص', 'ط', 'ع', 'ف', 'ق', 'ک', 'گ', 'ل', 'م', 'ن',
+        'و', 'ه', 'ی'
+    ]
+    
+    # Find Persian letter position
+    # We need to check for multi-character letters first (like 'الف')
+    letter_start = -1
+    letter_end = -1
+    
+    # First, try to find multi-character letters
+    for persian_letter in persian_letters:
+        idx = normalized.find(persian_letter)
+        if idx != -1:
+            letter_start = idx
+            letter_end = idx + len(persian_letter)
+            break
+    
+    # If no multi-character letter found, look for single Persian characters
+    if letter_start == -1:
+        for i, char in enumerate(normalized):
+            if re.match(r'[آ-ی]', char):
+                letter_start = i
+                letter_end = i + 1
+                break
+    
+    if letter_start == -1:
+        return False
+    
+    # Extract numbers before and after the letter
+    before = normalized[:letter_start]
+    after = normalized[letter_end:]
+    
+    # Check if all non-letter characters are digits
+    if before and not before.isdigit():
+        return False
+    if after and not after.isdigit():
+        return False
+    
+    # Valid formats:
+    # 1. Full format: 2 digits + letter + 3 digits + 2 digits (total 7 digits)
+    # 2. Short format: 2 digits + letter + 3 digits (total 5 digits)
+    
+    total_digits = len(before) + len(after)
+    
+    # Must have at least 5 digits (short format) and at most 7 digits (full format)
+    if total_digits < 5 or total_digits > 7:
+        return False
+    
+    # For full format (7 digits), we need:
+    # - At least 2 digits before or after the letter for series
+    # - At least 3 digits for serial
+    # - Exactly 2 digits for region
+    if total_digits == 7:
+        # Letter in middle: 2 before + 5 after OR 5 before + 2 after
+        if (len(before) == 2 and len(after) == 5) or (len(before) == 5 and len(after) == 2):
+            return True
+        # Letter at start: 0 before + 7 after
+        if len(before) == 0 and len(after) == 7:
+            return True
+        # Letter at end: 7 before + 0 after
+        if len(before) == 7 and len(after) == 0:
+            return True
+        return False
+    
+    # For short format (5 digits), we need:
+    # - At least 2 digits for series
+    # - At least 3 digits for serial
+    if total_digits == 5:
+        # Letter in middle: 2 before + 3 after OR 3 before + 2 after
+        if (len(before) == 2 and len(after) == 3) or (len(before) == 3 and len(after) == 2):
+            return True
+        # Letter at start: 0 before + 5 after
+        if len(before) == 0 and len(after) == 5:
+            return True
+        # Letter at end: 5 before + 0 after
+        if len(before) == 5 and len(after) == 0:
+            return True
+        return False
+    
+    # For 6 digits (edge case)
+    if total_digits == 6:
+        # Could be valid in some formats
+        if (len(before) == 2 and len(after) == 4) or (len(before) == 4 and len(after) == 2):
+            return True
+        if (len(before) == 3 and len(after) == 3):
+            return True
+        if len(before) == 0 and len(after) == 6:
+            return True
+        if len(before) == 6 and len(after) == 0:
+            return True
+    
+    return False
+
+
+LEGACY_FREE_ZONE_REGIONS = {
+    "22": "KISH",
+    "33": "ARVAND",
+    "44": "MAKU",
+    "55": "ARAS",
+    "77": "CHABAHAR",
+}
+
+
+def legacy_get_plate_region(plate_str):
+    digits = re.sub(r"\D", "", plate_str)
+    if len(digits) != 7:
+        return None
+    if re.search(r"[آ-ی]", plate_str):
+        return None
+    m = re.match(r"^(\d{5})(\d{2})$", digits)
+    if not m:
+        return None
+    serial, region_code = m.groups()
+    return LEGACY_FREE_ZONE_REGIONS.get(region_code)
+
+
+def legacy_format_plate(txt):
+    s = re.sub(r"[^0-9آ-ی]", "", txt)
+    m1 = re.match(r"^(\d{2})([آ-ی])(\d{3})(\d{2})$", s)
+    if m1:
+        a, b, c, d = m1.groups()
+        return f"{a} {b} {c} {d}"
+    m2 = re.match(r"^(\d{5})(\d{2})$", s)
+    if m2:
+        serial, region = m2.groups()
+        return f"{serial} {region}"
+    return s
+
+
+def legacy_clean_plate_text(text):
+    if not text:
+        return None
+    text = re.sub(r'\s+', '', text)
+    if len(text) < 5:
+        return None
+    return text
+
+
+# ----------------- استراتژی‌ها -----------------
+
+# Pieces OCR and users actually produce, plus the awkward ones: Persian /
+# Arabic-Indic / superscript digits, letters outside the plate table,
+# the pieces of «الف», separators, «ایران» and whitespace.
+plate_pieces = st.sampled_from(
+    list("0123456789") * 4
+    + list("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩²")
+    + list(plate_parser.PERSIAN_LETTERS) * 2
+    + ['ا', 'ل', 'چ', 'ژ', 'آ', 'ء', 'ك', 'ي']
+    + [' ', '-', '|', 'ایران', '\t', '\n', 'A', 'x', '.', '\u200d']
+)
+
+plate_like_text = st.lists(plate_pieces, max_size=14).map(''.join)
+
+formatted_plates = st.builds(
+    lambda series, letter, serial, region, sep: sep.join(
+        part for part in (series, letter, serial, region) if part
+    ),
+    series=st.integers(min_value=10, max_value=99).map(str),
+    letter=st.sampled_from(plate_parser.PERSIAN_LETTERS),
+    serial=st.integers(min_value=100, max_value=999).map(str),
+    region=st.one_of(st.just(''), st.integers(min_value=10, max_value=99).map(str)),
+    sep=st.sampled_from(['', ' ', '-', ' | ']),
+)
+
+any_text = st.one_of(plate_like_text, formatted_plates, st.text(max_size=12))
+
+
+class TestLegacyEquivalence(unittest.TestCase):
+    """The shared parser must accept / format exactly what the old code did."""
+
+    @settings(max_examples=2000, deadline=None)
+    @given(text=any_text)
+    def test_validate_plate_format(self, text):
+        self.assertEqual(db.validate_plate_format(text), legacy_validate_plate_format(text))
+
+    @settings(max_examples=1000, deadline=None)
+    @given(text=any_text)
+    def test_get_plate_region(self, text):
+        self.assertEqual(plate_utils.get_plate_region(text), legacy_get_plate_region(text))
+
+    @settings(max_examples=1000, deadline=None)
+    @given(text=any_text)
+    def test_ocr_helpers(self, text):
+        self.assertEqual(plate_parser.format_plate(text), legacy_format_plate(text))
+        self.assertEqual(plate_parser.clean_plate_text(text), legacy_clean_plate_text(text))
+
+    def test_non_string_input(self):
+        for value in (None, '', 1234567, ['12ب345-67']):
+            self.assertFalse(db.validate_plate_format(value))
+            self.assertIsNone(plate_parser.parse_plate(value))
+
+
+class TestParsePlate(unittest.TestCase):
+    """Tokenizing and the canonical storage key."""
+
+    def test_tokens(self):
+        self.assertEqual(
+            plate_parser.parse_plate('12 ب 345 - ایران 67'),
+            plate_parser.ParsedPlate('12', 'ب', '345', '67'),
+        )
+        self.assertEqual(
+            plate_parser.parse_plate('13الف111'),
+            plate_parser.ParsedPlate('13', 'الف', '111', ''),
+        )
+        self.assertIsNone(plate_parser.parse_plate('1234567'))
+
+    def test_plate_key(self):
+        spellings = ['12ب345-67', '12 ب 345 67', '12|ب|345|ایران 67', '۱۲ب۳۴۵۶۷', '12ب34567']
+        self.assertEqual({plate_parser.plate_key(p) for p in spellings}, {'12ب345-67'})
+        self.assertEqual(plate_parser.plate_key('12ب345'), '12ب345')
+        self.assertIsNone(plate_parser.plate_key('ABC'))
+
+    @settings(max_examples=500, deadline=None)
+    @given(text=any_text)
+    def test_plate_key_is_canonical(self, text):
+        key = plate_parser.plate_key(text)
+        if key is None:
+            self.assertFalse(plate_parser.is_valid_plate(text))
+        else:
+            # only the number parts are rewritten; the letter slot is kept as-is
+            letter = plate_parser.parse_plate(text).letter
+            digits = key.replace(letter, '', 1).replace('-', '')
+            self.assertTrue(digits.isascii() and digits.isdigit())
+            self.assertEqual(plate_parser.plate_key(key), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
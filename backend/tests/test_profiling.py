@@ -0,0 +1,148 @@
+"""
+Tests for the sampled request profiling middleware and its admin endpoints.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import time
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.test import Client, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import metrics
+from api import profiling
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def fake_detect(image_bytes):
+    time.sleep(0.06)
+    return {'success': True, 'plate': '12ب345-67', 'confidence': 0.9,
+            'bbox': {'x1': 0, 'y1': 0, 'x2': 1, 'y2': 1}}
+
+
+class TestRequestProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_phases_from_timed_functions(self):
+        profile = profiling.RequestProfile('POST', '/api/entry/', 'sampled')
+        token = metrics.current_trace.set(profile)
+        try:
+            db.register_entry('12ب345-67', 'in.jpg')
+        finally:
+            metrics.current_trace.reset(token)
+        db.count_active_cars()  # بیرون از ردیابی: ثبت نمی‌شود
+
+        data = profile.to_dict(201, 0.01, 5)
+        names = [phase['phase'] for phase in data['phases']]
+        self.assertIn('db.register_entry', names)
+        self.assertNotIn('db.count_active_cars', names)
+        self.assertEqual(data['breakdown'][0]['phase'], 'db.register_entry')
+
+
+class TestProfilingMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.profile_dir = Path(self.test_dir) / 'profiles'
+        self.client = Client()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def settings(self, **config):
+        return override_settings(PARKING_PROFILE=dict(config, DIR=self.profile_dir, KEEP=3))
+
+    def admin_headers(self):
+        user_id = db.create_user('09121111111', role='admin')
+        return {'HTTP_AUTHORIZATION': f'Token {db.create_auth_token(user_id)}'}
+
+    def test_off_by_default(self):
+        with self.settings(SAMPLE_RATE=0, SLOW_MS=0):
+            response = self.client.get('/api/status/')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(self.profile_dir.exists())
+
+    def test_sampled_detect_exit(self):
+        db.register_entry('12ب345-67', 'in.jpg')
+        image = SimpleUploadedFile('gate.jpg', b'\xff\xd8fake', content_type='image/jpeg')
+        with self.settings(SAMPLE_RATE=1.0, INTERVAL_MS=2), \
+                mock.patch('api.views.detect_plate_in_image', side_effect=fake_detect):
+            response = self.client.post('/api/detect-exit/', {'image': image})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response['X-Profile-Id']
+
+        headers = self.admin_headers()
+        with self.settings(SAMPLE_RATE=0):
+            listing = self.client.get('/api/admin/profiles/', **headers).json()
+            profile = self.client.get(f'/api/admin/profiles/{profile_id}/', **headers).json()
+            folded = self.client.get(f'/api/admin/profiles/{profile_id}/?output=folded', **headers)
+
+        self.assertEqual(listing['results'][0]['id'], profile_id)
+        self.assertEqual(profile['reason'], 'sampled')
+        phases = {item['phase'] for item in profile['breakdown']}
+        self.assertTrue({'inference.total', 'db.register_exit'} <= phases)
+        # نخ استنتاج هنگام خواب fake_detect نمونه‌برداری شده
+        self.assertTrue(any('fake_detect' in item['stack'] for item in profile['stacks']))
+        self.assertIn('fake_detect', folded.content.decode('utf-8'))
+
+    def test_slow_threshold_and_rolling_buffer(self):
+        with self.settings(SLOW_MS=60_000):
+            response = self.client.get('/api/status/')
+        self.assertNotIn('X-Profile-Id', response)
+
+        with self.settings(SLOW_MS=0.001):
+            ids = [self.client.get('/api/status/')['X-Profile-Id'] for _ in range(5)]
+        store = profiling.ProfileStore(self.profile_dir, keep=3)
+        self.assertEqual([p['id'] for p in store.list()], ids[:1:-1])
+        self.assertEqual(store.list()[0]['reason'], 'slow')
+        self.assertIsNone(store.get(ids[0]))
+
+    def test_endpoints_require_admin(self):
+        user_id = db.create_user('09122222222')
+        headers = {'HTTP_AUTHORIZATION': f'Token {db.create_auth_token(user_id)}'}
+        self.assertEqual(self.client.get('/api/admin/profiles/').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get('/api/admin/profiles/', **headers).status_code,
+                         status.HTTP_403_FORBIDDEN)
+        with self.settings():
+            response = self.client.get('/api/admin/profiles/nothere/', **self.admin_headers())
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+if __name__ == '__main__':
+    unittest.main()
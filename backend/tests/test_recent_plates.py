@@ -0,0 +1,136 @@
+"""
+Tests for the in-memory entry dedup window (was_recently_recorded).
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import event_bus
+from recent_plates import RecentPlates
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_entry_elsewhere(plate, t_in):
+    """An entry written by another process: row + change-log event, no window update."""
+    conn = db.get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+        (plate, t_in),
+    )
+    db._log_event(cur, 'entry', {
+        'entry_id': cur.lastrowid, 'plate': plate, 'image_in': '', 'timestamp_in': t_in,
+    })
+    conn.commit()
+    conn.close()
+
+
+class TestRecentPlates(unittest.TestCase):
+
+    def test_window_and_expiry(self):
+        window = RecentPlates(horizon=60, tick=10)
+        window.record('a', 1000, now=1000)
+        window.record('b', 1035, now=1035)
+
+        self.assertTrue(window.seen_within('a', 30, now=1020))
+        self.assertFalse(window.seen_within('a', 30, now=1031))
+        self.assertTrue(window.seen_within('a', 60, now=1055))
+
+        # بعد از افق، کلید از حافظه پاک می‌شود
+        self.assertFalse(window.seen_within('a', 60, now=1075))
+        self.assertEqual(len(window), 1)
+        self.assertFalse(window.seen_within('b', 60, now=2000))
+        self.assertEqual(len(window), 0)
+
+    def test_refresh_keeps_key(self):
+        window = RecentPlates(horizon=60, tick=10)
+        window.record('a', 1000, now=1000)
+        window.record('a', 1050, now=1050)
+        self.assertTrue(window.seen_within('a', 60, now=1100))
+        # رکورد قدیمی‌تر، زمان جدیدتر را عقب نمی‌برد
+        window.record('a', 1010, now=1100)
+        self.assertTrue(window.seen_within('a', 60, now=1105))
+        self.assertFalse(window.seen_within('a', 60, now=1115))
+
+
+class TestWasRecentlyRecorded(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_startup_load_and_no_queries(self):
+        old = (datetime.now() - timedelta(minutes=7)).strftime("%Y-%m-%d %H:%M:%S")
+        insert_entry_elsewhere('12ب345-67', old)
+        db.load_recent_entries()
+        db.register_entry('22ج111-11', 'in.jpg')
+
+        with mock.patch.object(db, 'get_conn', side_effect=AssertionError("queried SQLite")):
+            self.assertTrue(db.was_recently_recorded('22ج111-11'))
+            self.assertTrue(db.was_recently_recorded('22 ج 111 11'))
+            self.assertFalse(db.was_recently_recorded('12ب345-67', minutes=5))
+            self.assertTrue(db.was_recently_recorded('12ب345-67', minutes=10))
+            self.assertFalse(db.was_recently_recorded('33د222-22'))
+
+        # بازه بزرگ‌تر از افق پنجره: از جدول entries
+        self.assertTrue(db.was_recently_recorded('12ب345-67', minutes=60))
+
+    def test_fallback_past_horizon_matches_spellings(self):
+        # ورود ۲۰ دقیقه پیش، بیرون از پنجره حافظه (افق ۱۵ دقیقه)
+        old = (datetime.now() - timedelta(minutes=20)).strftime("%Y-%m-%d %H:%M:%S")
+        insert_entry_elsewhere('55ه333-33', old)
+        db.load_recent_entries()
+
+        self.assertFalse(db.was_recently_recorded('55ه333-33', minutes=db.DEDUP_HORIZON_MINUTES))
+        self.assertTrue(db.was_recently_recorded('55ه333-33', minutes=30))
+        self.assertTrue(db.was_recently_recorded('55 ه 333 33', minutes=30))
+        self.assertFalse(db.was_recently_recorded('55 ه 333 33', minutes=19))
+        self.assertFalse(db.was_recently_recorded('66و444-44', minutes=30))
+
+    def test_follows_other_processes(self):
+        db.load_recent_entries()
+        insert_entry_elsewhere('44د222-22', datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        event_bus.notify()
+
+        deadline = time.time() + 5
+        while not db.was_recently_recorded('44د222-22') and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(db.was_recently_recorded('44د222-22'))
+
+        db.reset_database()
+        deadline = time.time() + 5
+        while db.was_recently_recorded('44د222-22') and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(db.was_recently_recorded('44د222-22'))
+
+
+if __name__ == '__main__':
+    unittest.main()
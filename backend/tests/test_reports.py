@@ -0,0 +1,121 @@
+"""
+Tests for the streaming daily PDF report (reports.py).
+Skipped when reportlab is not installed.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from pathlib import Path
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import archive_utils
+import reports
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_visits(day, count):
+    conn = db.get_conn()
+    cur = conn.cursor()
+    for i in range(count):
+        cur.execute(
+            "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+            (f"12ب{100 + i}-67", f"{day} 08:00:00"),
+        )
+        cur.execute("""
+            INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+            VALUES (?, ?, '', ?, ?, 20000)
+        """, (cur.lastrowid, f"12ب{100 + i}-67", f"{day} 10:00:00", 60 + i))
+    cur.execute(
+        "INSERT INTO entries (plate, image_in, timestamp_in) VALUES ('99ی999-99', '', ?)",
+        (f"{day} 11:00:00",),
+    )
+    conn.commit()
+    conn.close()
+
+
+@unittest.skipUnless(reports.REPORTLAB_AVAILABLE, "reportlab is not installed")
+class TestReports(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.root = os.path.join(self.test_dir, 'archives')
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_streams_rows_and_summarizes_in_one_pass(self):
+        consumed = []
+
+        def rows():
+            for i in range(300):
+                consumed.append(i)
+                yield {'id': i, 'plate': 'p', 'timestamp_out': 't',
+                       'duration_minutes': i, 'cost': 1000}
+
+        out = os.path.join(self.test_dir, 'day.pdf')
+        summary = reports.generate_daily_report_pdf('2024-01-01', iter([]), rows(), out)
+
+        self.assertEqual(len(consumed), 300)
+        self.assertEqual(summary['total_exits'], 300)
+        self.assertEqual(summary['total_revenue'], 300 * 1000)
+        self.assertEqual(summary['max_duration'], 299)
+        with open(out, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b'%PDF'))
+        # 300 rows do not fit on one page
+        self.assertGreater(data.count(b'/Type /Page\n'), 1)
+
+    def test_day_report_from_database_and_archive(self):
+        insert_visits('2024-01-01', 5)
+
+        out = os.path.join(self.test_dir, 'live.pdf')
+        live = reports.generate_day_report('2024-01-01', out)
+        self.assertEqual((live['total_entries'], live['total_exits']), (6, 5))
+        self.assertEqual(live['active_end'], 1)
+        self.assertTrue(os.path.exists(out))
+        self.assertFalse(os.path.exists(out + '.tmp'))
+
+        with self.assertRaises(ValueError):
+            reports.generate_day_report('2024-01-01', archive_root=self.root)
+
+        archive_utils.archive_day('2024-01-01', archive_root=self.root)
+        archived = reports.generate_day_report('2024-01-01', archive_root=self.root)
+        self.assertEqual(archived, live)
+        self.assertTrue(os.path.exists(os.path.join(self.root, '2024-01-01', reports.REPORT_NAME)))
+
+    def test_parallel_reports(self):
+        insert_visits('2024-01-01', 3)
+        insert_visits('2024-01-02', 4)
+
+        out_dir = os.path.join(self.test_dir, 'reports')
+        os.makedirs(out_dir)
+        results = reports.generate_reports(['2024-01-01', '2024-01-02'], out_dir=out_dir, workers=2)
+
+        self.assertEqual(results['2024-01-01']['total_exits'], 3)
+        self.assertEqual(results['2024-01-02']['total_exits'], 4)
+        self.assertTrue(os.path.exists(os.path.join(out_dir, '2024-01-02.pdf')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+Tests for the rolling archiver: old closed sessions move to the archive
+in batches, active cars and recent rows stay, totals survive.
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+from datetime import date
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import archive_utils
+import rolling_archive
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def insert_visit(plate, t_in, t_out=None, cost=20000):
+    """Insert a visit directly; without t_out the car is still inside."""
+    conn = db.get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO entries (plate, image_in, timestamp_in) VALUES (?, '', ?)",
+        (plate, t_in),
+    )
+    entry_id = cur.lastrowid
+    if t_out is None:
+        cur.execute(
+            "INSERT INTO active_cars (entry_id, plate, timestamp_in) VALUES (?, ?, ?)",
+            (entry_id, plate, t_in),
+        )
+    else:
+        cur.execute("""
+            INSERT INTO exits (entry_id, plate, image_out, timestamp_out, duration_minutes, cost)
+            VALUES (?, ?, '', ?, 60, ?)
+        """, (entry_id, plate, t_out, cost))
+    conn.commit()
+    conn.close()
+    return entry_id
+
+
+def count(table):
+    conn = db.get_conn()
+    n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return n
+
+
+class TestRollingArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.root = os.path.join(self.test_dir, 'archives')
+        self.today = date(2024, 3, 1)
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def run_archiver(self, **kwargs):
+        kwargs.setdefault('older_than_days', 10)
+        kwargs.setdefault('pause', 0)
+        return rolling_archive.archive_closed_sessions(
+            today=self.today, archive_root=self.root, **kwargs
+        )
+
+    def test_moves_old_closed_sessions_only(self):
+        for i in range(25):
+            insert_visit(f'12ب{100 + i}-67', '2024-01-10 08:00:00', '2024-01-10 09:00:00')
+        long_stay = insert_visit('22ج111-11', '2024-01-10 10:00:00')
+        insert_visit('33د222-22', '2024-02-28 08:00:00', '2024-02-28 09:00:00')
+        db.rebuild_daily_stats()
+
+        stats = self.run_archiver(batch_size=10)
+
+        self.assertEqual(stats['days'], ['2024-01-10'])
+        self.assertEqual((stats['exits'], stats['entries']), (25, 25))
+        self.assertGreater(stats['batches'], 1)
+
+        # Recent session and the car still inside stay in the hot tables
+        self.assertEqual(count('exits'), 1)
+        self.assertEqual(count('entries'), 2)
+        self.assertEqual(count('active_cars'), 1)
+        self.assertEqual(db.count_active_cars(), 1)
+
+        day_dir = os.path.join(self.root, '2024-01-10')
+        self.assertEqual(len(archive_utils.read_archive_table(day_dir, 'exits')), 25)
+        archived_entries = archive_utils.read_archive_table(day_dir, 'entries')
+        self.assertIn(long_stay, [row['id'] for row in archived_entries])
+
+        # The income report still counts the archived day
+        self.assertEqual(db.get_income_report('2024-03-01')['archived'], 26 * 20000)
+
+        # Nothing left to do on a second run
+        self.assertEqual(self.run_archiver()['days'], [])
+
+    def test_rebuild_keeps_partly_archived_day(self):
+        insert_visit('12ب345-67', '2024-01-10 08:00:00', '2024-01-10 09:00:00')
+        insert_visit('22ج111-11', '2024-01-10 10:00:00')
+        db.rebuild_daily_stats()
+        self.run_archiver()
+
+        db.rebuild_daily_stats()
+        stats = db.get_daily_stats('2024-01-10')
+        self.assertEqual((stats['entries'], stats['exits'], stats['revenue']), (2, 1, 20000))
+
+    def archived(self, day, table):
+        return archive_utils.archived_ids(day, table, self.root)
+
+    def test_rows_added_after_archive_are_archived_before_purge(self):
+        insert_visit('12ب100-67', '2024-01-10 08:00:00', '2024-01-10 09:00:00')
+        db.rebuild_daily_stats()
+        # یک اجرای قبلی (مثلاً نیمه‌کاره) روز را آرشیو کرده بود
+        archive_utils.archive_day('2024-01-10', archive_root=self.root)
+        late = insert_visit('12ب101-67', '2024-01-10 10:00:00', '2024-01-10 11:00:00')
+
+        stats = self.run_archiver()
+        self.assertEqual((stats['exits'], stats['entries']), (2, 2))
+        self.assertIn(late, self.archived('2024-01-10', 'entries'))
+        self.assertEqual(len(self.archived('2024-01-10', 'exits')), 2)
+
+        # و دوباره: آرشیو، ردیف تازه، آرشیو و حذف
+        again = insert_visit('12ب102-67', '2024-01-10 12:00:00', '2024-01-10 13:00:00')
+        stats = self.run_archiver()
+        self.assertEqual(stats['days'], ['2024-01-10'])
+        self.assertEqual((stats['exits'], stats['entries']), (1, 1))
+        self.assertIn(again, self.archived('2024-01-10', 'entries'))
+        self.assertEqual(len(self.archived('2024-01-10', 'exits')), 3)
+        self.assertEqual((count('exits'), count('entries')), (0, 0))
+
+    def test_row_written_between_archive_and_purge_stays(self):
+        insert_visit('12ب100-67', '2024-01-10 08:00:00', '2024-01-10 09:00:00')
+        db.rebuild_daily_stats()
+        real_archive_day = rolling_archive.archive_day
+        late = []
+
+        def archive_then_insert(day, **kwargs):
+            summary = real_archive_day(day, **kwargs)
+            if not late:
+                late.append(insert_visit('12ب101-67', '2024-01-10 10:00:00',
+                                         '2024-01-10 11:00:00'))
+            return summary
+
+        with mock.patch.object(rolling_archive, 'archive_day', archive_then_insert):
+            stats = self.run_archiver()
+        self.assertEqual((stats['exits'], stats['entries']), (1, 1))
+        self.assertEqual((count('exits'), count('entries')), (1, 1))
+        self.assertNotIn(late[0], self.archived('2024-01-10', 'entries'))
+
+        # اجرای بعدی آن را آرشیو و حذف می‌کند
+        self.run_archiver()
+        self.assertIn(late[0], self.archived('2024-01-10', 'entries'))
+        self.assertEqual((count('exits'), count('entries')), (0, 0))
+
+    def test_entry_from_earlier_day_is_archived_before_delete(self):
+        archive_utils.archive_day('2024-01-09', archive_root=self.root)
+        # ورود دیروز بعد از آرشیو آن روز ثبت شده، خروج امروز
+        overnight = insert_visit('12ب100-67', '2024-01-09 23:00:00', '2024-01-10 01:00:00')
+        db.rebuild_daily_stats()
+
+        stats = self.run_archiver()
+        self.assertEqual((stats['exits'], stats['entries']), (1, 1))
+        self.assertIn(overnight, self.archived('2024-01-09', 'entries'))
+
+    def test_failed_day_is_not_deleted(self):
+        insert_visit('12ب345-67', '2024-01-10 08:00:00', '2024-01-10 09:00:00')
+        db.rebuild_daily_stats()
+        os.makedirs(os.path.join(self.root, '2024-01-10'))  # incomplete legacy dir
+
+        with self.assertRaises(RuntimeError):
+            self.run_archiver()
+        self.assertEqual(count('exits'), 1)
+        self.assertEqual(count('entries'), 1)
+
+    def test_retention_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            self.run_archiver(older_than_days=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
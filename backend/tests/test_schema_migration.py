@@ -0,0 +1,116 @@
+"""
+Tests for the schema migration to integer epoch columns (PRAGMA user_version 1).
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+import uuid
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+
+
+# اسکیمای قبل از مهاجرت (فقط ستون‌های زمان متنی)
+OLD_SCHEMA = """
+    CREATE TABLE entries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        plate TEXT NOT NULL,
+        image_in TEXT NOT NULL,
+        timestamp_in TEXT NOT NULL
+    );
+    CREATE TABLE active_cars (
+        entry_id INTEGER PRIMARY KEY,
+        plate TEXT NOT NULL,
+        timestamp_in TEXT NOT NULL
+    );
+    CREATE TABLE auth_tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        token TEXT UNIQUE NOT NULL,
+        created_at TEXT NOT NULL,
+        expires_at TEXT NOT NULL
+    );
+    INSERT INTO entries (plate, image_in, timestamp_in) VALUES ('12ب345-67', '', '2024-01-01 08:00:00');
+    INSERT INTO active_cars (entry_id, plate, timestamp_in) VALUES (1, '12ب345-67', '2024-01-01 08:00:00');
+"""
+
+
+class TestSchemaMigration(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.original_path = db.DB_PATH
+        db.DB_PATH = Path(self.test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+
+    def tearDown(self):
+        db.DB_PATH = self.original_path
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def columns(self, conn, table):
+        return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+    def test_old_database_is_migrated(self):
+        conn = sqlite3.connect(str(db.DB_PATH))
+        conn.executescript(OLD_SCHEMA)
+        conn.close()
+
+        db.init_db()
+        db.init_db()  # دوباره: بدون خطا و بدون تغییر
+
+        conn = db.get_conn()
+        try:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], db.SCHEMA_VERSION)
+            for table, column, _ in db.EPOCH_COLUMNS:
+                self.assertIn(column, self.columns(conn, table))
+            # ستون‌های قدیمی برای خواننده‌ها سر جایشان هستند
+            self.assertEqual(
+                conn.execute("SELECT timestamp_in, ts_in FROM entries").fetchone(),
+                ('2024-01-01 08:00:00', db.parse_ts('2024-01-01 08:00:00')),
+            )
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM entries WHERE ts_in >= ? AND ts_in < ?", (0, 1)
+            ).fetchall()
+            self.assertIn('idx_entries_ts_in', ' '.join(str(step[-1]) for step in plan))
+        finally:
+            conn.close()
+
+    def test_hot_paths_use_epoch_columns(self):
+        db.init_db()
+        t_in = (datetime.now() - timedelta(minutes=125)).strftime(db.TIME_FORMAT)
+        conn = db.get_conn()
+        conn.execute(
+            "INSERT INTO entries (id, plate, image_in, timestamp_in) VALUES (1, '22ج111-11', '', ?)", (t_in,)
+        )
+        conn.execute(
+            "INSERT INTO active_cars (entry_id, plate, timestamp_in) VALUES (1, '22ج111-11', ?)", (t_in,)
+        )
+        conn.commit()
+        conn.close()
+
+        result = db.register_exit('22ج111-11', 'out.jpg')
+        self.assertIn(result['duration'], (125, 126))
+        self.assertEqual(result['cost'], 3 * db.get_price_per_hour())
+
+        user_id = db.create_user('09120000000')
+        token = db.create_auth_token(user_id)
+        self.assertEqual(db.validate_token(token), user_id)
+
+        conn = db.get_conn()
+        conn.execute(
+            "UPDATE auth_tokens SET expires_at = ? WHERE token = ?",
+            ((datetime.now() - timedelta(seconds=5)).strftime(db.TIME_FORMAT), token),
+        )
+        conn.commit()
+        conn.close()
+        self.assertIsNone(db.validate_token(token))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,263 @@
+"""
+Tests for the SQL statement tracing under database.get_conn():
+statement stats, lock wait (native and opt-in retry), the slow-query log, query budgets and
+/api/admin/queries/.
+"""
+
+import sys
+import os
+import io
+import sqlite3
+import threading
+import time
+import unittest
+import tempfile
+import shutil
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+import uuid
+
+# Django setup
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'parking_api.settings')
+import django
+django.setup()
+
+from django.test import Client
+from rest_framework import status
+
+# Add src directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import database as db
+import sql_trace
+from sql_trace import QueryBudget, QueryBudgetExceeded
+
+
+def setup_test_db():
+    """Create a fresh test database and return its path."""
+    test_dir = tempfile.mkdtemp()
+    db_path = Path(test_dir) / f"test_parking_{uuid.uuid4().hex}.db"
+    original_path = db.DB_PATH
+    db.DB_PATH = db_path
+    db.init_db()
+    return db_path, original_path, test_dir
+
+
+def cleanup_test_db(db_path, original_path, test_dir):
+    """Clean up test database and restore original path."""
+    db.DB_PATH = original_path
+    shutil.rmtree(test_dir, ignore_errors=True)
+
+
+def stat_for(caller, sql_prefix):
+    for item in sql_trace.top(n=sql_trace.MAX_STATEMENTS):
+        if item['caller'] == caller and item['sql'].startswith(sql_prefix):
+            return item
+    return None
+
+
+class TestStatementStats(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        sql_trace.stats.reset()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_records_caller_rows_and_time(self):
+        user_id = db.create_user('09121111111')
+        for amount in (1000, 2000, 3000):
+            db.charge_wallet(user_id, amount)
+        result = db.get_wallet_transactions(user_id, limit=2)
+        self.assertEqual(result['count'], 3)
+
+        page = stat_for('database.get_wallet_transactions',
+                        'SELECT id, wallet_id, transaction_type')
+        self.assertEqual(page['calls'], 1)
+        self.assertEqual(page['rows'], 2)
+        self.assertGreater(page['total_ms'], 0)
+
+        update = stat_for('database.charge_wallet', 'UPDATE wallets')
+        self.assertEqual(update['calls'], 3)
+        self.assertEqual(update['rows'], 3)  # سطرهای تغییرکرده
+        self.assertEqual(stat_for('database.charge_wallet', 'COMMIT')['calls'], 3)
+
+        ranked = sql_trace.top(n=50, by='calls')
+        self.assertEqual(ranked, sorted(ranked, key=lambda r: r['calls'], reverse=True))
+        self.assertIn('database.get_wallet_transactions', sql_trace.report(50))
+
+    def test_in_lists_are_grouped(self):
+        self.assertEqual(sql_trace.normalize("SELECT *\n  FROM t WHERE id IN (?, ?,?)"),
+                         "SELECT * FROM t WHERE id IN (?, ...)")
+
+    def test_slow_query_log(self):
+        out = io.StringIO()
+        with mock.patch.object(sql_trace, 'SLOW_QUERY_MS', 0.000001), redirect_stdout(out):
+            db.count_active_cars()
+        self.assertIn('Slow query', out.getvalue())
+        self.assertIn('database.count_active_cars', out.getvalue())
+
+        out = io.StringIO()
+        with mock.patch.object(sql_trace, 'SLOW_QUERY_MS', 60_000), redirect_stdout(out):
+            db.count_active_cars()
+        self.assertEqual(out.getvalue(), '')
+
+
+class TestLockWait(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        sql_trace.stats.reset()
+        # یک نویسنده دیگر قفل RESERVED را نگه می‌دارد
+        self.other = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.other.execute("BEGIN IMMEDIATE")
+
+    def tearDown(self):
+        self.other.close()
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def release_after(self, seconds):
+        timer = threading.Timer(seconds, self.other.rollback)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_native_busy_timeout_is_kept(self):
+        conn = db.get_conn()
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+        conn.close()
+
+        self.release_after(0.2)
+        db.register_entry('12ب345-67', 'in.jpg')
+        self.assertEqual(db.count_active_cars(), 1)
+
+    def test_begin_immediate_records_lock_wait(self):
+        self.release_after(0.2)
+        conn = db.get_conn()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.rollback()
+        conn.close()
+
+        begin = next(r for r in sql_trace.top(n=sql_trace.MAX_STATEMENTS)
+                     if r['sql'] == 'BEGIN IMMEDIATE')
+        self.assertGreaterEqual(begin['lock_wait_ms'], 150)
+
+
+class TestLockRetry(TestLockWait):
+    """PARKING_SQL_LOCK_RETRY=1: the busy retry runs in Python."""
+
+    def setUp(self):
+        patcher = mock.patch.object(sql_trace, 'LOCK_RETRY', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+
+    def test_native_busy_timeout_is_kept(self):
+        conn = db.get_conn()
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 0)
+        conn.close()
+
+    def test_write_waits_and_records_lock_wait(self):
+        self.release_after(0.2)
+        db.register_entry('12ب345-67', 'in.jpg')
+
+        insert = stat_for('database.register_entry', 'INSERT INTO entries')
+        self.assertGreaterEqual(insert['lock_wait_ms'], 150)
+        self.assertEqual(db.count_active_cars(), 1)
+
+    def test_gives_up_after_timeout(self):
+        conn = sql_trace.connect(self.db_path, timeout=0.1)
+        started = time.perf_counter()
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO settings (key, value) VALUES ('x', '1')")
+        conn.close()
+        self.assertGreaterEqual(time.perf_counter() - started, 0.1)
+
+    def test_no_wait_while_holding_a_lock(self):
+        # مثل SQLite: با قفل SHARED در دست صبر نمی‌کند (دو نویسنده منتظر هم = بن‌بست)
+        self.other.rollback()
+        conn = db.get_conn()
+        conn.execute("BEGIN")
+        conn.execute("SELECT COUNT(*) FROM entries").fetchall()
+        self.other.execute("BEGIN IMMEDIATE")
+        started = time.perf_counter()
+        with self.assertRaises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO settings (key, value) VALUES ('x', '1')")
+        self.assertLess(time.perf_counter() - started, 1)
+        conn.rollback()
+        conn.close()
+
+
+class TestQueryBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.user_id = db.create_user('09121111111')
+        db.charge_wallet(self.user_id, 5000)
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_wallet_reads_use_one_connection(self):
+        with QueryBudget(2, max_connections=1):
+            db.get_wallet_transactions(self.user_id)
+        with QueryBudget(1, max_connections=1):
+            db.get_wallet_balance(self.user_id)
+
+    def test_exceeded_budget_lists_statements(self):
+        with self.assertRaises(QueryBudgetExceeded) as caught:
+            with QueryBudget(2, max_connections=1):
+                for _ in range(3):
+                    db.get_wallet_balance(self.user_id)
+        message = str(caught.exception)
+        self.assertIn('3 queries (budget 2)', message)
+        self.assertIn('3 connections (budget 1)', message)
+        self.assertIn('database.get_wallet_by_user_id: SELECT id, user_id, balance', message)
+
+    def test_nested_and_decorator(self):
+        @QueryBudget(1)
+        def one_read():
+            db.count_active_cars()
+
+        with QueryBudget(10) as outer:
+            one_read()
+            one_read()
+        self.assertEqual(len(outer.queries), 2)
+
+
+class TestQueryStatsEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.db_path, self.original_path, self.test_dir = setup_test_db()
+        self.client = Client()
+        user_id = db.create_user('09121111111', role='admin')
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {db.create_auth_token(user_id)}'}
+        sql_trace.stats.reset()
+
+    def tearDown(self):
+        cleanup_test_db(self.db_path, self.original_path, self.test_dir)
+
+    def test_top_statements_and_reset(self):
+        response = self.client.get('/api/admin/queries/?by=calls&limit=5', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertLessEqual(len(results), 5)
+        # احراز هویت همین درخواست
+        self.assertTrue(any(r['caller'] == 'database.validate_token' for r in results))
+
+        bad = self.client.get('/api/admin/queries/?by=nope', **self.headers)
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(self.client.delete('/api/admin/queries/', **self.headers).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertEqual(sql_trace.top(), [])
+
+    def test_requires_admin(self):
+        user_id = db.create_user('09122222222')
+        headers = {'HTTP_AUTHORIZATION': f'Token {db.create_auth_token(user_id)}'}
+        self.assertEqual(self.client.get('/api/admin/queries/', **headers).status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+
+if __name__ == '__main__':
+    unittest.main()